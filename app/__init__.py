@@ -13,7 +13,6 @@ from app.models.token_blacklist_model import TokenBlacklistModel
 from app.models.rol import RoleModel
 from app.controllers.cliente_controller import ClienteController
 from app.models.reclamo import ReclamoModel
-from app.models.chatbot_qa import ChatbotQA
 from app.views.admin_vehiculo_routes import vehiculo_bp
 from app.views.admin_despacho_routes import despacho_bp
 from types import SimpleNamespace
@@ -118,6 +117,7 @@ def _register_blueprints(app: Flask):
     from app.views.costos_fijos_routes import costos_fijos_bp
     from app.views.configuracion_produccion_routes import configuracion_produccion_bp
     from app.views.rol_routes import rol_bp
+    from app.views.admin_rendimiento_routes import admin_rendimiento_bp
 
     app.register_blueprint(main_bp)
     app.register_blueprint(public_bp)
@@ -162,6 +162,7 @@ def _register_blueprints(app: Flask):
     app.register_blueprint(costos_fijos_bp)
     app.register_blueprint(configuracion_produccion_bp)
     app.register_blueprint(rol_bp)
+    app.register_blueprint(admin_rendimiento_bp)
     from app.views.admin_zona_routes import zona_bp
     from app.views.admin_envio_routes import envio_bp
     app.register_blueprint(vehiculo_bp)
@@ -328,13 +329,24 @@ def create_app() -> Flask:
     from app.utils.template_helpers import setup_template_helpers
     setup_template_helpers(app)
 
-    with app.app_context():
-        chatbot_model = ChatbotQA()
-        chatbot_model.create_table_if_not_exists()
-
     _register_blueprints(app)
     _register_error_handlers(app)
 
+    from app.utils.query_profiler import init_query_profiler
+    init_query_profiler(app)
+
+    from app.services.hechos_produccion_service import init_hechos_produccion_cli
+    init_hechos_produccion_cli(app)
+
+    from app.services.costeo_service import init_costeo_cli
+    init_costeo_cli(app)
+
+    from app.utils.startup_profiler import init_startup_profiler_cli
+    init_startup_profiler_cli(app)
+
+    from app.services.ingesta_service import init_ingesta_cli
+    init_ingesta_cli(app)
+
     @app.before_request
     def before_request_loader():
         """
@@ -26,6 +26,14 @@ class Config:
     CREDIT_ALERT_THRESHOLD = int(os.getenv('CREDIT_ALERT_THRESHOLD', 2))
 
 
+    # Query Profiler (ver app/utils/query_profiler.py)
+    QUERY_PROFILER_ENABLED = os.getenv('QUERY_PROFILER_ENABLED', 'true').lower() in ('true', '1', 't')
+    QUERY_PROFILER_SAMPLE_RATE = float(os.getenv('QUERY_PROFILER_SAMPLE_RATE', 1.0))
+    QUERY_PROFILER_N1_THRESHOLD = int(os.getenv('QUERY_PROFILER_N1_THRESHOLD', 5))
+
+    # Secreto compartido con el Apps Script de Google Forms (header X-Webhook-Token).
+    GOOGLE_FORMS_WEBHOOK_SECRET = os.getenv('GOOGLE_FORMS_WEBHOOK_SECRET')
+
     # Pagination
     DEFAULT_PAGE_SIZE = 20
     MAX_PAGE_SIZE = 100
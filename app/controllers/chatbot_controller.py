@@ -1,53 +1,51 @@
-from flask import jsonify
+from flask import jsonify, make_response
 from app.models.chatbot_qa import ChatbotQA
+from app.services.chatbot_service import get_arbol_chatbot, invalidar_arbol_chatbot
 
 class ChatbotController:
     
     def __init__(self):
         self.model = ChatbotQA()
     
-    def get_all_active_qas(self):
+    def get_all_active_qas(self, if_none_match=None):
         """Obtiene todas las Q&As activas de nivel superior y añade una opción de fallback."""
         try:
-            # Filtrar por parent_id IS NULL para obtener solo las preguntas principales
-            result = self.model.db.table('chatbot_qa').select('*').eq('activo', True).is_('parent_id', None).execute()
-            
-            # Añadir la opción estática al final
-            qas = result.data
-            qas.append({
-                'id': -1,
-                'pregunta': 'No encuentro mi respuesta',
-                'respuesta': 'Serás redirigido a la página de consultas.',
-                'type': 'redirect',
-                'url': '/public/consulta'
-            })
-            
-            return jsonify({
-                'success': True,
-                'data': qas
-            }), 200
-            
+            qas, etag = get_arbol_chatbot().raices()
+            return self._respuesta_cacheable(qas, etag, if_none_match)
         except Exception as e:
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
 
-    def get_children_qas(self, parent_id):
+    def get_children_qas(self, parent_id, if_none_match=None):
         """Obtiene las Q&As hijas de una pregunta padre."""
         try:
-            result = self.model.db.table('chatbot_qa').select('*').eq('activo', True).eq('parent_id', parent_id).execute()
-            
-            return jsonify({
-                'success': True,
-                'data': result.data
-            }), 200
-            
+            qas, etag = get_arbol_chatbot().hijos(parent_id)
+            return self._respuesta_cacheable(qas, etag, if_none_match)
         except Exception as e:
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
+
+    @staticmethod
+    def _respuesta_cacheable(qas, etag, if_none_match=None):
+        """
+        Respuesta con ETag: 304 sin cuerpo si el cliente ya tiene esa versión.
+        `no-cache` obliga al navegador a revalidar, así un cambio del admin se ve enseguida.
+        """
+        etags_cliente = {e.strip().removeprefix('W/').strip('"') for e in (if_none_match or '').split(',')}
+        if etag in etags_cliente:
+            resp = make_response('', 304)
+        else:
+            resp = jsonify({
+                'success': True,
+                'data': qas
+            })
+        resp.headers['ETag'] = f'"{etag}"'
+        resp.headers['Cache-Control'] = 'public, no-cache'
+        return resp, resp.status_code
     
     def get_all_qas_for_admin(self):
         """Obtiene todas las Q&As (activas e inactivas) para el admin"""
@@ -87,6 +85,7 @@ class ChatbotController:
             }
             
             result = self.model.db.table('chatbot_qa').insert(nuevo_registro).execute()
+            invalidar_arbol_chatbot()
             
             return jsonify({
                 'success': True,
@@ -120,6 +119,7 @@ class ChatbotController:
             }
             
             result = self.model.db.table('chatbot_qa').update(actualizacion).eq('id', qa_id).execute()
+            invalidar_arbol_chatbot()
             
             if not result.data:
                 return jsonify({
@@ -148,6 +148,7 @@ class ChatbotController:
             result = self.model.db.table('chatbot_qa').update({
                 'activo': nuevo_estado
             }).eq('id', qa_id).execute()
+            invalidar_arbol_chatbot()
             
             if not result.data:
                 return jsonify({
@@ -173,6 +174,7 @@ class ChatbotController:
             result = self.model.db.table('chatbot_qa').update({
                 'activo': False
             }).eq('id', qa_id).execute()
+            invalidar_arbol_chatbot()
             
             if not result.data:
                 return jsonify({
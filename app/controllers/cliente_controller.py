@@ -8,6 +8,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from typing import Dict, Optional
 import logging
 from app.config import Config
+from app.utils.estados import calcular_transiciones_crediticias
 from decimal import Decimal
 
 
@@ -500,26 +501,38 @@ class ClienteController(BaseController):
         """
         Recalcula el estado crediticio para todos los clientes.
         Devuelve el número de clientes cuyo estado fue modificado.
+
+        Trabaja por conjuntos: los estados vienen con el conteo de pedidos
+        vencidos agrupado en la base, las transiciones se calculan en memoria
+        y se aplica un UPDATE masivo por estado destino, sin consultas por
+        cliente.
         """
         try:
-            clientes_afectados = 0
-            clientes_result = self.model.get_all()
+            clientes_result = self.model.get_estados_crediticios()
             if not clientes_result.get('success'):
                 logger.error("No se pudieron obtener los clientes para recalcular el estado crediticio.")
                 return 0
 
-            for cliente in clientes_result['data']:
-                pedidos_vencidos_result = self.pedido_controller.model.find_all({'id_cliente': cliente['id'], 'estado_pago': 'vencido'})
-                
-                if pedidos_vencidos_result.get('success'):
-                    conteo_vencidos = len(pedidos_vencidos_result['data'])
-                    umbral_alertado = Config.CREDIT_ALERT_THRESHOLD
-                    
-                    nuevo_estado = 'alertado' if conteo_vencidos > umbral_alertado else 'normal'
+            clientes = clientes_result['data']
+            if all('vencidos' in c for c in clientes):
+                # El conteo agrupado ya vino con los clientes.
+                vencidos = {c['id']: c['vencidos'] for c in clientes}
+            else:
+                vencidos_result = self.pedido_controller.model.contar_vencidos_por_cliente()
+                if not vencidos_result.get('success'):
+                    logger.error("No se pudieron contar los pedidos vencidos para recalcular el estado crediticio.")
+                    return 0
+                vencidos = vencidos_result['data']
+
+            transiciones = calcular_transiciones_crediticias(clientes, vencidos, Config.CREDIT_ALERT_THRESHOLD)
 
-                    if cliente.get('estado_crediticio') != nuevo_estado:
-                        self.model.update(cliente['id'], {'estado_crediticio': nuevo_estado}, 'id')
-                        clientes_afectados += 1
+            clientes_afectados = 0
+            for nuevo_estado, cliente_ids in transiciones.items():
+                update_result = self.model.actualizar_estado_crediticio_masivo(cliente_ids, nuevo_estado)
+                if update_result.get('success'):
+                    clientes_afectados += update_result['count']
+                else:
+                    logger.error(f"No se pudo pasar a '{nuevo_estado}' a {len(cliente_ids)} clientes: {update_result.get('error')}")
             return clientes_afectados
         except Exception as e:
             logger.error(f"Error recalculando el estado crediticio de todos los clientes: {e}", exc_info=True)
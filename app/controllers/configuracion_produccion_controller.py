@@ -5,6 +5,7 @@ import calendar
 from app.controllers.base_controller import BaseController
 from app.models.configuracion_produccion import ConfiguracionProduccionModel
 from app.models.calendario_excepcion import CalendarioExcepcionModel
+from app.services.costeo_service import propagar_cambio_costos
 
 logger = logging.getLogger(__name__)
 
@@ -88,7 +89,8 @@ class ConfiguracionProduccionController(BaseController):
             if not result.get('success'):
                 return self.error_response(f"Error al actualizar la configuración para ID {config_id}.")
             updated_configs.append(result['data'])
-        
+
+        propagar_cambio_costos(configuracion=True)
         return self.success_response(updated_configs, "Configuración actualizada exitosamente.")
 
     def get_calendario_mensual(self, year: int, month: int):
@@ -1,5 +1,6 @@
 from app.controllers.base_controller import BaseController
 from app.models.costo_fijo import CostoFijoModel
+from app.services.costeo_service import propagar_cambio_costos
 from flask_jwt_extended import get_jwt_identity
 import logging
 
@@ -70,6 +71,7 @@ class CostoFijoController(BaseController):
                     'usuario_id': usuario_id
                 }
                 self.model.db.table('historial_costos_fijos').insert(historial_data).execute()
+                propagar_cambio_costos(costos_fijos=[costo_fijo_id])
 
             return self.success_response(result['data'], "Costo fijo actualizado exitosamente.")
 
@@ -83,6 +85,7 @@ class CostoFijoController(BaseController):
         """
         result = self.model.delete(costo_fijo_id, soft_delete=True)
         if result.get('success'):
+            propagar_cambio_costos(costos_fijos=[costo_fijo_id])
             return self.success_response(message="Costo fijo desactivado exitosamente.")
         return self.error_response(result.get('error', 'No se pudo desactivar el costo fijo.'))
     
@@ -94,6 +97,7 @@ class CostoFijoController(BaseController):
             result = self.model.update(costo_fijo_id, {'activo': True})
             
             if result.get('success'):
+                propagar_cambio_costos(costos_fijos=[costo_fijo_id])
                 return self.success_response(message="Costo fijo reactivado exitosamente.")
             return self.error_response(result.get('error', 'No se pudo reactivar el costo fijo.'))
 
@@ -1,6 +1,6 @@
+from __future__ import annotations
+
 import os
-import cv2
-import numpy as np
 import base64
 import re
 import json
@@ -16,11 +16,12 @@ from app.utils.date_utils import get_now_in_argentina
 from app.models.totem_2fa_token import Totem2FATokenModel
 from app.services.email_service import send_email
 from app.controllers.registro_controller import RegistroController
+from app.utils.lazy_import import disponible, lazy_import
 
-try:
-    import face_recognition
-except ImportError:
-    face_recognition = None
+# OpenCV y face_recognition tardan en importarse: se cargan en el primer reconocimiento.
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+face_recognition = lazy_import('face_recognition')
 
 logger = logging.getLogger(__name__)
 
@@ -206,7 +207,7 @@ class FacialController:
         Identifica un usuario comparando una imagen facial con los perfiles
         registrados en la base de datos.
         """
-        if face_recognition is None:
+        if not disponible(face_recognition):
             return {'success': False, 'message': 'Librería de reconocimiento facial no disponible.'}
 
         t0 = time.time()
@@ -248,7 +249,7 @@ class FacialController:
         """
         Valida que una imagen contenga un único rostro, que no esté ya registrado, y devuelve su codificación.
         """
-        if face_recognition is None:
+        if not disponible(face_recognition):
             return {'success': False, 'message': 'Librería de reconocimiento facial no disponible.'}
             
         frame = self._get_image_from_data_url(image_data_url)
@@ -22,11 +22,13 @@ from app.models.nota_credito import NotaCreditoModel
 from app.models.alerta_riesgo import AlertaRiesgoModel
 from app.models.reclamo_proveedor_model import ReclamoProveedorModel
 from app.models.costo_fijo import CostoFijoModel
+from app.models.hecho_produccion_op import HechoProduccionOPModel
 from app.controllers.reporte_produccion_controller import ReporteProduccionController
 from app.controllers.reporte_stock_controller import ReporteStockController
 from app.controllers.rentabilidad_controller import RentabilidadController
 from decimal import Decimal
 from app.utils import estados
+from app.services.hechos_produccion_service import RegistradorHechosProduccion, calcular_oee_desde_hechos
 import logging
 from collections import defaultdict, Counter
 
@@ -46,6 +48,7 @@ class IndicadoresController:
         self.receta_model = RecetaModel()
         self.registro_paro_model = RegistroParoModel()
         self.bloqueo_capacidad_model = BloqueoCapacidadModel()
+        self.hecho_produccion_model = HechoProduccionOPModel()
         self.reclamo_model = ReclamoModel()
         self.pedido_model = PedidoModel()
         self.control_calidad_insumo_model = ControlCalidadInsumoModel()
@@ -1693,6 +1696,37 @@ class IndicadoresController:
         return carga_total
 
     def _calcular_oee(self, fecha_inicio, fecha_fin):
+        """
+        OEE del período como sumas sobre los hechos de producción por OP
+        (hechos_produccion_op). Las OPs del período que todavía no tienen
+        hecho (backfill parcial, o notificadas y aún en la ventana del
+        registrador) se calculan al vuelo desde sus datos crudos, así el
+        resultado no depende de qué parte del período esté materializada.
+        """
+        hechos_res = self.hecho_produccion_model.obtener_en_rango('fecha_inicio', fecha_inicio, fecha_fin)
+        ops_res = self.orden_produccion_model.find_all(filters={
+            'fecha_inicio_gte': fecha_inicio.isoformat(),
+            'fecha_inicio_lte': fecha_fin.isoformat()
+        }, select_columns=['id'])
+        if not hechos_res.get('success') or not ops_res.get('success'):
+            return self._calcular_oee_desde_ops(fecha_inicio, fecha_fin)
+        hechos = hechos_res.get('data') or []
+        con_hecho = {h['orden_produccion_id'] for h in hechos}
+        sin_hecho = [op['id'] for op in ops_res.get('data') or [] if op['id'] not in con_hecho]
+        if sin_hecho:
+            hechos += RegistradorHechosProduccion(ventana=0).construir(sin_hecho)
+
+        bloqueos_linea_res = self.bloqueo_capacidad_model.find_all(filters={
+            'fecha_gte': fecha_inicio.isoformat(),
+            'fecha_lte': fecha_fin.isoformat()
+        }, select_columns=['minutos_bloqueados'])
+        minutos_bloqueados = 0
+        if bloqueos_linea_res.get('success'):
+            minutos_bloqueados = sum(b.get('minutos_bloqueados') or 0 for b in bloqueos_linea_res.get('data', []))
+
+        return calcular_oee_desde_hechos(hechos, float(minutos_bloqueados))
+
+    def _calcular_oee_desde_ops(self, fecha_inicio, fecha_fin):
         ordenes_res = self.orden_produccion_model.get_all_in_date_range(fecha_inicio, fecha_fin)
         ordenes_en_periodo = ordenes_res.get('data', [])
         if not ordenes_en_periodo:
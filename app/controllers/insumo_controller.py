@@ -12,6 +12,9 @@ from app.utils.serializable import safe_serialize
 from marshmallow import ValidationError
 import math
 from app.models.proveedor import ProveedorModel
+from app.services.stock_ledger_service import get_stock_ledger
+from app.services.reposicion_service import (get_planificador_reposicion, necesita_reposicion, cantidad_a_reponer,
+                                             faltantes_proyectados_a_reponer)
 from datetime import date
 
 
@@ -456,14 +459,22 @@ class InsumoController(BaseController):
         """
         Calcula y actualiza el stock disponible (actual) de un insumo basado en
         la disponibilidad real de sus lotes (físico - reservado).
+
+        El saldo sale del libro de movimientos (las reservas ya descuentan la
+        cantidad física del lote al hacerse); sólo si el libro no está
+        disponible se recalcula recorriendo lotes y reservas.
         """
         try:
-            from app.controllers.inventario_controller import InventarioController
-            inventario_controller = InventarioController()
-            
-            lotes_con_disponibilidad = inventario_controller._obtener_lotes_con_disponibilidad(id_insumo)
-            
-            stock_disponible_total = sum(lote['disponibilidad'] for lote in lotes_con_disponibilidad)
+            ledger = get_stock_ledger()
+            stock_disponible_total = ledger.saldo_insumo(id_insumo) if ledger is not None else None
+
+            if stock_disponible_total is None:
+                from app.controllers.inventario_controller import InventarioController
+                inventario_controller = InventarioController()
+
+                lotes_con_disponibilidad = inventario_controller._obtener_lotes_con_disponibilidad(id_insumo)
+
+                stock_disponible_total = sum(lote['disponibilidad'] for lote in lotes_con_disponibilidad)
 
             # Actualizar el campo stock_actual en la tabla de insumos
             update_data = {'stock_actual': stock_disponible_total}
@@ -486,38 +497,40 @@ class InsumoController(BaseController):
             logger.error(f"Error crítico actualizando stock de insumo {id_insumo}: {str(e)}")
             return self.error_response(f'Error interno del servidor: {str(e)}', 500)
 
+    def actualizar_stock_insumos(self, insumo_ids: List[str]) -> Dict:
+        """
+        Versión en lote de `actualizar_stock_insumo` para cambios que tocan
+        muchos lotes a la vez (p. ej. una alerta de riesgo): la función
+        `actualizar_stock_insumos` copia en la base el saldo de cada insumo del
+        libro de movimientos a stock_actual, sin tocar el resto del catálogo.
+        Si la función no está instalada, recalcula de a un insumo.
+        """
+        insumo_ids = list(dict.fromkeys(str(i) for i in insumo_ids if i))
+        if not insumo_ids:
+            return {'success': True, 'data': []}
+        try:
+            actualizados = self.insumo_model.db.rpc('actualizar_stock_insumos', {'p_ids': insumo_ids}).execute().data or []
+        except Exception as e:
+            logger.warning(f"RPC actualizar_stock_insumos no disponible ({e}). Se actualiza por insumo.")
+            for id_insumo in insumo_ids:
+                self.actualizar_stock_insumo(id_insumo)
+            return {'success': True, 'data': []}
+        for insumo in actualizados:
+            self._verificar_y_reponer_stock(insumo)
+        logger.info(f"Stock disponible actualizado para {len(actualizados)} insumos.")
+        return {'success': True, 'data': actualizados}
+
     def _verificar_y_reponer_stock(self, insumo_actualizado: Dict):
         """
         Wrapper que se llama desde 'actualizar_stock_insumo'.
-        Verifica si el insumo está bajo stock y, de ser así,
-        dispara la lógica de OC para *todo* su proveedor.
+        Si el insumo quedó bajo stock, lo señala al planificador de reposición,
+        que agrupa las señales de una ventana corta y genera a lo sumo una OC
+        por proveedor (en lugar de evaluar el proveedor completo en cada cambio).
         """
         try:
-            stock_actual = float(insumo_actualizado.get('stock_actual') or 0)
-            stock_min = float(insumo_actualizado.get('stock_min') or 0)
-            en_espera = insumo_actualizado.get('en_espera_de_reestock', False)
-
-            if not en_espera and stock_actual < stock_min:
-                logger.info(f"Disparador de detalle: Insumo {insumo_actualizado['nombre']} bajo stock. Verificando OC para su proveedor.")
-                
-                proveedor_id = insumo_actualizado.get('id_proveedor')
-                proveedor_default_id = None
-                
-                # 1. Obtener el ID del proveedor default (PRV-0001)
-                default_prov_res = ProveedorModel().get_all(filtros={'codigo': 'PRV-0001'})
-                if default_prov_res.get('success') and default_prov_res.get('data'):
-                    proveedor_default_id = default_prov_res['data'][0]['id']
-                
-                if not proveedor_id:
-                    if proveedor_default_id:
-                        proveedor_id = proveedor_default_id
-                    else:
-                        logger.error(f"Insumo {insumo_actualizado['nombre']} sin proveedor y no se encontró PRV-0001. No se puede generar OC.")
-                        return
-                
-                # Llamamos a la función centralizada, pasando el ID del proveedor y el ID default
-                self._generar_oc_automatica_por_proveedor(proveedor_id, proveedor_default_id)
-        
+            if get_planificador_reposicion().notificar(insumo_actualizado):
+                logger.info(f"Disparador de detalle: Insumo {insumo_actualizado.get('nombre')} bajo stock. "
+                            "Señalado al planificador de reposición.")
         except Exception as e:
             logger.error(f"Error en _verificar_y_reponer_stock (wrapper) para insumo {insumo_actualizado.get('id_insumo')}: {e}", exc_info=True)
 
@@ -526,13 +539,9 @@ class InsumoController(BaseController):
         Método unificado para revisar todos los insumos y generar OCs automáticas.
         """
         try:
-            # 1. Obtener el ID del proveedor default (PRV-0001)
-            proveedor_default_id = None
-            default_prov_res = ProveedorModel().get_all(filtros={'codigo': 'PRV-0001'})
-            if default_prov_res.get('success') and default_prov_res.get('data'):
-                proveedor_default_id = default_prov_res['data'][0]['id']
-            else:
-                logger.warning("Disparador automático: No se encontró proveedor 'PRV-0001'. Insumos sin proveedor no se repondrán.")
+            # 1. Proveedor default (PRV-0001) y usuario de sistema, cacheados por el planificador
+            contexto = get_planificador_reposicion().contexto()
+            proveedor_default_id = contexto['proveedor_default_id']
 
             # 2. Buscar *todos* los insumos activos que no estén ya en espera
             insumos_a_chequear_result = self.insumo_model.find_all(filters={
@@ -543,13 +552,12 @@ class InsumoController(BaseController):
             if insumos_a_chequear_result.get('success'):
                 insumos_para_revisar = insumos_a_chequear_result.get('data', [])
                 proveedores_para_oc = set() # Usamos un 'set' para evitar duplicados
+                # Faltantes anticipados por la proyección MRP dentro del plazo de entrega
+                faltantes = faltantes_proyectados_a_reponer(insumos_para_revisar)
 
                 # 3. Iterar para encontrar *qué proveedores* necesitan una OC
                 for insumo in insumos_para_revisar:
-                    stock = float(insumo.get('stock_actual') or 0)
-                    minimo = float(insumo.get('stock_min') or 0)
-                    
-                    if stock < minimo:
+                    if necesita_reposicion(insumo) or insumo.get('id_insumo') in faltantes:
                         proveedor_id = insumo.get('id_proveedor')
                         if proveedor_id:
                             proveedores_para_oc.add(proveedor_id)
@@ -557,174 +565,147 @@ class InsumoController(BaseController):
                             # Si no tiene proveedor, se asigna al default
                             proveedores_para_oc.add(proveedor_default_id)
                 
-                # 4. Ahora, para cada proveedor, generar *una* OC
+                # 4. Una única pasada genera *una* OC por proveedor
                 if proveedores_para_oc:
                     logger.info(f"Disparador automático: Se generarán OCs para {len(proveedores_para_oc)} proveedores.")
-                    for prov_id in proveedores_para_oc:
-                        # Llamamos a la función refactorizada, pasando el ID default
-                        self._generar_oc_automatica_por_proveedor(prov_id, proveedor_default_id)
+                    self._generar_ocs_automaticas(sorted(proveedores_para_oc, key=str), proveedor_default_id,
+                                                  contexto['usuario'], faltantes)
                 
         except Exception as e_auto_oc:
             logger.error(f"Error crítico en el disparador automático de OCs: {e_auto_oc}", exc_info=True)
 
     def _generar_oc_automatica_por_proveedor(self, proveedor_id: str, default_prov_id: Optional[str]):
         """
-        Función central: Genera UNA orden de compra para un proveedor,
-        agrupando TODOS sus insumos con bajo stock.
-        
-        Si proveedor_id == default_prov_id, buscará insumos con ese ID Y también
-        insumos con id_proveedor = NULL.
+        Genera UNA orden de compra para un proveedor, agrupando TODOS sus
+        insumos con bajo stock. Ver `_generar_ocs_automaticas`.
         """
-        try:
-            logger.info(f"Generando OC automática para Proveedor ID: {proveedor_id} (Default ID: {default_prov_id})")
-            proveedor_model = ProveedorModel()
-
-            # 1. Obtener datos del proveedor (para el log)
-            prov_data = proveedor_model.find_by_id(proveedor_id)
-            proveedor_nombre_logging = f"ID {proveedor_id}"
-            if prov_data.get('success'):
-                proveedor_nombre_logging = prov_data['data'].get('nombre', proveedor_nombre_logging)
-
-            # 2. Determinar el ID del usuario creador
-            from app.models.usuario import UsuarioModel 
-            usuario_model = UsuarioModel()
-            ID_USUARIO_SISTEMA = 1 
-            usuario_res = usuario_model.find_by_id(ID_USUARIO_SISTEMA)
-            if not (usuario_res and usuario_res.get('success') and usuario_res.get('data')):
-                logger.error(f"FATAL: No se encontró al usuario de sistema con ID {ID_USUARIO_SISTEMA}. Abortando OC para {proveedor_nombre_logging}.")
-                return
-            id_usuario_creador = usuario_res['data']['id']
-            username_log = usuario_res['data'].get('username', f"ID: {id_usuario_creador}")
-
-            # 3. --- LÓGICA DE QUERY CORREGIDA ---
-            # Buscar TODOS los insumos de este proveedor que necesiten reposición
-            # Esta consulta es manual porque find_all() no soporta el 'OR' que necesitamos.
-            
-            query = (self.insumo_model.db.table(self.insumo_model.get_table_name())
-                         .select("*, proveedor:id_proveedor(*)")
-                         .eq('en_espera_de_reestock', False)
-                         .eq('activo', True))
-
-            if str(proveedor_id) == str(default_prov_id) and default_prov_id is not None:
-                # Es el proveedor default, buscar su ID O 'NULL'
-                logger.info(f"Consulta para proveedor DEFAULT: id_proveedor = {proveedor_id} O id_proveedor = NULL")
-                query = query.or_(f'id_proveedor.eq.{proveedor_id},id_proveedor.is.null')
-            else:
-                # Es un proveedor normal, buscar solo su ID
-                logger.info(f"Consulta para proveedor normal: id_proveedor = {proveedor_id}")
-                query = query.eq('id_proveedor', proveedor_id)
-            
-            response = query.execute()
-            
-            if not response.data:
-                logger.info(f"La consulta de insumos para {proveedor_nombre_logging} no devolvió resultados.")
-                insumos_a_reponer_result = {'success': True, 'data': []}
-            else:
-                insumos_a_reponer_result = {'success': True, 'data': response.data}
-                
-            # --- FIN LÓGICA DE QUERY CORREGIDA ---
-
-            if not insumos_a_reponer_result.get('success'):
-                logger.error(f"No se pudieron obtener los insumos del proveedor {proveedor_nombre_logging}.")
-                return
-
-            items_para_oc = []
-            insumos_para_marcar_en_espera = []
-            subtotal_calculado = 0.0
+        usuario = get_planificador_reposicion().contexto()['usuario']
+        return self._generar_ocs_automaticas([proveedor_id], default_prov_id, usuario)
 
-            for insumo in insumos_a_reponer_result.get('data', []):
-                stock = float(insumo.get('stock_actual') or 0)
-                minimo = float(insumo.get('stock_min') or 0)
-
-                if stock < minimo:
-                    insumo_completo_res = self.insumo_model.find_by_id(insumo['id_insumo'], 'id_insumo')
-                    if not insumo_completo_res.get('success'):
-                        logger.warning(f"No se pudo obtener el detalle completo del insumo {insumo['id_insumo']} para OC automática.")
-                        continue
-                    
-                    insumo_completo = insumo_completo_res.get('data', {})
-                    cantidad_a_pedir = math.ceil(minimo - stock)
-                    precio_unitario = float(insumo_completo.get('precio_unitario') or 0)
-                    
-                    items_para_oc.append({
-                        'insumo_id': insumo['id_insumo'],
-                        'cantidad_solicitada': cantidad_a_pedir,
-                        'precio_unitario': precio_unitario,
-                        'cantidad_recibida': 0.0
-                    })
-                    insumos_para_marcar_en_espera.append(insumo['id_insumo'])
-
-            if not items_para_oc:
-                logger.info(f"No se encontraron insumos CON BAJO STOCK (que no estén 'en espera') para el proveedor {proveedor_nombre_logging}.")
-                return
-
-            # 4. Calcular Totales (Asumimos IVA 21%)
-            iva_calculado = subtotal_calculado * 0.21
-            total_calculado = subtotal_calculado + iva_calculado
-
-            # 5. Marcar los insumos como "en espera" ANTES de crear la OC
+    def _generar_ocs_automaticas(self, proveedor_ids: List[str], default_prov_id: Optional[str],
+                                 usuario: Optional[Dict], faltantes: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """
+        Función central: genera a lo sumo UNA orden de compra por proveedor,
+        agrupando TODOS sus insumos con bajo stock o con un faltante proyectado
+        por el MRP dentro de su plazo de entrega. Los insumos de todos los
+        proveedores se leen en una sola consulta; si el proveedor default está
+        en la lista, también se incluyen los insumos con id_proveedor = NULL.
+        Devuelve un resultado por proveedor con OC creada.
+        """
+        resultados = []
+        try:
+            if not usuario:
+                logger.error(f"FATAL: No se encontró al usuario de sistema. Abortando OCs automáticas para {len(proveedor_ids)} proveedores.")
+                return resultados
+            id_usuario_creador = usuario['id']
+            username_log = usuario.get('username', f"ID: {id_usuario_creador}")
+
+            incluir_sin_proveedor = default_prov_id is not None and str(default_prov_id) in {str(p) for p in proveedor_ids}
+            candidatos_result = self.insumo_model.obtener_candidatos_reposicion(proveedor_ids, incluir_sin_proveedor)
+            if not candidatos_result.get('success'):
+                logger.error(f"No se pudieron obtener los insumos de {len(proveedor_ids)} proveedores para OC automática.")
+                return resultados
+
+            candidatos = candidatos_result.get('data', [])
+            if faltantes is None:
+                faltantes = faltantes_proyectados_a_reponer(candidatos)
+
+            # 1. Agrupar por proveedor los insumos a reponer (los que no tienen proveedor van al default)
+            items_por_proveedor = {}
+            for insumo in candidatos:
+                faltante = faltantes.get(insumo['id_insumo'], 0.0)
+                if not necesita_reposicion(insumo) and not faltante:
+                    continue
+                proveedor_id = insumo.get('id_proveedor') or default_prov_id
+                items_por_proveedor.setdefault(proveedor_id, []).append({
+                    'insumo_id': insumo['id_insumo'],
+                    'cantidad_solicitada': cantidad_a_reponer(insumo, faltante),
+                    'precio_unitario': float(insumo.get('precio_unitario') or 0),
+                    'cantidad_recibida': 0.0
+                })
+
+            if not items_por_proveedor:
+                logger.info("No se encontraron insumos CON BAJO STOCK (que no estén 'en espera') para los proveedores señalados.")
+                return resultados
+
+            # 2. Nombres de proveedores (para el log y la observación de la OC), en una consulta
+            nombres = {}
+            proveedores_res = ProveedorModel().find_all(filters={'id': list(items_por_proveedor.keys())})
+            for proveedor in proveedores_res.get('data') or []:
+                nombres[str(proveedor['id'])] = proveedor.get('nombre')
+
+            # 3. Marcar los insumos como "en espera" ANTES de crear las OCs
             #    para evitar que otro proceso los tome.
-            for insumo_id in insumos_para_marcar_en_espera:
-                self.insumo_model.marcar_en_espera(insumo_id)
+            todos_los_insumos = [item['insumo_id'] for items in items_por_proveedor.values() for item in items]
+            self.insumo_model.marcar_en_espera_masivo(todos_los_insumos)
 
-            # 6. Crear la Orden de Compra
+            # 4. Crear una Orden de Compra por proveedor
             from app.controllers.orden_compra_controller import OrdenCompraController
             orden_compra_controller = OrdenCompraController()
-            datos_oc = {
-                'proveedor_id': proveedor_id,
-                'estado': 'APROBADA',
-                'fecha_emision': date.today().isoformat(),
-                'prioridad': 'ALTA',
-                'observaciones': f"Orden de compra generada automáticamente por bajo stock. Proveedor: {proveedor_nombre_logging}. Creada por: {username_log}."
-            }
-
-            resultado_oc = orden_compra_controller.crear_orden(datos_oc, items_para_oc, id_usuario_creador)
-
-            if resultado_oc.get('success'):
-                oc_data = resultado_oc.get('data', {})
-                oc_codigo = oc_data.get('codigo_oc', 'N/A')
-                oc_id = oc_data.get('id')
-                logger.info(f"Orden de compra {oc_codigo} creada exitosamente para {len(items_para_oc)} insumos del proveedor {proveedor_nombre_logging}.")
-                
-                # 7. Lógica de Notificación (sin cambios)
-                from app.controllers.usuario_controller import UsuarioController
-                from app.models.rol import RoleModel
-                from app.models.notificacion import NotificacionModel
-
-                usuario_controller = UsuarioController()
-                role_model = RoleModel()
-                notificacion_model = NotificacionModel()
-                roles_a_notificar = ['GERENTE', 'SUPERVISOR']
-                usuarios_a_notificar = []
-                
-                for codigo_rol in roles_a_notificar:
-                    rol_result = role_model.find_by_codigo(codigo_rol)
-                    if rol_result.get('success'):
-                        rol_id = rol_result['data']['id']
-                        usuarios = usuario_controller.obtener_todos_los_usuarios(filtros={'role_id': rol_id, 'activo': True})
-                        usuarios_a_notificar.extend(usuarios)
-
-                mensaje = f"OC automática {oc_codigo} creada por bajo stock."
-                url_destino = f"/ordenes_compra/view/{oc_id}"
-
-                for usuario in usuarios_a_notificar:
-                    notificacion_data = {
-                        'usuario_id': usuario['id'],
-                        'mensaje': mensaje,
-                        'tipo': 'ADVERTENCIA',
-                        'url_destino': url_destino
-                    }
-                    notificacion_model.create(notificacion_data)
-                logger.info(f"Notificaciones enviadas a {len(usuarios_a_notificar)} usuarios para la OC {oc_codigo}.")
-
-            else:
-                logger.error(f"Fallo al crear la orden de compra automática para {proveedor_nombre_logging}: {resultado_oc.get('error')}")
-                # Revertir el estado 'en_espera_de_reestock' si la OC falla
-                for insumo_id in insumos_para_marcar_en_espera:
-                    self.insumo_model.quitar_en_espera(insumo_id)
+            insumos_a_revertir = []
+            for proveedor_id, items_para_oc in items_por_proveedor.items():
+                proveedor_nombre_logging = nombres.get(str(proveedor_id)) or f"ID {proveedor_id}"
+                datos_oc = {
+                    'proveedor_id': proveedor_id,
+                    'estado': 'APROBADA',
+                    'fecha_emision': date.today().isoformat(),
+                    'prioridad': 'ALTA',
+                    'observaciones': f"Orden de compra generada automáticamente por bajo stock. Proveedor: {proveedor_nombre_logging}. Creada por: {username_log}."
+                }
+                resultado_oc = orden_compra_controller.crear_orden(datos_oc, items_para_oc, id_usuario_creador)
+
+                if resultado_oc.get('success'):
+                    oc_data = resultado_oc.get('data', {})
+                    logger.info(f"Orden de compra {oc_data.get('codigo_oc', 'N/A')} creada exitosamente para {len(items_para_oc)} insumos del proveedor {proveedor_nombre_logging}.")
+                    resultados.append({'proveedor_id': proveedor_id, 'orden_compra': oc_data, 'items': len(items_para_oc)})
+                else:
+                    logger.error(f"Fallo al crear la orden de compra automática para {proveedor_nombre_logging}: {resultado_oc.get('error')}")
+                    insumos_a_revertir.extend(item['insumo_id'] for item in items_para_oc)
+
+            # Revertir el estado 'en_espera_de_reestock' de las OCs que fallaron
+            if insumos_a_revertir:
+                self.insumo_model.marcar_en_espera_masivo(insumos_a_revertir, en_espera=False)
+
+            if resultados:
+                self._notificar_ocs_automaticas([r['orden_compra'] for r in resultados])
 
         except Exception as e:
-            logger.error(f"Error crítico en _generar_oc_automatica_por_proveedor para ID {proveedor_id}: {e}", exc_info=True)
+            logger.error(f"Error crítico en _generar_ocs_automaticas para proveedores {proveedor_ids}: {e}", exc_info=True)
+        return resultados
+
+    def _notificar_ocs_automaticas(self, ordenes: List[Dict]):
+        """Avisa a gerentes y supervisores de las OCs automáticas creadas (destinatarios resueltos una vez)."""
+        from app.controllers.usuario_controller import UsuarioController
+        from app.models.rol import RoleModel
+        from app.models.notificacion import NotificacionModel
+
+        usuario_controller = UsuarioController()
+        role_model = RoleModel()
+        notificacion_model = NotificacionModel()
+        roles_a_notificar = ['GERENTE', 'SUPERVISOR']
+        usuarios_a_notificar = []
+
+        for codigo_rol in roles_a_notificar:
+            rol_result = role_model.find_by_codigo(codigo_rol)
+            if rol_result.get('success'):
+                rol_id = rol_result['data']['id']
+                usuarios = usuario_controller.obtener_todos_los_usuarios(filtros={'role_id': rol_id, 'activo': True})
+                usuarios_a_notificar.extend(usuarios)
+
+        for oc_data in ordenes:
+            oc_codigo = oc_data.get('codigo_oc', 'N/A')
+            mensaje = f"OC automática {oc_codigo} creada por bajo stock."
+            url_destino = f"/ordenes_compra/view/{oc_data.get('id')}"
+
+            for usuario in usuarios_a_notificar:
+                notificacion_data = {
+                    'usuario_id': usuario['id'],
+                    'mensaje': mensaje,
+                    'tipo': 'ADVERTENCIA',
+                    'url_destino': url_destino
+                }
+                notificacion_model.create(notificacion_data)
+            logger.info(f"Notificaciones enviadas a {len(usuarios_a_notificar)} usuarios para la OC {oc_codigo}.")
 
     def obtener_insumos_para_reclamo(self, filtros: Dict) -> tuple:
         """
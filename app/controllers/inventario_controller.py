@@ -27,6 +27,8 @@ from app.models.receta import RecetaModel # O donde tengas la lógica de recetas
 from app.models.reserva_insumo import ReservaInsumoModel # El nuevo modelo que debes crear
 from app.schemas.reserva_insumo_schema import ReservaInsumoSchema # El nuevo schema
 from app.models.trazabilidad import TrazabilidadModel
+from app.services.stock_ledger_service import movimiento_inventario
+from app.services.planificacion_snapshot_service import incrementar_version_plan
 from app.controllers.riesgo_controller import RiesgoController # Importación tardía para evitar ciclos
 
 
@@ -57,30 +59,13 @@ class InventarioController(BaseController):
 
     def get_all_stock_disponible_map(self) -> Dict:
         """
-        Obtiene el stock disponible de TODOS los insumos en una sola consulta
-        y lo devuelve como un mapa {insumo_id: stock_disponible}.
-
-        Utiliza la función RPC de Supabase 'get_stock_total_disponible'.
+        Obtiene el stock disponible de TODOS los insumos y lo devuelve como un
+        mapa {insumo_id: stock_disponible}, leyendo los saldos que mantiene el
+        libro de movimientos (sin recorrer lotes ni llamar a la RPC).
         """
-        try:
-            # --- ¡CORRECCIÓN! ---
-            # Cambiamos 'self.db.rpc' por 'self.inventario_model.db.rpc'
-            # (Usamos el modelo 'inventario_model' que se inicializa en __init__)
-            result = self.inventario_model.db.rpc('get_stock_total_disponible').execute()
-            # --- FIN CORRECCIÓN ---
-
-            # Convertir la lista de resultados en un mapa {id: stock}
-            stock_map = {
-                item['insumo_id']: Decimal(item['stock_disponible'])
-                for item in result.data
-            }
-
-            return {'success': True, 'data': stock_map}
-
-        except Exception as e:
-            logger.error(f"Error en get_all_stock_disponible_map: {e}", exc_info=True)
-            return {'success': False, 'error': str(e), 'data': {}}
+        return self.inventario_model.get_all_stock_disponible_map()
 
+    @movimiento_inventario('RESERVA')
     def reservar_stock_insumos_para_op(self, orden_produccion: Dict, usuario_id: int) -> dict:
         """
         Crea reservas de insumos Y DESCUENTA EL STOCK FÍSICO.
@@ -235,6 +220,7 @@ class InventarioController(BaseController):
             logger.error(f"Error crítico al consumir stock para OP {orden_produccion_id}: {e}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
+    @movimiento_inventario('LIBERACION')
     def liberar_stock_no_consumido_para_op(self, orden_produccion_id: int, insumo_id_perdido: int = None) -> dict:
         """
         Libera el stock de una OP cancelada o reseteada, devolviendo solo el stock "sano".
@@ -298,6 +284,7 @@ class InventarioController(BaseController):
 
             # 4. Cambiar el estado de todas las reservas de la OP a 'CANCELADO'
             self.reserva_insumo_model.db.table('reservas_insumos').update({'estado': 'CANCELADO'}).eq('orden_produccion_id', orden_produccion_id).execute()
+            incrementar_version_plan(f"reservas canceladas de OP {orden_produccion_id}")
 
             # 5. Actualizar stock consolidado de todos los insumos implicados
             for insumo_id in insumos_a_actualizar:
@@ -310,6 +297,7 @@ class InventarioController(BaseController):
             logger.error(f"Error crítico al liberar stock no consumido para OP {orden_produccion_id}: {e}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
+    @movimiento_inventario('CONSUMO')
     def consumir_stock_por_cantidad_producto(self, receta_id: int, cantidad_producto: float, op_id_referencia: int, motivo: str, usuario_id: int = None) -> dict:
         """
         Calcula los insumos necesarios para una cantidad de producto y los consume del inventario.
@@ -926,81 +914,34 @@ class InventarioController(BaseController):
 
     def obtener_lotes_agrupados_para_vista(self) -> tuple:
         """
-        Obtiene los lotes, los agrupa por insumo y enriquece con datos del catálogo.
-        CORRECCIÓN: Calcula el stock total sumando los lotes físicos, ignorando el campo
-        'stock_actual' de la tabla catálogo que puede estar desactualizado.
+        Resumen por insumo para la vista agrupada del inventario. Los totales
+        (físico, cuarentena y reservado) se agregan en la base en una sola
+        pasada; el stock mostrado es la suma de los lotes físicos, no el campo
+        'stock_actual' del catálogo, que puede estar desactualizado. El detalle
+        de lotes se pide aparte al expandir cada insumo
+        (`obtener_lotes_de_insumo_para_vista`).
         """
         try:
-            # 1. Obtener la lista definitiva de insumos desde el catálogo
-            catalogo_response = self.insumo_model.find_all(filters={'activo': True})
-            if not catalogo_response.get('success'):
-                return self.error_response(catalogo_response.get('error', 'No se pudo obtener el catálogo de insumos.'), 500)
-
-            insumos_del_catalogo = catalogo_response.get('data', [])
-
-            # 2. Obtener todos los lotes y agruparlos por insumo_id
-            lotes_response, _ = self.obtener_lotes_para_vista()
-            if not lotes_response.get('success'):
-                return self.error_response(lotes_response.get('error', 'No se pudieron obtener los lotes de inventario.'), 500)
-           # START MODIFICATION: Calculate reserved quantities
-            reservas_response = self.reserva_insumo_model.find_all(filters={'estado': 'RESERVADO'})
-            reservas_por_lote = {}
-            if reservas_response.get('success'):
-                for reserva in reservas_response.get('data', []):
-                    lote_id = reserva.get('lote_inventario_id')
-                    if lote_id:
-                        cantidad = float(reserva.get('cantidad_reservada', 0))
-                        reservas_por_lote[lote_id] = reservas_por_lote.get(lote_id, 0) + cantidad
-            # END MODIFICATION
-
-            lotes_por_insumo = {}
-            for lote in lotes_response.get('data', []):
-                insumo_id = lote.get('id_insumo')
-                if insumo_id:
-                    if insumo_id not in lotes_por_insumo:
-                        lotes_por_insumo[insumo_id] = []
-
-                    # Convertir cantidades a float para asegurar suma correcta
-                    # IMPORTANTE: Usamos cantidad_actual (físico disponible en lote)
-                    lote['cantidad_actual'] = float(lote.get('cantidad_actual') or 0)
-                    lote['cantidad_en_cuarentena'] = float(lote.get('cantidad_en_cuarentena') or 0)
-                    # START MODIFICATION: Add reserved quantity to lot
-                    lote['cantidad_reservada'] = reservas_por_lote.get(lote.get('id_lote'), 0)
-                    # END MODIFICATION
-                    lotes_por_insumo[insumo_id].append(lote)
-
-            # 3. Construir el resultado final iterando sobre los insumos del catálogo
-            resultado_final = []
-            for insumo in insumos_del_catalogo:
-                insumo_id = insumo['id_insumo']
-                lotes_de_insumo = lotes_por_insumo.get(insumo_id, [])
-
-                # --- CÁLCULO DE STOCK REAL ---
-                # Sumamos la cantidad física actual de todos los lotes asociados.
-                # Esto es la "única fuente de verdad" para el stock disponible.
-                stock_fisico_calculado = sum(lote['cantidad_actual'] for lote in lotes_de_insumo)
+            resumen = self.inventario_model.obtener_resumen_por_insumo()
+            if not resumen.get('success'):
+                return self.error_response(resumen.get('error', 'No se pudo obtener el resumen del inventario.'), 500)
 
-                # Crear la estructura de datos para la vista
-                datos_insumo_para_vista = {
-                    'id_insumo': insumo_id,
-                    'insumo_nombre': insumo.get('nombre', 'N/A'),
-                    'insumo_categoria': insumo.get('categoria', 'Sin categoría'),
-                    'insumo_unidad_medida': insumo.get('unidad_medida', ''),
-
-                    # Usamos el valor calculado para ambos campos visuales
+            resultado_final = []
+            for fila in resumen.get('data', []):
+                stock_fisico_calculado = float(fila.get('stock_fisico') or 0)
+                resultado_final.append({
+                    'id_insumo': fila['id_insumo'],
+                    'insumo_nombre': fila.get('nombre') or 'N/A',
+                    'insumo_categoria': fila.get('categoria') or 'Sin categoría',
+                    'insumo_unidad_medida': fila.get('unidad_medida') or '',
                     'stock_actual': stock_fisico_calculado,
                     'stock_total': stock_fisico_calculado,
-
-                    'lotes': lotes_de_insumo
-                }
-
-                # Calcular el estado general basado en el stock disponible real
-                if stock_fisico_calculado > 0:
-                    datos_insumo_para_vista['estado_general'] = 'Disponible'
-                else:
-                    datos_insumo_para_vista['estado_general'] = 'Agotado'
-
-                resultado_final.append(datos_insumo_para_vista)
+                    'stock_cuarentena': float(fila.get('stock_cuarentena') or 0),
+                    'stock_reservado': float(fila.get('stock_reservado') or 0),
+                    'cantidad_lotes': int(fila.get('cantidad_lotes') or 0),
+                    'numeros_lote': fila.get('numeros_lote') or '',
+                    'estado_general': 'Disponible' if stock_fisico_calculado > 0 else 'Agotado',
+                })
 
             # Ordenar por nombre de insumo
             resultado_final.sort(key=lambda x: x['insumo_nombre'])
@@ -1011,6 +952,21 @@ class InventarioController(BaseController):
             logger.error(f"Error agrupando lotes para la vista (robusto): {str(e)}", exc_info=True)
             return self.error_response(f'Error interno: {str(e)}', 500)
 
+    def obtener_lotes_de_insumo_para_vista(self, id_insumo: str) -> tuple:
+        """Lotes de un insumo, con cantidades normalizadas, para el detalle de la vista agrupada."""
+        try:
+            result = self.inventario_model.get_all_lotes_for_view({'id_insumo': id_insumo})
+            if not result.get('success'):
+                return self.error_response(result.get('error', 'No se pudieron obtener los lotes del insumo.'), 500)
+            lotes = result.get('data', [])
+            for lote in lotes:
+                lote['cantidad_actual'] = float(lote.get('cantidad_actual') or 0)
+                lote['cantidad_en_cuarentena'] = float(lote.get('cantidad_en_cuarentena') or 0)
+            return self.success_response(data=lotes)
+        except Exception as e:
+            logger.error(f"Error obteniendo lotes del insumo {id_insumo}: {str(e)}", exc_info=True)
+            return self.error_response(f'Error interno: {str(e)}', 500)
+
     def eliminar_lote(self, id_lote: str) -> tuple:
         """Eliminar un lote de inventario"""
         try:
@@ -1125,6 +1081,7 @@ class InventarioController(BaseController):
             logger.error(f"Error en liberar_lote_de_cuarentena_alerta: {e}", exc_info=True)
             return self.error_response('Error interno del servidor', 500)
 
+    @movimiento_inventario('MERMA')
     def marcar_lote_retirado_alerta(self, lote_id: str, usuario_id: int):
         """
         Marca un lote como 'retirado' por una alerta y anula su stock.
@@ -1727,6 +1684,7 @@ class InventarioController(BaseController):
             return self.error_response(f"Error interno: {str(e)}", 500)
 
 
+    @movimiento_inventario('MERMA')
     def retirar_lote_insumo_unificado(self, lote_id: str, cantidad: float, motivo_id: int, comentarios: str, usuario_id: int, foto_file=None, usar_foto_cuarentena=False, accion_ops: str = 'replanificar') -> tuple:
         """
         Método centralizado para retirar stock de un lote de insumo, registrar desperdicio
@@ -1906,6 +1864,7 @@ class InventarioController(BaseController):
             logger.error(f"Error en liberar_lote_de_cuarentena_alerta: {e}", exc_info=True)
             return self.error_response('Error interno del servidor', 500)
 
+    @movimiento_inventario('MERMA')
     def marcar_lote_retirado_alerta(self, lote_id: str, usuario_id: int):
         """
         Marca un lote como 'retirado' por una alerta y anula su stock.
@@ -2000,6 +1959,7 @@ class InventarioController(BaseController):
             logger.error(f"[DEBUG COBERTURA] Error crítico: {e}", exc_info=True)
             return False
 
+    @movimiento_inventario('CONSUMO')
     def consumir_stock_para_reposicion(self, orden_produccion_id: int, insumo_id: int, cantidad: float, usuario_id: int) -> dict:
         """
         Consume una cantidad específica de un insumo para reponer una merma en una OP activa.
@@ -2048,6 +2008,7 @@ class InventarioController(BaseController):
             logger.error(f"Error en consumir_stock_para_reposicion: {e}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
+    @movimiento_inventario('CONSUMO')
     def descontar_stock_fisico_y_reserva(self, reserva_id: int, cantidad_a_descontar: float):
         """
         Descuenta una cantidad del stock físico de un lote y actualiza la reserva correspondiente.
@@ -2,7 +2,6 @@
 import logging
 from datetime import datetime, date, timedelta
 from flask_jwt_extended import get_jwt_identity
-import pandas as pd
 from io import BytesIO
 from app.controllers.base_controller import BaseController
 from app.models.lote_producto import LoteProductoModel
@@ -21,6 +20,9 @@ from app.database import Database
 from werkzeug.utils import secure_filename
 import os
 from storage3.exceptions import StorageApiError
+from app.utils.lazy_import import lazy_import
+
+pd = lazy_import('pandas')
 
 
 
@@ -12,29 +12,24 @@ from datetime import datetime, date, timedelta
 import logging
 import time
 import math
-import requests  # <-- AÑADIR
-import threading # <-- AÑADIR
 from app.models.control_calidad_insumo import ControlCalidadInsumoModel
+from app.services.webhook_service import encolar_webhook
 
 logger = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
     from app.controllers.orden_produccion_controller import OrdenProduccionController
 
-def enviar_webhook_async(url: str, data: dict):
+def _usuario_actual_o_sistema():
     """
-    Envía un webhook en un hilo separado (Thread) para no bloquear
-    la respuesta de la aplicación web principal.
+    Usuario del JWT actual, o None cuando la operación corre fuera de un
+    request autenticado (p. ej. OCs automáticas del planificador de
+    reposición); el registro de auditoría lo anota como 'Sistema'.
     """
-    def thread_target():
-        try:
-            requests.post(url, json=data, timeout=3)
-            logger.info(f"Webhook de n8n enviado exitosamente (OC Alerta): {data.get('oc_codigo')}")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error al enviar webhook de n8n (OC Alerta): {e}")
-
-    thread = threading.Thread(target=thread_target)
-    thread.start()
+    try:
+        return get_current_user()
+    except RuntimeError:
+        return None
 
 class OrdenCompraController:
     def __init__(self):
@@ -138,7 +133,7 @@ class OrdenCompraController:
             if result.get('success'):
                 oc = result.get('data')
                 detalle = f"Se creó la orden de compra {oc.get('codigo_oc')}."
-                self.registro_controller.crear_registro(get_current_user(), 'Ordenes de compra', 'Creación', detalle)
+                self.registro_controller.crear_registro(_usuario_actual_o_sistema(), 'Ordenes de compra', 'Creación', detalle)
             return result
         except Exception as e:
             logger.error(f"Error en el controlador al crear la orden: {e}")
@@ -952,7 +947,7 @@ class OrdenCompraController:
                             "descripcion": descripcion_problemas.strip(),
                             "link_url": f"{BASE_APP_URL}/compras/detalle/{orden_id}"
                         }
-                        enviar_webhook_async(N8N_OC_ALERTA_URL, payload)
+                        encolar_webhook(N8N_OC_ALERTA_URL, payload)
                     except Exception as e_hook:
                         logger.error(f"Error webhook: {e_hook}")
 
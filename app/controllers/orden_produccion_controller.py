@@ -25,6 +25,8 @@ from app.models.insumo import InsumoModel # Asegúrate de importar esto
 from app.models.motivo_paro_model import MotivoParoModel
 from app.models.motivo_desperdicio_model import MotivoDesperdicioModel
 from app.models.registro_paro_model import RegistroParoModel
+from app.services.hechos_produccion_service import notificar_hecho_op
+from app.services.eventos_produccion_service import publicar_evento_op
 from app.models.registro_desperdicio_model import RegistroDesperdicioModel
 from app.models.operacion_receta_model import OperacionRecetaModel
 from app.controllers.op_cronometro_controller import OpCronometroController
@@ -747,7 +749,9 @@ class OrdenProduccionController(BaseController):
 
             result = self.model.cambiar_estado(orden_id, nuevo_estado, extra_data=update_data)
             if result.get('success'):
+                notificar_hecho_op(orden_id)
                 op = result.get('data')
+                publicar_evento_op('op_estado', orden_id, estado=nuevo_estado, operario_id=op.get('operario_asignado_id'))
                 detalle = f"La orden de producción {op.get('codigo')} cambió de estado a {nuevo_estado}."
                 self.registro_controller.crear_registro(get_current_user(), 'Ordenes de produccion', 'Cambio de Estado', detalle)
 
@@ -1822,6 +1826,10 @@ class OrdenProduccionController(BaseController):
                     if response_data.get('accion') == 'finalizar_op_crear_hija':
                          # Ya se finalizó en el helper. Solo actualizamos cantidad producida.
                          self.model.update(orden_id, update_data)
+                         notificar_hecho_op(orden_id)
+                         publicar_evento_op('op_avance', orden_id, estado=orden_actual.get('estado'),
+                                            operario_id=orden_actual.get('operario_asignado_id'),
+                                            cantidad_producida=float(update_data['cantidad_producida']))
                          return self.success_response(message=response_message, data=response_data)
 
                 # Si llegamos aquí, o no había desperdicio, o se repuso (accion='continuar').
@@ -1833,6 +1841,10 @@ class OrdenProduccionController(BaseController):
                     response_message += " Orden completada."
 
             self.model.update(orden_id, update_data)
+            notificar_hecho_op(orden_id)
+            publicar_evento_op('op_avance', orden_id, estado=update_data.get('estado', orden_actual.get('estado')),
+                               operario_id=orden_actual.get('operario_asignado_id'),
+                               cantidad_producida=float(update_data['cantidad_producida']))
             return self.success_response(message=response_message, data=response_data)
 
         except Exception as e:
@@ -2116,6 +2128,8 @@ class OrdenProduccionController(BaseController):
                 # El flujo de traspaso se encargará de la lógica.
                 message = "Orden lista para traspaso de turno."
 
+            notificar_hecho_op(orden_id)
+            publicar_evento_op('op_estado', orden_id, estado='PAUSADA', operario_id=orden.get('operario_asignado_id'))
             return self.success_response(message=message)
 
         except Exception as e:
@@ -2163,6 +2177,8 @@ class OrdenProduccionController(BaseController):
 
             # Reanudar el cronómetro
             self.op_cronometro_controller.registrar_inicio(orden_id)
+            notificar_hecho_op(orden_id)
+            publicar_evento_op('op_estado', orden_id, estado='EN_PROCESO', operario_id=orden.get('operario_asignado_id'))
 
             detalle = f"Se reanudó la producción de la OP {orden.get('codigo')}."
             self.registro_controller.crear_registro(get_current_user(), 'Ordenes de produccion', 'Reanudación de Producción', detalle)
@@ -2315,6 +2331,8 @@ class OrdenProduccionController(BaseController):
             if update_result.get('success'):
                 # Iniciar el cronómetro
                 self.op_cronometro_controller.registrar_inicio(orden_id)
+                publicar_evento_op('op_estado', orden_id, estado='EN_PROCESO', operario_id=usuario_id)
+                notificar_hecho_op(orden_id)
 
                 logger.info(f"Iniciando consumo de stock físico para la OP {orden_id}...")
                 consumo_result = self.inventario_controller.consumir_stock_reservado_para_op(orden_id)
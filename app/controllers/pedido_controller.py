@@ -26,6 +26,7 @@ from app.schemas.pedido_schema import PedidoSchema
 from typing import Dict, Optional
 from marshmallow import ValidationError
 from app.config import Config
+from app.utils.estados import estado_crediticio_por_vencidos
 from app.models.reserva_producto import ReservaProductoModel # <--- AGREGAR ESTO
 import time
 from app.models.orden_produccion import OrdenProduccionModel # <--- IMPORTANTE
@@ -1188,8 +1189,10 @@ class PedidoController(BaseController):
             if not update_result.get('success'):
                 return self.error_response("Error al actualizar el estado del pago.", 500)
 
+            # Sólo un pedido vencido que se paga puede cambiar el conteo de vencidos
+            # del cliente; si no lo estaba, el estado crediticio no se mueve.
             id_cliente = pedido.get('id_cliente')
-            if id_cliente:
+            if id_cliente and pedido.get('estado_pago') == 'vencido':
                 self._recalcular_estado_crediticio_cliente(id_cliente)
 
             return self.success_response(message="Pago registrado y estado crediticio actualizado.")
@@ -1201,19 +1204,15 @@ class PedidoController(BaseController):
     def _recalcular_estado_crediticio_cliente(self, cliente_id: int):
         """
         Recalcula el estado crediticio de un cliente basándose en sus pedidos vencidos.
+        Usa un conteo sin traer filas y una actualización condicional, de modo
+        que cada evento de pago cuesta dos llamadas como máximo.
         """
         try:
-            pedidos_vencidos_result = self.model.find_all({'id_cliente': cliente_id, 'estado_pago': 'vencido'})
-            if pedidos_vencidos_result.get('success'):
-                conteo_vencidos = len(pedidos_vencidos_result['data'])
-
-                umbral_alertado = Config.CREDIT_ALERT_THRESHOLD
-
-                nuevo_estado = 'alertado' if conteo_vencidos > umbral_alertado else 'normal'
-
-                cliente_actual = self.cliente_model.find_by_id(cliente_id)
-                if cliente_actual.get('success') and cliente_actual['data'].get('estado_crediticio') != nuevo_estado:
-                    self.cliente_model.update(cliente_id, {'estado_crediticio': nuevo_estado}, 'id')
+            conteo_result = self.model.contar_vencidos_cliente(cliente_id)
+            if conteo_result.get('success'):
+                nuevo_estado = estado_crediticio_por_vencidos(conteo_result['count'], Config.CREDIT_ALERT_THRESHOLD)
+                update_result = self.cliente_model.actualizar_estado_crediticio_si_cambia(cliente_id, nuevo_estado)
+                if update_result.get('changed'):
                     logger.info(f"Estado crediticio del cliente {cliente_id} actualizado a '{nuevo_estado}'.")
         except Exception as e:
             logger.error(f"Error recalculando estado crediticio para el cliente {cliente_id}: {e}", exc_info=True)
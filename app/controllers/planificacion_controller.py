@@ -18,32 +18,13 @@ from datetime import date # <-- Asegúrate que esté
 from flask import jsonify # <-- Añadir (o usar desde tu BaseController si ya lo tienes)
 from app.models.bloqueo_capacidad_model import BloqueoCapacidadModel # (Debes crear este modelo simple)
 from app.models.issue_planificacion_model import IssuePlanificacionModel
-import holidays
-import requests
-import threading
+from app.services.mrp_service import obtener_resultado_mrp
+from app.services.planificacion_snapshot_service import get_snapshot_planificacion
+from app.services.calendario_laboral_service import get_calendario_laboral
+from app.services.webhook_service import encolar_webhook
 
 logger = logging.getLogger(__name__)
 
-def enviar_webhook_async(url: str, data: dict):
-    """
-    Envía un webhook en un hilo separado (Thread) para no bloquear
-    la respuesta de la aplicación web principal.
-    """
-    def thread_target():
-        try:
-            # Usamos un timeout corto. Si n8n no responde en 3 segundos,
-            # no nos importa, la app debe continuar.
-            requests.post(url, json=data, timeout=3)
-            logger.info(f"Webhook de n8n enviado exitosamente para OP {data.get('op_codigo')}")
-        except requests.exceptions.RequestException as e:
-            # Si n8n está caído o la URL es incorrecta, solo lo logueamos.
-            # NUNCA debe detener la ejecución de Flask.
-            logger.error(f"Error al enviar webhook de n8n (no bloqueante): {e}")
-
-    # Iniciar el hilo
-    thread = threading.Thread(target=thread_target)
-    thread.start()
-
 class PlanificacionController(BaseController):
     def __init__(self):
         super().__init__()
@@ -55,7 +36,6 @@ class PlanificacionController(BaseController):
         self.insumo_model = InsumoModel() # Asegúrate que esté inicializado
         self.bloqueo_capacidad_model = BloqueoCapacidadModel() # <-- Añadir esto
         self.issue_planificacion_model = IssuePlanificacionModel()
-        self.feriados_ar_cache = None # <-- ¡AÑADIR ESTA LÍNEA!
 
     @property
     def orden_produccion_controller(self):
@@ -139,12 +119,20 @@ class PlanificacionController(BaseController):
                     carga_total_minutos / capacidad_neta_linea_sugerida
                 )
 
-            # ... (Paso 5: Verificar Stock (T_Proc) - SIN CAMBIOS) ...
-            # [Lógica copiada de planificacion_controller.py, lines 974-1002]
+            # ... (Paso 5: Verificar Stock (T_Proc)) ...
             ingredientes_receta = ingredientes_map.get(receta_id, [])
             stock_ok_agg = True
             tiempos_entrega_agg = []
-            if ingredientes_receta:
+            # Con la proyección MRP la cobertura descuenta lo que consumen antes las demás OPs del plan.
+            resultado_mrp = mapas_precargados.get('mrp')
+            cobertura_mrp = resultado_mrp.cobertura_op(op) if resultado_mrp is not None and ingredientes_receta else None
+            if cobertura_mrp is not None:
+                stock_ok_agg = cobertura_mrp['stock_ok']
+                for faltante in cobertura_mrp['insumos_faltantes']:
+                    insumo_data = insumos_map.get(faltante['insumo_id'])
+                    if insumo_data:
+                        tiempos_entrega_agg.append(insumo_data.get('tiempo_entrega_dias', 0))
+            elif ingredientes_receta:
                 for ingrediente in ingredientes_receta:
                     insumo_id = ingrediente['id_insumo']
                     cantidad_ingrediente = Decimal(ingrediente.get('cantidad', 0))
@@ -247,8 +235,36 @@ class PlanificacionController(BaseController):
         })
     def obtener_datos_para_vista_planificacion(self, week_str: str, horizonte_dias: int, current_user_id: int, current_user_rol: str) -> tuple:
         """
-        Método orquestador que obtiene y procesa todos los datos necesarios para la
-        vista de planificación de forma optimizada (con Precarga Total).
+        Método orquestador de la vista de planificación. El snapshot no depende
+        del usuario: se sirve desde la caché versionada mientras el plan no
+        cambie y se reconstruye una sola vez (compartido) cuando cambia.
+        """
+        errores = []
+
+        def construir():
+            respuesta, status = self._construir_datos_vista_planificacion(week_str, horizonte_dias)
+            if status != 200:
+                errores.append((respuesta, status))
+                return None
+            return respuesta.get('data')
+
+        datos_vista = get_snapshot_planificacion().obtener(week_str or '', horizonte_dias, construir)
+        if datos_vista is None:
+            return errores[0] if errores else self.error_response("Error al construir la vista de planificación.", 500)
+        return self.success_response(data=datos_vista)
+
+    def obtener_version_plan(self, desde: Optional[int] = None) -> tuple:
+        """Indica si el plan cambió desde la versión `desde` que tiene el cliente."""
+        snapshot = get_snapshot_planificacion()
+        return self.success_response(data={
+            'version': snapshot.version,
+            'cambio': snapshot.cambio_desde(desde)
+        })
+
+    def _construir_datos_vista_planificacion(self, week_str: str, horizonte_dias: int) -> tuple:
+        """
+        Obtiene y procesa todos los datos necesarios para la vista de
+        planificación de forma optimizada (con Precarga Total).
         """
         try:
             # --- Tarea de fondo (movida al scheduler) ---
@@ -302,6 +318,7 @@ class PlanificacionController(BaseController):
             ingredientes_resp = self.receta_model.get_ingredientes_by_receta_ids(receta_ids_globales)
             centros_resp = self.centro_trabajo_model.find_all() # Son solo 2-3, es barato
             stock_resp = self.inventario_controller.get_all_stock_disponible_map()
+            resultado_mrp = obtener_resultado_mrp()
 
             # C. Construir los Mapas de Datos
             mapas_precargados = {
@@ -310,7 +327,8 @@ class PlanificacionController(BaseController):
                 'centros_trabajo': {c['id']: c for c in centros_resp.get('data', [])},
                 'ingredientes': defaultdict(list),
                 'stock': stock_resp.get('data', {}),
-                'insumos': {}
+                'insumos': {},
+                'mrp': resultado_mrp
             }
 
             # Poblar mapa de operaciones
@@ -472,7 +490,7 @@ class PlanificacionController(BaseController):
             return self.success_response(data=datos_vista)
 
         except Exception as e:
-            logger.error(f"Error en obtener_datos_para_vista_planificacion: {e}", exc_info=True)
+            logger.error(f"Error en _construir_datos_vista_planificacion: {e}", exc_info=True)
             return self.error_response(f"Error interno del servidor: {str(e)}", 500)
 
     def _ajustar_meta_a_dia_laborable(self, fecha_meta: date) -> date:
@@ -482,19 +500,12 @@ class PlanificacionController(BaseController):
         Ej: Sábado 15 -> Viernes 14.
         Ej: Viernes 14 -> Viernes 14.
         """
-        fecha_ajustada = fecha_meta
-        dias_chequeados = 0
-
-        # Mover hacia atrás MIENTRAS no sea un día laborable
-        while not self._es_dia_laborable(fecha_ajustada) and dias_chequeados < 7:
-            fecha_ajustada -= timedelta(days=1)
-            dias_chequeados += 1
-
-        if dias_chequeados == 7:
+        try:
+            return get_calendario_laboral().anterior_laborable(fecha_meta)
+        except ValueError:
             logger.warning(f"No se encontró día laborable para la meta {fecha_meta.isoformat()}. Usando meta original.")
             return fecha_meta # Fallback
 
-        return fecha_ajustada
     def _ajustar_inicio_a_dia_laborable(self, fecha_inicio: date) -> date:
         """
         Ajusta una Fecha de Inicio al próximo día laborable SIGUIENTE o IGUAL.
@@ -502,20 +513,12 @@ class PlanificacionController(BaseController):
         Ej: Domingo 16 -> Lunes 17.
         Ej: Lunes 17 -> Lunes 17.
         """
-        fecha_ajustada = fecha_inicio
-        dias_chequeados = 0
-
-        # Mover hacia adelante MIENTRAS no sea un día laborable
-        while not self._es_dia_laborable(fecha_ajustada) and dias_chequeados < 7:
-            fecha_ajustada += timedelta(days=1)
-            dias_chequeados += 1
-
-        if dias_chequeados == 7:
+        try:
+            return get_calendario_laboral().siguiente_laborable(fecha_inicio)
+        except ValueError:
             logger.warning(f"No se encontró día laborable para el inicio {fecha_inicio.isoformat()}. Usando inicio original.")
             return fecha_inicio # Fallback
 
-        return fecha_ajustada
-
     def _calcular_sugerencias_para_op(self, op: Dict) -> Dict:
         """
         Calcula T_Prod, T_Proc, Línea Sug, y JIT para una ÚNICA OP.
@@ -1356,7 +1359,8 @@ class PlanificacionController(BaseController):
                 op_simulada = {
                     'receta_id': receta_id_agrupada,
                     'cantidad_planificada': cantidad_total_agrupada,
-                    'fecha_meta': data.get('fecha_meta_mas_proxima')
+                    'fecha_meta': data.get('fecha_meta_mas_proxima'),
+                    'ordenes_ids': [o['id'] for o in data['ordenes'] if o.get('id') is not None]
                 }
 
                 # --- ¡CAMBIO DE LÓGICA! ---
@@ -1575,28 +1579,20 @@ class PlanificacionController(BaseController):
             if bloqueos_resp.get('success'):
                 for bloqueo in bloqueos_resp.get('data', []):
                     bloqueos_map[bloqueo['centro_trabajo_id']][bloqueo['fecha']] = bloqueo
-            try:
-                years_to_check = list(set(range(fecha_inicio.year, fecha_fin.year + 1)))
-                feriados_ar = holidays.country_holidays('AR', years=years_to_check)
-                logger.info(f"Cargados {len(feriados_ar)} feriados de Argentina para los años {years_to_check}")
-            except Exception as e_hol:
-                logger.error(f"Error al inicializar la librería 'holidays': {e_hol}. Los feriados no se descontarán.")
-                feriados_ar = {}
+            calendario = get_calendario_laboral()
             for dia_offset in range(num_dias):
                 fecha_actual = fecha_inicio + timedelta(days=dia_offset)
                 fecha_iso = fecha_actual.isoformat()
-                dia_de_semana = fecha_actual.weekday()
-                es_fin_de_semana = (dia_de_semana >= 5)
-                nombre_feriado = feriados_ar.get(fecha_actual)
-                es_feriado = nombre_feriado is not None
+                # Fin de semana, feriado o excepción de planta (ya resueltos en el calendario)
+                motivo_no_laborable = calendario.motivo_no_laborable(fecha_actual)
                 for ct_id in centro_trabajo_ids:
                     centro = centros_trabajo.get(ct_id)
                     cap_data = {
                         'bruta': Decimal(0), 'bloqueado': Decimal(0), 'neta': Decimal(0),
                         'motivo_bloqueo': None, 'hora_inicio': None, 'hora_fin': None
                     }
-                    if es_fin_de_semana or es_feriado:
-                        cap_data['motivo_bloqueo'] = nombre_feriado if es_feriado else 'Fin de Semana'
+                    if motivo_no_laborable:
+                        cap_data['motivo_bloqueo'] = motivo_no_laborable
                         capacidad_por_centro_y_fecha[ct_id][fecha_iso] = cap_data
                         continue
                     if centro:
@@ -2486,11 +2482,11 @@ class PlanificacionController(BaseController):
                         "link_url": f"{BASE_APP_URL}/planificacion/" # Enlace directo al tablero
                     }
 
-                    # 5. Llamar al helper en un hilo (no bloqueante)
-                    enviar_webhook_async(N8N_WEBHOOK_URL, payload)
+                    # 5. Encolar en el outbox (no bloqueante, se reintenta si n8n está caído)
+                    encolar_webhook(N8N_WEBHOOK_URL, payload)
 
                 except Exception as e_webhook:
-                    logger.error(f"Error al iniciar el hilo del webhook de n8n: {e_webhook}")
+                    logger.error(f"Error al preparar el webhook de n8n: {e_webhook}")
                 # --- ¡¡FIN DE LA IMPLEMENTACIÓN DE n8n!! ---
 
                 return result.get('data')
@@ -2823,43 +2819,11 @@ class PlanificacionController(BaseController):
             pass # Fallback
         return 480.0
 
-    def _get_feriados_ar(self, years: List[int]) -> dict:
-        """
-        Helper para obtener y cachear el objeto de feriados de Argentina.
-        Evita tener que reinstanciarlo en cada llamada.
-        """
-        try:
-            # Comprobar si el caché existe y si cubre los años solicitados
-            if self.feriados_ar_cache and all(y in self.feriados_ar_cache.years for y in years):
-                return self.feriados_ar_cache
-
-            # Si no, (re)crear el caché
-            self.feriados_ar_cache = holidays.country_holidays('AR', years=years)
-            logger.info(f"[Holidays] Caché de feriados de Argentina actualizado para años: {years}")
-            return self.feriados_ar_cache
-        except Exception as e_hol:
-            logger.error(f"Error al inicializar o acceder al caché de 'holidays': {e_hol}.")
-            return {} # Fallback a un dict vacío
-
     def _es_dia_laborable(self, fecha: date) -> bool:
         """
-        Verifica si un día es laborable (no es fin de semana Y no es feriado).
+        Verifica si un día es laborable (no es fin de semana, feriado ni excepción de planta).
         """
-        # 1. Chequear Fin de Semana (0=Lunes, 5=Sábado, 6=Domingo)
-        if fecha.weekday() >= 5:
-            return False
-
-        # 2. Chequear Feriado
-        try:
-            feriados_ar = self._get_feriados_ar(years=[fecha.year])
-            if fecha in feriados_ar:
-                return False # Es feriado
-        except Exception as e:
-            logger.error(f"Error al chequear feriado para {fecha.isoformat()}: {e}")
-            # Ser conservador: si falla la librería, asumir que es laborable
-            pass
-
-        return True # Es laborable
+        return get_calendario_laboral().es_laborable(fecha)
 
     def resolver_issue_api(self, issue_id: int) -> tuple:
         """
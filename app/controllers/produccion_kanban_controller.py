@@ -10,6 +10,9 @@ from app.controllers.insumo_controller import InsumoController
 from app.models.registro_desperdicio_model import RegistroDesperdicioModel
 from app.models.reserva_insumo import ReservaInsumoModel
 from app.utils.estados import OP_KANBAN_COLUMNAS
+from app.services.mrp_service import obtener_resultado_mrp
+from app.services.kanban_delta_service import clave_tablero, get_tablero_kanban
+from app.services.eventos_produccion_service import publicar_evento_op
 from app.controllers.lote_producto_controller import LoteProductoController
 from app.controllers.control_calidad_producto_controller import ControlCalidadProductoController
 from app.database import Database
@@ -45,9 +48,11 @@ class ProduccionKanbanController(BaseController):
                 return self.error_response("Error al cargar las órdenes para el tablero.")
             ordenes = response_ops.get('data', [])
             if not ordenes:
-                return self.success_response(data={
+                contexto = {
                     'ordenes_por_estado': {}, 'columnas': OP_KANBAN_COLUMNAS, 'metricas_dia': {}, 'usuario_rol': usuario_rol
-                })
+                }
+                contexto['version'] = get_tablero_kanban().registrar(clave_tablero(usuario_id, usuario_rol), contexto)
+                return self.success_response(data=contexto)
 
             # 2. Recopilar IDs para consultas masivas
             op_ids = [o['id'] for o in ordenes]
@@ -64,6 +69,12 @@ class ProduccionKanbanController(BaseController):
                 todos_los_insumo_ids.update(insumos_por_receta.keys())
             
             stock_map = self._obtener_stock_masivo(list(todos_los_insumo_ids))
+            # Una sola consulta para saber qué OPs 'LISTA PARA PRODUCIR' tienen reservas.
+            ops_listas = [o['id'] for o in ordenes if (o.get('estado') or '').strip().replace(' ', '_') == 'LISTA_PARA_PRODUCIR']
+            ops_con_reservas = self.reserva_insumo_model.get_op_ids_con_reservas(ops_listas).get('data', set())
+            # La proyección MRP sólo hace falta si hay OPs en espera cuyos materiales evaluar.
+            hay_en_espera = any((o.get('estado') or '').strip().replace(' ', '_') == 'EN_ESPERA' for o in ordenes)
+            resultado_mrp = obtener_resultado_mrp() if hay_en_espera else None
 
             # 4. Enriquecer y agrupar órdenes utilizando los datos precargados
             ordenes_enriquecidas = []
@@ -77,6 +88,7 @@ class ProduccionKanbanController(BaseController):
                 total_desperdicio = desperdicios_map.get(op_id, 0.0)
                 cantidad_producida = float(orden.get('cantidad_producida', 0) or 0)
                 cantidad_total = cantidad_producida + total_desperdicio
+                orden['desperdicio_total'] = total_desperdicio
                 orden['desperdicio_porcentaje'] = round((total_desperdicio / cantidad_total) * 100, 1) if cantidad_total > 0 else 0.0
 
                 # Datos de materiales
@@ -90,11 +102,10 @@ class ProduccionKanbanController(BaseController):
                 # - Para otros estados no es relevante.
                 estado_actual_normalizado = (orden.get('estado', '').strip().replace(' ', '_'))
                 if estado_actual_normalizado == 'LISTA_PARA_PRODUCIR':
-                    reservas_result = self.reserva_insumo_model.get_by_orden_produccion_id(op_id)
-                    orden['materiales_disponibles'] = reservas_result.get('success') and bool(reservas_result.get('data'))
+                    orden['materiales_disponibles'] = op_id in ops_con_reservas
                 elif estado_actual_normalizado == 'EN_ESPERA':
                     orden['materiales_disponibles'] = self._verificar_materiales_disponibles(
-                        orden, insumos_receta, stock_map, ocs_de_la_op
+                        orden, insumos_receta, stock_map, ocs_de_la_op, resultado_mrp
                     )
                 else:
                     orden['materiales_disponibles'] = True # No es relevante para otros estados
@@ -144,10 +155,6 @@ class ProduccionKanbanController(BaseController):
             ordenes_hoy = [o for o in ordenes_enriquecidas if o.get('fecha_inicio') and datetime.fromisoformat(o['fecha_inicio']) >= hoy_inicio]
             
             completadas_hoy = [o for o in ordenes_hoy if o.get('estado') == 'COMPLETADA']
-            
-            oee_sum = sum(o.get('oee_actual', 0) for o in ordenes_hoy if o.get('oee_actual') is not None)
-            oee_count = len([o for o in ordenes_hoy if o.get('oee_actual') is not None])
-            oee_promedio = round(oee_sum / oee_count, 0) if oee_count > 0 else 0
 
             total_producido = sum(float(o.get('cantidad_producida', 0) or 0) for o in ordenes_hoy)
             total_desperdicio = sum(desperdicios_map.get(o['id'], 0.0) for o in ordenes_hoy)
@@ -160,7 +167,7 @@ class ProduccionKanbanController(BaseController):
                 'completadas': len(completadas_hoy),
                 'en_proceso': len(ordenes_por_estado.get('EN_PROCESO', [])),
                 'pendientes': len(ordenes_por_estado.get('LISTA_PARA_PRODUCIR', [])) + len(ordenes_por_estado.get('EN_ESPERA', [])),
-                'oee_promedio': oee_promedio,
+                **self._metricas_de_reloj(ordenes_enriquecidas),
                 'desperdicio': desperdicio_promedio,
                 'a_tiempo': a_tiempo_porcentaje
             }
@@ -180,12 +187,39 @@ class ProduccionKanbanController(BaseController):
                 'metricas_dia': metricas_dia,
                 'usuario_rol': usuario_rol
             }
+            contexto['version'] = get_tablero_kanban().registrar(clave_tablero(usuario_id, usuario_rol), contexto)
             return self.success_response(data=contexto)
 
         except Exception as e:
             logger.error(f"Error crítico al obtener datos para el tablero Kanban: {e}", exc_info=True)
             return self.error_response(f"Error interno: {str(e)}", 500)
 
+    def obtener_delta_tablero(self, usuario_id: int, usuario_rol: str, desde: str = None) -> tuple:
+        """
+        Refresco incremental del tablero: devuelve sólo las tarjetas nuevas o
+        cambiadas y los ids eliminados desde la versión `desde`, más las
+        métricas del día. El tablero se reconstruye sólo si el estado en
+        memoria quedó viejo (cambió el plan o venció).
+        """
+        tablero = get_tablero_kanban()
+        clave = clave_tablero(usuario_id, usuario_rol)
+        estado = tablero.vigente(clave)
+        if estado is None:
+            response, status = self.obtener_datos_para_tablero(usuario_id, usuario_rol)
+            if status != 200:
+                return response, status
+            return self.success_response(data=tablero.delta(clave, desde))
+        # Con el tablero en memoria sólo se recalculan las métricas que dependen del reloj.
+        ordenes = [tarjeta['orden'] for tarjeta in estado['tarjetas'].values()]
+        return self.success_response(data=tablero.delta(clave, desde, self._metricas_de_reloj(ordenes)))
+
+    def _metricas_de_reloj(self, ordenes: list) -> dict:
+        """Métricas del día que cambian con el reloj (OEE promedio de las OPs iniciadas hoy)."""
+        hoy_inicio = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        oees = [self._calcular_oee_actual(o, o.get('desperdicio_total', 0.0)) for o in ordenes
+                if o.get('fecha_inicio') and datetime.fromisoformat(o['fecha_inicio']) >= hoy_inicio]
+        return {'oee_promedio': round(sum(oees) / len(oees), 0) if oees else 0}
+
     # --- BULK DATA FETCHING HELPERS ---
 
     def _obtener_ocs_asociadas_masivo(self, op_ids: list) -> dict:
@@ -325,11 +359,13 @@ class ProduccionKanbanController(BaseController):
         except (ValueError, TypeError):
             return "0min"
 
-    def _verificar_materiales_disponibles(self, orden: dict, insumos_receta: dict, stock_map: dict, ocs_asociadas: list) -> bool:
+    def _verificar_materiales_disponibles(self, orden: dict, insumos_receta: dict, stock_map: dict, ocs_asociadas: list,
+                                          resultado_mrp=None) -> bool:
         """
         Verifica la disponibilidad de materiales.
         1. Si hay OCs asociadas, la disponibilidad depende de que TODAS estén 'RECEPCION_COMPLETA'.
-        2. Si no hay OCs, verifica el stock actual contra la receta.
+        2. Si no hay OCs, consulta la proyección MRP (que descuenta lo que consumen antes
+           otras OPs planificadas); sin proyección, verifica el stock actual contra la receta.
         """
         # Caso 1: La OP tiene órdenes de compra asociadas.
         if ocs_asociadas:
@@ -337,11 +373,14 @@ class ProduccionKanbanController(BaseController):
             todas_completas = all(oc.get('estado') == 'RECEPCION_COMPLETA' for oc in ocs_asociadas)
             return todas_completas
 
-        # Caso 2: No hay OCs. La disponibilidad depende del stock actual.
+        # Caso 2: No hay OCs. La disponibilidad depende del stock.
         cantidad_planificada = float(orden.get('cantidad_planificada', 0))
         if not insumos_receta:
             return True  # Si no hay ingredientes, los materiales están "disponibles".
 
+        if resultado_mrp is not None and resultado_mrp.incluye_op(orden.get('id')):
+            return resultado_mrp.cobertura_op(orden)['stock_ok']
+
         for insumo_id, cantidad_necesaria_por_unidad in insumos_receta.items():
             cantidad_total_necesaria = cantidad_necesaria_por_unidad * cantidad_planificada
             stock_actual = stock_map.get(insumo_id, 0.0)
@@ -508,6 +547,8 @@ class ProduccionKanbanController(BaseController):
             resultado = self.orden_produccion_controller.cambiar_estado_orden_simple(op_id, nuevo_estado)
             
             if resultado.get('success'):
+                publicar_evento_op('op_estado', op_id, estado=nuevo_estado,
+                                   operario_id=op_actual_res['data'].get('operario_asignado_id'))
                 return self.success_response(data=resultado.get('data'))
             else:
                 return self.error_response(resultado.get('error', 'Error al cambiar el estado.'), 500)
@@ -16,6 +16,7 @@ from marshmallow import ValidationError
 from decimal import Decimal, InvalidOperation
 from app.models.operacion_receta_model import OperacionRecetaModel
 from app.models.historial_costos_producto import HistorialCostosProductoModel
+from app.services.costeo_service import get_motor_costos
 
 logger = logging.getLogger(__name__)
 
@@ -185,37 +186,14 @@ class ProductoController(BaseController):
             return self.error_response('Error interno del servidor', 500)
 
     def actualizar_costo_productos_insumo(self, insumos_id: Optional[Dict]) -> Dict:
-        """Actualiza el costo de todos los productos que contienen los insumos dados."""
+        """
+        Actualiza el costo de todos los productos que contienen los insumos dados.
+        El motor de costos propaga el cambio de precio sólo a los productos
+        afectados y los guarda en lote.
+        """
         try:
-
-            productos_a_actualizar = set()
-
-            # 1. Recorrer los insumos actualizados y recopilar todos los productos afectados.
-            for insumo in insumos_id:
-                insumo_id = insumo.get('id_insumo')
-                if not insumo_id:
-                    continue
-
-                # Buscar todas las recetas que usan este insumo
-                recetas_result = self.receta_model.find_all_recetas_by_insumo(insumo_id)
-
-
-                if recetas_result.get('success') and recetas_result.get('data'):
-                    recetas = recetas_result['data']
-                    # Agrega los IDs de los productos a un conjunto (set) para asegurar unicidad
-                    for receta in recetas:
-                        if 'producto_id' in receta:
-                            productos_a_actualizar.add(receta['producto_id'])
-
-            productos_actualizados = []
-
-            # 2. Iterar sobre el CONJUNTO único de productos afectados y actualizarlos solo una vez.
-            for producto_id in productos_a_actualizar:
-                costo_update_result = self._recalcular_costos_producto(producto_id)
-                if costo_update_result.get('success'):
-                    productos_actualizados.append(producto_id)
-                else:
-                    logger.error(f"Error actualizando costo para producto ID {producto_id}: {costo_update_result.get('error')}")
+            ids = [insumo.get('id_insumo') for insumo in insumos_id or [] if insumo.get('id_insumo')]
+            productos_actualizados = get_motor_costos().actualizar_precios_insumos(ids)
 
             return self.success_response(
                 {'productos_actualizados': productos_actualizados},
@@ -228,101 +206,13 @@ class ProductoController(BaseController):
 
     def _recalcular_costos_producto(self, producto_id: int) -> Dict:
         """
-        Orquestador central para calcular todos los costos de un producto y actualizar la DB.
-        NUEVA LÓGICA:
-        1. Mano de Obra: Suma de (Tiempo * Tarifa Rol * Porcentaje Participacion) para cada paso.
-        2. Costos Fijos: Suma de (Tiempo Paso * Tasa Hora Costo Fijo) por cada costo fijo asociado al paso.
+        Calcula todos los costos de un producto y actualiza la DB (y su historial de costos).
+        1. Materia Prima: Suma de (Cantidad * Precio Insumo) de la receta.
+        2. Mano de Obra: Suma de (Tiempo * Tarifa Rol * Porcentaje Participacion) para cada paso.
+        3. Costos Fijos: Suma de (Tiempo Paso * Tasa Hora Costo Fijo) por cada costo fijo asociado al paso.
         """
         try:
-            # 1. Obtener datos base
-            producto_res = self.model.find_by_id(producto_id, 'id')
-            if not producto_res.get('success'): return producto_res
-            producto = producto_res['data']
-
-            receta_res = self.receta_model.find_all({'producto_id': producto_id})
-            if not receta_res.get('data'): return {'success': True, 'message': 'Producto sin receta, no se calculan costos.'}
-            receta_id = receta_res['data'][0]['id']
-
-            # 2. Calcular Costo de Materia Prima
-            costo_materia_prima_res = self.receta_controller.calcular_costo_total_receta(receta_id)
-            costo_materia_prima = costo_materia_prima_res['data']['costo_total'] if costo_materia_prima_res.get('success') else 0
-
-            # 3. Preparación de datos globales (Roles y Config Producción)
-            roles_res, _ = self.rol_controller.get_all_roles()
-            roles_data = roles_res.get('data', [])
-            roles_costo_map = {rol['id']: Decimal(rol.get('costo_por_hora', 0) or 0) for rol in roles_data}
-
-            config_prod_res, _ = self.config_produccion_controller.get_configuracion_produccion()
-            horas_prod_config = config_prod_res.get('data', [])
-            total_horas_prod_mes = sum(Decimal(d.get('horas', 0)) for d in horas_prod_config) * 4 # 4 semanas/mes
-
-            # Obtener TODOS los costos fijos activos para mapearlos
-            all_costos_fijos_res, _ = self.costo_fijo_controller.get_all_costos_fijos({'activo': True})
-            costos_fijos_map = {c['id']: Decimal(c.get('monto_mensual', 0)) for c in all_costos_fijos_res.get('data', [])}
-
-            # 4. Iterar sobre Operaciones para sumarizar MO y CF
-            receta_detallada_res, _ = self.receta_controller.obtener_receta_con_ingredientes(receta_id)
-            operaciones = receta_detallada_res.get('data', {}).get('operaciones', [])
-
-            costo_mano_obra_total = Decimal(0)
-            costo_fijos_total = Decimal(0)
-
-            for op in operaciones:
-                tiempo_prep = Decimal(op.get('tiempo_preparacion', 0))
-                tiempo_ejec = Decimal(op.get('tiempo_ejecucion_unitario', 0))
-                tiempo_total_paso_min = tiempo_prep + tiempo_ejec
-                tiempo_total_paso_horas = tiempo_total_paso_min / Decimal(60)
-
-                # --- Mano de Obra (Distribuida por Roles y Porcentaje) ---
-                # 'roles_detalle' viene de obtener_receta_con_ingredientes
-                for rol_info in op.get('roles_detalle', []):
-                    rol_id = rol_info.get('rol_id')
-                    porcentaje = Decimal(rol_info.get('porcentaje_participacion', 100)) / Decimal(100)
-                    costo_hora_rol = roles_costo_map.get(rol_id, Decimal(0))
-                    
-                    # Costo del Rol en este paso = Tiempo Paso * Costo Hora * % Participacion
-                    costo_mano_obra_total += tiempo_total_paso_horas * costo_hora_rol * porcentaje
-
-                # --- Costos Fijos (Específicos por Paso) ---
-                # 'costos_fijos_ids' viene de obtener_receta_con_ingredientes
-                for cf_id in op.get('costos_fijos_ids', []):
-                    monto_mensual = costos_fijos_map.get(cf_id, Decimal(0))
-                    # Tasa Hora del Costo Fijo Específico
-                    tasa_hora_cf = monto_mensual / total_horas_prod_mes if total_horas_prod_mes > 0 else 0
-                    
-                    costo_fijos_total += tiempo_total_paso_horas * tasa_hora_cf
-
-            # 5. Calcular Totales y Precio Final
-            costo_total_produccion = Decimal(costo_materia_prima) + costo_mano_obra_total + costo_fijos_total
-            
-            porcentaje_ganancia = Decimal(producto.get('porcentaje_ganancia', 0) or 0) / Decimal(100)
-            precio_sin_iva = costo_total_produccion * (1 + porcentaje_ganancia)
-            
-            factor_iva = Decimal('1.21') if producto.get('iva') else Decimal('1.0')
-            precio_final = precio_sin_iva * factor_iva
-
-            # 6. Actualizar Producto en DB
-            update_data = {
-                'costo_mano_obra': float(costo_mano_obra_total),
-                'costo_fijos': float(costo_fijos_total),
-                'costo_total_produccion': float(costo_total_produccion),
-                'precio_unitario': float(precio_final)
-            }
-            self.model.update(producto_id, update_data, 'id')
-
-            # 7. Registrar Historial de Costos
-            historial_data = {
-                'producto_id': producto_id,
-                'costo_materia_prima': float(costo_materia_prima),
-                'costo_mano_obra': float(costo_mano_obra_total),
-                'costo_indirecto': float(costo_fijos_total),
-                'costo_total': float(costo_total_produccion),
-                'fecha_registro': datetime.now().isoformat()
-            }
-            self.historial_costos_model.create(historial_data)
-
-            return {'success': True}
-
+            return get_motor_costos().recostear_producto(producto_id)
         except Exception as e:
             logger.error(f"Error crítico en _recalcular_costos_producto para ID {producto_id}: {e}", exc_info=True)
             return {'success': False, 'error': str(e)}
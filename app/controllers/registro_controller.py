@@ -1,4 +1,9 @@
+import logging
 from app.models.registro import RegistroModel
+from app.services.audit_service import get_audit_sink
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
 
 class RegistroController:
     
@@ -9,7 +14,8 @@ class RegistroController:
         """
         Crea un registro de auditoría.
         Es robusto y maneja diferentes tipos de objetos de usuario.
-        La fecha es manejada automáticamente por la base de datos para evitar problemas de zona horaria.
+        El registro se encola en el AuditSink y se inserta en lote fuera del request;
+        la fecha se fija aquí en UTC para conservar el momento real del evento.
         """
         try:
             usuario_nombre = "Sistema"
@@ -38,12 +44,12 @@ class RegistroController:
                 'usuario_rol': usuario_rol,
                 'categoria': categoria,
                 'accion': accion,
-                'detalle': detalle
+                'detalle': detalle,
+                'fecha': datetime.now(timezone.utc).isoformat()
             }
-            self.model.create(registro_data)
+            get_audit_sink().submit(registro_data)
         except Exception as e:
-            # En un sistema real, aquí se registraría el error en un log más persistente.
-            print(f"Error al crear registro de auditoría: {e}")
+            logger.error(f"Error al crear registro de auditoría: {e}", exc_info=True)
 
     def obtener_registros_por_categoria(self, categoria):
         result = self.model.find_by_categoria(categoria)
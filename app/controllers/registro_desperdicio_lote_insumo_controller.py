@@ -4,6 +4,7 @@ from app.models.inventario import InventarioModel
 from app.models.registro_desperdicio_lote_insumo_model import RegistroDesperdicioLoteInsumoModel
 from app.controllers.storage_controller import StorageController
 from datetime import datetime
+from app.services.stock_ledger_service import movimiento_inventario
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +15,7 @@ class RegistroDesperdicioLoteInsumoController(BaseController):
         self.inventario_model = InventarioModel()
         self.registro_desperdicio_model = RegistroDesperdicioLoteInsumoModel()
 
+    @movimiento_inventario('MERMA')
     def registrar_desperdicio(self, lote_insumo_id: str, form_data: dict, usuario_id: int, file) -> tuple:
         """Registra un desperdicio para un lote de insumo."""
         try:
@@ -5,6 +5,8 @@ from app.models.producto import ProductoModel
 from app.models.receta_ingrediente import RecetaIngredienteModel
 from app.models.registro_desperdicio_model import RegistroDesperdicioModel
 from app.models.registro_desperdicio_lote_insumo_model import RegistroDesperdicioLoteInsumoModel
+from app.models.hecho_produccion_op import HechoProduccionOPModel
+from app.services.hechos_produccion_service import RegistradorHechosProduccion, tiempo_ciclo_desde_hechos
 from datetime import datetime, timedelta
 from collections import defaultdict
 import logging
@@ -20,6 +22,7 @@ class ReporteProduccionController:
         self.receta_ingrediente_model = RecetaIngredienteModel()
         self.registro_desperdicio_model = RegistroDesperdicioModel()
         self.registro_desperdicio_lote_insumo_model = RegistroDesperdicioLoteInsumoModel()
+        self.hecho_produccion_model = HechoProduccionOPModel()
 
     def obtener_ordenes_por_estado(self):
         """
@@ -137,12 +140,17 @@ class ReporteProduccionController:
     def calcular_tiempo_ciclo_segundos(self, fecha_inicio=None, fecha_fin=None):
         """
         Retorna (promedio_segundos, cantidad_ordenes_validas).
-        OPTIMIZADO: Solo selecciona fechas.
+        Se calcula sobre los hechos de producción por OP; las OPs completadas
+        del período que todavía no tienen hecho se calculan al vuelo, igual
+        que en el OEE. Si no se pueden leer los hechos, se usan las fechas de
+        las OPs completadas.
         """
+        hechos_res = self.hecho_produccion_model.obtener_en_rango('fecha_fin', fecha_inicio, fecha_fin, estado='COMPLETADA')
+
         try:
             query = self.orden_produccion_model.db.table(
                 self.orden_produccion_model.get_table_name()
-            ).select('fecha_inicio, fecha_fin').eq('estado', 'COMPLETADA')
+            ).select('id, fecha_inicio, fecha_fin').eq('estado', 'COMPLETADA')
 
             if fecha_inicio:
                 query = query.gte('fecha_fin', fecha_inicio.isoformat())
@@ -152,6 +160,14 @@ class ReporteProduccionController:
             response = query.execute()
             ordenes = response.data if response.data else []
 
+            if hechos_res.get('success'):
+                hechos = hechos_res.get('data') or []
+                con_hecho = {h['orden_produccion_id'] for h in hechos}
+                sin_hecho = [o['id'] for o in ordenes if o['id'] not in con_hecho]
+                if sin_hecho:
+                    hechos += RegistradorHechosProduccion(ventana=0).construir(sin_hecho)
+                return tiempo_ciclo_desde_hechos(hechos)
+
             if not ordenes:
                 return 0, 0
 
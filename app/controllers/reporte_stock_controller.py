@@ -5,6 +5,7 @@ from app.models.producto import ProductoModel
 from app.models.lote_producto import LoteProductoModel
 from app.models.pedido import PedidoModel
 from datetime import datetime, timedelta
+from app.services.stock_ledger_service import get_stock_ledger
 
 class ReporteStockController:
     def __init__(self):
@@ -154,6 +155,40 @@ class ReporteStockController:
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+    def obtener_stock_insumos_a_fecha(self, fecha_str, id_insumo=None):
+        """
+        Reconstruye el stock utilizable de cada insumo al cierre de una fecha
+        a partir del libro de movimientos (checkpoint + movimientos posteriores).
+        """
+        try:
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return {'success': False, 'error': 'Formato de fecha inválido. Use YYYY-MM-DD.'}
+
+        ledger = get_stock_ledger()
+        if ledger is None:
+            return {'success': False, 'error': 'El libro de movimientos de inventario está deshabilitado.'}
+
+        response = ledger.stock_a_fecha(fecha, id_insumo)
+        if not response.get('success'):
+            return response
+
+        saldos = response['data']
+        nombres = {}
+        if saldos:
+            insumos_res = self.insumo_model.find_all(filters={'id_insumo': list(saldos.keys())},
+                                                     select_columns=['id_insumo', 'nombre', 'unidad_medida'])
+            if insumos_res.get('success'):
+                nombres = {i['id_insumo']: i for i in insumos_res.get('data', [])}
+
+        data = [{
+            'id_insumo': insumo_id,
+            'nombre': nombres.get(insumo_id, {}).get('nombre', 'Desconocido'),
+            'unidad_medida': nombres.get(insumo_id, {}).get('unidad_medida'),
+            'stock': cantidad,
+        } for insumo_id, cantidad in sorted(saldos.items(), key=lambda kv: -kv[1])]
+        return {'success': True, 'data': data, 'fecha': fecha.isoformat()}
+
     def obtener_lotes_insumos_a_vencer(self, dias_horizonte=30):
         """
         Obtiene los lotes de insumos que vencerán en los próximos X días.
@@ -6,8 +6,11 @@ from app.controllers.nota_credito_controller import NotaCreditoController
 from marshmallow import ValidationError
 from flask import flash, url_for
 from app.services.email_service import send_email
+from app.services.telegram_service import notificar_telegram
+from app.services.efectos_alerta_service import EjecutorEfectosAlerta
 from app.models.usuario import UsuarioModel
 from app.models.rol import RoleModel
+import html
 import logging
 import os
 
@@ -71,9 +74,11 @@ class RiesgoController(BaseController):
                  return {"success": False, "error": "No se pudo crear la alerta base."}, 500
 
             if afectados:
-                estados_previos = self._obtener_estados_actuales(afectados)
+                ejecutor = EjecutorEfectosAlerta()
+                estados_previos = self._obtener_estados_actuales(afectados, ejecutor)
                 self.alerta_riesgo_model.asociar_afectados(nueva_alerta['id'], afectados, estados_previos)
-                self._procesar_efectos_secundarios_alerta(nueva_alerta, afectados, estados_previos, f"Alerta {nueva_alerta['codigo']}", usuario_id)
+                self._procesar_efectos_secundarios_alerta(nueva_alerta, afectados, estados_previos,
+                                                          f"Alerta {nueva_alerta['codigo']}", usuario_id, ejecutor)
 
             self._enviar_notificaciones_alerta(nueva_alerta)
             return {"success": True, "data": nueva_alerta}, 201
@@ -97,117 +102,33 @@ class RiesgoController(BaseController):
         nueva_alerta = resultado_alerta.get("data")
         return nueva_alerta[0] if isinstance(nueva_alerta, list) else nueva_alerta
 
-    def _obtener_estados_actuales(self, afectados: list) -> dict:
-        estados = {}
-        from app.models.inventario import InventarioModel
-        from app.models.lote_producto import LoteProductoModel
-        from app.models.orden_produccion import OrdenProduccionModel
-        from app.models.pedido import PedidoModel
-        models = {'lote_insumo': (InventarioModel(), 'id_lote'), 'lote_producto': (LoteProductoModel(), 'id_lote'),
-                  'orden_produccion': (OrdenProduccionModel(), 'id'), 'pedido': (PedidoModel(), 'id')}
-        for afectado in afectados:
-            tipo, entidad_id = afectado['tipo_entidad'], afectado['id_entidad']
-            if tipo in models:
-                model, id_field = models[tipo]
-                try:
-                    res = model.find_by_id(int(entidad_id) if id_field == 'id' else entidad_id, id_field=id_field)
-                    if res.get('success') and res.get('data'):
-                        estados[(tipo, str(entidad_id))] = res['data'].get('estado', 'Desconocido')
-                except Exception as e:
-                    logger.error(f"No se pudo obtener el estado para {tipo}:{entidad_id}. Error: {e}")
-        return estados
-
-    def _procesar_efectos_secundarios_alerta(self, alerta, afectados, estados_previos, motivo_log, usuario_id):
-        from app.controllers.inventario_controller import InventarioController
-        from app.controllers.lote_producto_controller import LoteProductoController
-        from app.controllers.orden_produccion_controller import OrdenProduccionController
-        from app.controllers.pedido_controller import PedidoController
-        controllers = {'lote_insumo': InventarioController(), 'lote_producto': LoteProductoController(),
-                       'orden_produccion': OrdenProduccionController(), 'pedido': PedidoController()}
-        ESTADOS_AFECTADOS = {
-            'lote_insumo': ['disponible', 'agotado', 'reservado', 'vencido'], 'lote_producto': ['disponible', 'reservado', 'agotado', 'vencido'],
-            'orden_produccion': ['en proceso', 'lista para producir', 'en linea 1', 'en linea 2', 'en empaquetado'],
-            'pedido': ['en proceso', 'listo para entrega', 'en transito']
-        }
-        for afectado in afectados:
-            tipo, entidad_id = afectado['tipo_entidad'], afectado['id_entidad']
-            estado_actual = estados_previos.get((tipo, str(entidad_id)), '').lower()
-            
-            # --- Lógica Mejorada para Lotes de Producto ---
-            if tipo == 'lote_producto':
-                # Obtener detalles completos del lote para verificar cantidad
-                lote_data_res = controllers[tipo].model.find_by_id(entidad_id, 'id_lote')
-                if lote_data_res.get('success') and lote_data_res.get('data'):
-                    lote_data = lote_data_res['data']
-                    cantidad_total = float(lote_data.get('cantidad_actual', 0)) + float(lote_data.get('cantidad_en_cuarentena', 0))
-                    
-                    # Si está agotado por estado O por cantidad, lo saltamos para que el usuario pueda solicitar devolución
-                    if 'agotado' in estado_actual or cantidad_total <= 0:
-                        self.alerta_riesgo_model._actualizar_flag_en_alerta_entidad(tipo, entidad_id, True)
-                        continue
-            # --- Fin Lógica Mejorada ---
+    def _obtener_estados_actuales(self, afectados: list, ejecutor: EjecutorEfectosAlerta = None) -> dict:
+        """Estados actuales de los afectados: una consulta `in_` por tipo de entidad."""
+        return (ejecutor or EjecutorEfectosAlerta()).obtener_estados(afectados)
 
-            # Si es insumo agotado, o si no está en un estado procesable, lo marcamos como resuelto automáticamente.
-            if (tipo == 'lote_insumo' and 'agotado' in estado_actual) or \
-               not any(s in estado_actual for s in ESTADOS_AFECTADOS.get(tipo, [])):
-                
-                # Marcar como resuelto en la tabla de afectados
-                self.alerta_riesgo_model.db.table('alerta_riesgo_afectados') \
-                    .update({
-                        'estado': 'resuelto',
-                        'resolucion_aplicada': 'omitido_por_estado_previo',
-                        'id_usuario_resolucion': usuario_id
-                    }) \
-                    .eq('alerta_id', alerta['id']) \
-                    .eq('tipo_entidad', tipo) \
-                    .eq('id_entidad', entidad_id) \
-                    .execute()
-                
-                self.alerta_riesgo_model._actualizar_flag_en_alerta_entidad(tipo, entidad_id, True)
-                continue
-
-            self.alerta_riesgo_model._actualizar_flag_en_alerta_entidad(tipo, entidad_id, True)
-            try:
-                # Preparar datos extra para guardar el estado previo en la entidad misma
-                # Asumimos que el campo se llama 'estado_previo_alerta' si existe en la tabla
-                extra_data_previo = {'estado_previo_alerta': estados_previos.get((tipo, str(entidad_id)), '')}
-
-                if tipo == 'lote_insumo':
-                    # Si está agotado, ya lo saltamos arriba. Aquí llega solo si tiene stock o reservado.
-                    cantidad_a_cuarentena = 999999
-                    
-                    # Actualizar estado previo explícitamente antes de cuarentena si es necesario
-                    controllers[tipo].inventario_model.update(entidad_id, extra_data_previo, 'id_lote')
-
-                    controllers[tipo].poner_lote_en_cuarentena(
-                        lote_id=entidad_id, 
-                        motivo=motivo_log, 
-                        cantidad=cantidad_a_cuarentena, 
-                        usuario_id=usuario_id,
-                        resultado_inspeccion="Pendiente de revisión (Automático por Alerta)",
-                        foto_file=None
-                    )
-                elif tipo == 'lote_producto':
-                    controllers[tipo].model.update(entidad_id, extra_data_previo, 'id_lote')
-
-                    controllers[tipo].poner_lote_en_cuarentena(
-                        lote_id=entidad_id, 
-                        motivo=motivo_log, 
-                        cantidad=999999, 
-                        usuario_id=None, # LoteProductoController no usa usuario_id en args posicionales, pero verificamos firma
-                        resultado_inspeccion="Pendiente de revisión (Automático por Alerta)",
-                        foto_file=None
-                    )
-                elif tipo == 'orden_produccion':
-                    controllers[tipo].cambiar_estado_orden_simple(int(entidad_id), 'EN ESPERA', extra_data=extra_data_previo)
-                elif tipo == 'pedido':
-                    controllers[tipo].model.update(int(entidad_id), extra_data_previo)
-                    controllers[tipo].cambiar_estado_pedido(int(entidad_id), 'EN REVISION')
-            except Exception as e:
-                logger.error(f"Fallo al procesar efecto secundario para {tipo}:{entidad_id}. Error: {e}", exc_info=True)
+    def _procesar_efectos_secundarios_alerta(self, alerta, afectados, estados_previos, motivo_log, usuario_id,
+                                             ejecutor: EjecutorEfectosAlerta = None):
+        """
+        Cuarentena de lotes, OPs en espera y flags de alerta aplicados en lote
+        (ver EjecutorEfectosAlerta). Nunca interrumpe la creación de la alerta.
+        """
+        try:
+            resumen = (ejecutor or EjecutorEfectosAlerta()).aplicar(
+                alerta, afectados, estados_previos, motivo_log, usuario_id, usuario=self._usuario_actual())
+            logger.info(f"Efectos de la alerta {alerta.get('codigo')} aplicados: {resumen}")
+            return resumen
+        except Exception as e:
+            logger.error(f"Fallo al procesar los efectos secundarios de la alerta {alerta.get('codigo')}. Error: {e}", exc_info=True)
+            return None
 
+    @staticmethod
+    def _usuario_actual():
+        try:
+            from flask_jwt_extended import get_current_user
+            return get_current_user()
+        except Exception:
+            return None
 
-        
     def crear_alerta_riesgo(self, datos_json):
         try:
             tipo_entidad = datos_json.get("tipo_entidad")
@@ -717,16 +638,22 @@ class RiesgoController(BaseController):
             base_url = os.getenv("APP_BASE_URL", "http://localhost:5000")
             url_alerta = f"{base_url}/administrar/riesgos/{codigo_alerta}/detalle"
             
+            # El motivo y el origen los escribe el usuario: se escapan antes de armar el HTML.
             mensaje = (
                 f"<b>Nueva Alerta de Riesgo Creada</b>\n\n"
-                f"<b>Código:</b> {codigo_alerta}\n"
-                f"<b>Motivo:</b> {nueva_alerta.get('motivo')}\n"
-                f"<b>Origen:</b> {nueva_alerta.get('origen_tipo_entidad')} ID: {nueva_alerta.get('origen_id_entidad')}\n\n"
+                f"<b>Código:</b> {html.escape(str(codigo_alerta))}\n"
+                f"<b>Motivo:</b> {html.escape(str(nueva_alerta.get('motivo')))}\n"
+                f"<b>Origen:</b> {html.escape(str(nueva_alerta.get('origen_tipo_entidad')))} "
+                f"ID: {html.escape(str(nueva_alerta.get('origen_id_entidad')))}\n\n"
                 f"Puede ver los detalles en el siguiente enlace:\n"
-                f"<a href='{url_alerta}'>Ver Alerta</a>"
+                f"<a href='{html.escape(url_alerta)}'>Ver Alerta</a>"
             )
             asunto = f"Nueva Alerta de Riesgo Creada: {codigo_alerta}"
 
+            # Telegram: se encola y se despacha en segundo plano (nunca bloquea la cuarentena).
+            # Las alertas creadas en ráfaga se agrupan en un único resumen.
+            notificar_telegram(mensaje, key='alerta_riesgo')
+
             # Enviar por Email al supervisor de calidad
             rol_model = RoleModel()
             rol_calidad_res = rol_model.find_by_codigo('CALIDAD')
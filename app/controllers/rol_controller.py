@@ -1,5 +1,6 @@
 from app.controllers.base_controller import BaseController
 from app.models.rol import RoleModel
+from app.services.costeo_service import propagar_cambio_costos
 
 class RolController(BaseController):
     """
@@ -47,6 +48,8 @@ class RolController(BaseController):
         
         result = self.model.update(rol_id, data)
         if result.get('success'):
+            if 'costo_por_hora' in data:
+                propagar_cambio_costos(roles=[rol_id])
             return self.success_response(result['data'], "Rol actualizado exitosamente.")
         return self.error_response(result.get('error', 'No se pudo actualizar el rol.'))
 
@@ -1,31 +1,31 @@
 from app.controllers.base_controller import BaseController
 import logging
-from app.database import Database
+from app.services.storage_service import ErrorSubida, get_pipeline_subidas
 
 logger = logging.getLogger(__name__)
 
 class StorageController(BaseController):
     def __init__(self):
         super().__init__()
-        from app.config import Config
-        from supabase import create_client
-        
-        # Crear un cliente de Supabase con la clave de servicio para tener permisos de administrador
-        self.supabase_admin = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
+        # Pipeline compartido por el proceso: un único cliente de administrador y un pool de subidas.
+        self.pipeline = get_pipeline_subidas()
 
-    def upload_file(self, file, bucket_name: str, destination_path: str):
+    def upload_file(self, file, bucket_name: str, destination_path: str = None):
+        """
+        Sube el archivo y devuelve su URL pública una vez guardado en Storage.
+        La ruta en el bucket es el hash del contenido; de `destination_path`
+        (o del nombre original) sólo se conserva la extensión.
+        """
         try:
-            # Usar el cliente de administrador para la subida
-            response = self.supabase_admin.storage.from_(bucket_name).upload(
-                path=destination_path,
-                file_options={"content-type": file.mimetype},
-                file=file.read(),
+            resultado = self.pipeline.subir(
+                file.read(), bucket_name,
+                nombre=destination_path or file.filename,
+                content_type=file.mimetype,
             )
+            return {"success": True, "url": resultado['url'], "miniaturas": resultado['miniaturas']}, 200
 
-            # Usar el cliente de administrador también para obtener la URL pública
-            public_url_res = self.supabase_admin.storage.from_(bucket_name).get_public_url(destination_path)
-            
-            return {"success": True, "url": public_url_res}, 200
+        except ErrorSubida as e:
+            return {"success": False, "error": str(e)}, 502
 
         except Exception as e:
             logger.error(f"Error al subir archivo a Supabase Storage: {e}", exc_info=True)
@@ -747,54 +747,82 @@ class UsuarioController(BaseController):
         """Obtiene la lista de logins en la web, con filtros opcionales."""
         return self.registro_acceso_model.obtener_actividad_filtrada(filtros)
 
-    def obtener_actividad_unificada(self, filtros: Optional[Dict] = None) -> Dict:
-        """Obtiene una lista unificada de actividad de totem y web."""
-        totem_actividad = self.obtener_actividad_totem(filtros)
-        web_actividad = self.obtener_actividad_web(filtros)
-
-        if not totem_actividad.get('success') or not web_actividad.get('success'):
+    def iterar_actividad_unificada(self, filtros: Optional[Dict] = None, cursor: Optional[str] = None,
+                                   page_size: int = 200):
+        """
+        Feed unificado de actividad (tótem y web) ordenado por fecha de ingreso
+        descendente. Cada fuente se lee de a `page_size` filas y se combinan con
+        un merge perezoso, así que consumir N elementos lee del orden de N filas.
+        `cursor` reanuda después del último elemento de una página anterior.
+        """
+        from app.services.actividad_service import fusionar_actividad, posicion_por_fuente
+        filtros = filtros or {}
+        posiciones = posicion_por_fuente(cursor)
+
+        usuario_ids = None
+        if filtros.get('sector_id'):
+            usuario_ids = self.usuario_sector_model.obtener_usuario_ids_por_sector(filtros['sector_id'])
+            if not usuario_ids:
+                return iter(())
+
+        totem = self.totem_sesion.iterar_actividad(filtros, usuario_ids, posiciones['Totem'], page_size)
+        web = self.registro_acceso_model.iterar_actividad(filtros, usuario_ids, posiciones['Web'], page_size)
+        return fusionar_actividad({
+            'Totem': (self._item_actividad_totem(sesion) for sesion in totem),
+            'Web': (self._item_actividad_web(registro) for registro in web),
+        })
+
+    def obtener_actividad_unificada(self, filtros: Optional[Dict] = None, cursor: Optional[str] = None,
+                                    limite: int = 50) -> Dict:
+        """
+        Obtiene una página de la actividad unificada de totem y web y el cursor
+        opaco de la página siguiente (None si no hay más).
+        """
+        from app.services.actividad_service import CursorInvalidoError, tomar_pagina
+        limite = max(1, min(int(limite or 50), 500))
+        try:
+            # +1 por fuente: alcanza para saber si hay otra página sin una consulta extra.
+            items = self.iterar_actividad_unificada(filtros, cursor, page_size=limite + 1)
+            pagina, siguiente = tomar_pagina(items, limite)
+        except CursorInvalidoError as e:
+            return {'success': False, 'error': str(e), 'status_code': 400}
+        except Exception as e:
+            logger.error(f"Error obteniendo la actividad unificada: {e}", exc_info=True)
             return {'success': False, 'error': 'Error al obtener actividad'}
+        return {'success': True, 'data': pagina, 'siguiente_cursor': siguiente}
 
-        unificada = []
-        for sesion in totem_actividad.get('data', []):
-            unificada.append({
-                'legajo': sesion['usuario']['legajo'],
-                'nombre': f"{sesion['usuario']['nombre']} {sesion['usuario']['apellido']}",
-                'rol': sesion['usuario']['roles']['nombre'],
-                'rol_id': sesion['usuario']['roles']['id'],
-                'sector': sesion['usuario']['sectores'][0]['sectores']['nombre'] if sesion['usuario']['sectores'] else 'N/A',
-                'fecha_ingreso': sesion['fecha_inicio'],
-                'fecha_egreso': sesion['fecha_fin'],
-                'acceso_en': 'Totem',
-                'metodo_acceso': sesion.get('metodo_acceso', 'N/A'),
-                'estado': 'Dentro' if sesion['activa'] else 'Fuera',
-                'id_empleado': sesion['usuario']['id']
-            })
-
-        for registro in web_actividad.get('data', []):
-            unificada.append({
-                'legajo': registro['usuario']['legajo'],
-                'nombre': f"{registro['usuario']['nombre']} {registro['usuario']['apellido']}",
-                'rol': registro['usuario']['roles']['nombre'],
-                'rol_id': registro['usuario']['roles']['id'],
-                'sector': registro['usuario']['sectores'][0]['sectores']['nombre'] if registro['usuario']['sectores'] else 'N/A',
-                'fecha_ingreso': registro['fecha_hora'],
-                'fecha_egreso': None,
-                'acceso_en': 'Web',
-                'metodo_acceso': registro.get('metodo', 'N/A'),
-                'estado': 'N/A',
-                'id_empleado': registro['usuario']['id']
-            })
-
-        # Apply role filter
-        if filtros and filtros.get('rol_id'):
-            rol_id = int(filtros['rol_id'])
-            unificada = [item for item in unificada if item['rol_id'] == rol_id]
-
-        # Sort by fecha_ingreso descending
-        unificada.sort(key=lambda x: x['fecha_ingreso'], reverse=True)
-
-        return {'success': True, 'data': unificada}
+    @staticmethod
+    def _datos_usuario_actividad(usuario: Dict) -> Dict:
+        return {
+            'legajo': usuario['legajo'],
+            'nombre': f"{usuario['nombre']} {usuario['apellido']}",
+            'rol': usuario['roles']['nombre'],
+            'rol_id': usuario['roles']['id'],
+            'sector': usuario['sectores'][0]['sectores']['nombre'] if usuario['sectores'] else 'N/A',
+            'id_empleado': usuario['id'],
+        }
+
+    def _item_actividad_totem(self, sesion: Dict) -> Dict:
+        return {
+            **self._datos_usuario_actividad(sesion['usuario']),
+            'fecha_ingreso': sesion['fecha_inicio'],
+            'fecha_egreso': sesion['fecha_fin'],
+            'acceso_en': 'Totem',
+            'metodo_acceso': sesion.get('metodo_acceso', 'N/A'),
+            'estado': 'Dentro' if sesion['activa'] else 'Fuera',
+            '_id': sesion['id'],
+        }
+
+    def _item_actividad_web(self, registro: Dict) -> Dict:
+        return {
+            **self._datos_usuario_actividad(registro['usuario']),
+            'fecha_ingreso': registro['fecha_hora'],
+            'fecha_egreso': None,
+            'acceso_en': 'Web',
+            'metodo_acceso': registro.get('metodo', 'N/A'),
+            'estado': 'N/A',
+            '_id': registro['id'],
+        }
 
     def obtener_porcentaje_asistencia(self) -> float:
         """Calcula el porcentaje de asistencia actual basado en sesiones de tótem activas."""
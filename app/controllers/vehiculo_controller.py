@@ -2,11 +2,13 @@ import re
 from datetime import datetime, timedelta
 from app.controllers.base_controller import BaseController
 from app.models.vehiculo import VehiculoModel
+from app.services.cumplimiento_flota_service import MotorCumplimientoFlota
 
 class VehiculoController(BaseController):
     def __init__(self):
         super().__init__()
         self.model = VehiculoModel()
+        self.cumplimiento = MotorCumplimientoFlota(self.model)
 
     def _validar_datos_vehiculo(self, data, requerir_fechas=False):
         """
@@ -104,81 +106,9 @@ class VehiculoController(BaseController):
     def _enrich_vehicle_data(self, vehiculos_list):
         """
         Calcula alertas y formatea fechas para una lista de vehiculos.
-        Modifica la lista in-place.
+        Modifica la lista in-place. Estados: AL_DIA, PRONTO_VENC (vence en 30 días o menos), VENCIDA.
         """
-        hoy = datetime.now().date()
-        alerta_delta = timedelta(days=30)
-
-        for vehiculo in vehiculos_list:
-             # Alerta VTV
-            vehiculo['alerta_vtv'] = False # Mantenido por compatibilidad legacy
-            vehiculo['estado_vtv'] = 'AL_DIA' # AL_DIA, PRONTO_VENC, VENCIDA
-            vehiculo['vtv_emision_estimada'] = None # Nuevo campo
-            
-            if vehiculo.get('vtv_vencimiento'):
-                try:
-                    # Manejar formato ISO o YYYY-MM-DD que pueda venir de DB
-                    venc_str = str(vehiculo['vtv_vencimiento'])
-                    # Supabase puede devolver timestamp con T
-                    if 'T' in venc_str:
-                            venc_str = venc_str.split('T')[0]
-                    venc = datetime.strptime(venc_str, '%Y-%m-%d').date()
-                    
-                    # Lógica de 3 estados
-                    if venc < hoy:
-                        vehiculo['estado_vtv'] = 'VENCIDA'
-                        vehiculo['alerta_vtv'] = True # Rojo
-                    elif venc <= (hoy + alerta_delta):
-                        vehiculo['estado_vtv'] = 'PRONTO_VENC'
-                        vehiculo['alerta_vtv'] = True # Usamos esto para pintar de rojo/amarillo en front? Mejor diferenciar.
-                    else:
-                        vehiculo['estado_vtv'] = 'AL_DIA'
-
-                    # Calcular emision estimada (vencimiento - 1 año)
-                    try:
-                        emision = venc.replace(year=venc.year - 1)
-                    except ValueError:
-                        emision = venc - timedelta(days=365)
-                    vehiculo['vtv_emision_estimada'] = emision.strftime('%Y-%m-%d')
-
-                    # Guardar formato limpio para vista
-                    vehiculo['vtv_vencimiento'] = venc_str
-                except (ValueError, TypeError):
-                    pass
-
-            # Alerta Licencia
-            vehiculo['alerta_licencia'] = False
-            vehiculo['estado_licencia'] = 'AL_DIA'
-            vehiculo['licencia_emision_estimada'] = None 
-            
-            if vehiculo.get('licencia_vencimiento'):
-                try:
-                    venc_str = str(vehiculo['licencia_vencimiento'])
-                    if 'T' in venc_str:
-                            venc_str = venc_str.split('T')[0]
-                    venc = datetime.strptime(venc_str, '%Y-%m-%d').date()
-                    
-                    # Lógica de 3 estados
-                    if venc < hoy:
-                        vehiculo['estado_licencia'] = 'VENCIDA'
-                        vehiculo['alerta_licencia'] = True
-                    elif venc <= (hoy + alerta_delta):
-                        vehiculo['estado_licencia'] = 'PRONTO_VENC'
-                        vehiculo['alerta_licencia'] = True
-                    else:
-                        vehiculo['estado_licencia'] = 'AL_DIA'
-                        
-                    # Calcular emision estimada (vencimiento - 5 años)
-                    try:
-                        emision = venc.replace(year=venc.year - 5)
-                    except ValueError:
-                         # Ajuste simple
-                        emision = venc.replace(day=28) - timedelta(days=365*5) # Aprox
-                    vehiculo['licencia_emision_estimada'] = emision.strftime('%Y-%m-%d')
-
-                    vehiculo['licencia_vencimiento'] = venc_str
-                except (ValueError, TypeError):
-                    pass
+        self.cumplimiento.enriquecer(vehiculos_list)
 
     def crear_vehiculo(self, data):
         # Lógica para crear un nuevo vehículo
@@ -1,5 +1,6 @@
 from supabase import create_client, Client
 from app.config import Config
+from app.utils.query_profiler import ProfiledClient
 import logging
 
 
@@ -14,7 +15,8 @@ class Database:
         if cls._instance is None:
             cls._instance = super(Database, cls).__new__(cls)
             try:
-                cls._client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+                # El cliente se envuelve para que el perfilador de consultas vea cada llamada PostgREST.
+                cls._client = ProfiledClient(create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY))
                 logger.info("Conexión a Supabase establecida exitosamente")
             except Exception as e:
                 logger.error(f"Error conectando a Supabase: {str(e)}")
@@ -1,5 +1,11 @@
+import logging
+from typing import Optional
+
+from app.utils import cursor as cursor_keyset
 from .base_model import BaseModel
 
+logger = logging.getLogger(__name__)
+
 class AlertaRiesgoModel(BaseModel):
     def __init__(self, id=None, codigo=None, origen_tipo_entidad=None, origen_id_entidad=None, estado=None, motivo=None, comentarios=None, url_evidencia=None, fecha_creacion=None, resolucion_seleccionada=None, id_usuario_creador=None):
        
@@ -326,71 +332,76 @@ class AlertaRiesgoModel(BaseModel):
             logger.error(f"Error al registrar resolución para {tipo_entidad}:{id_entidad} en alerta {alerta_id}: {e}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
-    def get_all_paginated(self, page: int, per_page: int, filters: dict, select_query: str = None) -> dict:
+    def _agregar_resumen_afectados(self, alertas: list):
+        """Agrega a cada alerta la cantidad de afectados pendientes y los nombres de quienes resolvieron."""
+        if not alertas:
+            return
+        alerta_ids = [a['id'] for a in alertas]
+
+        # 1. Contar pendientes
+        pendientes_res = self.db.table('alerta_riesgo_afectados').select('alerta_id').in_('alerta_id', alerta_ids).eq('estado', 'pendiente').execute()
+        pendientes_map = {}
+        if pendientes_res.data:
+            for p in pendientes_res.data:
+                pendientes_map[p['alerta_id']] = pendientes_map.get(p['alerta_id'], 0) + 1
+
+        # 2. Obtener participantes (resolutores únicos)
+        resolutores_res = self.db.table('alerta_riesgo_afectados').select('alerta_id, usuarios!alerta_riesgo_afectados_id_usuario_resolucion_fkey(nombre, apellido)').in_('alerta_id', alerta_ids).not_.is_('id_usuario_resolucion', 'null').execute()
+        participantes_map = {}
+        if resolutores_res.data:
+            for r in resolutores_res.data:
+                aid = r['alerta_id']
+                user_data = r.get('usuarios')
+                if user_data:
+                    nombre_completo = f"{user_data.get('nombre', '')} {user_data.get('apellido', '')}".strip()
+                    if aid not in participantes_map: participantes_map[aid] = set()
+                    participantes_map[aid].add(nombre_completo)
+
+        # Asignar datos a las alertas
+        for alerta in alertas:
+            alerta['pendientes_count'] = pendientes_map.get(alerta['id'], 0)
+            alerta['participantes_nombres'] = list(participantes_map.get(alerta['id'], []))
+
+            if alerta.get('creador'):
+                nombre_creador = f"{alerta['creador'].get('nombre', '')} {alerta['creador'].get('apellido', '')}".strip()
+                alerta['nombre_creador'] = nombre_creador
+
+    @staticmethod
+    def codificar_cursor(alerta: dict) -> str:
+        """Cursor opaco (rank, fecha_creacion, id) de la última alerta de una página."""
+        return cursor_keyset.codificar_cursor([alerta.get('rank') or 0, alerta['fecha_creacion'], alerta['id']])
+
+    @staticmethod
+    def decodificar_cursor(cursor: Optional[str]) -> Optional[tuple]:
+        if not cursor:
+            return None
+        try:
+            rank, fecha, alerta_id = cursor_keyset.decodificar_cursor(cursor, 3)
+            return float(rank), cursor_keyset.fecha_iso(fecha), int(alerta_id)
+        except (ValueError, TypeError):
+            logger.warning(f"Cursor de alertas inválido: {cursor!r}. Se vuelve a la primera página.")
+            return None
+
+    def buscar(self, texto: Optional[str] = None, estado: Optional[str] = None, limite: int = 20,
+               cursor: Optional[str] = None) -> dict:
         """
-        Obtiene una lista paginada de alertas de riesgo, incluyendo datos agregados como conclusión, participantes y pendientes.
+        Búsqueda de texto completo con la función `buscar_alertas_riesgo`
+        (índice GIN sobre `busqueda`). Con texto ordena por relevancia y
+        después por fecha; sin texto, por fecha. La paginación es por cursor
+        (keyset): una alerta nueva no corre ni repite las páginas siguientes.
+        Devuelve {'success', 'data', 'siguiente_cursor'}.
         """
         try:
-            offset = (page - 1) * per_page
-            
-            # Seleccionamos los campos necesarios, incluyendo conclusion_final
-            query = self._get_query_builder().select(
-                '*, creador:usuarios!alerta_riesgo_id_usuario_creador_fkey(nombre, apellido)', 
-                count='exact'
-            )
-
-            if filters:
-                for key, value in filters.items():
-                    if value:
-                        query = query.ilike(key, f'%{value}%')
-            
-            query = query.order('id', desc=True).range(offset, offset + per_page - 1)
-            
-            result = query.execute()
-            
-            alertas = result.data if result.data else []
-            
-            # Enriquecer con datos agregados (N+1 optimizado no es posible fácilmente con postgrest sin funciones RPC complejas, 
-            # pero haremos queries agrupadas si es posible o iterativas dado que la paginación limita el impacto)
-            
-            if alertas:
-                alerta_ids = [a['id'] for a in alertas]
-                
-                # 1. Contar pendientes
-                pendientes_res = self.db.table('alerta_riesgo_afectados').select('alerta_id').in_('alerta_id', alerta_ids).eq('estado', 'pendiente').execute()
-                pendientes_map = {}
-                if pendientes_res.data:
-                    for p in pendientes_res.data:
-                        pendientes_map[p['alerta_id']] = pendientes_map.get(p['alerta_id'], 0) + 1
-                
-                # 2. Obtener participantes (resolutores únicos)
-                resolutores_res = self.db.table('alerta_riesgo_afectados').select('alerta_id, usuarios!alerta_riesgo_afectados_id_usuario_resolucion_fkey(nombre, apellido)').in_('alerta_id', alerta_ids).not_.is_('id_usuario_resolucion', 'null').execute()
-                participantes_map = {}
-                if resolutores_res.data:
-                    for r in resolutores_res.data:
-                        aid = r['alerta_id']
-                        user_data = r.get('usuarios')
-                        if user_data:
-                            nombre_completo = f"{user_data.get('nombre', '')} {user_data.get('apellido', '')}".strip()
-                            if aid not in participantes_map: participantes_map[aid] = set()
-                            participantes_map[aid].add(nombre_completo)
-
-                # Asignar datos a las alertas
-                for alerta in alertas:
-                    alerta['pendientes_count'] = pendientes_map.get(alerta['id'], 0)
-                    alerta['participantes_nombres'] = list(participantes_map.get(alerta['id'], []))
-                    
-                    if alerta.get('creador'):
-                        nombre_creador = f"{alerta['creador'].get('nombre', '')} {alerta['creador'].get('apellido', '')}".strip()
-                        alerta['nombre_creador'] = nombre_creador
-
-            return {
-                'success': True,
-                'data': alertas,
-                'count': result.count
-            }
+            params = {'p_texto': (texto or '').strip() or None, 'p_estado': estado or None, 'p_limite': limite + 1}
+            posicion = self.decodificar_cursor(cursor)
+            if posicion:
+                params.update(p_cursor_rank=posicion[0], p_cursor_fecha=posicion[1], p_cursor_id=posicion[2])
+
+            alertas = self.db.rpc('buscar_alertas_riesgo', params).execute().data or []
+            siguiente = self.codificar_cursor(alertas[limite - 1]) if len(alertas) > limite else None
+            alertas = alertas[:limite]
+            self._agregar_resumen_afectados(alertas)
+            return {'success': True, 'data': alertas, 'siguiente_cursor': siguiente}
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error al obtener alertas paginadas: {str(e)}", exc_info=True)
+            logger.error(f"Error en la búsqueda de alertas: {e}", exc_info=True)
             return {'success': False, 'error': str(e)}
@@ -1,10 +1,11 @@
 import logging
 from app.models.base_model import BaseModel
+from app.services.planificacion_snapshot_service import VersionaPlanMixin
 from typing import Dict
 
 logger = logging.getLogger(__name__)
 
-class BloqueoCapacidadModel(BaseModel):
+class BloqueoCapacidadModel(VersionaPlanMixin, BaseModel):
     """
     Modelo para gestionar los bloqueos de capacidad (mantenimiento)
     en la tabla 'bloqueos_capacidad'.
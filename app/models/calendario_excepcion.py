@@ -1,4 +1,5 @@
 import logging
+from typing import Dict
 from app.models.base_model import BaseModel
 
 logger = logging.getLogger(__name__)
@@ -9,3 +10,29 @@ class CalendarioExcepcionModel(BaseModel):
     """
     def get_table_name(self) -> str:
         return 'calendario_excepciones'
+
+    # Las excepciones cambian los días laborables: se descarta el calendario
+    # precalculado antes de invalidar el plan, para que se reconstruya con ellas.
+    def _calendario_cambiado(self, motivo: str):
+        from app.services.calendario_laboral_service import invalidar_calendario_laboral
+        from app.services.planificacion_snapshot_service import incrementar_version_plan
+        invalidar_calendario_laboral()
+        incrementar_version_plan(motivo)
+
+    def create(self, data: Dict) -> Dict:
+        resultado = super().create(data)
+        if resultado.get('success'):
+            self._calendario_cambiado(f"alta en {self.get_table_name()}")
+        return resultado
+
+    def update(self, *args, **kwargs) -> Dict:
+        resultado = super().update(*args, **kwargs)
+        if resultado.get('success'):
+            self._calendario_cambiado(f"cambio en {self.get_table_name()}")
+        return resultado
+
+    def delete(self, *args, **kwargs) -> Dict:
+        resultado = super().delete(*args, **kwargs)
+        if resultado.get('success'):
+            self._calendario_cambiado(f"baja en {self.get_table_name()}")
+        return resultado
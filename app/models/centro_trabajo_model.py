@@ -1,6 +1,7 @@
 from .base_model import BaseModel
+from app.services.planificacion_snapshot_service import VersionaPlanMixin
 
-class CentroTrabajoModel(BaseModel):
+class CentroTrabajoModel(VersionaPlanMixin, BaseModel):
 
     # --- MÉTODO REQUERIDO ---
     def get_table_name(self) -> str:
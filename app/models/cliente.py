@@ -1,5 +1,5 @@
 from app.models.base_model import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,6 +29,79 @@ class ClienteModel(BaseModel):
             # En caso de error, retornamos 0 para evitar fallos.
             return 0
 
+    def get_estados_crediticios(self, page_size: int = 1000) -> Dict:
+        """
+        Devuelve id, estado_crediticio y la cantidad de pedidos vencidos
+        ('vencidos', contados agrupados en la base) de todos los clientes,
+        paginado. Sin la función SQL sólo trae id y estado_crediticio.
+        """
+        try:
+            clientes, offset = [], 0
+            while True:
+                filas = self.db.rpc('get_estados_crediticios_con_vencidos', {}) \
+                    .order('id') \
+                    .range(offset, offset + page_size - 1) \
+                    .execute().data or []
+                clientes.extend(filas)
+                if len(filas) < page_size:
+                    return {'success': True, 'data': clientes}
+                offset += page_size
+        except Exception as e:
+            logger.warning(f"RPC get_estados_crediticios_con_vencidos no disponible ({e}). Se leen sólo los estados.")
+        try:
+            clientes = []
+            offset = 0
+            while True:
+                response = self.db.table(self.get_table_name()) \
+                    .select('id, estado_crediticio') \
+                    .order('id') \
+                    .range(offset, offset + page_size - 1) \
+                    .execute()
+                filas = response.data or []
+                clientes.extend(filas)
+                if len(filas) < page_size:
+                    break
+                offset += page_size
+            return {'success': True, 'data': clientes}
+        except Exception as e:
+            logger.error(f"Error obteniendo estados crediticios: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def actualizar_estado_crediticio_masivo(self, cliente_ids: List[int], estado: str, chunk_size: int = 500) -> Dict:
+        """
+        Asigna el mismo estado crediticio a muchos clientes con un UPDATE por
+        bloque de IDs (los bloques evitan URLs demasiado largas en el filtro in).
+        """
+        try:
+            actualizados = 0
+            for i in range(0, len(cliente_ids), chunk_size):
+                bloque = cliente_ids[i:i + chunk_size]
+                self.db.table(self.get_table_name()) \
+                    .update({'estado_crediticio': estado}, returning='minimal') \
+                    .in_('id', bloque) \
+                    .execute()
+                actualizados += len(bloque)
+            return {'success': True, 'count': actualizados}
+        except Exception as e:
+            logger.error(f"Error actualizando estado crediticio a '{estado}': {e}")
+            return {'success': False, 'error': str(e)}
+
+    def actualizar_estado_crediticio_si_cambia(self, cliente_id: int, estado: str) -> Dict:
+        """
+        Actualiza el estado crediticio sólo si es distinto del actual, en una
+        única llamada. 'changed' indica si hubo cambio.
+        """
+        try:
+            response = self.db.table(self.get_table_name()) \
+                .update({'estado_crediticio': estado}) \
+                .eq('id', cliente_id) \
+                .or_(f"estado_crediticio.is.null,estado_crediticio.neq.{estado}") \
+                .execute()
+            return {'success': True, 'changed': bool(response.data)}
+        except Exception as e:
+            logger.error(f"Error actualizando estado crediticio del cliente {cliente_id}: {e}")
+            return {'success': False, 'error': str(e)}
+
     def get_all(self, filtros: Optional[Dict] = None, limit: Optional[int] = None) -> Dict:
         """Obtener todos los clientes, con filtros opcionales de búsqueda y activos."""
         try:
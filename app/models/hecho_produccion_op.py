@@ -0,0 +1,42 @@
+from app.models.base_model import BaseModel
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_HECHO = [
+    'orden_produccion_id', 'estado', 'fecha_inicio', 'fecha_fin', 'tiempo_produccion_seg',
+    'tiempo_paro_seg', 'minutos_planificados', 'cantidad_producida', 'cantidad_desperdicio',
+    'cantidad_rechazada'
+]
+
+
+class HechoProduccionOPModel(BaseModel):
+    """Modelo para la tabla hechos_produccion_op (un resumen de producción por OP para los KPIs)"""
+
+    def get_table_name(self) -> str:
+        return 'hechos_produccion_op'
+
+    def guardar_bulk(self, hechos: List[Dict]) -> Dict:
+        """Inserta o reemplaza los hechos de varias OPs en un único upsert."""
+        if not hechos:
+            return {'success': True, 'data': []}
+        try:
+            filas = [self._prepare_data_for_db(h) for h in hechos]
+            result = self.db.table(self.get_table_name()) \
+                .upsert(filas, on_conflict='orden_produccion_id').execute()
+            return {'success': True, 'data': result.data or []}
+        except Exception as e:
+            logger.error(f"Error guardando hechos de producción: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def obtener_en_rango(self, campo_fecha: str, fecha_inicio, fecha_fin, estado: Optional[str] = None) -> Dict:
+        """Hechos cuya `campo_fecha` (fecha_inicio o fecha_fin) cae en el rango, sólo con las columnas numéricas."""
+        filtros = {}
+        if fecha_inicio:
+            filtros[f'{campo_fecha}_gte'] = fecha_inicio.isoformat()
+        if fecha_fin:
+            filtros[f'{campo_fecha}_lte'] = fecha_fin.isoformat()
+        if estado:
+            filtros['estado'] = estado
+        return self.find_all(filters=filtros, select_columns=COLUMNAS_HECHO)
@@ -1,4 +1,8 @@
 from app.models.base_model import BaseModel
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
 
 class HistorialCostosProductoModel(BaseModel):
     def __init__(self):
@@ -7,3 +11,14 @@ class HistorialCostosProductoModel(BaseModel):
 
     def get_table_name(self):
         return self.table_name
+
+    def registrar_bulk(self, registros: List[Dict]) -> Dict:
+        """Inserta varios registros de historial de costos en una sola consulta."""
+        if not registros:
+            return {'success': True, 'data': []}
+        try:
+            result = self.db.table(self.get_table_name()).insert(registros).execute()
+            return {'success': True, 'data': result.data or []}
+        except Exception as e:
+            logger.error(f"Error registrando historial de costos en lote: {str(e)}")
+            return {'success': False, 'error': str(e)}
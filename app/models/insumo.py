@@ -1,5 +1,5 @@
 from app.models.base_model import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import logging
 from datetime import datetime
 
@@ -236,6 +236,46 @@ class InsumoModel(BaseModel):
         """
         return self.update(id_insumo, {'en_espera_de_reestock': False}, 'id_insumo')
 
+    def marcar_en_espera_masivo(self, ids_insumos: List[str], en_espera: bool = True) -> Dict:
+        """
+        Marca (o desmarca) varios insumos como 'en espera de reestock' con un
+        único UPDATE.
+        """
+        try:
+            if not ids_insumos:
+                return {'success': True, 'count': 0}
+            self.db.table(self.get_table_name()) \
+                .update({'en_espera_de_reestock': en_espera}, returning='minimal') \
+                .in_('id_insumo', list(ids_insumos)) \
+                .execute()
+            return {'success': True, 'count': len(ids_insumos)}
+        except Exception as e:
+            logger.error(f"Error actualizando 'en espera de reestock' de {len(ids_insumos)} insumos: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def obtener_candidatos_reposicion(self, proveedor_ids: List[str], incluir_sin_proveedor: bool = False) -> Dict:
+        """
+        Insumos activos que no están en espera de reestock de todos los
+        proveedores indicados (y, opcionalmente, los que no tienen proveedor),
+        en una sola consulta.
+        """
+        try:
+            query = self.db.table(self.get_table_name()).select('*') \
+                .eq('en_espera_de_reestock', False) \
+                .eq('activo', True)
+            condiciones = []
+            if proveedor_ids:
+                condiciones.append(f"id_proveedor.in.({','.join(str(p) for p in proveedor_ids)})")
+            if incluir_sin_proveedor:
+                condiciones.append('id_proveedor.is.null')
+            if not condiciones:
+                return {'success': True, 'data': []}
+            query = query.or_(','.join(condiciones))
+            return {'success': True, 'data': query.execute().data or []}
+        except Exception as e:
+            logger.error(f"Error obteniendo insumos candidatos a reposición: {e}")
+            return {'success': False, 'error': str(e)}
+
     def find_by_orden_compra_ids(self, orden_compra_ids: list) -> Dict:
         """
         Encuentra todos los insumos únicos asociados a una lista de IDs de órdenes de compra,
@@ -8,6 +8,46 @@ import math  # <-- CORRECCIÓN 1: Importar math
 
 logger = logging.getLogger(__name__)
 
+
+def resumir_inventario_por_insumo(catalogo: List[Dict], lotes: List[Dict], reservas: List[Dict]) -> List[Dict]:
+    """
+    Equivalente en Python de la función SQL `get_resumen_inventario_insumos`:
+    una fila por insumo activo con stock físico, en cuarentena y reservado,
+    cantidad de lotes y los números de lote (para el filtro de la vista).
+    """
+    totales = {}
+    for lote in lotes:
+        t = totales.setdefault(lote.get('id_insumo'), {'fisico': 0.0, 'cuarentena': 0.0, 'lotes': 0, 'numeros': set()})
+        t['fisico'] += float(lote.get('cantidad_actual') or 0)
+        t['cuarentena'] += float(lote.get('cantidad_en_cuarentena') or 0)
+        t['lotes'] += 1
+        if lote.get('numero_lote_proveedor'):
+            t['numeros'].add(str(lote['numero_lote_proveedor']).lower())
+    reservado = {}
+    for reserva in reservas:
+        if reserva.get('estado', 'RESERVADO') == 'RESERVADO':
+            reservado[reserva.get('insumo_id')] = reservado.get(reserva.get('insumo_id'), 0.0) + float(reserva.get('cantidad_reservada') or 0)
+
+    resumen = []
+    for insumo in catalogo:
+        if insumo.get('activo') is False:
+            continue
+        t = totales.get(insumo['id_insumo'], {'fisico': 0.0, 'cuarentena': 0.0, 'lotes': 0, 'numeros': set()})
+        resumen.append({
+            'id_insumo': insumo['id_insumo'],
+            'nombre': insumo.get('nombre'),
+            'categoria': insumo.get('categoria'),
+            'unidad_medida': insumo.get('unidad_medida'),
+            'stock_fisico': t['fisico'],
+            'stock_cuarentena': t['cuarentena'],
+            'stock_reservado': reservado.get(insumo['id_insumo'], 0.0),
+            'cantidad_lotes': t['lotes'],
+            'numeros_lote': ' '.join(sorted(t['numeros'])),
+        })
+    resumen.sort(key=lambda r: r['nombre'] or '')
+    return resumen
+
+
 class InventarioModel(BaseModel):
     """Modelo para la tabla insumos_inventario"""
 
@@ -73,7 +113,51 @@ class InventarioModel(BaseModel):
         sanitized_data = self._sanitize_dates_for_db(data)
 
         # Llamada al método update de BaseModel (usando super() para llamar a la implementación base)
-        return super().update(id_value, sanitized_data, key_name)
+        result = super().update(id_value, sanitized_data, key_name)
+        if result.get('success'):
+            self._registrar_movimiento(result['data'])
+        return result
+
+    def create(self, data: Dict) -> Dict:
+        """Crea el lote y registra su ingreso en el libro de movimientos."""
+        result = super().create(data)
+        if result.get('success'):
+            self._registrar_movimiento(result['data'], alta=True)
+        return result
+
+    def poner_en_cuarentena(self, lote_ids: List[str], motivo: str) -> Dict:
+        """
+        Pasa a cuarentena todo el stock físico (disponible + reservado) de los
+        lotes con la función `cuarentena_lotes_insumo`, que calcula sobre los
+        valores vigentes de cada lote y sólo escribe las columnas de cuarentena.
+        Registra los movimientos en el libro con una única llamada.
+        """
+        if not lote_ids:
+            return {'success': True, 'data': []}
+        try:
+            actualizados = self.db.rpc('cuarentena_lotes_insumo', {
+                'p_ids': [str(i) for i in lote_ids], 'p_motivo': motivo}).execute().data or []
+        except Exception as e:
+            logger.error(f"Error pasando a cuarentena {len(lote_ids)} lotes de inventario: {str(e)}")
+            return {'success': False, 'error': str(e)}
+        try:
+            from app.services.stock_ledger_service import get_stock_ledger
+            ledger = get_stock_ledger()
+            if ledger is not None:
+                ledger.registrar_cambios_lotes(actualizados)
+        except Exception as e:
+            logger.error(f"Error registrando movimientos de inventario de {len(actualizados)} lotes: {e}", exc_info=True)
+        return {'success': True, 'data': actualizados}
+
+    def _registrar_movimiento(self, lote: Dict, alta: bool = False):
+        """Informa el nuevo estado del lote al libro de inventario (nunca interrumpe la escritura)."""
+        try:
+            from app.services.stock_ledger_service import get_stock_ledger
+            ledger = get_stock_ledger()
+            if ledger is not None:
+                ledger.registrar_cambio_lote(lote, alta=alta)
+        except Exception as e:
+            logger.error(f"Error registrando movimiento de inventario para el lote {lote.get('id_lote')}: {e}", exc_info=True)
 
 
     def actualizar_cantidad(self, id_lote: str, nueva_cantidad: float, motivo: str = '') -> Dict:
@@ -223,9 +307,13 @@ class InventarioModel(BaseModel):
             # --- NUEVO: Obtener reservas activas de insumos ---
             # Buscamos en la tabla 'reserva_insumos' (o 'reservas_insumos' según tu DB)
             # Asumo 'reserva_insumos' basado en tus controladores anteriores.
-            reservas_result = self.db.table('reservas_insumos').select(
+            reservas_query = self.db.table('reservas_insumos').select(
                 'lote_inventario_id, cantidad_reservada'
-            ).eq('estado', 'RESERVADO').execute()
+            ).eq('estado', 'RESERVADO')
+            # Al pedir los lotes de un solo insumo (detalle de la vista agrupada) alcanzan sus reservas.
+            if filtros and filtros.get('id_insumo') and not isinstance(filtros['id_insumo'], tuple):
+                reservas_query = reservas_query.eq('insumo_id', filtros['id_insumo'])
+            reservas_result = reservas_query.execute()
 
             reservas_map = {}
             if hasattr(reservas_result, 'data'):
@@ -279,6 +367,41 @@ class InventarioModel(BaseModel):
             logger.error(f"Error obteniendo lotes de insumos: {e}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
+    def obtener_resumen_por_insumo(self) -> Dict:
+        """
+        Totales por insumo activo (físico, cuarentena, reservado y cantidad de
+        lotes) calculados en la base con la función `get_resumen_inventario_insumos`.
+        Si la función no está instalada, se calcula leyendo sólo las columnas
+        necesarias, por páginas (PostgREST corta cada respuesta en 1000 filas).
+        """
+        try:
+            result = self.db.rpc('get_resumen_inventario_insumos').execute()
+            return {'success': True, 'data': result.data or []}
+        except Exception as e:
+            logger.warning(f"RPC get_resumen_inventario_insumos no disponible ({e}). Se agrega en Python.")
+        try:
+            catalogo = self._leer_paginado(lambda: self.db.table('insumos_catalogo').select(
+                'id_insumo, nombre, categoria, unidad_medida').eq('activo', True), 'id_insumo')
+            lotes = self._leer_paginado(lambda: self.db.table(self.get_table_name()).select(
+                'id_insumo, cantidad_actual, cantidad_en_cuarentena, numero_lote_proveedor'), 'id_lote')
+            reservas = self._leer_paginado(lambda: self.db.table('reservas_insumos').select(
+                'insumo_id, cantidad_reservada').eq('estado', 'RESERVADO'), 'id')
+            return {'success': True, 'data': resumir_inventario_por_insumo(catalogo, lotes, reservas)}
+        except Exception as e:
+            logger.error(f"Error obteniendo el resumen de inventario por insumo: {e}", exc_info=True)
+            return {'success': False, 'error': str(e)}
+
+    @staticmethod
+    def _leer_paginado(crear_query, orden: str, page_size: int = 1000) -> List[Dict]:
+        """Todas las filas de `crear_query()`, pedidas de a `page_size` en orden por `orden`."""
+        filas, offset = [], 0
+        while True:
+            pagina = crear_query().order(orden).range(offset, offset + page_size - 1).execute().data or []
+            filas.extend(pagina)
+            if len(pagina) < page_size:
+                return filas
+            offset += page_size
+
     def get_lote_detail_for_view(self, id_lote: str) -> Dict:
         """
         Obtiene un único lote con todos los detalles de insumo y proveedor.
@@ -589,19 +712,18 @@ class InventarioModel(BaseModel):
 
     def get_all_stock_disponible_map(self) -> Dict:
         """
-        Obtiene el stock disponible de TODOS los insumos en una sola consulta
-        y lo devuelve como un mapa {insumo_id: stock_disponible}.
+        Obtiene el stock disponible de TODOS los insumos como un mapa
+        {insumo_id: stock_disponible}. Se lee de los saldos del libro de
+        movimientos; la función RPC 'get_stock_total_disponible' queda como
+        respaldo si el libro no está disponible.
         """
         try:
-            # Asumiendo que tienes una función o vista en Supabase que hace esto.
-            # Si no, esta es la consulta SQL que necesitas crear:
-            # SELECT insumo_id, SUM(stock_disponible) as stock_disponible
-            # FROM stock_insumos_lote
-            # WHERE estado = 'DISPONIBLE'
-            # GROUP BY insumo_id
-
-            # Usando Supabase RPC (Remote Procedure Call)
-            # Debes crear una función en tu DB llamada 'get_stock_total_disponible'
+            from app.services.stock_ledger_service import get_stock_ledger
+            ledger = get_stock_ledger()
+            saldos = ledger.saldos_insumos() if ledger is not None else None
+            if saldos is not None:
+                return {'success': True, 'data': saldos}
+
             result = self.db.rpc('get_stock_total_disponible').execute()
 
             stock_map = {item['insumo_id']: Decimal(item['stock_disponible']) for item in result.data}
@@ -609,4 +731,4 @@ class InventarioModel(BaseModel):
 
         except Exception as e:
             logger.error(f"Error en get_all_stock_disponible_map: {e}", exc_info=True)
-            return {'success': False, 'error': str(e), 'data': {}}
\ No newline at end of file
+            return {'success': False, 'error': str(e), 'data': {}}
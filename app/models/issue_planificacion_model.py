@@ -1,12 +1,13 @@
 import logging
 from app.models.base_model import BaseModel
+from app.services.planificacion_snapshot_service import VersionaPlanMixin, incrementar_version_plan
 from app.schemas.issue_planificacion_schema import IssuePlanificacionSchema
 from typing import Dict
 from datetime import datetime # Importar datetime
 
 logger = logging.getLogger(__name__)
 
-class IssuePlanificacionModel(BaseModel):
+class IssuePlanificacionModel(VersionaPlanMixin, BaseModel):
     """
     Modelo para gestionar la tabla 'issues_planificacion'.
     """
@@ -61,6 +62,7 @@ class IssuePlanificacionModel(BaseModel):
         """ Elimina un issue usando el ID de la orden de producción. """
         try:
             self.db.table(self.get_table_name()).delete().eq('orden_produccion_id', op_id).execute()
+            incrementar_version_plan(f"baja de issue de OP {op_id}")
             return {'success': True}
         except Exception as e:
             logger.error(f"Error al eliminar issue por op_id {op_id}: {e}", exc_info=True)
@@ -93,6 +95,7 @@ class IssuePlanificacionModel(BaseModel):
                                     .execute()
 
                 if update_result.data:
+                    incrementar_version_plan(f"cambio de issue de OP {op_id}")
                     return {'success': True, 'data': update_result.data[0]}
                 else:
                     return {'success': False, 'error': f"No se pudo actualizar el issue para OP {op_id}."}
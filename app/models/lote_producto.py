@@ -38,6 +38,22 @@ class LoteProductoModel(BaseModel):
         
         return super().update(record_id, data, id_column)
 
+    def poner_en_cuarentena(self, lote_ids: List[int], motivo: str) -> Dict:
+        """
+        Pasa a cuarentena todo lo disponible de los lotes con la función
+        `cuarentena_lotes_producto` (AGOTADO si no queda nada), calculado sobre
+        los valores vigentes y sin tocar el resto de la fila.
+        """
+        if not lote_ids:
+            return {'success': True, 'data': []}
+        try:
+            result = self.db.rpc('cuarentena_lotes_producto', {
+                'p_ids': [int(i) for i in lote_ids], 'p_motivo': motivo}).execute()
+            return {'success': True, 'data': result.data or []}
+        except Exception as e:
+            logger.error(f"Error pasando a cuarentena {len(lote_ids)} lotes de producto: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
     def get_all_lotes_for_antiquity_view(self) -> Dict:
         """
         Obtiene todos los lotes de producto con su costo de producción calculado,
@@ -0,0 +1,115 @@
+from app.models.base_model import BaseModel
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MovimientoInventarioModel(BaseModel):
+    """Modelo para la tabla movimientos_inventario (libro mayor append-only de stock de insumos)"""
+
+    def get_table_name(self) -> str:
+        return 'movimientos_inventario'
+
+    def obtener_posteriores(self, ultimo_id: int, hasta_fecha: Optional[str] = None,
+                            id_insumo: Optional[str] = None, page_size: int = 1000) -> Dict:
+        """
+        Devuelve, en orden, los movimientos con id mayor a `ultimo_id`
+        (opcionalmente hasta una fecha y de un único insumo). Se usa para
+        reproducir el libro a partir de un checkpoint.
+        """
+        try:
+            movimientos = []
+            desde = ultimo_id
+            while True:
+                query = self.db.table(self.get_table_name()) \
+                    .select('id, fecha, tipo, id_lote, id_insumo, cantidad') \
+                    .gt('id', desde)
+                if hasta_fecha:
+                    query = query.lte('fecha', hasta_fecha)
+                if id_insumo:
+                    query = query.eq('id_insumo', id_insumo)
+                filas = query.order('id').limit(page_size).execute().data or []
+                movimientos.extend(filas)
+                if len(filas) < page_size:
+                    break
+                desde = filas[-1]['id']
+            return {'success': True, 'data': movimientos}
+        except Exception as e:
+            logger.error(f"Error obteniendo movimientos de inventario posteriores a {ultimo_id}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def registrar_cambios(self, cambios: List[Dict]) -> Dict:
+        """
+        Registra los movimientos de los lotes indicados (`id_lote`, `alta`,
+        `tipo`, referencia y usuario) con la función de la base, que toma la
+        cantidad actual de cada lote y actualiza los saldos en la misma
+        transacción. Devuelve sólo los movimientos con cambio de saldo.
+        """
+        try:
+            result = self.db.rpc('registrar_movimientos_inventario', {'p_cambios': cambios}).execute()
+            return {'success': True, 'data': result.data or []}
+        except Exception as e:
+            logger.error(f"Error registrando movimientos de inventario: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def obtener_saldos_insumos(self, ids_insumo: Optional[List[str]] = None, page_size: int = 1000) -> Dict:
+        """Saldos por insumo mantenidos por el libro (tabla saldos_inventario_insumo)."""
+        try:
+            saldos, offset = [], 0
+            while True:
+                query = self.db.table('saldos_inventario_insumo').select('id_insumo, saldo')
+                if ids_insumo is not None:
+                    query = query.in_('id_insumo', ids_insumo)
+                filas = query.order('id_insumo').range(offset, offset + page_size - 1).execute().data or []
+                saldos.extend(filas)
+                if len(filas) < page_size:
+                    return {'success': True, 'data': saldos}
+                offset += page_size
+        except Exception as e:
+            logger.error(f"Error obteniendo saldos de inventario: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def obtener_por_lote(self, id_lote: str) -> Dict:
+        """Historial completo de un lote, del más reciente al más antiguo."""
+        return self.find_all(filters={'id_lote': id_lote}, order_by='id.desc')
+
+
+class CheckpointInventarioModel(BaseModel):
+    """Modelo para la tabla checkpoints_inventario (saldos consolidados a un momento dado)"""
+
+    def get_table_name(self) -> str:
+        return 'checkpoints_inventario'
+
+    def obtener_ultimo(self, hasta_fecha: Optional[str] = None) -> Dict:
+        """Último checkpoint, o el último anterior o igual a `hasta_fecha`."""
+        try:
+            query = self.db.table(self.get_table_name()).select('*')
+            if hasta_fecha:
+                query = query.lte('fecha', hasta_fecha)
+            result = query.order('id', desc=True).limit(1).execute()
+            return {'success': True, 'data': result.data[0] if result.data else None}
+        except Exception as e:
+            logger.error(f"Error obteniendo checkpoint de inventario: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def crear(self) -> Dict:
+        """Guarda un checkpoint con los saldos actuales del libro."""
+        try:
+            result = self.db.rpc('crear_checkpoint_inventario', {}).execute()
+            return {'success': True, 'data': result.data}
+        except Exception as e:
+            logger.error(f"Error creando checkpoint de inventario: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def conciliar(self) -> Dict:
+        """Ajusta los saldos contra los lotes reales y guarda un checkpoint. `data` es la cantidad de ajustes."""
+        try:
+            result = self.db.rpc('conciliar_inventario', {}).execute()
+            return {'success': True, 'data': result.data or 0}
+        except Exception as e:
+            logger.error(f"Error conciliando el libro de inventario: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def listar(self, limit: int = 30) -> Dict:
+        return self.find_all(order_by='id.desc', limit=limit, select_columns=['id', 'fecha', 'ultimo_movimiento_id'])
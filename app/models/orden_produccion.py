@@ -1,10 +1,11 @@
 from app.models.base_model import BaseModel
+from app.services.planificacion_snapshot_service import VersionaPlanMixin
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import logging
 logger = logging.getLogger(__name__)
 
-class OrdenProduccionModel(BaseModel):
+class OrdenProduccionModel(VersionaPlanMixin, BaseModel):
     """
     Modelo para gestionar las operaciones de la tabla `ordenes_produccion` en la base de datos."""
 
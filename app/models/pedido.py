@@ -782,6 +782,53 @@ class PedidoModel(BaseModel):
             logger.error(f"Error en get_sales_by_product_in_period: {str(e)}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
+    def contar_vencidos_por_cliente(self, page_size: int = 1000) -> Dict:
+        """
+        Cuenta los pedidos con pago vencido agrupados por cliente con
+        `contar_pedidos_vencidos_por_cliente` (un conteo agrupado en la base).
+        Sin la función SQL, se cuentan en una sola pasada trayendo sólo la
+        columna id_cliente, paginando de a `page_size`.
+        Devuelve {'success': True, 'data': {id_cliente: cantidad}}.
+        """
+        try:
+            result = self.db.rpc('contar_pedidos_vencidos_por_cliente', {}).execute()
+            return {'success': True, 'data': {fila['id_cliente']: fila['vencidos'] for fila in result.data or []}}
+        except Exception as e:
+            logger.warning(f"RPC contar_pedidos_vencidos_por_cliente no disponible ({e}). Se cuentan en Python.")
+        try:
+            conteo = {}
+            offset = 0
+            while True:
+                result = self.db.table(self.get_table_name()) \
+                    .select('id_cliente') \
+                    .eq('estado_pago', 'vencido') \
+                    .order('id') \
+                    .range(offset, offset + page_size - 1) \
+                    .execute()
+                filas = result.data or []
+                for fila in filas:
+                    conteo[fila['id_cliente']] = conteo.get(fila['id_cliente'], 0) + 1
+                if len(filas) < page_size:
+                    break
+                offset += page_size
+            return {'success': True, 'data': conteo}
+        except Exception as e:
+            logger.error(f"Error contando pedidos vencidos por cliente: {str(e)}", exc_info=True)
+            return {'success': False, 'error': str(e)}
+
+    def contar_vencidos_cliente(self, id_cliente: int) -> Dict:
+        """Cuenta (sin traer filas) los pedidos con pago vencido de un cliente."""
+        try:
+            result = self.db.table(self.get_table_name()) \
+                .select('id', count='exact', head=True) \
+                .eq('id_cliente', id_cliente) \
+                .eq('estado_pago', 'vencido') \
+                .execute()
+            return {'success': True, 'count': result.count or 0}
+        except Exception as e:
+            logger.error(f"Error contando pedidos vencidos del cliente {id_cliente}: {str(e)}", exc_info=True)
+            return {'success': False, 'count': 0}
+
     def count_by_estado_in_date_range(self, estado: str, fecha_inicio: datetime, fecha_fin: datetime) -> Dict:
         """
         Cuenta los pedidos por estado en un rango de fechas.
@@ -1,5 +1,5 @@
 from app.models.base_model import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -130,4 +130,30 @@ class ProductoModel(BaseModel):
                 return {'success': False, 'error': 'No se encontraron productos con esos nombres'}
         except Exception as e:
             logger.error(f"Error buscando productos por nombres: {str(e)}")
-            return {'success': False, 'error': str(e)}
\ No newline at end of file
+            return {'success': False, 'error': str(e)}
+
+    COLUMNAS_COSTO = ('costo_mano_obra', 'costo_fijos', 'costo_total_produccion', 'precio_unitario')
+
+    def actualizar_costos_bulk(self, filas: List[Dict]) -> Dict:
+        """
+        Actualiza sólo los costos y el precio de varios productos. Cada fila trae
+        el 'id' y las columnas de COLUMNAS_COSTO; el resto del producto no se toca.
+        Usa la función `actualizar_costos_productos` (una sentencia para todo el
+        lote); si no está instalada, actualiza producto por producto.
+        """
+        if not filas:
+            return {'success': True, 'data': 0}
+        filas = [{'id': f['id'], **{c: f[c] for c in self.COLUMNAS_COSTO}} for f in filas]
+        try:
+            result = self.db.rpc('actualizar_costos_productos', {'p_filas': filas}).execute()
+            return {'success': True, 'data': result.data}
+        except Exception as e:
+            logger.warning(f"RPC actualizar_costos_productos no disponible ({e}). Se actualiza por producto.")
+        try:
+            for fila in filas:
+                self.db.table(self.get_table_name()).update(
+                    {c: fila[c] for c in self.COLUMNAS_COSTO}).eq('id', fila['id']).execute()
+            return {'success': True, 'data': len(filas)}
+        except Exception as e:
+            logger.error(f"Error actualizando costos de productos en lote: {str(e)}")
+            return {'success': False, 'error': str(e)}
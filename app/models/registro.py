@@ -12,6 +12,20 @@ class RegistroModel(BaseModel):
         """
         return super().create(data)
 
+    def create_many(self, registros: List[Dict]) -> Dict:
+        """
+        Inserta varios registros en una sola llamada (bulk insert), sin pedir
+        la representación de las filas creadas.
+        """
+        try:
+            if not registros:
+                return {'success': True, 'count': 0}
+            clean_data = [self._prepare_data_for_db(r) for r in registros]
+            self._get_query_builder().insert(clean_data, returning="minimal").execute()
+            return {'success': True, 'count': len(clean_data)}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
     def find_by_categoria(self, categoria: str) -> Dict:
         """
         Busca todos los registros de una categoría específica, ordenados por fecha descendente.
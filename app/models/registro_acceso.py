@@ -1,6 +1,6 @@
 from app.models.base_model import BaseModel
 import logging
-from typing import Dict
+from typing import Dict, Iterator, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -44,3 +44,29 @@ class RegistroAccesoModel(BaseModel):
         except Exception as e:
             logger.error(f"Error obteniendo la actividad de acceso web filtrada: {str(e)}", exc_info=True)
             return {'success': False, 'error': str(e)}
+
+    def iterar_actividad(self, filtros: Optional[dict] = None, usuario_ids: Optional[List[int]] = None,
+                         despues_de: Optional[Tuple[str, Optional[int]]] = None, page_size: int = 200) -> Iterator[Dict]:
+        """
+        Recorre los accesos web por fecha_hora descendente, de a páginas
+        (keyset sobre fecha_hora, id). Los filtros de fecha y rol ('rol_id')
+        se resuelven en la consulta; el de sector llega ya resuelto en `usuario_ids`.
+        """
+        from app.services.actividad_service import iterar_keyset_desc
+        filtros = filtros or {}
+
+        def construir_query():
+            query = self.db.table(self.get_table_name()).select(
+                '*, usuario:usuarios!inner(id, nombre, apellido, legajo, role_id, roles(id, nombre), sectores:usuario_sectores(sectores(nombre)))'
+            )
+            if usuario_ids is not None:
+                query = query.in_('usuario_id', usuario_ids)
+            if filtros.get('rol_id'):
+                query = query.eq('usuario.role_id', int(filtros['rol_id']))
+            if filtros.get('fecha_desde'):
+                query = query.gte('fecha_hora', f"{filtros['fecha_desde']}T00:00:00")
+            if filtros.get('fecha_hasta'):
+                query = query.lte('fecha_hora', f"{filtros['fecha_hasta']}T23:59:59")
+            return query
+
+        return iterar_keyset_desc(construir_query, 'fecha_hora', despues_de, page_size)
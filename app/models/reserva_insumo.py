@@ -1,11 +1,12 @@
 from app.models.base_model import BaseModel
-from typing import Dict
+from app.services.planificacion_snapshot_service import VersionaPlanMixin
+from typing import Dict, List
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-class ReservaInsumoModel(BaseModel):
+class ReservaInsumoModel(VersionaPlanMixin, BaseModel):
     """Modelo para la tabla reservas_insumos"""
 
     def get_table_name(self) -> str:
@@ -183,3 +184,18 @@ class ReservaInsumoModel(BaseModel):
         except Exception as e:
             logger.error(f"Error al obtener reservas por ID de orden de producción {orden_produccion_id}: {str(e)}")
             return {'success': False, 'error': str(e), 'data': []}
+
+    def get_op_ids_con_reservas(self, op_ids: List[int]) -> Dict:
+        """
+        Devuelve, en una sola consulta, el conjunto de OPs (de `op_ids`) que
+        tienen al menos una reserva de insumos.
+        """
+        if not op_ids:
+            return {'success': True, 'data': set()}
+        try:
+            result = self.db.table(self.get_table_name()).select('orden_produccion_id') \
+                .in_('orden_produccion_id', list(set(op_ids))).execute()
+            return {'success': True, 'data': {r['orden_produccion_id'] for r in (result.data or [])}}
+        except Exception as e:
+            logger.error(f"Error al obtener reservas de las OPs {op_ids}: {str(e)}")
+            return {'success': False, 'error': str(e), 'data': set()}
@@ -1,7 +1,7 @@
 from app.models.base_model import BaseModel
 import logging
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Iterator, List, Optional, Tuple
 from app.utils.date_utils import get_now_in_argentina, get_today_utc3_range
 
 logger = logging.getLogger(__name__)
@@ -137,6 +137,31 @@ class TotemSesionModel(BaseModel):
             logger.error(f"Error obteniendo la actividad del tótem filtrada: {str(e)}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
+    def iterar_actividad(self, filtros: Optional[dict] = None, usuario_ids: Optional[List[int]] = None,
+                         despues_de: Optional[Tuple[str, Optional[int]]] = None, page_size: int = 200) -> Iterator[Dict]:
+        """
+        Recorre las sesiones del tótem por fecha_inicio descendente, de a páginas
+        (keyset sobre fecha_inicio, id). Los filtros de fecha y rol ('rol_id')
+        se resuelven en la consulta; el de sector llega ya resuelto en `usuario_ids`.
+        """
+        from app.services.actividad_service import iterar_keyset_desc
+        filtros = filtros or {}
+
+        def construir_query():
+            query = self.db.table(self.get_table_name())\
+                .select('*, usuario:usuarios!inner(id, nombre, apellido, legajo, role_id, roles(id, nombre), sectores:usuario_sectores(sectores(nombre)))')
+            if usuario_ids is not None:
+                query = query.in_('usuario_id', usuario_ids)
+            if filtros.get('rol_id'):
+                query = query.eq('usuario.role_id', int(filtros['rol_id']))
+            if filtros.get('fecha_desde'):
+                query = query.gte('fecha_inicio', f"{filtros['fecha_desde']}T00:00:00")
+            if filtros.get('fecha_hasta'):
+                query = query.lte('fecha_inicio', f"{filtros['fecha_hasta']}T23:59:59")
+            return query
+
+        return iterar_keyset_desc(construir_query, 'fecha_inicio', despues_de, page_size)
+
     def find_all_active(self) -> Dict:
         """
         Obtiene todas las sesiones de tótem que están actualmente activas.
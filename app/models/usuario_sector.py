@@ -25,6 +25,13 @@ class UsuarioSectorModel(BaseModel):
             logger.error(f"Error al obtener sectores del usuario {usuario_id}: {e}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
+    def obtener_usuario_ids_por_sector(self, sector_id: int) -> List[int]:
+        """
+        Devuelve los ids de los usuarios asignados a un sector (lanza la excepción si falla la consulta).
+        """
+        response = self.db.table(self.get_table_name()).select('usuario_id').eq('sector_id', sector_id).execute()
+        return [item['usuario_id'] for item in response.data or []]
+
     def asignar_sector(self, usuario_id: int, sector_id: int) -> Dict[str, bool | Dict | str]:
         """
         Crea una nueva asignación de un sector a un usuario.
@@ -121,6 +121,48 @@ def init_scheduler(app: Flask):
         minute=app.config.get('CREDIT_UPDATE_MINUTE', 0),
         replace_existing=True
     )
+    scheduler.add_job(
+        id='checkpoint_inventario_diario',
+        func=job_checkpoint_inventario,
+        args=[app],
+        trigger='cron',
+        hour=app.config.get('STOCK_CHECKPOINT_HOUR', 2), # 2 AM por defecto
+        minute=app.config.get('STOCK_CHECKPOINT_MINUTE', 0),
+        replace_existing=True
+    )
+    scheduler.add_job(
+        id='recalculo_stock_insumos',
+        func=job_recalculo_stock_insumos,
+        args=[app],
+        trigger='interval',
+        minutes=app.config.get('STOCK_RECALC_MINUTES', 30),
+        replace_existing=True
+    )
+    scheduler.add_job(
+        id='vencimientos_flota_diario',
+        func=job_vencimientos_flota,
+        args=[app],
+        trigger='cron',
+        hour=app.config.get('FLEET_CHECK_HOUR', 6), # 6 AM por defecto
+        minute=app.config.get('FLEET_CHECK_MINUTE', 0),
+        replace_existing=True
+    )
+    scheduler.add_job(
+        id='outbox_webhooks',
+        func=job_outbox_webhooks,
+        args=[app],
+        trigger='interval',
+        minutes=1,
+        replace_existing=True
+    )
+    scheduler.add_job(
+        id='ingesta_webhooks',
+        func=job_ingesta_webhooks,
+        args=[app],
+        trigger='interval',
+        minutes=1,
+        replace_existing=True
+    )
     scheduler.start()
     # --- JOB 1: PLANIFICACIÓN DIARIA (Tu job existente) ---
     if app.config.get('AUTO_PLAN_ENABLED', False):
@@ -186,4 +228,84 @@ def job_actualizacion_crediticia_diaria(app: Flask):
             logger.info("--- Job de Actualización Crediticia Diaria Completado ---")
 
         except Exception as e:
-            logger.error(f"¡CRÍTICO! El Job de Actualización Crediticia Diaria falló: {e}", exc_info=True)
\ No newline at end of file
+            logger.error(f"¡CRÍTICO! El Job de Actualización Crediticia Diaria falló: {e}", exc_info=True)
+
+def job_checkpoint_inventario(app: Flask):
+    """
+    Concilia el libro de movimientos de inventario con los lotes reales
+    (registrando AJUSTES si hubo desvíos) y guarda un checkpoint de saldos.
+    """
+    with app.app_context():
+        logger.info("--- Iniciando Job de Checkpoint de Inventario ---")
+        try:
+            from app.services.stock_ledger_service import get_stock_ledger
+
+            ledger = get_stock_ledger()
+            if ledger is None:
+                logger.info("Libro de inventario deshabilitado. Se omite el checkpoint.")
+                return
+
+            resultado = ledger.reconstruir_desde_lotes()
+            logger.info(f"--- Job de Checkpoint de Inventario Completado. Resultado: {resultado} ---")
+        except Exception as e:
+            logger.error(f"¡CRÍTICO! El Job de Checkpoint de Inventario falló: {e}", exc_info=True)
+
+def job_recalculo_stock_insumos(app: Flask):
+    """
+    Recalcula stock_actual y stock_total de todo el catálogo a partir de los
+    lotes y reservas. Antes se hacía en cada carga del listado de inventario.
+    """
+    with app.app_context():
+        try:
+            from app.models.inventario import InventarioModel
+
+            resultado = InventarioModel().calcular_y_actualizar_stock_general()
+            logger.info(f"Recálculo periódico de stock de insumos: {resultado.get('message') or resultado}")
+        except Exception as e:
+            logger.error(f"¡CRÍTICO! El Job de Recálculo de Stock de Insumos falló: {e}", exc_info=True)
+
+def job_vencimientos_flota(app: Flask):
+    """
+    Revisa los vencimientos de VTV y licencias de la flota activa y avisa
+    sólo a los vehículos cuyo estado cambió desde la última revisión.
+    """
+    with app.app_context():
+        logger.info("--- Iniciando Job de Vencimientos de Flota ---")
+        try:
+            from app.services.cumplimiento_flota_service import MotorCumplimientoFlota
+
+            resumen = MotorCumplimientoFlota().revisar_transiciones()
+            logger.info(f"--- Job de Vencimientos de Flota Completado. Resumen: {resumen} ---")
+        except Exception as e:
+            logger.error(f"¡CRÍTICO! El Job de Vencimientos de Flota falló: {e}", exc_info=True)
+
+def job_outbox_webhooks(app: Flask):
+    """
+    Asegura que el despachador de webhooks esté corriendo, así los eventos
+    que quedaron en el outbox antes de un reinicio se envían aunque todavía
+    no se haya encolado ninguno nuevo.
+    """
+    with app.app_context():
+        try:
+            from app.services.webhook_service import get_despachador_webhooks
+
+            pendientes = get_despachador_webhooks().resumen()
+            logger.debug(f"Outbox de webhooks: {pendientes}")
+        except Exception as e:
+            logger.error(f"¡CRÍTICO! El Job del Outbox de Webhooks falló: {e}", exc_info=True)
+
+def job_ingesta_webhooks(app: Flask):
+    """
+    Asegura que los workers de la cola de ingesta estén corriendo, así los
+    envíos que quedaron pendientes antes de un reinicio se procesan aunque no
+    llegue ninguno nuevo, y purga las claves de idempotencia vencidas.
+    """
+    with app.app_context():
+        try:
+            from app.views.google_forms_routes import iniciar_cola_google_forms
+
+            cola = iniciar_cola_google_forms(app)
+            purgadas = cola.purgar()
+            logger.debug(f"Cola de ingesta: {cola.resumen()} ({purgadas} entrada(s) vencidas purgadas)")
+        except Exception as e:
+            logger.error(f"¡CRÍTICO! El Job de la Cola de Ingesta falló: {e}", exc_info=True)
@@ -0,0 +1,109 @@
+import heapq
+import logging
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.services import exportacion_service
+from app.utils import cursor as cursor_keyset
+
+logger = logging.getLogger(__name__)
+
+# Orden de las fuentes dentro de un mismo instante: desempata el merge y el cursor.
+FUENTES_ACTIVIDAD = ('Totem', 'Web')
+
+COLUMNAS_CSV = [
+    ('legajo', 'Legajo'), ('nombre', 'Nombre'), ('rol', 'Rol'), ('sector', 'Sector'),
+    ('fecha_ingreso', 'Fecha ingreso'), ('fecha_egreso', 'Fecha egreso'), ('acceso_en', 'Acceso en'),
+    ('metodo_acceso', 'Método'), ('estado', 'Estado'),
+]
+
+
+class CursorInvalidoError(ValueError):
+    pass
+
+
+def codificar_cursor(fecha: str, fuente: str, registro_id: int) -> str:
+    """Cursor opaco con la posición del último elemento entregado (fecha, fuente, id)."""
+    return cursor_keyset.codificar_cursor([fecha, FUENTES_ACTIVIDAD.index(fuente), registro_id])
+
+
+def decodificar_cursor(cursor: str) -> Tuple[str, int, int]:
+    try:
+        fecha, rango, registro_id = cursor_keyset.decodificar_cursor(cursor, 3)
+        if rango not in range(len(FUENTES_ACTIVIDAD)):
+            raise ValueError(rango)
+        return cursor_keyset.fecha_iso(fecha), rango, int(registro_id)
+    except (ValueError, TypeError) as e:
+        raise CursorInvalidoError(f"Cursor de actividad inválido: {cursor}") from e
+
+
+def posicion_por_fuente(cursor: Optional[str]) -> Dict[str, Optional[Tuple[str, Optional[int]]]]:
+    """
+    Traduce el cursor del feed unificado al punto de reanudación de cada
+    fuente. El feed se ordena por (fecha, fuente, id) descendente, así que
+    con la misma fecha: una fuente anterior en FUENTES_ACTIVIDAD aún no
+    entregó ninguno de esos registros (id None: fecha <= f) y una posterior
+    ya los entregó todos (id 0: fecha < f, los ids son seriales positivos).
+    """
+    if not cursor:
+        return {fuente: None for fuente in FUENTES_ACTIVIDAD}
+    fecha, rango, registro_id = decodificar_cursor(cursor)
+    posiciones = {}
+    for i, fuente in enumerate(FUENTES_ACTIVIDAD):
+        if i == rango:
+            posiciones[fuente] = (fecha, registro_id)
+        else:
+            posiciones[fuente] = (fecha, None if i < rango else 0)
+    return posiciones
+
+
+def iterar_keyset_desc(construir_query: Callable, campo_fecha: str,
+                       despues_de: Optional[Tuple[str, Optional[int]]] = None,
+                       page_size: int = 200) -> Iterator[Dict]:
+    """
+    Recorre una consulta ordenada por (campo_fecha, id) descendente de a
+    `page_size` filas con paginación keyset: cada página pide sólo lo
+    posterior a la última fila, sin OFFSET. `construir_query()` debe devolver
+    un query builder nuevo con los filtros ya aplicados.
+    """
+    def pagina(posicion):
+        query = construir_query()
+        if posicion is not None:
+            fecha, registro_id = posicion
+            if registro_id is None:
+                query = query.lte(campo_fecha, fecha)
+            else:
+                query = query.or_(f'{campo_fecha}.lt."{fecha}",and({campo_fecha}.eq."{fecha}",id.lt.{registro_id})')
+        return query.order(campo_fecha, desc=True).order('id', desc=True).limit(page_size).execute().data or []
+
+    return exportacion_service.recorrer_keyset(pagina, lambda fila: (fila[campo_fecha], fila['id']), page_size,
+                                               desde=despues_de)
+
+
+def fusionar_actividad(fuentes: Dict[str, Iterable[Dict]]) -> Iterator[Dict]:
+    """
+    Merge k-way perezoso de los feeds de cada fuente (ya ordenados por fecha
+    descendente): sólo mantiene en memoria la cabeza de cada uno.
+    """
+    def _clave(item):
+        return (item['fecha_ingreso'] or '', FUENTES_ACTIVIDAD.index(item['acceso_en']), item['_id'])
+    return heapq.merge(*fuentes.values(), key=_clave, reverse=True)
+
+
+def tomar_pagina(items: Iterator[Dict], limite: int) -> Tuple[List[Dict], Optional[str]]:
+    """Toma hasta `limite` elementos y devuelve el cursor si quedan más."""
+    pagina = []
+    for item in items:
+        if len(pagina) == limite:
+            ultimo = pagina[-1]
+            return [_publico(i) for i in pagina], codificar_cursor(ultimo['fecha_ingreso'], ultimo['acceso_en'], ultimo['_id'])
+        pagina.append(item)
+    return [_publico(i) for i in pagina], None
+
+
+def _publico(item: Dict) -> Dict:
+    return {k: v for k, v in item.items() if k != '_id'}
+
+
+def generar_csv(items: Iterable[Dict]) -> Iterator[str]:
+    """Serializa el feed a CSV fila por fila (para enviarlo como stream)."""
+    return exportacion_service.generar_csv(items, COLUMNAS_CSV, bom=False)
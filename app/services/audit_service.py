@@ -0,0 +1,293 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _proceso_vivo(pid: int) -> bool:
+    """True si existe un proceso con ese PID (señal 0: sólo verifica, no envía nada)."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # existe, pero es de otro usuario
+    except OSError:
+        return False
+    return True
+
+
+class AuditSink:
+    """
+    Buffer en memoria para los registros de auditoría (`registros_sistema`).
+
+    Los registros se encolan sin tocar la base de datos y un hilo en segundo
+    plano los inserta en lote cuando se alcanza `batch_size`, cuando pasan
+    `flush_interval` segundos o al apagar el proceso. El buffer está acotado:
+    si se llena, `submit` espera brevemente (backpressure) y, si sigue lleno,
+    el registro se escribe directamente en el journal de disco. Los lotes que
+    la base de datos rechaza también van al journal y se reintentan más tarde,
+    de modo que ningún registro se pierde por una caída breve de la DB.
+    """
+
+    JOURNAL_PATTERN = 'registros-*.jsonl'
+
+    def __init__(self, writer: Optional[Callable[[List[Dict]], Dict]] = None, batch_size: int = 50,
+                 flush_interval: float = 2.0, max_buffer: int = 5000, max_block: float = 0.05,
+                 journal_dir: Optional[str] = None, replay_interval: float = 30.0):
+        self._writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_block = max_block
+        self.replay_interval = replay_interval
+        self.journal_dir = journal_dir or os.getenv(
+            'AUDIT_JOURNAL_DIR', os.path.join(tempfile.gettempdir(), 'frozen_audit_journal'))
+        self.journal_path = os.path.join(self.journal_dir, f'registros-{os.getpid()}.jsonl')
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._journal_lock = threading.Lock()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._stop = False
+        self._next_replay = 0.0
+        self._worker = None
+
+    @property
+    def writer(self) -> Callable[[List[Dict]], Dict]:
+        if self._writer is None:
+            from app.models.registro import RegistroModel
+            self._writer = RegistroModel().create_many
+        return self._writer
+
+    def start(self):
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop = False
+                self._worker = threading.Thread(target=self._run, name='audit-sink', daemon=True)
+                self._worker.start()
+
+    def submit(self, registro: Dict):
+        """
+        Encola un registro. Nunca realiza E/S de red en el hilo que llama.
+        """
+        self.start()
+        with self._cond:
+            limite = time.monotonic() + self.max_block
+            while len(self._buffer) >= self.max_buffer:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                self._cond.notify_all()
+                self._cond.wait(restante)
+
+            if len(self._buffer) < self.max_buffer:
+                self._buffer.append(registro)
+                if len(self._buffer) >= self.batch_size:
+                    self._cond.notify_all()
+                return
+
+        logger.warning("Buffer de auditoría lleno. Se deriva el registro al journal en disco.")
+        self._spill([registro])
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Fuerza la escritura de todo lo encolado y espera a que termine.
+        Devuelve False si se agota el tiempo de espera.
+        """
+        if self._worker is None or not self._worker.is_alive():
+            self._drain()
+            return True
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._buffer or self._in_flight:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._cond.wait(restante)
+        return True
+
+    def stop(self, timeout: float = 5.0):
+        self.flush(timeout)
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._buffer) + self._in_flight
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._buffer and not self._stop:
+                    self._cond.wait(self.flush_interval)
+                elif len(self._buffer) < self.batch_size and not self._flush_requested and not self._stop:
+                    self._cond.wait(self.flush_interval)
+                if self._stop and not self._buffer:
+                    return
+                lote = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                self._in_flight = len(lote)
+                if not self._buffer:
+                    self._flush_requested = False
+                self._cond.notify_all()
+
+            if lote:
+                self._write(lote)
+            self._maybe_replay()
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _drain(self):
+        with self._cond:
+            pendientes = list(self._buffer)
+            self._buffer.clear()
+        for i in range(0, len(pendientes), self.batch_size):
+            self._write(pendientes[i:i + self.batch_size])
+
+    def _write(self, lote: List[Dict]) -> bool:
+        try:
+            resultado = self.writer(lote)
+            if resultado.get('success'):
+                return True
+            logger.error(f"No se pudo insertar el lote de auditoría: {resultado.get('error')}")
+        except Exception as e:
+            logger.error(f"Error al insertar el lote de auditoría: {e}", exc_info=True)
+        self._spill(lote)
+        return False
+
+    def _spill(self, registros: List[Dict]) -> bool:
+        if not registros:
+            return True
+        try:
+            with self._journal_lock:
+                os.makedirs(self.journal_dir, exist_ok=True)
+                with open(self.journal_path, 'a', encoding='utf-8') as journal:
+                    for registro in registros:
+                        journal.write(json.dumps(registro, default=str) + '\n')
+                    journal.flush()
+                    os.fsync(journal.fileno())
+            self._next_replay = min(self._next_replay, time.monotonic() + self.replay_interval)
+            return True
+        except OSError as e:
+            logger.critical(f"No se pudo escribir el journal de auditoría ({len(registros)} registros perdidos): {e}")
+            return False
+
+    def _maybe_replay(self):
+        ahora = time.monotonic()
+        if ahora < self._next_replay:
+            return
+        self._next_replay = ahora + self.replay_interval
+        self.replay_journal()
+
+    def replay_journal(self) -> int:
+        """
+        Reintenta los registros pendientes del journal de este proceso y de
+        procesos que ya terminaron. El journal de otro proceso vivo no se
+        toca: ese proceso puede estar escribiéndolo y lo reprocesa él mismo.
+        Devuelve la cantidad de registros insertados.
+        """
+        insertados = 0
+        for path in glob.glob(os.path.join(self.journal_dir, self.JOURNAL_PATTERN)):
+            if not self._journal_reclamable(path):
+                continue
+            reclamado = f"{path}.replay-{os.getpid()}"
+            try:
+                with self._journal_lock:
+                    os.rename(path, reclamado)
+            except OSError:
+                continue  # Otro proceso ya lo está reprocesando.
+
+            registros = []
+            descartadas = 0
+            try:
+                with open(reclamado, encoding='utf-8') as journal:
+                    for linea in journal:
+                        if not linea.strip():
+                            continue
+                        try:
+                            registros.append(json.loads(linea))
+                        except ValueError:
+                            descartadas += 1
+            except OSError as e:
+                logger.error(f"Journal de auditoría ilegible {reclamado}: {e}")
+                self._devolver(reclamado, path)
+                continue
+            if descartadas:
+                logger.error(f"Se descartaron {descartadas} líneas corruptas del journal {reclamado}")
+
+            # El archivo reclamado se borra recién cuando cada registro quedó
+            # insertado o de vuelta en el journal; si no, se devuelve entero.
+            completo, caida = True, False
+            for i in range(0, len(registros), self.batch_size):
+                lote = registros[i:i + self.batch_size]
+                if self._write(lote):
+                    insertados += len(lote)
+                else:
+                    # _write ya devolvió el lote al journal; el resto también vuelve.
+                    completo, caida = self._spill(registros[i + self.batch_size:]), True
+                    break
+            if completo:
+                os.remove(reclamado)
+            else:
+                self._devolver(reclamado, path)
+            if caida:
+                return insertados
+        if insertados:
+            logger.info(f"Se reprocesaron {insertados} registros de auditoría desde el journal.")
+        return insertados
+
+    def _devolver(self, reclamado: str, path: str):
+        """Vuelve a dejar el journal reclamado bajo su nombre original para un próximo reintento."""
+        try:
+            with self._journal_lock:
+                if os.path.exists(path):
+                    raise FileExistsError(path)
+                os.rename(reclamado, path)
+        except OSError as e:
+            logger.critical(f"No se pudo devolver el journal de auditoría {reclamado}: {e}")
+
+    @staticmethod
+    def _journal_reclamable(path: str) -> bool:
+        """El journal es de este proceso o de uno que ya no existe."""
+        nombre = os.path.basename(path)
+        try:
+            pid = int(nombre[len('registros-'):-len('.jsonl')])
+        except ValueError:
+            return False
+        return pid == os.getpid() or not _proceso_vivo(pid)
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_audit_sink() -> AuditSink:
+    """
+    Devuelve el sink de auditoría compartido por todo el proceso.
+    """
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = AuditSink(
+                batch_size=int(os.getenv('AUDIT_BATCH_SIZE', 50)),
+                flush_interval=float(os.getenv('AUDIT_FLUSH_SECONDS', 2)),
+                max_buffer=int(os.getenv('AUDIT_MAX_BUFFER', 5000)),
+            )
+            atexit.register(_sink.stop)
+        return _sink
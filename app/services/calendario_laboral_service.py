@@ -0,0 +1,219 @@
+import logging
+import os
+import threading
+import time
+from array import array
+from datetime import date, timedelta
+from typing import Dict, Optional, Tuple
+
+import holidays
+
+logger = logging.getLogger(__name__)
+
+# Años que se recorren buscando un día laborable antes de desistir.
+MAX_ANIOS_EXTENSION = 10
+
+
+class _RangoLaboral:
+    """
+    Estado inmutable del calendario para un rango de años completos.
+
+    `laborable[i]` indica si el día `inicio + i` es laborable; `prefijo[i]` es
+    la cantidad de días laborables en [inicio, inicio + i) y `posiciones[k]`
+    el índice del k-ésimo día laborable. Con eso todas las consultas son O(1).
+    """
+
+    def __init__(self, anio_desde: int, anio_hasta: int, feriados: Dict[date, str], excepciones: Dict[date, Dict]):
+        self.anio_desde = anio_desde
+        self.anio_hasta = anio_hasta
+        self.inicio = date(anio_desde, 1, 1)
+        dias = (date(anio_hasta, 12, 31) - self.inicio).days + 1
+        self.laborable = bytearray(dias)
+        self.prefijo = array('i', [0]) * (dias + 1)
+        self.posiciones = array('i')
+        self.motivos: Dict[date, str] = {}
+
+        for i in range(dias):
+            fecha = self.inicio + timedelta(days=i)
+            excepcion = excepciones.get(fecha)
+            if excepcion is not None:
+                es_laborable = bool(excepcion.get('es_laborable'))
+                if not es_laborable:
+                    self.motivos[fecha] = excepcion.get('motivo') or 'Excepción de planta'
+            elif fecha in feriados:
+                es_laborable = False
+                self.motivos[fecha] = feriados[fecha]
+            else:
+                es_laborable = fecha.weekday() < 5
+                if not es_laborable:
+                    self.motivos[fecha] = 'Fin de Semana'
+            self.laborable[i] = es_laborable
+            self.prefijo[i + 1] = self.prefijo[i] + es_laborable
+            if es_laborable:
+                self.posiciones.append(i)
+
+    def indice(self, fecha: date) -> Optional[int]:
+        i = (fecha - self.inicio).days
+        return i if 0 <= i < len(self.laborable) else None
+
+    def fecha(self, indice: int) -> date:
+        return self.inicio + timedelta(days=indice)
+
+
+class CalendarioLaboral:
+    """
+    Calendario de días laborables compartido por planificación y producción.
+
+    Un día es laborable si es de lunes a viernes y no es feriado nacional
+    (librería `holidays`, AR), salvo que exista una excepción de planta
+    (`calendario_excepciones`), que tiene prioridad en ambos sentidos. El
+    rango se precalcula por años completos la primera vez que se consulta
+    una fecha de ese año y se guarda en el proceso: responder si un día es
+    laborable, el próximo/anterior día laborable o sumar N días laborables
+    es O(1). `invalidar()` lo descarta cuando cambian las excepciones;
+    `max_edad` acota cuánto tarda en verse un cambio hecho en otro worker.
+    Si no se pudieron cargar los feriados o las excepciones, el rango se usa
+    igual pero vence a los `reintento` segundos para volver a intentarlo.
+    """
+
+    def __init__(self, max_edad: float = 3600.0, excepcion_model=None, reintento: float = 60.0):
+        self.max_edad = max_edad
+        self.reintento = reintento
+        self._excepcion_model = excepcion_model
+        self._rango: Optional[_RangoLaboral] = None
+        self._vence = 0.0
+        self._lock = threading.Lock()
+
+    # --- Carga ---------------------------------------------------------
+    def invalidar(self):
+        with self._lock:
+            self._rango = None
+        logger.info("[Calendario] Calendario laboral invalidado.")
+
+    def _obtener_rango(self, anio: int, anio_hasta: Optional[int] = None) -> _RangoLaboral:
+        """Devuelve un rango vigente que cubra [anio, anio_hasta], extendiéndolo si hace falta."""
+        anio_hasta = anio if anio_hasta is None else anio_hasta
+        rango = self._rango
+        if rango is not None and rango.anio_desde <= anio and anio_hasta <= rango.anio_hasta \
+                and time.monotonic() < self._vence:
+            return rango
+        with self._lock:
+            rango = self._rango
+            vigente = rango is not None and time.monotonic() < self._vence
+            if vigente and rango.anio_desde <= anio and anio_hasta <= rango.anio_hasta:
+                return rango
+            desde, hasta = anio, anio_hasta
+            if vigente:
+                desde, hasta = min(rango.anio_desde, anio), max(rango.anio_hasta, anio_hasta)
+            rango, completo = self._construir(desde, hasta)
+            edad = self.max_edad if completo else min(self.max_edad, self.reintento)
+            self._rango, self._vence = rango, time.monotonic() + edad
+            return rango
+
+    def _construir(self, anio_desde: int, anio_hasta: int) -> Tuple[_RangoLaboral, bool]:
+        """Devuelve el rango y si se pudieron cargar tanto los feriados como las excepciones."""
+        anios = list(range(anio_desde, anio_hasta + 1))
+        completo = True
+        try:
+            feriados = dict(holidays.country_holidays('AR', years=anios).items())
+        except Exception as e:
+            logger.error(f"[Calendario] No se pudieron cargar los feriados de {anios}: {e}. No se descontarán.")
+            feriados = {}
+            completo = False
+
+        excepciones = {}
+        try:
+            resultado = self._modelo_excepciones().find_all(filters={
+                'fecha_gte': date(anio_desde, 1, 1).isoformat(),
+                'fecha_lte': date(anio_hasta, 12, 31).isoformat(),
+            })
+            if resultado.get('success'):
+                for excepcion in resultado.get('data', []):
+                    excepciones[date.fromisoformat(str(excepcion['fecha'])[:10])] = excepcion
+            else:
+                logger.error(f"[Calendario] Error obteniendo excepciones de calendario: {resultado.get('error')}")
+                completo = False
+        except Exception as e:
+            logger.error(f"[Calendario] Error obteniendo excepciones de calendario: {e}")
+            completo = False
+
+        logger.info(f"[Calendario] Calendario laboral {anio_desde}-{anio_hasta}: "
+                    f"{len(feriados)} feriados, {len(excepciones)} excepciones.")
+        if not completo:
+            logger.warning(f"[Calendario] Calendario incompleto; se reintenta en {self.reintento:.0f} s.")
+        return _RangoLaboral(anio_desde, anio_hasta, feriados, excepciones), completo
+
+    def _modelo_excepciones(self):
+        if self._excepcion_model is None:
+            from app.models.calendario_excepcion import CalendarioExcepcionModel
+            self._excepcion_model = CalendarioExcepcionModel()
+        return self._excepcion_model
+
+    # --- Consultas -----------------------------------------------------
+    def es_laborable(self, fecha: date) -> bool:
+        rango = self._obtener_rango(fecha.year)
+        return bool(rango.laborable[rango.indice(fecha)])
+
+    def motivo_no_laborable(self, fecha: date) -> Optional[str]:
+        """Nombre del feriado, motivo de la excepción o 'Fin de Semana'; None si es laborable."""
+        return self._obtener_rango(fecha.year).motivos.get(fecha)
+
+    def siguiente_laborable(self, fecha: date) -> date:
+        """Primer día laborable igual o posterior a `fecha`."""
+        return self.sumar_dias_laborables(fecha, 0)
+
+    def anterior_laborable(self, fecha: date) -> date:
+        """Último día laborable igual o anterior a `fecha`."""
+        for _ in range(MAX_ANIOS_EXTENSION):
+            rango = self._obtener_rango(fecha.year)
+            i = rango.indice(fecha)
+            anteriores = rango.prefijo[i + 1]
+            if anteriores > 0:
+                return rango.fecha(rango.posiciones[anteriores - 1])
+            fecha = date(rango.anio_desde - 1, 12, 31)
+        raise ValueError(f"No hay días laborables antes de {fecha.isoformat()}")
+
+    def sumar_dias_laborables(self, fecha: date, dias: int) -> date:
+        """
+        Día laborable que está `dias` días laborables después de `fecha`
+        (con `dias=0`, el mismo día si es laborable o el siguiente que lo sea;
+        si `fecha` no es laborable se cuenta desde el siguiente laborable).
+        """
+        if dias < 0:
+            raise ValueError("La cantidad de días laborables debe ser positiva.")
+        rango = self._obtener_rango(fecha.year)
+        objetivo = rango.prefijo[rango.indice(fecha)] + dias
+        for _ in range(MAX_ANIOS_EXTENSION):
+            if objetivo < len(rango.posiciones):
+                return rango.fecha(rango.posiciones[objetivo])
+            # El resultado cae después del rango cargado: se extiende un año.
+            rango = self._obtener_rango(fecha.year, rango.anio_hasta + 1)
+            objetivo = rango.prefijo[rango.indice(fecha)] + dias
+        raise ValueError(f"No se encontró el día laborable {dias} desde {fecha.isoformat()}")
+
+    def contar_dias_laborables(self, desde: date, hasta: date) -> int:
+        """Cantidad de días laborables en [desde, hasta]."""
+        if hasta < desde:
+            return 0
+        rango = self._obtener_rango(desde.year, hasta.year)
+        return rango.prefijo[rango.indice(hasta) + 1] - rango.prefijo[rango.indice(desde)]
+
+
+_calendario = None
+_calendario_lock = threading.Lock()
+
+
+def get_calendario_laboral() -> CalendarioLaboral:
+    """Devuelve el calendario laboral del proceso, creándolo en el primer uso."""
+    global _calendario
+    with _calendario_lock:
+        if _calendario is None:
+            _calendario = CalendarioLaboral(max_edad=float(os.getenv('CALENDARIO_LABORAL_SECONDS', 3600)),
+                                            reintento=float(os.getenv('CALENDARIO_LABORAL_REINTENTO_SECONDS', 60)))
+        return _calendario
+
+
+def invalidar_calendario_laboral():
+    """Descarta el calendario precalculado (p. ej. al cambiar una excepción de planta)."""
+    if _calendario is not None:
+        _calendario.invalidar()
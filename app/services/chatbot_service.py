@@ -0,0 +1,106 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Opción fija que el widget muestra al final de las preguntas principales.
+QA_FALLBACK = {
+    'id': -1,
+    'pregunta': 'No encuentro mi respuesta',
+    'respuesta': 'Serás redirigido a la página de consultas.',
+    'type': 'redirect',
+    'url': '/public/consulta'
+}
+
+
+def _etag(contenido) -> str:
+    texto = json.dumps(contenido, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()[:16]
+
+
+class ArbolChatbot:
+    """
+    Árbol de decisión del chatbot público en memoria.
+
+    Todas las Q&A activas se leen con una sola consulta y se guardan como
+    mapa padre → hijos (None para las preguntas principales), junto con un
+    ETag por cada lista, así el widget navega el árbol sin ir a la base y
+    el navegador puede revalidar con If-None-Match. Las altas, ediciones y
+    bajas del administrador llaman a `invalidar()`; `max_edad` acota cuánto
+    tarda en verse un cambio hecho desde otro worker (0 desactiva el caché).
+    """
+
+    def __init__(self, max_edad: float = 300.0, model=None):
+        self.max_edad = max_edad
+        self._model = model
+        self._hijos: Optional[Dict[Optional[int], List[Dict]]] = None
+        self._etags: Dict[Optional[int], str] = {}
+        self._cargado_en = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            from app.models.chatbot_qa import ChatbotQA
+            self._model = ChatbotQA()
+        return self._model
+
+    def invalidar(self):
+        with self._lock:
+            self._hijos = None
+        logger.info("[Chatbot] Árbol de preguntas invalidado.")
+
+    def _vigente(self) -> bool:
+        return self._hijos is not None and time.monotonic() - self._cargado_en <= self.max_edad
+
+    def _obtener(self) -> Tuple[Dict[Optional[int], List[Dict]], Dict[Optional[int], str]]:
+        if self._vigente():
+            return self._hijos, self._etags
+        with self._lock:
+            if self._vigente():
+                return self._hijos, self._etags
+            qas = self.model.db.table(self.model.get_table_name()).select('*') \
+                .eq('activo', True).order('id').execute().data or []
+            hijos: Dict[Optional[int], List[Dict]] = {}
+            for qa in qas:
+                hijos.setdefault(qa.get('parent_id'), []).append(qa)
+            hijos.setdefault(None, [])
+            hijos[None] = hijos[None] + [QA_FALLBACK]
+            etags = {padre: _etag(lista) for padre, lista in hijos.items()}
+            if self.max_edad > 0:
+                self._hijos, self._etags, self._cargado_en = hijos, etags, time.monotonic()
+            return hijos, etags
+
+    def raices(self) -> Tuple[List[Dict], str]:
+        """Preguntas principales (con la opción de fallback al final) y su ETag."""
+        hijos, etags = self._obtener()
+        return list(hijos[None]), etags[None]
+
+    def hijos(self, parent_id: int) -> Tuple[List[Dict], str]:
+        """Preguntas hijas de `parent_id` y su ETag (lista vacía si no tiene)."""
+        hijos, etags = self._obtener()
+        return list(hijos.get(parent_id, [])), etags.get(parent_id) or _etag([parent_id])
+
+
+_arbol = None
+_arbol_lock = threading.Lock()
+
+
+def get_arbol_chatbot() -> ArbolChatbot:
+    """Devuelve el árbol del chatbot del proceso, creándolo en el primer uso."""
+    global _arbol
+    with _arbol_lock:
+        if _arbol is None:
+            _arbol = ArbolChatbot(max_edad=float(os.getenv('CHATBOT_CACHE_SECONDS', 300)))
+        return _arbol
+
+
+def invalidar_arbol_chatbot():
+    """Descarta el árbol en memoria (tras un cambio del administrador)."""
+    if _arbol is not None:
+        _arbol.invalidar()
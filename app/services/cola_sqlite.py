@@ -0,0 +1,205 @@
+"""
+Base de las colas persistentes en un archivo SQLite local (la ingesta de
+webhooks entrantes y el outbox de webhooks salientes).
+
+Cada hilo usa su propia conexión en modo WAL y las entradas se toman dentro
+de `BEGIN IMMEDIATE`, así varios workers de gunicorn pueden compartir el
+archivo. Una entrada tomada queda en curso con su `tomado_en`; si el proceso
+que la tomó muere, otro la vuelve a tomar cuando vence el `lease`. Cada toma
+lleva un token (`tomado_por`) y el cierre de la entrada sólo se escribe si el
+token sigue siendo el mismo: un worker que terminó tarde, con el lease ya
+retomado por otro, no pisa el resultado. Los fallos se reintentan con
+backoff exponencial (`_espera`).
+"""
+import contextlib
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ColaSQLite:
+    """
+    Las subclases definen la tabla de trabajo (con las columnas `estado`,
+    `intentos`, `proximo_intento` y `tomado_en`), los estados, las columnas
+    que se pasan a `_procesar` y cómo se procesa cada entrada. `_procesar`
+    recibe esas columnas más el token de la toma, que debe pasar a
+    `_cerrar_tomada`. `_aceptar` permite saltear candidatos (p. ej. un
+    endpoint en su límite) y puede reservar algo que `_soltar` devuelve si
+    la toma no llega a confirmarse; `_filtro_candidatos` descarta en el SQL
+    los que `_aceptar` rechazaría, para que no tapen a los demás.
+    """
+
+    nombre = 'cola'
+    tabla: str = None
+    columna_id: str = None
+    columnas_trabajo: Tuple[str, ...] = ()
+    pendiente = 'PENDIENTE'
+    en_curso: str = None
+    lote_worker = 50
+    lote_candidatos = 50
+
+    def __init__(self, path: str, max_workers: int, max_intentos: int, espera_base: float, espera_max: float,
+                 lease: float, intervalo: float):
+        self.path = path
+        self.max_workers = max_workers
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.lease = lease
+        self.intervalo = intervalo
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hay_trabajo = threading.Event()
+        self._stop = threading.Event()
+        self._workers: List[threading.Thread] = []
+        conn = self._conexion()
+        self._crear_tablas(conn)
+        # Archivos creados antes de que existiera el token de toma.
+        if 'tomado_por' not in {fila[1] for fila in conn.execute(f"PRAGMA table_info({self.tabla})")}:
+            conn.execute(f"ALTER TABLE {self.tabla} ADD COLUMN tomado_por TEXT")
+
+    def _crear_tablas(self, conn: sqlite3.Connection):
+        raise NotImplementedError
+
+    def _procesar(self, *fila):
+        raise NotImplementedError
+
+    def _aceptar(self, fila: tuple) -> bool:
+        return True
+
+    def _soltar(self, fila: tuple):
+        """Deshace lo que reservó `_aceptar` cuando la toma no se confirmó."""
+
+    def _filtro_candidatos(self) -> Tuple[str, tuple]:
+        """Condición SQL extra (con sus parámetros) para los candidatos a tomar."""
+        return '', ()
+
+    def _conexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaccion(self):
+        conn = self._conexion()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _espera(self, intentos: int) -> float:
+        """Backoff exponencial antes del próximo intento."""
+        return min(self.espera_base * 2 ** (intentos - 1), self.espera_max)
+
+    def resumen(self):
+        filas = self._conexion().execute(f"SELECT estado, COUNT(*) FROM {self.tabla} GROUP BY estado").fetchall()
+        return {estado: cantidad for estado, cantidad in filas}
+
+    # region Procesamiento
+    def _tomar(self) -> Optional[tuple]:
+        """
+        Toma la próxima entrada disponible (o con el lease vencido) que acepte
+        `_aceptar`. Devuelve sus `columnas_trabajo` más el token de la toma.
+        """
+        ahora = time.time()
+        token = uuid.uuid4().hex
+        tomada = None
+        try:
+            with self._transaccion() as conn:
+                desde = 0
+                while tomada is None:
+                    filtro, parametros = self._filtro_candidatos()
+                    candidatos = conn.execute(
+                        f"SELECT {', '.join(self.columnas_trabajo)} FROM {self.tabla} "
+                        "WHERE ((estado = ? AND proximo_intento <= ?) OR (estado = ? AND tomado_en < ?))"
+                        f"{' AND ' + filtro if filtro else ''} "
+                        f"ORDER BY proximo_intento, {self.columna_id} LIMIT ? OFFSET ?",
+                        (self.pendiente, ahora, self.en_curso, ahora - self.lease, *parametros,
+                         self.lote_candidatos, desde)).fetchall()
+                    tomada = next((fila for fila in candidatos if self._aceptar(fila)), None)
+                    if tomada is None and len(candidatos) < self.lote_candidatos:
+                        return None
+                    desde += self.lote_candidatos
+                conn.execute(f"UPDATE {self.tabla} SET estado = ?, tomado_en = ?, tomado_por = ? "
+                             f"WHERE {self.columna_id} = ?", (self.en_curso, ahora, token, tomada[0]))
+        except BaseException:
+            if tomada is not None:
+                self._soltar(tomada)
+            raise
+        return tomada + (token,)
+
+    def _cerrar_tomada(self, conn: sqlite3.Connection, id_entrada, token: str, valores: Dict) -> bool:
+        """
+        Escribe el resultado de una entrada tomada sólo si la toma sigue siendo
+        la de `token`. Devuelve False (y no escribe nada) si el lease venció y
+        otro worker la retomó.
+        """
+        asignaciones = ', '.join(f"{columna} = ?" for columna in valores)
+        cursor = conn.execute(
+            f"UPDATE {self.tabla} SET {asignaciones} WHERE {self.columna_id} = ? AND estado = ? AND tomado_por = ?",
+            (*valores.values(), id_entrada, self.en_curso, token))
+        if cursor.rowcount == 0:
+            logger.warning(f"[{self.nombre.capitalize()}] {id_entrada}: el lease venció y otro worker retomó "
+                           "la entrada; se descarta este resultado.")
+            return False
+        return True
+
+    def procesar_pendientes(self, limite: Optional[int] = None) -> int:
+        """Procesa en este hilo las entradas disponibles ahora. Devuelve cuántas tomó."""
+        procesadas = 0
+        while limite is None or procesadas < limite:
+            fila = self._tomar()
+            if fila is None:
+                break
+            self._procesar(*fila)
+            procesadas += 1
+        return procesadas
+
+    def iniciar(self):
+        """Arranca los workers si no están corriendo (idempotente)."""
+        with self._lock:
+            self._workers = [w for w in self._workers if w.is_alive()]
+            for i in range(len(self._workers), self.max_workers):
+                worker = threading.Thread(target=self._run, name=f'{self.nombre}-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.procesar_pendientes(limite=self.lote_worker):
+                    continue
+            except Exception as e:
+                logger.error(f"[{self.nombre.capitalize()}] Error en el worker: {e}", exc_info=True)
+            self._hay_trabajo.wait(self.intervalo)
+            self._hay_trabajo.clear()
+
+    def detener(self, timeout: float = 5.0):
+        self._stop.set()
+        self._hay_trabajo.set()
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def esperar(self, timeout: float = 10.0) -> bool:
+        """Espera a que no queden entradas pendientes (incluidas las que esperan un reintento) ni en curso."""
+        fin = time.monotonic() + timeout
+        while time.monotonic() < fin:
+            fila = self._conexion().execute(
+                f"SELECT COUNT(*) FROM {self.tabla} WHERE estado IN (?, ?)", (self.pendiente, self.en_curso)).fetchone()
+            if not fila[0]:
+                return True
+            time.sleep(0.02)
+        return False
+    # endregion
@@ -0,0 +1,400 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PAGINA_LECTURA = 1000
+CERO = Decimal(0)
+SESENTA = Decimal(60)
+CIEN = Decimal(100)
+
+
+def _dec(valor) -> Decimal:
+    return Decimal(str(valor)) if valor not in (None, '') else CERO
+
+
+class MotorCostos:
+    """
+    Grafo de costos de productos para propagar cambios incrementalmente.
+
+    Se carga una vez con una consulta por tabla y guarda, por producto, los
+    coeficientes de su receta: cantidad de cada insumo, horas-rol (tiempo del
+    paso * % de participación) y horas por costo fijo de sus operaciones. Los
+    índices inversos insumo → productos, rol → productos y costo fijo →
+    productos permiten que un cambio de precio, tarifa o monto recalcule
+    exactamente los productos afectados (aplicando el delta a la materia
+    prima, sin releer recetas) y los escriba en lote: un upsert en productos
+    y un insert en historial_costos_productos.
+
+    Los cambios de estructura (ingredientes u operaciones de una receta) se
+    recargan por producto con `recostear_producto`. `max_edad` acota cuánto
+    puede quedar desactualizado el grafo por cambios hechos en otros workers.
+    """
+
+    def __init__(self, max_edad: float = 600.0):
+        self.max_edad = max_edad
+        self._lock = threading.RLock()
+        self._cargado_en: Optional[float] = None
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self._productos: Dict[int, Dict] = {}
+        self._precios: Dict[str, Decimal] = {}
+        self._tarifas: Dict[int, Decimal] = {}
+        self._montos_cf: Dict[int, Decimal] = {}
+        self._horas_mes = CERO
+        self._consumo: Dict[int, Dict[str, Decimal]] = {}
+        self._horas_rol: Dict[int, Dict[int, Decimal]] = {}
+        self._horas_cf: Dict[int, Dict[int, Decimal]] = {}
+        self._materia: Dict[int, Decimal] = {}
+        self._usan_insumo: Dict[str, Set[int]] = defaultdict(set)
+        self._usan_rol: Dict[int, Set[int]] = defaultdict(set)
+        self._usan_cf: Dict[int, Set[int]] = defaultdict(set)
+
+    # --- Acceso a datos ------------------------------------------------
+    @property
+    def db(self):
+        from app.database import Database
+        return Database().client
+
+    def _leer(self, tabla: str, columnas: str, orden: Iterable[str], filtro=None) -> List[Dict]:
+        """Lee una tabla completa de a PAGINA_LECTURA filas (PostgREST limita las filas por respuesta)."""
+        filas, inicio = [], 0
+        while True:
+            query = self.db.table(tabla).select(columnas)
+            if filtro:
+                query = filtro(query)
+            for columna in orden:
+                query = query.order(columna)
+            pagina = query.range(inicio, inicio + PAGINA_LECTURA - 1).execute().data or []
+            filas.extend(pagina)
+            if len(pagina) < PAGINA_LECTURA:
+                return filas
+            inicio += PAGINA_LECTURA
+
+    # --- Carga del grafo -----------------------------------------------
+    def invalidar(self):
+        with self._lock:
+            self._cargado_en = None
+
+    def _asegurar_cargado(self):
+        if self._cargado_en is None or time.monotonic() - self._cargado_en > self.max_edad:
+            self.cargar()
+
+    def cargar(self):
+        """Carga el grafo completo: una lectura por tabla, sin consultas por producto."""
+        with self._lock:
+            self._reiniciar()
+            self._cargar_globales()
+            productos = self._leer('productos', '*', ['id'])
+            self._productos = {p['id']: p for p in productos}
+            self._precios = {i['id_insumo']: _dec(i.get('precio_unitario'))
+                             for i in self._leer('insumos_catalogo', 'id_insumo, precio_unitario', ['id_insumo'])}
+            self._cargar_estructura(None)
+            self._cargado_en = time.monotonic()
+            logger.info(f"[Costeo] Grafo de costos cargado: {len(self._productos)} productos, "
+                        f"{len(self._materia)} con receta, {len(self._precios)} insumos.")
+
+    def _cargar_globales(self):
+        self._tarifas = {r['id']: _dec(r.get('costo_por_hora')) for r in self._leer('roles', 'id, costo_por_hora', ['id'])}
+        self._montos_cf = {c['id']: _dec(c.get('monto_mensual'))
+                           for c in self._leer('costos_fijos', 'id, monto_mensual', ['id'],
+                                               lambda q: q.eq('activo', True))}
+        horas = self._leer('configuracion_produccion', 'id, horas', ['id'])
+        self._horas_mes = sum((_dec(d.get('horas')) for d in horas), CERO) * 4  # 4 semanas/mes
+
+    def _cargar_estructura(self, producto_ids: Optional[List[int]]):
+        """
+        (Re)carga recetas, ingredientes y operaciones de `producto_ids` (o de
+        todos con None) y recalcula sus coeficientes y su materia prima.
+        """
+        def por_productos(q):
+            return q.in_('producto_id', producto_ids) if producto_ids is not None else q
+
+        recetas = self._leer('recetas', 'id, producto_id', ['id'], por_productos)
+        receta_por_producto = {}
+        for receta in recetas:
+            receta_por_producto.setdefault(receta['producto_id'], receta['id'])
+        producto_por_receta = {r: p for p, r in receta_por_producto.items()}
+        receta_ids = list(producto_por_receta)
+
+        def por_recetas(q):
+            return q.in_('receta_id', receta_ids) if producto_ids is not None else q
+
+        ingredientes, operaciones = [], []
+        if receta_ids or producto_ids is None:
+            ingredientes = self._leer('receta_ingredientes', 'receta_id, id_insumo, cantidad', ['id'], por_recetas)
+            operaciones = self._leer('operacionesreceta', 'id, receta_id, tiempo_preparacion, tiempo_ejecucion_unitario',
+                                     ['id'], por_recetas)
+        horas_paso = {op['id']: (_dec(op.get('tiempo_preparacion')) + _dec(op.get('tiempo_ejecucion_unitario'))) / SESENTA
+                      for op in operaciones if op['receta_id'] in producto_por_receta}
+        producto_por_op = {op['id']: producto_por_receta[op['receta_id']]
+                           for op in operaciones if op['receta_id'] in producto_por_receta}
+        op_ids = list(horas_paso)
+
+        def por_ops(q):
+            return q.in_('operacion_receta_id', op_ids) if producto_ids is not None else q
+
+        roles, costos_fijos = [], []
+        if op_ids:
+            roles = self._leer('operacion_receta_roles', 'operacion_receta_id, rol_id, porcentaje_participacion',
+                               ['operacion_receta_id', 'rol_id'], por_ops)
+            costos_fijos = self._leer('operacion_receta_costos_fijos', 'operacion_receta_id, costo_fijo_id',
+                                      ['operacion_receta_id', 'costo_fijo_id'], por_ops)
+
+        afectados = list(producto_ids) if producto_ids is not None else list(receta_por_producto)
+        for producto_id in afectados:
+            self._quitar_de_indices(producto_id)
+        for producto_id in receta_por_producto:
+            self._consumo[producto_id], self._horas_rol[producto_id], self._horas_cf[producto_id] = {}, {}, {}
+
+        for ing in ingredientes:
+            producto_id = producto_por_receta.get(ing['receta_id'])
+            if producto_id is None:
+                continue
+            consumo = self._consumo[producto_id]
+            consumo[ing['id_insumo']] = consumo.get(ing['id_insumo'], CERO) + _dec(ing.get('cantidad'))
+        for rol in roles:
+            op_id = rol['operacion_receta_id']
+            if op_id not in horas_paso:
+                continue
+            porcentaje = rol.get('porcentaje_participacion')
+            porcentaje = _dec(100 if porcentaje is None else porcentaje) / CIEN
+            horas = self._horas_rol[producto_por_op[op_id]]
+            horas[rol['rol_id']] = horas.get(rol['rol_id'], CERO) + horas_paso[op_id] * porcentaje
+        for cf in costos_fijos:
+            op_id = cf['operacion_receta_id']
+            if op_id not in horas_paso:
+                continue
+            horas = self._horas_cf[producto_por_op[op_id]]
+            horas[cf['costo_fijo_id']] = horas.get(cf['costo_fijo_id'], CERO) + horas_paso[op_id]
+
+        faltantes = {i for p in receta_por_producto for i in self._consumo[p] if i not in self._precios}
+        if faltantes:
+            for insumo in self.db.table('insumos_catalogo').select('id_insumo, precio_unitario') \
+                    .in_('id_insumo', list(faltantes)).execute().data or []:
+                self._precios[insumo['id_insumo']] = _dec(insumo.get('precio_unitario'))
+
+        for producto_id in receta_por_producto:
+            self._materia[producto_id] = sum(
+                (cantidad * self._precios.get(insumo, CERO) for insumo, cantidad in self._consumo[producto_id].items()), CERO)
+            for insumo in self._consumo[producto_id]:
+                self._usan_insumo[insumo].add(producto_id)
+            for rol_id in self._horas_rol[producto_id]:
+                self._usan_rol[rol_id].add(producto_id)
+            for cf_id in self._horas_cf[producto_id]:
+                self._usan_cf[cf_id].add(producto_id)
+
+    def _quitar_de_indices(self, producto_id: int):
+        for insumo in self._consumo.pop(producto_id, {}):
+            self._usan_insumo[insumo].discard(producto_id)
+        for rol_id in self._horas_rol.pop(producto_id, {}):
+            self._usan_rol[rol_id].discard(producto_id)
+        for cf_id in self._horas_cf.pop(producto_id, {}):
+            self._usan_cf[cf_id].discard(producto_id)
+        self._materia.pop(producto_id, None)
+
+    # --- Cálculo -------------------------------------------------------
+    def costos_producto(self, producto_id: int) -> Optional[Dict[str, Decimal]]:
+        """Costos y precio de un producto con los datos del grafo (None si no tiene receta)."""
+        if producto_id not in self._materia or producto_id not in self._productos:
+            return None
+        producto = self._productos[producto_id]
+        mano_obra = sum((horas * self._tarifas.get(rol_id, CERO)
+                         for rol_id, horas in self._horas_rol[producto_id].items()), CERO)
+        fijos = CERO
+        if self._horas_mes > 0:
+            fijos = sum((horas * self._montos_cf.get(cf_id, CERO)
+                         for cf_id, horas in self._horas_cf[producto_id].items()), CERO) / self._horas_mes
+        total = self._materia[producto_id] + mano_obra + fijos
+        ganancia = _dec(producto.get('porcentaje_ganancia')) / CIEN
+        factor_iva = Decimal('1.21') if producto.get('iva') else Decimal('1.0')
+        return {
+            'costo_materia_prima': self._materia[producto_id],
+            'costo_mano_obra': mano_obra,
+            'costo_fijos': fijos,
+            'costo_total_produccion': total,
+            'precio_unitario': total * (1 + ganancia) * factor_iva,
+        }
+
+    def _releer_margenes(self, producto_ids: List[int]):
+        """
+        Relee margen e IVA de los productos antes de fijar su precio: el grafo
+        puede tener hasta `max_edad` segundos y otro worker pudo editarlos.
+        """
+        for inicio in range(0, len(producto_ids), PAGINA_LECTURA):
+            parte = producto_ids[inicio:inicio + PAGINA_LECTURA]
+            for fila in self.db.table('productos').select('id, porcentaje_ganancia, iva') \
+                    .in_('id', parte).execute().data or []:
+                if fila['id'] in self._productos:
+                    self._productos[fila['id']].update(fila)
+
+    def _guardar(self, producto_ids: Iterable[int], releer: bool = True) -> List[int]:
+        """
+        Escribe en lote los costos de los productos y su historial. Devuelve
+        los ids guardados. Con `releer=False` se usan los márgenes del grafo
+        (recién cargados por quien llama).
+        """
+        from app.models.historial_costos_producto import HistorialCostosProductoModel
+        from app.models.producto import ProductoModel
+
+        producto_ids = sorted(p for p in set(producto_ids) if p in self._materia)
+        if producto_ids and releer:
+            self._releer_margenes(producto_ids)
+        ahora = datetime.now().isoformat()
+        filas, historial = [], []
+        for producto_id in producto_ids:
+            costos = self.costos_producto(producto_id)
+            if costos is None:
+                continue
+            filas.append({
+                'id': producto_id,
+                'costo_mano_obra': float(costos['costo_mano_obra']),
+                'costo_fijos': float(costos['costo_fijos']),
+                'costo_total_produccion': float(costos['costo_total_produccion']),
+                'precio_unitario': float(costos['precio_unitario']),
+            })
+            historial.append({
+                'producto_id': producto_id,
+                'costo_materia_prima': float(costos['costo_materia_prima']),
+                'costo_mano_obra': float(costos['costo_mano_obra']),
+                'costo_indirecto': float(costos['costo_fijos']),
+                'costo_total': float(costos['costo_total_produccion']),
+                'fecha_registro': ahora,
+            })
+        if not filas:
+            return []
+        resultado = ProductoModel().actualizar_costos_bulk(filas)
+        if not resultado.get('success'):
+            raise RuntimeError(resultado.get('error'))
+        historial_res = HistorialCostosProductoModel().registrar_bulk(historial)
+        if not historial_res.get('success'):
+            logger.error(f"[Costeo] No se pudo registrar el historial de costos: {historial_res.get('error')}")
+        for fila in filas:
+            self._productos[fila['id']]['precio_unitario'] = fila['precio_unitario']
+        return [fila['id'] for fila in filas]
+
+    # --- Propagación ---------------------------------------------------
+    def actualizar_precios_insumos(self, insumo_ids: Iterable[str]) -> List[int]:
+        """
+        Relee el precio de los insumos dados (una consulta) y propaga la
+        diferencia a los productos que los usan. Devuelve los productos actualizados.
+        """
+        insumo_ids = [i for i in set(insumo_ids) if i]
+        if not insumo_ids:
+            return []
+        with self._lock:
+            self._asegurar_cargado()
+            nuevos = self.db.table('insumos_catalogo').select('id_insumo, precio_unitario') \
+                .in_('id_insumo', insumo_ids).execute().data or []
+            afectados = set()
+            for insumo in nuevos:
+                insumo_id = insumo['id_insumo']
+                nuevo = _dec(insumo.get('precio_unitario'))
+                delta = nuevo - self._precios.get(insumo_id, CERO)
+                self._precios[insumo_id] = nuevo
+                if delta == 0:
+                    continue
+                for producto_id in self._usan_insumo.get(insumo_id, ()):
+                    self._materia[producto_id] += delta * self._consumo[producto_id][insumo_id]
+                    afectados.add(producto_id)
+            return self._guardar(afectados)
+
+    def actualizar_tarifas_roles(self, rol_ids: Iterable[int]) -> List[int]:
+        """Relee el costo por hora de los roles y recalcula los productos que los usan."""
+        rol_ids = list(set(rol_ids))
+        with self._lock:
+            self._asegurar_cargado()
+            for rol in self.db.table('roles').select('id, costo_por_hora').in_('id', rol_ids).execute().data or []:
+                self._tarifas[rol['id']] = _dec(rol.get('costo_por_hora'))
+            return self._guardar(p for rol_id in rol_ids for p in self._usan_rol.get(rol_id, ()))
+
+    def actualizar_costos_fijos(self, costo_fijo_ids: Iterable[int]) -> List[int]:
+        """Relee el monto (y si sigue activo) de los costos fijos y recalcula los productos que los usan."""
+        costo_fijo_ids = list(set(costo_fijo_ids))
+        with self._lock:
+            self._asegurar_cargado()
+            filas = self.db.table('costos_fijos').select('id, monto_mensual, activo') \
+                .in_('id', costo_fijo_ids).execute().data or []
+            for cf_id in costo_fijo_ids:
+                self._montos_cf.pop(cf_id, None)
+            for cf in filas:
+                if cf.get('activo'):
+                    self._montos_cf[cf['id']] = _dec(cf.get('monto_mensual'))
+            return self._guardar(p for cf_id in costo_fijo_ids for p in self._usan_cf.get(cf_id, ()))
+
+    def actualizar_configuracion_produccion(self) -> List[int]:
+        """Las horas de producción del mes cambian la tasa horaria de todos los costos fijos."""
+        with self._lock:
+            self._asegurar_cargado()
+            self._cargar_globales()
+            return self._guardar(p for productos in self._usan_cf.values() for p in productos)
+
+    def recostear_producto(self, producto_id: int) -> Dict:
+        """Recarga la receta de un producto (p. ej. tras editarla) y guarda sus costos."""
+        with self._lock:
+            self._asegurar_cargado()
+            producto = self.db.table('productos').select('*').eq('id', producto_id).execute().data or []
+            if not producto:
+                return {'success': False, 'error': 'Producto no encontrado'}
+            self._productos[producto_id] = producto[0]
+            self._cargar_estructura([producto_id])
+            if producto_id not in self._materia:
+                return {'success': True, 'message': 'Producto sin receta, no se calculan costos.'}
+            self._guardar([producto_id], releer=False)
+            return {'success': True}
+
+    def recostear_todos(self) -> List[int]:
+        """Recarga el grafo completo y recalcula todo el catálogo en una sola pasada y una escritura."""
+        with self._lock:
+            self.cargar()
+            return self._guardar(self._materia.keys(), releer=False)
+
+
+_motor = None
+_motor_lock = threading.Lock()
+
+
+def get_motor_costos() -> MotorCostos:
+    """Devuelve el motor de costos del proceso, creándolo en el primer uso."""
+    global _motor
+    with _motor_lock:
+        if _motor is None:
+            _motor = MotorCostos(max_edad=float(os.getenv('COSTEO_GRAFO_SECONDS', 600)))
+        return _motor
+
+
+def propagar_cambio_costos(roles: Iterable[int] = (), costos_fijos: Iterable[int] = (),
+                           configuracion: bool = False) -> List[int]:
+    """
+    Propaga a los productos un cambio de tarifas de roles, costos fijos o
+    configuración de producción. Nunca interrumpe el flujo que lo llama.
+    """
+    actualizados = set()
+    try:
+        motor = get_motor_costos()
+        if roles:
+            actualizados.update(motor.actualizar_tarifas_roles(roles))
+        if costos_fijos:
+            actualizados.update(motor.actualizar_costos_fijos(costos_fijos))
+        if configuracion:
+            actualizados.update(motor.actualizar_configuracion_produccion())
+    except Exception as e:
+        logger.error(f"[Costeo] No se pudo propagar el cambio de costos a los productos: {e}", exc_info=True)
+    return sorted(actualizados)
+
+
+def init_costeo_cli(app):
+    """Registra `flask recostear-productos` para recalcular los costos de todo el catálogo."""
+    import click
+
+    @app.cli.command('recostear-productos')
+    def recostear_productos():
+        actualizados = get_motor_costos().recostear_todos()
+        click.echo(f"Costos recalculados para {len(actualizados)} productos.")
@@ -0,0 +1,165 @@
+import html
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+AL_DIA = 'AL_DIA'
+PRONTO_VENC = 'PRONTO_VENC'
+VENCIDA = 'VENCIDA'
+
+# Documento -> (columna de vencimiento, columna con el último estado notificado, años de validez).
+DOCUMENTOS = {
+    'vtv': ('vtv_vencimiento', 'estado_vtv', 1),
+    'licencia': ('licencia_vencimiento', 'estado_licencia', 5),
+}
+NOMBRES_DOCUMENTO = {'vtv': 'VTV', 'licencia': 'licencia del conductor'}
+DIAS_AVISO = 30
+
+
+def _restar_anios(fecha: date, anios: int) -> date:
+    try:
+        return fecha.replace(year=fecha.year - anios)
+    except ValueError:  # 29 de febrero
+        return fecha.replace(year=fecha.year - anios, day=28)
+
+
+@lru_cache(maxsize=4096)
+def normalizar_vencimiento(valor, anios: int) -> Optional[Tuple[date, str, str]]:
+    """
+    (vencimiento, vencimiento 'YYYY-MM-DD', emisión estimada 'YYYY-MM-DD') a
+    partir de lo que devuelva la base (fecha o timestamp ISO). Cada valor
+    distinto se interpreta una sola vez por proceso.
+    """
+    if not valor:
+        return None
+    try:
+        vencimiento = date.fromisoformat(str(valor)[:10])
+    except ValueError:
+        return None
+    return vencimiento, vencimiento.isoformat(), _restar_anios(vencimiento, anios).isoformat()
+
+
+class IndiceVencimientos:
+    """
+    Vencimientos de la flota ordenados por fecha. Con dos búsquedas binarias
+    (hoy y hoy + días de aviso) se parte el índice en VENCIDA / PRONTO_VENC /
+    AL_DIA, así el estado de todos los documentos sale de una sola pasada sin
+    comparar fecha por fecha.
+    """
+
+    def __init__(self, vehiculos: List[Dict]):
+        entradas = []
+        for posicion, vehiculo in enumerate(vehiculos):
+            for documento, (columna, _, anios) in DOCUMENTOS.items():
+                normalizado = normalizar_vencimiento(vehiculo.get(columna), anios)
+                if normalizado:
+                    entradas.append((normalizado[0].toordinal(), posicion, documento))
+        entradas.sort()
+        self.ordinales = [e[0] for e in entradas]
+        self.claves = [(e[1], e[2]) for e in entradas]
+
+    def estados(self, hoy: date, dias_aviso: int = DIAS_AVISO) -> Dict[Tuple[int, str], str]:
+        """{(posición del vehículo, documento): estado} para los documentos con vencimiento."""
+        vencidas = bisect_left(self.ordinales, hoy.toordinal())
+        pronto = bisect_right(self.ordinales, (hoy + timedelta(days=dias_aviso)).toordinal())
+        estados = dict.fromkeys(self.claves[:vencidas], VENCIDA)
+        estados.update(dict.fromkeys(self.claves[vencidas:pronto], PRONTO_VENC))
+        estados.update(dict.fromkeys(self.claves[pronto:], AL_DIA))
+        return estados
+
+
+class MotorCumplimientoFlota:
+    """
+    Estado de VTV y licencia de la flota: enriquece los listados de vehículos
+    y, desde el scheduler, detecta los cambios de estado para avisar sólo
+    cuando un documento pasa a PRONTO_VENC o VENCIDA. El último estado
+    avisado se guarda en el propio vehículo (`estado_vtv`, `estado_licencia`).
+    """
+
+    def __init__(self, model=None, dias_aviso: int = DIAS_AVISO):
+        self._model = model
+        self.dias_aviso = dias_aviso
+
+    @property
+    def model(self):
+        if self._model is None:
+            from app.models.vehiculo import VehiculoModel
+            self._model = VehiculoModel()
+        return self._model
+
+    def enriquecer(self, vehiculos: List[Dict], hoy: Optional[date] = None) -> Dict[Tuple[int, str], str]:
+        """
+        Completa estado_*, alerta_* y *_emision_estimada de cada vehículo (in-place)
+        y devuelve los estados calculados por (posición, documento).
+        """
+        hoy = hoy or date.today()
+        estados = IndiceVencimientos(vehiculos).estados(hoy, self.dias_aviso)
+        for posicion, vehiculo in enumerate(vehiculos):
+            for documento, (columna, _, anios) in DOCUMENTOS.items():
+                normalizado = normalizar_vencimiento(vehiculo.get(columna), anios)
+                estado = estados.get((posicion, documento), AL_DIA)
+                vehiculo[f'estado_{documento}'] = estado
+                vehiculo[f'alerta_{documento}'] = estado != AL_DIA
+                vehiculo[f'{documento}_emision_estimada'] = normalizado[2] if normalizado else None
+                if normalizado:
+                    vehiculo[columna] = normalizado[1]
+        return estados
+
+    def revisar_transiciones(self, hoy: Optional[date] = None) -> Dict:
+        """
+        Recalcula el estado de la flota activa, guarda los que cambiaron
+        (un update por estado nuevo) y avisa los que empeoraron.
+        """
+        columnas = ['id', 'patente', 'nombre_conductor'] + [c for col, estado, _ in DOCUMENTOS.values() for c in (col, estado)]
+        vehiculos = self.model.db.table(self.model.get_table_name()).select(', '.join(columnas)) \
+            .eq('activo', True).execute().data or []
+        estados = IndiceVencimientos(vehiculos).estados(hoy or date.today(), self.dias_aviso)
+
+        cambios: Dict[Tuple[str, str], List[int]] = {}
+        avisos = []
+        for posicion, vehiculo in enumerate(vehiculos):
+            for documento, (columna, columna_estado, _) in DOCUMENTOS.items():
+                nuevo = estados.get((posicion, documento), AL_DIA)
+                anterior = vehiculo.get(columna_estado) or AL_DIA
+                if nuevo == anterior:
+                    continue
+                cambios.setdefault((columna_estado, nuevo), []).append(vehiculo['id'])
+                if nuevo != AL_DIA:
+                    avisos.append((vehiculo, documento, nuevo))
+
+        for (columna_estado, estado), ids in cambios.items():
+            self.model.db.table(self.model.get_table_name()).update({columna_estado: estado}).in_('id', ids).execute()
+        if avisos:
+            self._avisar(avisos)
+
+        resumen = {'vehiculos': len(vehiculos), 'cambios': sum(len(ids) for ids in cambios.values()), 'avisos': len(avisos)}
+        logger.info(f"[Flota] Revisión de vencimientos: {resumen}")
+        return resumen
+
+    def _avisar(self, avisos: List[Tuple[Dict, str, str]]):
+        lineas = []
+        for vehiculo, documento, estado in avisos:
+            columna = DOCUMENTOS[documento][0]
+            situacion = 'venció' if estado == VENCIDA else 'vence pronto'
+            lineas.append(f"{vehiculo.get('patente')}: la {NOMBRES_DOCUMENTO[documento]} {situacion} "
+                          f"({normalizar_vencimiento(vehiculo.get(columna), 1)[1]}).")
+        mensaje = "Vencimientos de la flota:\n" + "\n".join(lineas)
+
+        try:
+            from app.controllers.usuario_controller import UsuarioController
+            gerentes_res = UsuarioController().obtener_usuarios_por_rol(['GERENTE'])
+            if gerentes_res.get('success') and gerentes_res.get('data'):
+                self.model.db.table('notificaciones').insert([
+                    {'usuario_id': gerente['id'], 'mensaje': mensaje, 'tipo': 'ALERTA', 'url_destino': '/admin/vehiculos/'}
+                    for gerente in gerentes_res['data']
+                ]).execute()
+        except Exception as e:
+            logger.warning(f"[Flota] Error notificando vencimientos: {e}")
+
+        from app.services.telegram_service import notificar_telegram
+        # Telegram usa parse_mode=HTML y la patente la carga el usuario.
+        notificar_telegram(html.escape(mensaje), key='flota_vencimientos')
@@ -0,0 +1,306 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tabla y columna identificadora de cada tipo de entidad afectada por una alerta.
+TABLAS_ENTIDAD = {
+    'lote_insumo': ('insumos_inventario', 'id_lote'),
+    'lote_producto': ('lotes_productos', 'id_lote'),
+    'orden_produccion': ('ordenes_produccion', 'id'),
+    'pedido': ('pedidos', 'id'),
+}
+# Estados (en minúscula, por coincidencia parcial) en los que la alerta tiene efecto sobre la entidad.
+ESTADOS_AFECTADOS = {
+    'lote_insumo': ['disponible', 'agotado', 'reservado', 'vencido'],
+    'lote_producto': ['disponible', 'reservado', 'agotado', 'vencido'],
+    'orden_produccion': ['en proceso', 'lista para producir', 'en linea 1', 'en linea 2', 'en empaquetado'],
+    'pedido': ['en proceso', 'listo para entrega', 'en transito'],
+}
+ESTADOS_LOTE_PRODUCTO_CUARENTENABLES = ('DISPONIBLE', 'CUARENTENA')
+RESULTADO_INSPECCION_ALERTA = "Pendiente de revisión (Automático por Alerta)"
+# Ids por filtro `in_`: mantiene la URL de PostgREST acotada aun con UUIDs.
+TAMANIO_LOTE_IN = 150
+
+
+def _partes(valores: List, tamanio: int = TAMANIO_LOTE_IN) -> Iterable[List]:
+    for i in range(0, len(valores), tamanio):
+        yield valores[i:i + tamanio]
+
+
+def _num(valor) -> float:
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class EjecutorEfectosAlerta:
+    """
+    Aplica en lote los efectos de una alerta de riesgo sobre sus entidades
+    afectadas (lotes de insumo y de producto, OPs y pedidos).
+
+    Los afectados se agrupan por `tipo_entidad`: los estados se leen con un
+    `in_` por tipo y las transiciones se escriben por conjunto (flag
+    `en_alerta`, afectados omitidos, OPs en espera, reservas canceladas) o
+    con un upsert por tabla cuando cada fila lleva valores propios (las
+    cantidades movidas a cuarentena). Al final se deja un único registro de
+    auditoría con el resumen. La cantidad de consultas depende de la
+    cantidad de tipos, no de la cantidad de entidades.
+
+    Como las escrituras van directo a las tablas (sin los modelos que
+    versionan el plan), al terminar se incrementa una vez la versión del plan
+    y se recalculan los hechos de producción de las OPs tocadas.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+        self._filas: Dict[Tuple[str, str], Dict] = {}
+        self._ops_tocadas = set()
+        self._plan_cambio = False
+
+    @property
+    def db(self):
+        if self._db is None:
+            from app.database import Database
+            self._db = Database().client
+        return self._db
+
+    # --- Lectura -------------------------------------------------------
+    @staticmethod
+    def agrupar(afectados: List[Dict]) -> Dict[str, List[str]]:
+        """Ids (str, sin repetir, en orden) de los afectados de cada tipo conocido."""
+        grupos = defaultdict(dict)
+        for afectado in afectados:
+            tipo = afectado.get('tipo_entidad')
+            if tipo in TABLAS_ENTIDAD:
+                grupos[tipo][str(afectado['id_entidad'])] = None
+        return {tipo: list(ids) for tipo, ids in grupos.items()}
+
+    def obtener_estados(self, afectados: List[Dict]) -> Dict[Tuple[str, str], str]:
+        """
+        Estado actual de cada afectado, {(tipo, id): estado}. Las filas leídas
+        se conservan para calcular los efectos sin volver a consultarlas.
+        """
+        estados = {}
+        for tipo, ids in self.agrupar(afectados).items():
+            tabla, columna = TABLAS_ENTIDAD[tipo]
+            for parte in _partes(ids):
+                try:
+                    filas = self.db.table(tabla).select('*').in_(columna, parte).execute().data or []
+                except Exception as e:
+                    logger.error(f"No se pudo obtener el estado de {len(parte)} entidades {tipo}. Error: {e}")
+                    continue
+                for fila in filas:
+                    clave = (tipo, str(fila[columna]))
+                    self._filas[clave] = fila
+                    estados[clave] = fila.get('estado', 'Desconocido')
+        return estados
+
+    # --- Efectos -------------------------------------------------------
+    def aplicar(self, alerta: Dict, afectados: List[Dict], estados_previos: Dict, motivo: str,
+                usuario_id: Optional[int], usuario=None) -> Dict:
+        """
+        Pone en cuarentena los lotes, en espera las OPs y marca en alerta
+        todas las entidades que corresponda. Devuelve un resumen con la
+        cantidad de entidades de cada efecto.
+        """
+        grupos = self.agrupar(afectados)
+        faltantes = [a for a in afectados if (a.get('tipo_entidad'), str(a.get('id_entidad'))) not in self._filas]
+        if faltantes:
+            self.obtener_estados(faltantes)
+
+        en_alerta, omitidos, procesables = defaultdict(list), defaultdict(list), defaultdict(list)
+        for tipo, ids in grupos.items():
+            for entidad_id in ids:
+                estado = str(estados_previos.get((tipo, entidad_id)) or '').lower()
+                fila = self._filas.get((tipo, entidad_id))
+                en_alerta[tipo].append(entidad_id)
+                # Un lote de producto agotado queda pendiente para que se pueda pedir su devolución.
+                if tipo == 'lote_producto' and fila is not None and \
+                        ('agotado' in estado or _num(fila.get('cantidad_actual')) + _num(fila.get('cantidad_en_cuarentena')) <= 0):
+                    continue
+                if (tipo == 'lote_insumo' and 'agotado' in estado) or \
+                        not any(s in estado for s in ESTADOS_AFECTADOS[tipo]):
+                    omitidos[tipo].append(entidad_id)
+                    continue
+                if fila is not None:
+                    procesables[tipo].append(fila)
+
+        self._ops_tocadas, self._plan_cambio = set(), False
+        resumen = {'en_alerta': sum(len(ids) for ids in en_alerta.values()),
+                   'omitidos': sum(len(ids) for ids in omitidos.values())}
+        self._marcar_en_alerta(en_alerta)
+        self._resolver_omitidos(alerta['id'], omitidos, usuario_id)
+
+        pasos = [
+            ('lotes_insumo_cuarentena', lambda: self._cuarentena_lotes_insumo(procesables['lote_insumo'], alerta, motivo, usuario_id)),
+            ('lotes_producto_cuarentena', lambda: self._cuarentena_lotes_producto(procesables['lote_producto'], motivo, usuario_id)),
+            ('ops_en_espera', lambda: self._poner_ops_en_espera([f['id'] for f in procesables['orden_produccion']])),
+        ]
+        for nombre, paso in pasos:
+            try:
+                resumen[nombre] = paso()
+            except Exception as e:
+                resumen[nombre] = 0
+                logger.error(f"Fallo al aplicar '{nombre}' de la alerta {alerta.get('codigo')}. Error: {e}", exc_info=True)
+        # Los pedidos quedan en revisión a través del flag en_alerta y su fila pendiente en
+        # alerta_riesgo_afectados: 'EN REVISION' no es un estado de pedido válido.
+        resumen['pedidos_en_revision'] = len(procesables['pedido'])
+
+        self._avisar_cambios_plan(alerta)
+        self._auditar(alerta, resumen, usuario)
+        return resumen
+
+    def _avisar_cambios_plan(self, alerta: Dict):
+        """Invalida una sola vez el plan en caché y marca los hechos de las OPs tocadas."""
+        if not self._plan_cambio:
+            return
+        from app.services.hechos_produccion_service import notificar_hecho_op
+        from app.services.planificacion_snapshot_service import incrementar_version_plan
+        try:
+            incrementar_version_plan(f"efectos de la alerta {alerta.get('codigo')}")
+        except Exception as e:
+            logger.error(f"No se pudo incrementar la versión del plan tras la alerta {alerta.get('codigo')}: {e}")
+        for op_id in sorted(self._ops_tocadas):
+            notificar_hecho_op(op_id)
+
+    def _marcar_en_alerta(self, ids_por_tipo: Dict[str, List[str]]):
+        for tipo, ids in ids_por_tipo.items():
+            tabla, columna = TABLAS_ENTIDAD[tipo]
+            for parte in _partes(ids):
+                try:
+                    self.db.table(tabla).update({'en_alerta': True}).in_(columna, parte).execute()
+                except Exception as e:
+                    logger.error(f"Error actualizando flag 'en_alerta' de {len(parte)} entidades {tipo}: {e}", exc_info=True)
+
+    def _resolver_omitidos(self, alerta_id, ids_por_tipo: Dict[str, List[str]], usuario_id):
+        """Las entidades que no estaban en un estado procesable se dan por resueltas en la alerta."""
+        for tipo, ids in ids_por_tipo.items():
+            for parte in _partes(ids):
+                try:
+                    self.db.table('alerta_riesgo_afectados').update({
+                        'estado': 'resuelto',
+                        'resolucion_aplicada': 'omitido_por_estado_previo',
+                        'id_usuario_resolucion': usuario_id,
+                    }).eq('alerta_id', alerta_id).eq('tipo_entidad', tipo).in_('id_entidad', parte).execute()
+                except Exception as e:
+                    logger.error(f"Error resolviendo {len(parte)} afectados {tipo} omitidos de la alerta {alerta_id}: {e}")
+
+    def _cuarentena_lotes_insumo(self, lotes: List[Dict], alerta: Dict, motivo: str, usuario_id) -> int:
+        """
+        Mueve todo el stock físico (disponible + reservado) de los lotes a
+        cuarentena, cancela sus reservas y devuelve a EN ESPERA las OPs que
+        estaban listas para producir con esos lotes.
+        """
+        if not lotes:
+            return 0
+        from app.models.inventario import InventarioModel
+        from app.services.stock_ledger_service import movimiento_inventario
+
+        lote_ids = [l['id_lote'] for l in lotes]
+        reservas = []
+        for parte in _partes(lote_ids):
+            reservas += self.db.table('reservas_insumos').select('id, orden_produccion_id') \
+                .in_('lote_inventario_id', parte).eq('estado', 'RESERVADO').execute().data or []
+
+        # La base suma lo disponible y lo reservado de cada lote antes de cancelar las reservas.
+        with movimiento_inventario('CUARENTENA_ENTRADA', referencia_tipo='alerta_riesgo',
+                                   referencia_id=alerta['id'], usuario_id=usuario_id):
+            resultado = InventarioModel().poner_en_cuarentena(lote_ids, motivo)
+        if not resultado.get('success'):
+            raise RuntimeError(resultado.get('error'))
+
+        if reservas:
+            for parte in _partes([r['id'] for r in reservas]):
+                self.db.table('reservas_insumos').delete().in_('id', parte).execute()
+            logger.info(f"Se cancelaron {len(reservas)} reservas de {len(lotes)} lotes al pasar a cuarentena.")
+            op_ids = sorted({r['orden_produccion_id'] for r in reservas if r.get('orden_produccion_id')})
+            self._plan_cambio = True
+            self._ops_tocadas.update(int(i) for i in op_ids)
+            self._poner_ops_en_espera(op_ids, solo_estado='LISTA PARA PRODUCIR', observaciones=(
+                f"Regresada a EN ESPERA automáticamente. Lotes reservados pasaron a cuarentena por la alerta {alerta.get('codigo')}."))
+
+        ahora = datetime.now().isoformat()
+        self.db.table('control_calidad_insumos').insert([{
+            'lote_insumo_id': lote['id_lote'], 'orden_compra_id': None, 'usuario_supervisor_id': usuario_id,
+            'decision_final': 'EN_CUARENTENA', 'comentarios': motivo,
+            'resultado_inspeccion': RESULTADO_INSPECCION_ALERTA, 'foto_url': None, 'fecha_inspeccion': ahora,
+        } for lote in lotes]).execute()
+
+        from app.controllers.insumo_controller import InsumoController
+        InsumoController().actualizar_stock_insumos([l['id_insumo'] for l in lotes])
+        self._notificar_gerentes(alerta, len(lotes))
+        return len(lotes)
+
+    def _cuarentena_lotes_producto(self, lotes: List[Dict], motivo: str, usuario_id) -> int:
+        """Mueve todo lo disponible de los lotes de producto a cuarentena."""
+        lotes = [l for l in lotes if l.get('estado') in ESTADOS_LOTE_PRODUCTO_CUARENTENABLES]
+        if not lotes:
+            return 0
+        from app.models.lote_producto import LoteProductoModel
+
+        resultado = LoteProductoModel().poner_en_cuarentena([l['id_lote'] for l in lotes], motivo)
+        if not resultado.get('success'):
+            raise RuntimeError(resultado.get('error'))
+
+        ahora = datetime.now().isoformat()
+        self.db.table('control_calidad_productos').insert([{
+            'lote_producto_id': lote['id_lote'], 'usuario_supervisor_id': usuario_id, 'decision_final': 'CUARENTENA',
+            'comentarios': motivo, 'resultado_inspeccion': RESULTADO_INSPECCION_ALERTA, 'foto_url': None,
+            'fecha_inspeccion': ahora,
+        } for lote in lotes]).execute()
+        return len(lotes)
+
+    def _poner_ops_en_espera(self, op_ids: List, solo_estado: Optional[str] = None,
+                             observaciones: Optional[str] = None) -> int:
+        """Pasa las OPs a EN ESPERA (sólo las que están en `solo_estado`, si se indica) y avisa al Kanban."""
+        if not op_ids:
+            return 0
+        from app.services.eventos_produccion_service import publicar_evento_op
+
+        datos = {'estado': 'EN ESPERA'}
+        if observaciones:
+            datos['observaciones'] = observaciones
+        actualizadas = []
+        for parte in _partes([int(i) for i in op_ids]):
+            query = self.db.table('ordenes_produccion').update(datos).in_('id', parte)
+            if solo_estado:
+                query = query.eq('estado', solo_estado)
+            actualizadas += query.execute().data or []
+        for op in actualizadas:
+            publicar_evento_op('op_estado', op['id'], estado='EN ESPERA', operario_id=op.get('operario_asignado_id'))
+        if actualizadas:
+            self._plan_cambio = True
+            self._ops_tocadas.update(int(op['id']) for op in actualizadas)
+        return len(actualizadas)
+
+    def _notificar_gerentes(self, alerta: Dict, cantidad_lotes: int):
+        """Una notificación por gerente con el resumen, en lugar de una por lote."""
+        try:
+            from flask import url_for
+            from app.controllers.usuario_controller import UsuarioController
+            gerentes_res = UsuarioController().obtener_usuarios_por_rol(['GERENTE'])
+            if not gerentes_res.get('success') or not gerentes_res.get('data'):
+                return
+            try:
+                url = url_for('admin_riesgo.detalle_alerta_riesgo', codigo_alerta=alerta.get('codigo'))
+            except RuntimeError:
+                url = f"/administrar/riesgos/detalle/{alerta.get('codigo')}"
+            mensaje = f"{cantidad_lotes} lote(s) de insumo pasaron a cuarentena por la alerta {alerta.get('codigo')}."
+            self.db.table('notificaciones').insert([
+                {'usuario_id': gerente['id'], 'mensaje': mensaje, 'tipo': 'ALERTA', 'url_destino': url}
+                for gerente in gerentes_res['data']
+            ]).execute()
+        except Exception as e:
+            logger.warning(f"Error enviando notificaciones de cuarentena de la alerta {alerta.get('codigo')}: {e}")
+
+    def _auditar(self, alerta: Dict, resumen: Dict, usuario):
+        from app.controllers.registro_controller import RegistroController
+        detalle = (f"Alerta {alerta.get('codigo')}: {resumen.get('lotes_insumo_cuarentena', 0)} lotes de insumo y "
+                   f"{resumen.get('lotes_producto_cuarentena', 0)} lotes de producto en cuarentena, "
+                   f"{resumen.get('ops_en_espera', 0)} OPs en espera, {resumen.get('pedidos_en_revision', 0)} pedidos en revisión, "
+                   f"{resumen.get('omitidos', 0)} entidades omitidas por su estado.")
+        RegistroController().crear_registro(usuario, 'Alertas de riesgo', 'Efectos de alerta', detalle)
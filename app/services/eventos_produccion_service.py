@@ -0,0 +1,329 @@
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def puede_ver(evento: Dict, rol: str, usuario_id=None) -> bool:
+    """
+    Filtro por rol del canal de eventos: un evento con 'roles' sólo llega a
+    esos roles, y un operario sólo recibe los eventos de OPs sin operario
+    asignado o asignadas a él (lo mismo que muestra su tablero).
+    """
+    roles = evento.get('roles')
+    if roles and rol not in roles:
+        return False
+    if rol == 'OPERARIO':
+        operario_id = evento.get('operario_id')
+        return operario_id is None or str(operario_id) == str(usuario_id)
+    return True
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente conectado. Si el cliente no consume, se descartan los más viejos."""
+
+    def __init__(self, capacidad: int = 256):
+        self._cola = queue.Queue(maxsize=capacidad)
+        self.descartados = 0
+
+    def entregar(self, evento: Dict):
+        while True:
+            try:
+                self._cola.put_nowait(evento)
+                return
+            except queue.Full:
+                try:
+                    self._cola.get_nowait()
+                    self.descartados += 1
+                except queue.Empty:
+                    pass
+
+    def esperar(self, timeout: float) -> Optional[Dict]:
+        try:
+            return self._cola.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RelayArchivoEventos:
+    """
+    Relay entre workers de gunicorn a través de un archivo SQLite local.
+
+    `publicar` inserta el evento (el autoincremental da ids globales y
+    crecientes para todos los workers del host) y un hilo por worker lee los
+    nuevos cada `intervalo` segundos y los entrega a su bus local. También
+    sirve el replay por Last-Event-ID. Se conservan los últimos `retencion`.
+    """
+
+    def __init__(self, path: str, intervalo: float = 0.25, retencion: int = 5000):
+        self.path = path
+        self.intervalo = intervalo
+        self.retencion = retencion
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._worker = None
+        with self._conexion() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS eventos (id INTEGER PRIMARY KEY AUTOINCREMENT, evento TEXT NOT NULL)")
+        self._ultimo_id = self.ultimo_id()
+
+    def _conexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def ultimo_id(self) -> int:
+        fila = self._conexion().execute('SELECT MAX(id) FROM eventos').fetchone()
+        return fila[0] or 0
+
+    def publicar(self, evento: Dict) -> int:
+        conn = self._conexion()
+        cursor = conn.execute('INSERT INTO eventos (evento) VALUES (?)', (json.dumps(evento, default=str),))
+        evento_id = cursor.lastrowid
+        if evento_id % 100 == 0:
+            conn.execute('DELETE FROM eventos WHERE id <= ?', (evento_id - self.retencion,))
+        return evento_id
+
+    def leer_desde(self, ultimo_id: int, limite: int = 1000) -> List[Dict]:
+        filas = self._conexion().execute(
+            'SELECT id, evento FROM eventos WHERE id > ? ORDER BY id LIMIT ?', (ultimo_id, limite)).fetchall()
+        return [dict(json.loads(texto), id=evento_id) for evento_id, texto in filas]
+
+    def primer_id(self) -> int:
+        fila = self._conexion().execute('SELECT MIN(id) FROM eventos').fetchone()
+        return fila[0] or 0
+
+    def iniciar(self, entregar):
+        if self._worker is not None and self._worker.is_alive():
+            return
+
+        def _run():
+            while not self._stop.wait(self.intervalo):
+                try:
+                    for evento in self.leer_desde(self._ultimo_id):
+                        self._ultimo_id = evento['id']
+                        entregar(evento)
+                except Exception as e:
+                    logger.error(f"[Eventos] Error leyendo el relay {self.path}: {e}")
+
+        self._worker = threading.Thread(target=_run, name='eventos-relay', daemon=True)
+        self._worker.start()
+
+    def detener(self):
+        self._stop.set()
+
+
+class BusEventos:
+    """
+    Bus pub/sub en proceso para los cambios de estado de producción.
+
+    Los controladores publican después de cada cambio exitoso; cada cliente
+    SSE tiene una `Suscripcion`. Se guarda un buffer circular de los últimos
+    `capacidad` eventos para el replay por Last-Event-ID. Con un `relay`
+    (varios workers) la publicación pasa por el relay y cada worker entrega
+    lo que lee de él; sin relay se entrega directamente.
+    """
+
+    def __init__(self, capacidad: int = 500, relay: Optional[RelayArchivoEventos] = None):
+        self.relay = relay
+        self._buffer = deque(maxlen=capacidad)
+        self._suscripciones = set()
+        self._oyentes = []
+        self._lock = threading.Lock()
+        # Ids crecientes aun entre reinicios del proceso (milisegundos al arrancar).
+        self._id_inicial = int(time.time() * 1000)
+        self._ids = itertools.count(self._id_inicial)
+        if relay is not None:
+            relay.iniciar(self._entregar_desde_relay)
+
+    def publicar(self, tipo: str, op_id=None, estado: Optional[str] = None, operario_id=None,
+                 roles: Optional[Iterable[str]] = None, **data) -> Dict:
+        evento = {
+            'tipo': tipo, 'op_id': op_id, 'estado': estado, 'operario_id': operario_id,
+            'roles': list(roles) if roles else None, 'data': data, 'ts': time.time(), 'pid': os.getpid(),
+        }
+        if self.relay is not None:
+            evento['id'] = self.relay.publicar(evento)
+        else:
+            evento['id'] = next(self._ids)
+            self._entregar(evento)
+        return evento
+
+    def _entregar(self, evento: Dict):
+        with self._lock:
+            self._buffer.append(evento)
+            suscripciones = list(self._suscripciones)
+            oyentes = list(self._oyentes)
+        for suscripcion in suscripciones:
+            suscripcion.entregar(evento)
+        for oyente in oyentes:
+            try:
+                oyente(evento)
+            except Exception as e:
+                logger.error(f"[Eventos] Error en un oyente del evento '{evento.get('tipo')}': {e}")
+
+    def agregar_oyente(self, oyente):
+        """Registra una función que se llama con cada evento entregado en este proceso (p. ej. invalidar cachés)."""
+        with self._lock:
+            self._oyentes.append(oyente)
+
+    def _entregar_desde_relay(self, evento: Dict):
+        # Un cambio hecho en otro worker invalida también los snapshots de este.
+        if evento.get('pid') != os.getpid():
+            from app.services.planificacion_snapshot_service import incrementar_version_plan
+            incrementar_version_plan(f"evento {evento.get('tipo')} de otro worker")
+        self._entregar(evento)
+
+    def suscribir(self, maximo: Optional[int] = None) -> Optional[Suscripcion]:
+        """
+        Abre una suscripción. Con `maximo`, la cuenta y el alta se hacen bajo
+        el mismo lock y devuelve None si ya hay `maximo` abiertas.
+        """
+        with self._lock:
+            if maximo is not None and len(self._suscripciones) >= maximo:
+                return None
+            suscripcion = Suscripcion()
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion: Suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def conexiones(self) -> int:
+        with self._lock:
+            return len(self._suscripciones)
+
+    def eventos_desde(self, ultimo_id: int) -> Optional[List[Dict]]:
+        """
+        Eventos posteriores a `ultimo_id` para el replay. Devuelve None si
+        `ultimo_id` ya salió del historial (el cliente debe recargar todo).
+        """
+        if self.relay is not None:
+            if ultimo_id < self.relay.primer_id() - 1:
+                return None
+            return self.relay.leer_desde(ultimo_id)
+        if ultimo_id < self._id_inicial - 1:
+            return None  # id de un proceso anterior: los eventos intermedios se perdieron
+        with self._lock:
+            eventos = list(self._buffer)
+        if eventos and ultimo_id < eventos[0]['id'] - 1 and len(eventos) == self._buffer.maxlen:
+            return None
+        return [e for e in eventos if e['id'] > ultimo_id]
+
+
+def formatear_sse(evento: Dict) -> str:
+    """Serializa un evento al formato text/event-stream (id + data)."""
+    datos = {k: v for k, v in evento.items() if k not in ('roles', 'id', 'pid')}
+    return f"id: {evento['id']}\ndata: {json.dumps(datos, default=str)}\n\n"
+
+
+def stream_eventos(bus: BusEventos, rol: str, usuario_id=None, ultimo_id: Optional[int] = None,
+                   heartbeat: float = 10.0, duracion_max: float = 55.0,
+                   suscripcion: Optional[Suscripcion] = None):
+    """
+    Generador SSE para un cliente: reintento sugerido, replay desde
+    `ultimo_id`, eventos filtrados por rol y un comentario de heartbeat cada
+    `heartbeat` segundos. Cierra tras `duracion_max` para liberar el hilo
+    (con gthread cada conexión abierta ocupa uno); el navegador reconecta
+    solo enviando Last-Event-ID y recibe por replay lo que se perdió.
+    `suscripcion` es la ya reservada con `bus.suscribir(maximo)`, si la hay.
+    """
+    if suscripcion is None:
+        suscripcion = bus.suscribir()
+    try:
+        yield 'retry: 3000\n\n'
+        ultimo_enviado = ultimo_id or 0
+        if ultimo_id is not None:
+            pendientes = bus.eventos_desde(ultimo_id)
+            if pendientes is None:
+                yield 'event: reset\ndata: {}\n\n'
+                pendientes = []
+            for evento in pendientes:
+                ultimo_enviado = evento['id']
+                if puede_ver(evento, rol, usuario_id):
+                    yield formatear_sse(evento)
+
+        fin = time.monotonic() + duracion_max
+        while time.monotonic() < fin:
+            evento = suscripcion.esperar(timeout=min(heartbeat, max(fin - time.monotonic(), 0.01)))
+            if evento is None:
+                yield ': heartbeat\n\n'
+                continue
+            if evento['id'] <= ultimo_enviado:
+                continue  # ya enviado en el replay
+            ultimo_enviado = evento['id']
+            if puede_ver(evento, rol, usuario_id):
+                yield formatear_sse(evento)
+    finally:
+        bus.desuscribir(suscripcion)
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def _cantidad_workers() -> int:
+    """Workers de gunicorn configurados (WEB_CONCURRENCY, GUNICORN_CMD_ARGS o la línea de comandos); 1 si no se sabe."""
+    if os.getenv('WEB_CONCURRENCY', '').isdigit():
+        return int(os.environ['WEB_CONCURRENCY'])
+    argumentos = os.getenv('GUNICORN_CMD_ARGS', '').split() + sys.argv[1:]
+    for i, argumento in enumerate(argumentos):
+        valor = None
+        if argumento.startswith('--workers='):
+            valor = argumento.split('=', 1)[1]
+        elif argumento in ('-w', '--workers') and i + 1 < len(argumentos):
+            valor = argumentos[i + 1]
+        elif argumento.startswith('-w') and len(argumento) > 2:
+            valor = argumento[2:]
+        if valor and valor.isdigit():
+            return int(valor)
+    return 1
+
+
+def get_bus_eventos() -> BusEventos:
+    """
+    Devuelve el bus del proceso. Si EVENTOS_RELAY_PATH está definido (varios
+    workers en el mismo host) los eventos se comparten por ese archivo. Sin
+    él, con más de un worker se usa un archivo en el directorio temporal:
+    el bus local sólo llega a los clientes conectados al mismo worker.
+    """
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            relay = None
+            path = os.getenv('EVENTOS_RELAY_PATH')
+            workers = _cantidad_workers()
+            if not path and workers > 1:
+                path = os.path.join(tempfile.gettempdir(), 'eventos_produccion.sqlite3')
+                logger.warning(f"[Eventos] {workers} workers sin EVENTOS_RELAY_PATH: los eventos se comparten por "
+                               f"{path}. Definí EVENTOS_RELAY_PATH si los workers no comparten el directorio temporal.")
+            if path:
+                try:
+                    relay = RelayArchivoEventos(path, intervalo=float(os.getenv('EVENTOS_RELAY_INTERVALO', 0.25)))
+                    atexit.register(relay.detener)
+                except Exception as e:
+                    logger.error(f"[Eventos] No se pudo abrir el relay {path}; se usa sólo el bus local: {e}")
+            _bus = BusEventos(relay=relay)
+        return _bus
+
+
+def publicar_evento_op(tipo: str, op_id, estado: Optional[str] = None, operario_id=None, **data):
+    """Publica un cambio de una OP. Nunca interrumpe el flujo que lo llama."""
+    try:
+        get_bus_eventos().publicar(tipo, op_id=op_id, estado=estado, operario_id=operario_id, **data)
+    except Exception as e:
+        logger.error(f"No se pudo publicar el evento '{tipo}' de la OP {op_id}: {e}")
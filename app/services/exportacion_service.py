@@ -0,0 +1,150 @@
+"""
+Exportaciones grandes a CSV o Excel sin cargar el resultado en memoria.
+
+`paginar_find_all` recorre una tabla con `BaseModel.find_all` por páginas
+(keyset sobre una columna única: `<clave>_gt` + orden + límite), así sólo una
+página vive en memoria a la vez; el bucle de páginas (`recorrer_keyset`) es
+el mismo que usa el feed de actividad. Los generadores escriben fila por
+fila: el CSV (formato por defecto) se envía a medida que se produce; el
+Excel se escribe con openpyxl en modo write-only sobre un archivo temporal
+(el .xlsx es un zip y recién se puede enviar al cerrarlo), por eso se corta
+en `MAX_FILAS_XLSX` filas. `respuesta_exportacion` arma la respuesta con
+`stream_with_context`.
+"""
+import csv
+import io
+import logging
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Response, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+TAMANIO_PAGINA = 1000
+TAMANIO_BLOQUE = 64 * 1024
+FORMATO_POR_DEFECTO = 'csv'
+# El .xlsx se arma entero antes de enviarse: más allá de esto, CSV.
+MAX_FILAS_XLSX = int(os.getenv('EXPORTACION_MAX_FILAS_XLSX', 100_000))
+FORMATOS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+Columnas = Sequence[Tuple[str, str]]
+
+
+def recorrer_keyset(pedir_pagina: Callable, posicion: Callable, tamanio_pagina: int,
+                    filas: Optional[List[Dict]] = None, desde=None) -> Iterator[Dict]:
+    """
+    Bucle de paginación keyset: `pedir_pagina(desde)` devuelve hasta
+    `tamanio_pagina` filas posteriores a `desde` y `posicion(fila)` da el
+    `desde` de la página siguiente. `filas` es una primera página ya pedida.
+    """
+    if filas is None:
+        filas = pedir_pagina(desde)
+    while True:
+        yield from filas
+        if len(filas) < tamanio_pagina:
+            return
+        filas = pedir_pagina(posicion(filas[-1]))
+
+
+def paginar_find_all(model, clave: str, filtros: Optional[Dict] = None, columnas: Optional[List[str]] = None,
+                     tamanio_pagina: int = TAMANIO_PAGINA) -> Iterator[Dict]:
+    """
+    Itera todos los registros de `model.find_all(filtros)` ordenados por
+    `clave`, pidiendo `tamanio_pagina` por vez. La primera página se pide
+    antes de devolver el iterador: si falla, el error se ve antes de empezar
+    a responder.
+    """
+    if columnas and clave not in columnas:
+        columnas = [clave] + list(columnas)
+
+    def pagina(desde):
+        filtros_pagina = dict(filtros or {})
+        if desde is not None:
+            filtros_pagina[f'{clave}_gt'] = desde
+        resultado = model.find_all(filtros_pagina, order_by=clave, limit=tamanio_pagina, select_columns=columnas)
+        if not resultado.get('success'):
+            raise RuntimeError(resultado.get('error') or f"Error leyendo {model.get_table_name()}")
+        return resultado.get('data') or []
+
+    return recorrer_keyset(pagina, lambda fila: fila[clave], tamanio_pagina, filas=pagina(None))
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (list, dict)):
+        return str(valor)
+    return valor
+
+
+def generar_csv(filas: Iterable[Dict], columnas: Columnas, bom: bool = True) -> Iterator[str]:
+    """CSV fila por fila, enviado en bloques de ~64 KB. Con `bom` empieza con BOM para que Excel detecte UTF-8."""
+    buffer = io.StringIO()
+    if bom:
+        buffer.write('\ufeff')
+    escritor = csv.writer(buffer)
+    escritor.writerow([titulo for _, titulo in columnas])
+    for fila in filas:
+        escritor.writerow([_valor_csv(fila.get(campo)) for campo, _ in columnas])
+        if buffer.tell() >= TAMANIO_BLOQUE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _valor_excel(valor):
+    if isinstance(valor, datetime) and valor.tzinfo is not None:
+        return valor.replace(tzinfo=None)  # Excel no admite zona horaria
+    if valor is None or isinstance(valor, (int, float, bool, date, datetime)):
+        return valor
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return str(valor)
+
+
+def generar_xlsx(filas: Iterable[Dict], columnas: Columnas, hoja: str = 'Datos',
+                 max_filas: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Excel escrito con openpyxl en modo write-only (las filas van a disco, no
+    quedan en memoria). Pasadas `max_filas` (por defecto MAX_FILAS_XLSX) deja
+    de leer y cierra la hoja con una fila que avisa del corte.
+    """
+    from openpyxl import Workbook
+
+    max_filas = MAX_FILAS_XLSX if max_filas is None else max_filas
+    libro = Workbook(write_only=True)
+    planilla = libro.create_sheet(hoja)
+    planilla.append([titulo for _, titulo in columnas])
+    for escritas, fila in enumerate(filas):
+        if escritas == max_filas:
+            logger.warning(f"Exportación a Excel cortada en {max_filas} filas.")
+            planilla.append([f'Exportación cortada en {max_filas} filas; use el formato CSV para el listado completo.'])
+            break
+        planilla.append([_valor_excel(fila.get(campo)) for campo, _ in columnas])
+
+    with tempfile.TemporaryFile() as archivo:
+        libro.save(archivo)
+        archivo.seek(0)
+        while True:
+            bloque = archivo.read(TAMANIO_BLOQUE)
+            if not bloque:
+                return
+            yield bloque
+
+
+def respuesta_exportacion(filas: Iterable[Dict], columnas: Columnas, formato: str, nombre: str) -> Response:
+    """Respuesta de descarga que se genera a medida que se envía. `formato` es 'csv' o 'xlsx'."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    generador = generar_csv(filas, columnas) if formato == 'csv' else generar_xlsx(filas, columnas)
+    return Response(stream_with_context(generador), mimetype=FORMATOS[formato], headers={
+        'Content-Disposition': f'attachment; filename={nombre}_{date.today().isoformat()}.{formato}',
+    })
@@ -0,0 +1,262 @@
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+from app.services.procesador_diferido import ProcesadorDiferido
+
+logger = logging.getLogger(__name__)
+
+DECISIONES_RECHAZO = ['RECHAZADO', 'CUARENTENA', 'NO APTO']
+COLUMNAS_OP = 'id, receta_id, estado, fecha_inicio, fecha_fin, cantidad_planificada, cantidad_producida'
+
+
+def _segundos(inicio: Optional[str], fin: Optional[str]) -> float:
+    if not inicio or not fin:
+        return 0.0
+    try:
+        return (datetime.fromisoformat(fin) - datetime.fromisoformat(inicio)).total_seconds()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def calcular_hechos(ops: List[Dict], paros: List[Dict], desperdicios: List[Dict],
+                    rechazos: Dict[int, float], operaciones_por_receta: Dict[int, List[Dict]]) -> List[Dict]:
+    """
+    Arma el hecho de producción de cada OP a partir de sus datos crudos:
+    tiempo de producción (inicio a fin), tiempo de paros cerrados, minutos
+    planificados según las operaciones de la receta, y cantidades producida,
+    desperdiciada y rechazada en calidad.
+    """
+    paro_por_op = defaultdict(float)
+    for paro in paros:
+        paro_por_op[paro['orden_produccion_id']] += _segundos(paro.get('fecha_inicio'), paro.get('fecha_fin'))
+    desperdicio_por_op = defaultdict(float)
+    for registro in desperdicios:
+        desperdicio_por_op[registro['orden_produccion_id']] += float(registro.get('cantidad') or 0)
+
+    ahora = datetime.now().isoformat()
+    hechos = []
+    for op in ops:
+        cantidad = float(op.get('cantidad_planificada') or 0)
+        minutos = 0.0
+        if cantidad > 0:
+            for paso in operaciones_por_receta.get(op.get('receta_id'), []):
+                minutos += float(paso.get('tiempo_preparacion') or 0) + float(paso.get('tiempo_ejecucion_unitario') or 0) * cantidad
+        hechos.append({
+            'orden_produccion_id': op['id'],
+            'receta_id': op.get('receta_id'),
+            'estado': op.get('estado'),
+            'fecha_inicio': op.get('fecha_inicio'),
+            'fecha_fin': op.get('fecha_fin'),
+            'tiempo_produccion_seg': _segundos(op.get('fecha_inicio'), op.get('fecha_fin')),
+            'tiempo_paro_seg': paro_por_op.get(op['id'], 0.0),
+            'minutos_planificados': minutos,
+            'cantidad_producida': float(op.get('cantidad_producida') or 0),
+            'cantidad_desperdicio': desperdicio_por_op.get(op['id'], 0.0),
+            'cantidad_rechazada': float(rechazos.get(op['id'], 0.0)),
+            'actualizado_en': ahora,
+        })
+    return hechos
+
+
+def calcular_oee_desde_hechos(hechos: List[Dict], minutos_bloqueo_linea: float = 0.0) -> Dict:
+    """
+    OEE del período como sumas sobre los hechos (mismas fórmulas que el
+    cálculo a partir de las OPs): disponibilidad = operativo / producción,
+    rendimiento = planificado / operativo y calidad = buenas / producidas.
+    """
+    tiempo_produccion_real = sum(float(h.get('tiempo_produccion_seg') or 0) for h in hechos)
+    tiempo_paradas_total = sum(float(h.get('tiempo_paro_seg') or 0) for h in hechos) + minutos_bloqueo_linea * 60
+    tiempo_operativo = tiempo_produccion_real - tiempo_paradas_total
+    tiempo_produccion_planificado = sum(float(h.get('minutos_planificados') or 0) for h in hechos) * 60
+
+    disponibilidad = tiempo_operativo / tiempo_produccion_real if tiempo_produccion_real > 0 else 0
+    rendimiento = tiempo_produccion_planificado / tiempo_operativo if tiempo_operativo > 0 else 0
+
+    produccion_real = sum(float(h.get('cantidad_producida') or 0) for h in hechos)
+    unidades_malas = sum(float(h.get('cantidad_desperdicio') or 0) + float(h.get('cantidad_rechazada') or 0) for h in hechos)
+    unidades_buenas = max(produccion_real - unidades_malas, 0)
+    calidad = unidades_buenas / produccion_real if produccion_real > 0 else 0
+
+    return {
+        "valor": round(disponibilidad * rendimiento * calidad * 100, 2),
+        "disponibilidad": round(disponibilidad, 2),
+        "rendimiento": round(rendimiento, 2),
+        "calidad": round(calidad, 2)
+    }
+
+
+def tiempo_ciclo_desde_hechos(hechos: List[Dict]) -> tuple:
+    """(promedio_segundos, cantidad_ordenes_validas) de las OPs con inicio y fin."""
+    validos = [float(h['tiempo_produccion_seg']) for h in hechos
+               if h.get('fecha_inicio') and h.get('fecha_fin')]
+    if not validos:
+        return 0, 0
+    return sum(validos) / len(validos), len(validos)
+
+
+class RegistradorHechosProduccion(ProcesadorDiferido):
+    """
+    Mantiene la tabla hechos_produccion_op al día.
+
+    Los puntos del flujo de producción (avance, pausa, reanudación, cambio de
+    estado) llaman a `notificar(op_id)`, que sólo anota la OP. Un hilo de
+    fondo junta las OPs notificadas durante `ventana` segundos y recalcula
+    sus hechos con una consulta por tabla y un único upsert. Con
+    `ventana <= 0` se recalcula en el mismo hilo.
+    """
+
+    nombre_hilo = 'hechos-produccion'
+    mensaje_error = 'Error registrando hechos de producción'
+
+    def __init__(self, ventana: float = 2.0, page_size: int = 200):
+        super().__init__(ventana)
+        self.page_size = page_size
+        self._pendientes = set()
+
+    def notificar(self, orden_id: int):
+        if not orden_id:
+            return
+        with self._senal():
+            self._pendientes.add(int(orden_id))
+
+    def flush(self) -> int:
+        return super().flush()
+
+    def _tomar_pendientes(self) -> List[int]:
+        lote, self._pendientes = sorted(self._pendientes), set()
+        return lote
+
+    def _procesar(self, lote: List[int]) -> int:
+        if not lote:
+            return 0
+        return self._en_contexto_app(self.registrar, lote)
+
+    # --- Cálculo -------------------------------------------------------
+    def registrar(self, op_ids: Iterable[int]) -> int:
+        """Recalcula y guarda los hechos de las OPs indicadas. Devuelve cuántos se guardaron."""
+        from app.models.orden_produccion import OrdenProduccionModel
+        op_ids = list(op_ids)
+        if not op_ids:
+            return 0
+        db = OrdenProduccionModel().db
+        ops = db.table('ordenes_produccion').select(COLUMNAS_OP).in_('id', op_ids).execute().data or []
+        return self._registrar_ops(db, ops)
+
+    def construir(self, op_ids: Iterable[int]) -> List[Dict]:
+        """Calcula los hechos de las OPs indicadas sin guardarlos (OPs que todavía no tienen hecho)."""
+        from app.models.orden_produccion import OrdenProduccionModel
+        op_ids = list(op_ids)
+        if not op_ids:
+            return []
+        db = OrdenProduccionModel().db
+        ops = db.table('ordenes_produccion').select(COLUMNAS_OP).in_('id', op_ids).execute().data or []
+        return self._calcular_ops(db, ops)
+
+    def backfill(self, fecha_inicio: Optional[date] = None, fecha_fin: Optional[date] = None) -> int:
+        """
+        Recalcula los hechos de todas las OPs iniciadas en el rango (o de todas
+        si no se indica), recorriéndolas por páginas de `page_size`.
+        """
+        from app.models.orden_produccion import OrdenProduccionModel
+        db = OrdenProduccionModel().db
+        total, ultimo_id = 0, 0
+        while True:
+            query = db.table('ordenes_produccion').select(COLUMNAS_OP).gt('id', ultimo_id)
+            if fecha_inicio:
+                query = query.gte('fecha_inicio', fecha_inicio.isoformat())
+            if fecha_fin:
+                query = query.lte('fecha_inicio', fecha_fin.isoformat())
+            ops = query.order('id').limit(self.page_size).execute().data or []
+            if not ops:
+                break
+            total += self._registrar_ops(db, ops)
+            ultimo_id = ops[-1]['id']
+            if len(ops) < self.page_size:
+                break
+        logger.info(f"[Hechos producción] Backfill: {total} OPs recalculadas.")
+        return total
+
+    def _registrar_ops(self, db, ops: List[Dict]) -> int:
+        from app.models.hecho_produccion_op import HechoProduccionOPModel
+        if not ops:
+            return 0
+        hechos = self._calcular_ops(db, ops)
+        resultado = HechoProduccionOPModel().guardar_bulk(hechos)
+        if not resultado.get('success'):
+            logger.error(f"[Hechos producción] No se pudieron guardar los hechos de {len(hechos)} OPs: {resultado.get('error')}")
+            return 0
+        return len(hechos)
+
+    def _calcular_ops(self, db, ops: List[Dict]) -> List[Dict]:
+        if not ops:
+            return []
+        op_ids = [op['id'] for op in ops]
+        paros = db.schema('mes_kanban').table('registros_paro') \
+            .select('orden_produccion_id, fecha_inicio, fecha_fin').in_('orden_produccion_id', op_ids).execute().data or []
+        desperdicios = db.schema('mes_kanban').table('registros_desperdicio') \
+            .select('orden_produccion_id, cantidad').in_('orden_produccion_id', op_ids).execute().data or []
+
+        rechazos = defaultdict(float)
+        controles = db.table('control_calidad_productos').select('orden_produccion_id, lote_producto_id') \
+            .in_('orden_produccion_id', op_ids).in_('decision_final', DECISIONES_RECHAZO).execute().data or []
+        lote_a_op = {c['lote_producto_id']: c['orden_produccion_id'] for c in controles if c.get('lote_producto_id')}
+        if lote_a_op:
+            lotes = db.table('lotes_productos').select('id_lote, cantidad_inicial') \
+                .in_('id_lote', list(lote_a_op)).execute().data or []
+            for lote in lotes:
+                rechazos[lote_a_op[lote['id_lote']]] += float(lote.get('cantidad_inicial') or 0)
+
+        operaciones_por_receta = defaultdict(list)
+        receta_ids = list({op['receta_id'] for op in ops if op.get('receta_id')})
+        if receta_ids:
+            operaciones = db.table('operacionesreceta').select('receta_id, tiempo_preparacion, tiempo_ejecucion_unitario') \
+                .in_('receta_id', receta_ids).execute().data or []
+            for paso in operaciones:
+                operaciones_por_receta[paso['receta_id']].append(paso)
+
+        return calcular_hechos(ops, paros, desperdicios, rechazos, operaciones_por_receta)
+
+
+_registrador = None
+_registrador_lock = threading.Lock()
+
+
+def get_registrador_hechos() -> RegistradorHechosProduccion:
+    """Devuelve el registrador del proceso, creándolo en el primer uso."""
+    global _registrador
+    with _registrador_lock:
+        if _registrador is None:
+            _registrador = RegistradorHechosProduccion(
+                ventana=float(os.getenv('HECHOS_PRODUCCION_DEBOUNCE_SECONDS', 2.0)),
+            )
+            atexit.register(_registrador.stop, 3.0)
+        return _registrador
+
+
+def notificar_hecho_op(orden_id: int):
+    """Marca la OP para recalcular su hecho de producción. Nunca interrumpe el flujo que la llama."""
+    try:
+        get_registrador_hechos().notificar(orden_id)
+    except Exception as e:
+        logger.error(f"No se pudo notificar el hecho de producción de la OP {orden_id}: {e}")
+
+
+def init_hechos_produccion_cli(app):
+    """Registra `flask backfill-hechos-produccion [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]`."""
+    import click
+
+    @app.cli.command('backfill-hechos-produccion')
+    @click.option('--desde', default=None, help='Fecha de inicio (AAAA-MM-DD) de las OPs a recalcular.')
+    @click.option('--hasta', default=None, help='Fecha de fin (AAAA-MM-DD) de las OPs a recalcular.')
+    def backfill_hechos_produccion(desde, hasta):
+        registrador = RegistradorHechosProduccion(ventana=0)
+        total = registrador.backfill(
+            date.fromisoformat(desde) if desde else None,
+            date.fromisoformat(hasta) if hasta else None,
+        )
+        click.echo(f"Hechos de producción recalculados: {total} OPs.")
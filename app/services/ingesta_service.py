@@ -0,0 +1,249 @@
+"""
+Cola de ingesta durable para webhooks entrantes.
+
+El endpoint guarda el payload crudo en un archivo SQLite local con una clave
+de idempotencia (el header Idempotency-Key o el SHA-256 del payload
+canónico) y responde enseguida; un mismo envío reintentado por el proveedor
+cae sobre la misma fila y no se vuelve a procesar. Las claves vencen a las
+`retencion` horas de procesadas: pasado ese plazo, el mismo payload es un
+envío nuevo (p. ej. el mismo pedido al otro día) y `purgar` borra las filas
+viejas. Un grupo acotado de hilos
+toma las entradas pendientes (la toma, el lease y el backoff son los de
+`ColaSQLite`), las procesa con el procesador de su fuente y reintenta los
+errores transitorios. Las que
+agotan los intentos o fallan con `ErrorPermanente` pasan a la tabla
+`dead_letter`, desde donde se pueden reencolar (`flask ingesta-reintentar`).
+"""
+import atexit
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.cola_sqlite import ColaSQLite
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = 'PENDIENTE'
+PROCESANDO = 'PROCESANDO'
+PROCESADO = 'PROCESADO'
+DEAD_LETTER = 'DEAD_LETTER'
+
+
+class ErrorPermanente(Exception):
+    """El payload nunca se va a poder procesar (datos inválidos): va directo a dead-letter."""
+
+
+def clave_idempotencia(fuente: str, payload, clave_externa: Optional[str] = None) -> str:
+    """Clave de la entrada: la que mande el proveedor o el hash del payload con claves ordenadas."""
+    if clave_externa:
+        base = f"{fuente}:key:{clave_externa}"
+    else:
+        base = f"{fuente}:{json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)}"
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()
+
+
+class ColaIngesta(ColaSQLite):
+    """
+    Cola persistente con workers propios. `encolar` sólo hace un INSERT OR
+    IGNORE; el procesamiento ocurre en los hilos (o con `procesar_pendientes`
+    de forma sincrónica, para la CLI y los tests). Una entrada tomada por un
+    proceso que murió se vuelve a tomar cuando vence su `lease`.
+    """
+
+    nombre = 'ingesta'
+    tabla = 'ingesta'
+    columna_id = 'clave'
+    columnas_trabajo = ('clave', 'fuente', 'payload', 'intentos')
+    en_curso = PROCESANDO
+
+    def __init__(self, path: str, app=None, max_workers: int = 2, max_intentos: int = 5,
+                 espera_base: float = 2.0, espera_max: float = 300.0, lease: float = 300.0,
+                 intervalo: float = 1.0, retencion: float = 24.0):
+        self.app = app
+        self.retencion = retencion
+        self._procesadores: Dict[str, Callable] = {}
+        super().__init__(path, max_workers=max_workers, max_intentos=max_intentos, espera_base=espera_base,
+                         espera_max=espera_max, lease=lease, intervalo=intervalo)
+
+    def _crear_tablas(self, conn):
+        conn.execute("""CREATE TABLE IF NOT EXISTS ingesta (
+            clave TEXT PRIMARY KEY, fuente TEXT NOT NULL, payload TEXT NOT NULL,
+            estado TEXT NOT NULL, intentos INTEGER NOT NULL DEFAULT 0, proximo_intento REAL NOT NULL,
+            tomado_en REAL, ultimo_error TEXT, resultado TEXT, creado_en REAL NOT NULL, actualizado_en REAL NOT NULL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_ingesta_pendientes ON ingesta (estado, proximo_intento)")
+        conn.execute("""CREATE TABLE IF NOT EXISTS dead_letter (
+            clave TEXT PRIMARY KEY, fuente TEXT NOT NULL, payload TEXT NOT NULL,
+            intentos INTEGER NOT NULL, ultimo_error TEXT, fecha REAL NOT NULL)""")
+
+    def registrar_procesador(self, fuente: str, procesador: Callable[[Dict], object]):
+        """`procesador(payload)` devuelve un resultado serializable o lanza (ErrorPermanente si no tiene arreglo)."""
+        self._procesadores[fuente] = procesador
+
+    # region Ingreso
+    def encolar(self, fuente: str, payload: Dict, clave_externa: Optional[str] = None) -> Tuple[str, bool]:
+        """
+        Guarda el payload y devuelve (clave, nueva). Si la clave ya existía y
+        no venció no hace nada más.
+        """
+        clave = clave_idempotencia(fuente, payload, clave_externa)
+        ahora = time.time()
+        with self._transaccion() as conn:
+            conn.execute("DELETE FROM ingesta WHERE clave = ? AND estado = ? AND actualizado_en < ?",
+                         (clave, PROCESADO, ahora - self.retencion * 3600))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO ingesta (clave, fuente, payload, estado, proximo_intento, creado_en, actualizado_en) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (clave, fuente, json.dumps(payload, default=str), PENDIENTE, ahora, ahora, ahora))
+            nueva = cursor.rowcount == 1
+        if nueva:
+            self._hay_trabajo.set()
+        return clave, nueva
+
+    def estado(self, clave: str) -> Optional[Dict]:
+        fila = self._conexion().execute(
+            "SELECT clave, fuente, estado, intentos, ultimo_error, resultado, creado_en, actualizado_en "
+            "FROM ingesta WHERE clave = ?", (clave,)).fetchone()
+        if fila is None:
+            return None
+        columnas = ('clave', 'fuente', 'estado', 'intentos', 'ultimo_error', 'resultado', 'creado_en', 'actualizado_en')
+        entrada = dict(zip(columnas, fila))
+        entrada['resultado'] = json.loads(entrada['resultado']) if entrada['resultado'] else None
+        return entrada
+    # endregion
+
+    # region Procesamiento
+    def _procesar(self, clave: str, fuente: str, payload: str, intentos: int, token: str):
+        procesador = self._procesadores.get(fuente)
+        intentos += 1
+        try:
+            if procesador is None:
+                raise RuntimeError(f"No hay procesador registrado para la fuente '{fuente}'.")
+            with self.app.app_context() if self.app is not None else contextlib.nullcontext():
+                resultado = procesador(json.loads(payload))
+        except Exception as e:
+            permanente = isinstance(e, ErrorPermanente)
+            self._registrar_fallo(clave, fuente, payload, intentos, token, str(e) or type(e).__name__, permanente)
+            return
+        with self._transaccion() as conn:
+            self._cerrar_tomada(conn, clave, token, {
+                'estado': PROCESADO, 'intentos': intentos, 'resultado': json.dumps(resultado, default=str),
+                'ultimo_error': None, 'actualizado_en': time.time()})
+
+    def _registrar_fallo(self, clave, fuente, payload, intentos, token, error, permanente):
+        ahora = time.time()
+        with self._transaccion() as conn:
+            if permanente or intentos >= self.max_intentos:
+                if self._cerrar_tomada(conn, clave, token, {
+                        'estado': DEAD_LETTER, 'intentos': intentos, 'ultimo_error': error, 'actualizado_en': ahora}):
+                    conn.execute("INSERT OR REPLACE INTO dead_letter (clave, fuente, payload, intentos, ultimo_error, fecha) "
+                                 "VALUES (?, ?, ?, ?, ?, ?)", (clave, fuente, payload, intentos, error, ahora))
+                    logger.error(f"[Ingesta] {fuente} {clave[:12]} a dead-letter tras {intentos} intento(s): {error}")
+                return
+            espera = self._espera(intentos)
+            if not self._cerrar_tomada(conn, clave, token, {
+                    'estado': PENDIENTE, 'intentos': intentos, 'ultimo_error': error,
+                    'proximo_intento': ahora + espera, 'actualizado_en': ahora}):
+                return
+        logger.warning(f"[Ingesta] {fuente} {clave[:12]} falló (intento {intentos}), reintento en {espera:.0f} s: {error}")
+
+    # endregion
+
+    # region Dead-letter y replay
+    def purgar(self) -> int:
+        """Borra las entradas procesadas hace más de `retencion` horas. Devuelve cuántas borró."""
+        cursor = self._conexion().execute("DELETE FROM ingesta WHERE estado = ? AND actualizado_en < ?",
+                                          (PROCESADO, time.time() - self.retencion * 3600))
+        return cursor.rowcount
+
+    def dead_letters(self, fuente: Optional[str] = None) -> List[Dict]:
+        sql = "SELECT clave, fuente, payload, intentos, ultimo_error, fecha FROM dead_letter"
+        filas = self._conexion().execute(sql + (" WHERE fuente = ?" if fuente else "") + " ORDER BY fecha",
+                                         (fuente,) if fuente else ()).fetchall()
+        return [{'clave': c, 'fuente': f, 'payload': json.loads(p), 'intentos': i, 'ultimo_error': e, 'fecha': d}
+                for c, f, p, i, e, d in filas]
+
+    def reencolar(self, claves: Optional[List[str]] = None, fuente: Optional[str] = None,
+                  incluir_procesados: bool = False) -> int:
+        """
+        Vuelve a poner en PENDIENTE (con los intentos en cero) las entradas en
+        dead-letter indicadas, o todas las de la fuente. Con `incluir_procesados`
+        también las ya procesadas de esas claves (replay explícito).
+        """
+        estados = [DEAD_LETTER, PROCESADO] if incluir_procesados else [DEAD_LETTER]
+        condiciones = [f"estado IN ({', '.join('?' * len(estados))})"]
+        parametros: list = list(estados)
+        if claves:
+            condiciones.append(f"clave IN ({', '.join('?' * len(claves))})")
+            parametros += claves
+        if fuente:
+            condiciones.append("fuente = ?")
+            parametros.append(fuente)
+        ahora = time.time()
+        with self._transaccion() as conn:
+            seleccion = [c for (c,) in conn.execute(
+                f"SELECT clave FROM ingesta WHERE {' AND '.join(condiciones)}", parametros).fetchall()]
+            for clave in seleccion:
+                conn.execute("UPDATE ingesta SET estado = ?, intentos = 0, proximo_intento = ?, tomado_en = NULL, "
+                             "actualizado_en = ? WHERE clave = ?", (PENDIENTE, ahora, ahora, clave))
+                conn.execute("DELETE FROM dead_letter WHERE clave = ?", (clave,))
+        if seleccion:
+            self._hay_trabajo.set()
+            logger.info(f"[Ingesta] {len(seleccion)} entrada(s) reencoladas.")
+        return len(seleccion)
+    # endregion
+
+
+_cola = None
+_cola_lock = threading.Lock()
+
+
+def get_cola_ingesta(app=None) -> ColaIngesta:
+    """
+    Cola del proceso. El archivo se toma de INGESTA_DB_PATH (por defecto
+    `ingesta_webhooks.sqlite3` en el directorio de trabajo); los workers
+    comparten la cola si apuntan al mismo archivo.
+    """
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaIngesta(
+                os.getenv('INGESTA_DB_PATH', os.path.join(os.getcwd(), 'ingesta_webhooks.sqlite3')),
+                app=app,
+                max_workers=int(os.getenv('INGESTA_WORKERS', 2)),
+                max_intentos=int(os.getenv('INGESTA_MAX_INTENTOS', 5)),
+                retencion=float(os.getenv('INGESTA_RETENCION_HORAS', 24)),
+            )
+            atexit.register(_cola.detener, 1.0)
+        elif _cola.app is None and app is not None:
+            _cola.app = app
+        return _cola
+
+
+def init_ingesta_cli(app):
+    """Registra `flask ingesta-estado` y `flask ingesta-reintentar` para revisar y reprocesar la cola."""
+    import click
+
+    @app.cli.command('ingesta-estado')
+    def ingesta_estado():
+        cola = get_cola_ingesta(app)
+        click.echo(f"Entradas por estado: {cola.resumen()}")
+        for entrada in cola.dead_letters():
+            click.echo(f"  {entrada['clave']} {entrada['fuente']} ({entrada['intentos']} intentos): {entrada['ultimo_error']}")
+
+    @app.cli.command('ingesta-reintentar')
+    @click.option('--clave', 'claves', multiple=True, help='Clave a reencolar (se puede repetir).')
+    @click.option('--fuente', default=None, help='Reencolar sólo las entradas de esta fuente.')
+    @click.option('--incluir-procesados', is_flag=True, help='También reprocesar entradas ya procesadas.')
+    def ingesta_reintentar(claves, fuente, incluir_procesados):
+        from app.views.google_forms_routes import registrar_procesadores_google_forms
+
+        cola = get_cola_ingesta(app)
+        registrar_procesadores_google_forms(cola)
+        reencoladas = cola.reencolar(list(claves) or None, fuente=fuente, incluir_procesados=incluir_procesados)
+        procesadas = cola.procesar_pendientes()
+        click.echo(f"Reencoladas {reencoladas}; procesadas ahora {procesadas}. Estado: {cola.resumen()}")
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Campos de la tarjeta que dependen sólo del reloj: cambian en cada poll y el
+# cliente los puede recalcular, así que no forman parte de la versión.
+CAMPOS_VOLATILES = {'tiempo_transcurrido', 'tiempo_hasta_meta_horas', 'ritmo_actual', 'oee_actual', 'turno'}
+METRICAS_VOLATILES = {'oee_promedio'}
+
+
+def _hash(contenido) -> str:
+    texto = json.dumps(contenido, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()[:16]
+
+
+def _etiqueta(version: str, metricas: Dict) -> str:
+    """ETag del tablero: la versión de las tarjetas más un hash corto de las métricas de reloj."""
+    return f"{version}.{_hash({k: metricas.get(k) for k in sorted(METRICAS_VOLATILES)})[:8]}"
+
+
+def version_tarjeta(orden: Dict, columna: str) -> str:
+    """Hash del contenido de una tarjeta del Kanban (columna incluida, sin los campos de reloj)."""
+    return _hash([columna, {k: v for k, v in orden.items() if k not in CAMPOS_VOLATILES}])
+
+
+class TableroKanbanVersionado:
+    """
+    Versionado del tablero Kanban para refrescos incrementales.
+
+    Cada tarjeta (OP) tiene un hash de su contenido y el tablero una versión
+    (ETag) que resume los hashes, las columnas y las métricas estables. Por
+    cada tablero (rol / operario) se guarda el estado vigente y el historial
+    de las últimas `historial` versiones, de modo que un cliente que envía la
+    versión que tiene recibe sólo las tarjetas nuevas o cambiadas y los ids
+    eliminados. El estado vigente se reutiliza sin consultar la base mientras
+    no cambie la versión del plan ni llegue un evento de OP (`invalidar`);
+    `max_edad` sólo acota lo que no pasa por ninguno de los dos y debe ser
+    mayor que el intervalo de polling del cliente.
+
+    La etiqueta que se entrega al cliente suma a la versión un hash de las
+    métricas de reloj (OEE promedio): si sólo cambiaron ésas, el delta viene
+    sin tarjetas y con las métricas nuevas en lugar de un 304.
+    """
+
+    def __init__(self, max_edad: float = 300.0, historial: int = 20):
+        self.max_edad = max_edad
+        self.historial = historial
+        self._estados: Dict[Hashable, Dict] = {}
+        self._historiales: Dict[Hashable, OrderedDict] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, clave: Hashable, contexto: Dict) -> str:
+        """Registra un tablero recién construido y devuelve su etiqueta."""
+        tarjetas = {}
+        for columna, ordenes in (contexto.get('ordenes_por_estado') or {}).items():
+            for orden in ordenes:
+                tarjetas[orden['id']] = {'hash': version_tarjeta(orden, columna), 'columna': columna, 'orden': orden}
+        metricas = contexto.get('metricas_dia') or {}
+        version = _hash([
+            sorted((op_id, t['hash']) for op_id, t in tarjetas.items()),
+            contexto.get('columnas'),
+            {k: v for k, v in metricas.items() if k not in METRICAS_VOLATILES},
+        ])
+        estado = {
+            'version': version,
+            'version_plan': self._version_plan(),
+            'creado': time.monotonic(),
+            'tarjetas': tarjetas,
+            'metricas_dia': metricas,
+            'columnas': contexto.get('columnas'),
+            'usuario_rol': contexto.get('usuario_rol'),
+        }
+        with self._lock:
+            self._estados[clave] = estado
+            historial = self._historiales.setdefault(clave, OrderedDict())
+            historial[version] = {op_id: t['hash'] for op_id, t in tarjetas.items()}
+            historial.move_to_end(version)
+            while len(historial) > self.historial:
+                historial.popitem(last=False)
+        return _etiqueta(version, metricas)
+
+    def invalidar(self, *_):
+        """Descarta los tableros vigentes (el historial se conserva para los deltas)."""
+        with self._lock:
+            self._estados.clear()
+
+    def vigente(self, clave: Hashable) -> Optional[Dict]:
+        estado = self._estados.get(clave)
+        if estado is None:
+            return None
+        if estado['version_plan'] != self._version_plan() or time.monotonic() - estado['creado'] > self.max_edad:
+            return None
+        return estado
+
+    def delta(self, clave: Hashable, desde: Optional[str], metricas_reloj: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Cambios del tablero `clave` respecto de la etiqueta `desde`. Devuelve
+        None si no hay un estado registrado. `metricas_reloj` reemplaza las
+        métricas de reloj guardadas por las recién calculadas. Si `desde` es
+        la etiqueta actual, 'sin_cambios' es True; si es desconocida, se
+        envía el tablero completo.
+        """
+        estado = self._estados.get(clave)
+        if estado is None:
+            return None
+        metricas = {**estado['metricas_dia'], **(metricas_reloj or {})}
+        etiqueta = _etiqueta(estado['version'], metricas)
+        respuesta = {
+            'version': etiqueta,
+            'metricas_dia': metricas,
+            'sin_cambios': desde == etiqueta,
+            'completo': False,
+            'cambiadas': [],
+            'eliminadas': [],
+        }
+        if respuesta['sin_cambios']:
+            return respuesta
+
+        desde = desde.split('.')[0] if desde else None
+        anteriores = self._historiales.get(clave, {}).get(desde) if desde else None
+        if anteriores is None:
+            respuesta['completo'] = True
+            respuesta['columnas'] = estado['columnas']
+            anteriores = {}
+        for op_id, tarjeta in estado['tarjetas'].items():
+            if anteriores.get(op_id) != tarjeta['hash']:
+                respuesta['cambiadas'].append({'columna': tarjeta['columna'], 'version': tarjeta['hash'], 'orden': tarjeta['orden']})
+        respuesta['eliminadas'] = [op_id for op_id in anteriores if op_id not in estado['tarjetas']]
+        return respuesta
+
+    @staticmethod
+    def _version_plan() -> int:
+        from app.services.planificacion_snapshot_service import get_snapshot_planificacion
+        return get_snapshot_planificacion().version
+
+
+_tablero = None
+_tablero_lock = threading.Lock()
+
+
+def get_tablero_kanban() -> TableroKanbanVersionado:
+    """Devuelve el versionado del tablero del proceso, creándolo en el primer uso."""
+    global _tablero
+    with _tablero_lock:
+        if _tablero is None:
+            _tablero = TableroKanbanVersionado(max_edad=float(os.getenv('KANBAN_CACHE_SECONDS', 300)))
+            # Cada evento de OP (de este worker o, con relay, de otro) vuelve a armar los tableros.
+            from app.services.eventos_produccion_service import get_bus_eventos
+            get_bus_eventos().agregar_oyente(_tablero.invalidar)
+        return _tablero
+
+
+def clave_tablero(usuario_id, usuario_rol: str) -> tuple:
+    """Los operarios ven sólo sus OPs; el resto de los roles comparte el tablero de su rol."""
+    return (usuario_rol, usuario_id if usuario_rol == 'OPERARIO' else None)
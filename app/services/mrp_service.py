@@ -0,0 +1,438 @@
+"""
+Motor MRP de netting por períodos (time-phased).
+
+Explota las recetas de todas las OPs pendientes y planificadas en
+requerimientos brutos por insumo y por día, y los netea contra:
+
+- los lotes en mano (con su vencimiento: un lote deja de servir el día que
+  vence y lo que no se consumió antes se pierde, consumiendo FEFO),
+- las reservas ya hechas (las reservas descuentan `cantidad_actual` del lote
+  al hacerse, así que lo reservado por una OP se resta de su requerimiento),
+- las OCs en tránsito, por fecha estimada de entrega.
+
+El resultado es una matriz insumos × días con el saldo proyectado, la fecha
+del primer faltante por insumo y la cobertura de cada OP en orden de fecha
+(las OPs anteriores consumen primero). Todo el cálculo está vectorizado con
+NumPy/pandas sobre el horizonte completo; el único bucle es sobre el rango
+del lote dentro de su insumo (pocas iteraciones), no sobre insumos ni días.
+
+Planificación, Kanban y la reposición automática consultan `get_motor_mrp()`,
+que cachea el último resultado unos segundos.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from app.services.stock_ledger_service import ESTADOS_UTILIZABLES
+from app.utils.lazy_import import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# OPs cuya demanda de insumos todavía no se consumió del stock.
+ESTADOS_OP_DEMANDA = ['PENDIENTE', 'APROBADA', 'EN ESPERA', 'EN_ESPERA',
+                      'LISTA PARA PRODUCIR', 'LISTA_PARA_PRODUCIR']
+# OCs cuya mercadería todavía no ingresó como lote.
+ESTADOS_OC_EN_TRANSITO = ['PENDIENTE', 'APROBADA', 'EN_TRANSITO', 'EN_RECEPCION', 'EN ESPERA DE INSUMO']
+TIEMPO_ENTREGA_DEFAULT_DIAS = 7
+TOLERANCIA = 1e-6
+
+
+def _a_fecha(valor) -> Optional[date]:
+    if not valor:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(str(valor).split('T')[0].split(' ')[0])
+    except ValueError:
+        return None
+
+
+def fecha_necesidad_op(op: Dict, hoy: date) -> date:
+    """Día en que la OP necesita sus insumos: inicio planificado, si no la meta, si no hoy."""
+    return (_a_fecha(op.get('fecha_inicio_planificada')) or _a_fecha(op.get('fecha_meta')) or hoy)
+
+
+class ResultadoMRP:
+    """Proyección calculada por `calcular_mrp`. Sólo lectura."""
+
+    def __init__(self, hoy: date, horizonte_dias: int, insumos: List[str], bruto: np.ndarray,
+                 recepciones: np.ndarray, vencimientos: np.ndarray, en_mano: np.ndarray,
+                 requerimientos: pd.DataFrame, ingredientes: Dict[int, Dict[str, float]]):
+        self.hoy = hoy
+        self.horizonte_dias = horizonte_dias
+        self.fechas = [hoy + timedelta(days=d) for d in range(horizonte_dias)]
+        self.insumos = insumos
+        self.indice = {insumo: i for i, insumo in enumerate(insumos)}
+        self.bruto = bruto
+        self.recepciones = recepciones
+        self.vencimientos = vencimientos
+        self.en_mano = en_mano
+        self.ingredientes = ingredientes
+        self.calculado_en = datetime.now()
+
+        # Oferta acumulada disponible cada día (sin descontar demanda) y saldo proyectado.
+        self.oferta = en_mano[:, None] + np.cumsum(recepciones, axis=1) - np.cumsum(vencimientos, axis=1)
+        self.saldo = self.oferta - np.cumsum(bruto, axis=1)
+        negativos = self.saldo < -TOLERANCIA
+        self._tiene_faltante = negativos.any(axis=1)
+        self._primer_faltante = np.where(self._tiene_faltante, negativos.argmax(axis=1), -1)
+        # Mínimo del saldo desde cada día hasta el final: lo que se puede tomar ese día sin
+        # dejar descubierta a ninguna OP posterior.
+        self._minimo_futuro = np.minimum.accumulate(self.saldo[:, ::-1], axis=1)[:, ::-1]
+
+        self._faltantes_por_op = self._asignar_por_op(requerimientos)
+
+    def _asignar_por_op(self, req: pd.DataFrame) -> Dict:
+        """Faltante de cada OP por insumo, consumiendo en orden de fecha (y de id dentro del día)."""
+        if req.empty:
+            return {}
+        req = req.sort_values(['idx', 'periodo', 'orden', 'op_id'], kind='mergesort')
+        acumulado = req.groupby('idx', sort=False)['neto'].cumsum().to_numpy()
+        oferta = self.oferta[req['idx'].to_numpy(), req['periodo'].to_numpy()]
+        faltante = np.clip(acumulado - oferta, 0, req['neto'].to_numpy())
+        req = req.assign(faltante=faltante)
+        con_faltante = req[req['faltante'] > TOLERANCIA]
+        resultado = {op_id: {} for op_id in req['op_id'].unique().tolist()}
+        for op_id, id_insumo, cant, periodo in zip(con_faltante['op_id'], con_faltante['id_insumo'],
+                                                    con_faltante['faltante'], con_faltante['periodo']):
+            resultado[op_id][id_insumo] = {'cantidad_faltante': float(cant), 'fecha': self.fechas[int(periodo)]}
+        return resultado
+
+    # --- Consultas -----------------------------------------------------
+    def periodo(self, fecha) -> int:
+        fecha = _a_fecha(fecha) or self.hoy
+        return int(min(max((fecha - self.hoy).days, 0), self.horizonte_dias - 1))
+
+    def saldo_proyectado(self, id_insumo: str, fecha=None) -> Optional[float]:
+        i = self.indice.get(id_insumo)
+        if i is None:
+            return None
+        return float(self.saldo[i, self.periodo(fecha)])
+
+    def faltantes(self, hasta_fecha=None) -> List[Dict]:
+        """Insumos con saldo proyectado negativo: fecha del primer faltante y déficit máximo."""
+        limite = self.periodo(hasta_fecha) if hasta_fecha else self.horizonte_dias - 1
+        filas = []
+        for i in np.flatnonzero(self._tiene_faltante & (self._primer_faltante <= limite)):
+            filas.append({
+                'id_insumo': self.insumos[i],
+                'fecha_faltante': self.fechas[int(self._primer_faltante[i])].isoformat(),
+                'cantidad_faltante': float(-self.saldo[i, :limite + 1].min()),
+                'saldo_final': float(self.saldo[i, -1]),
+            })
+        return sorted(filas, key=lambda f: (f['fecha_faltante'], f['id_insumo']))
+
+    def faltantes_por_insumo(self, hasta_fecha=None) -> Dict[str, float]:
+        return {f['id_insumo']: f['cantidad_faltante'] for f in self.faltantes(hasta_fecha)}
+
+    def incluye_op(self, op_id) -> bool:
+        return op_id in self._faltantes_por_op
+
+    def cobertura_op(self, op: Dict) -> Optional[Dict]:
+        """
+        Cobertura de materiales de una OP: {'stock_ok', 'insumos_faltantes'}.
+
+        - OP incluida en el plan (por 'id', o un grupo con 'ordenes_ids'): su
+          faltante según el orden de consumo del plan.
+        - OP simulada (no planificada): lo que puede tomar sin dejar sin stock
+          a las OPs ya planificadas. Devuelve None si no se conocen sus
+          ingredientes (la receta no está en el plan).
+        """
+        ids = op.get('ordenes_ids') or ([op['id']] if op.get('id') is not None else [])
+        if ids and all(self.incluye_op(op_id) for op_id in ids):
+            agregados = {}
+            for op_id in ids:
+                for id_insumo, dato in self._faltantes_por_op[op_id].items():
+                    previo = agregados.get(id_insumo)
+                    agregados[id_insumo] = {
+                        'cantidad_faltante': dato['cantidad_faltante'] + (previo['cantidad_faltante'] if previo else 0),
+                        'fecha': min(dato['fecha'], previo['fecha']) if previo else dato['fecha'],
+                    }
+            return self._formatear_cobertura(agregados)
+
+        ingredientes = self.ingredientes.get(op.get('receta_id'))
+        if ingredientes is None:
+            return None
+        cantidad = float(op.get('cantidad_planificada') or 0)
+        periodo = self.periodo(fecha_necesidad_op(op, self.hoy))
+        faltantes = {}
+        for id_insumo, por_unidad in ingredientes.items():
+            necesario = por_unidad * cantidad
+            i = self.indice.get(id_insumo)
+            tomable = max(0.0, float(self._minimo_futuro[i, periodo])) if i is not None else 0.0
+            if necesario - tomable > TOLERANCIA:
+                faltantes[id_insumo] = {'cantidad_faltante': necesario - tomable, 'fecha': self.fechas[periodo]}
+        return self._formatear_cobertura(faltantes)
+
+    @staticmethod
+    def _formatear_cobertura(faltantes: Dict) -> Dict:
+        return {
+            'stock_ok': not faltantes,
+            'insumos_faltantes': [
+                {'insumo_id': id_insumo, 'cantidad_faltante': round(d['cantidad_faltante'], 6),
+                 'fecha_faltante': d['fecha'].isoformat()}
+                for id_insumo, d in faltantes.items()
+            ],
+        }
+
+    def to_dict(self, id_insumo: Optional[str] = None) -> Dict:
+        insumos = [id_insumo] if id_insumo else self.insumos
+        proyeccion = {}
+        for insumo in insumos:
+            i = self.indice.get(insumo)
+            if i is None:
+                continue
+            proyeccion[insumo] = {
+                'en_mano': float(self.en_mano[i]),
+                'requerimiento_bruto': self.bruto[i].round(6).tolist(),
+                'recepciones': self.recepciones[i].round(6).tolist(),
+                'vencimientos': self.vencimientos[i].round(6).tolist(),
+                'saldo_proyectado': self.saldo[i].round(6).tolist(),
+            }
+        return {
+            'hoy': self.hoy.isoformat(),
+            'fechas': [f.isoformat() for f in self.fechas],
+            'insumos': proyeccion,
+            'faltantes': self.faltantes(),
+            'calculado_en': self.calculado_en.isoformat(),
+        }
+
+
+def calcular_mrp(ops: List[Dict], ingredientes: List[Dict], lotes: List[Dict], reservas: List[Dict],
+                 items_en_transito: List[Dict], hoy: Optional[date] = None, horizonte_dias: int = 60,
+                 tiempos_entrega: Optional[Dict[str, int]] = None) -> ResultadoMRP:
+    """
+    Cálculo puro (sin base de datos) de la proyección.
+
+    - ops: {'id', 'receta_id', 'cantidad_planificada', 'fecha_inicio_planificada'/'fecha_meta'}
+    - ingredientes: {'receta_id', 'id_insumo', 'cantidad'} (por unidad producida)
+    - lotes: {'id_insumo', 'cantidad_actual', 'estado', 'f_vencimiento'}
+    - reservas: {'orden_produccion_id', 'insumo_id', 'cantidad_reservada'} (sólo las vigentes)
+    - items_en_transito: {'insumo_id', 'cantidad_solicitada', 'cantidad_recibida',
+      'fecha_estimada_entrega', 'fecha_emision'}
+    """
+    hoy = hoy or date.today()
+    H = max(1, int(horizonte_dias))
+    tiempos_entrega = tiempos_entrega or {}
+
+    # --- Requerimientos brutos por OP e insumo --------------------------
+    ops_df = pd.DataFrame([{
+        'op_id': op['id'], 'receta_id': op.get('receta_id'),
+        'cantidad_op': float(op.get('cantidad_planificada') or 0),
+        'fecha': fecha_necesidad_op(op, hoy),
+    } for op in ops if op.get('id') is not None and op.get('receta_id')],
+        columns=['op_id', 'receta_id', 'cantidad_op', 'fecha'])
+    ing_df = pd.DataFrame([{
+        'receta_id': ing.get('receta_id'), 'id_insumo': str(ing.get('id_insumo')),
+        'por_unidad': float(ing.get('cantidad') or 0),
+    } for ing in ingredientes if ing.get('id_insumo')], columns=['receta_id', 'id_insumo', 'por_unidad'])
+    ing_df = ing_df.groupby(['receta_id', 'id_insumo'], as_index=False)['por_unidad'].sum()
+
+    req = ops_df.merge(ing_df, on='receta_id', how='inner')
+    req['bruto'] = req['cantidad_op'] * req['por_unidad']
+
+    res_df = pd.DataFrame([{
+        'op_id': r.get('orden_produccion_id'), 'id_insumo': str(r.get('insumo_id')),
+        'reservado': float(r.get('cantidad_reservada') or 0),
+    } for r in reservas], columns=['op_id', 'id_insumo', 'reservado'])
+    res_df = res_df.groupby(['op_id', 'id_insumo'], as_index=False)['reservado'].sum()
+    req = req.merge(res_df, on=['op_id', 'id_insumo'], how='left')
+    req['neto'] = (req['bruto'] - req['reservado'].astype(float).fillna(0.0)).clip(lower=0)
+
+    # --- Oferta: lotes y OCs en tránsito ---------------------------------
+    lotes_df = pd.DataFrame([{
+        'id_insumo': str(l.get('id_insumo')), 'cantidad': float(l.get('cantidad_actual') or 0),
+        'vence': _a_fecha(l.get('f_vencimiento')),
+    } for l in lotes if str(l.get('estado') or '').lower() in ESTADOS_UTILIZABLES],
+        columns=['id_insumo', 'cantidad', 'vence'])
+    lotes_df = lotes_df[lotes_df['cantidad'] > 0]
+
+    transito_df = pd.DataFrame([{
+        'id_insumo': str(it.get('insumo_id')),
+        'cantidad': max(0.0, float(it.get('cantidad_solicitada') or 0) - float(it.get('cantidad_recibida') or 0)),
+        'fecha': _a_fecha(it.get('fecha_estimada_entrega')) or (
+            (_a_fecha(it.get('fecha_emision')) or hoy)
+            + timedelta(days=int(tiempos_entrega.get(str(it.get('insumo_id'))) or TIEMPO_ENTREGA_DEFAULT_DIAS))),
+    } for it in items_en_transito], columns=['id_insumo', 'cantidad', 'fecha'])
+
+    insumos = sorted(set(req['id_insumo']) | set(lotes_df['id_insumo']) | set(transito_df['id_insumo']))
+    indice = {insumo: i for i, insumo in enumerate(insumos)}
+    n = len(insumos)
+
+    def periodos(fechas: pd.Series) -> np.ndarray:
+        dias = np.array([(f - hoy).days for f in fechas], dtype=np.int64)
+        return np.clip(dias, 0, H - 1)
+
+    bruto = np.zeros((n, H))
+    req['idx'] = req['id_insumo'].map(indice).astype(np.int64)
+    req['periodo'] = periodos(req['fecha'])
+    req['orden'] = req['fecha'].map(lambda f: f.toordinal())
+    np.add.at(bruto, (req['idx'].to_numpy(), req['periodo'].to_numpy()), req['neto'].to_numpy())
+
+    recepciones = np.zeros((n, H))
+    if not transito_df.empty:
+        np.add.at(recepciones, (transito_df['id_insumo'].map(indice).to_numpy(dtype=np.int64), periodos(transito_df['fecha'])),
+                  transito_df['cantidad'].to_numpy())
+
+    # --- Vencimientos con consumo FEFO -----------------------------------
+    # Período en que el lote deja de servir (H = no vence dentro del horizonte).
+    vence_en = np.array([H if v is None else min(max((v - hoy).days, 0), H) for v in lotes_df['vence']], dtype=np.int64)
+    lotes_df = lotes_df.assign(idx=lotes_df['id_insumo'].map(indice).to_numpy(dtype=np.int64), vence_en=vence_en)
+    lotes_df = lotes_df[lotes_df['vence_en'] > 0]  # vencidos hoy o antes: no cuentan
+    en_mano = np.zeros(n)
+    np.add.at(en_mano, lotes_df['idx'].to_numpy(), lotes_df['cantidad'].to_numpy())
+
+    vencimientos = np.zeros((n, H))
+    if not lotes_df.empty:
+        lotes_df = lotes_df.sort_values(['idx', 'vence_en'], kind='mergesort')
+        lotes_df['rango'] = lotes_df.groupby('idx').cumcount()
+        k_max = int(lotes_df['rango'].max()) + 1
+        cantidades = np.zeros((n, k_max))
+        vence = np.full((n, k_max), H, dtype=np.int64)
+        posiciones = (lotes_df['idx'].to_numpy(), lotes_df['rango'].to_numpy())
+        cantidades[posiciones] = lotes_df['cantidad'].to_numpy()
+        vence[posiciones] = lotes_df['vence_en'].to_numpy()
+
+        # Demanda acumulada antes de cada período (con 0 al inicio para indexar vence_en directamente).
+        demanda_previa = np.concatenate([np.zeros((n, 1)), np.cumsum(bruto, axis=1)], axis=1)
+        filas = np.arange(n)
+        consumido = np.zeros(n)
+        for k in range(k_max):
+            # FEFO: el lote k cubre la demanda anterior a su vencimiento que no cubrieron los lotes previos.
+            demanda_antes = demanda_previa[filas, vence[:, k]]
+            nuevo = np.minimum(consumido + cantidades[:, k], np.maximum(consumido, demanda_antes))
+            perdido = cantidades[:, k] - (nuevo - consumido)
+            vencen = (vence[:, k] < H) & (perdido > TOLERANCIA)
+            np.add.at(vencimientos, (filas[vencen], vence[vencen, k]), perdido[vencen])
+            consumido = nuevo
+
+    recetas = {}
+    for receta_id, id_insumo, por_unidad in zip(ing_df['receta_id'], ing_df['id_insumo'], ing_df['por_unidad']):
+        recetas.setdefault(receta_id, {})[id_insumo] = float(por_unidad)
+
+    return ResultadoMRP(hoy, H, insumos, bruto, recepciones, vencimientos, en_mano,
+                        req[['op_id', 'id_insumo', 'idx', 'periodo', 'orden', 'neto']], recetas)
+
+
+class MotorMRP:
+    """Carga los datos del plan desde la base y mantiene en caché el último `ResultadoMRP`."""
+
+    def __init__(self, horizonte_dias: int = 60, cache_ttl: float = 30.0, page_size: int = 1000):
+        self.horizonte_dias = horizonte_dias
+        self.cache_ttl = cache_ttl
+        self.page_size = page_size
+        self._resultado = None
+        self._expira = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def db(self):
+        from app.database import Database
+        return Database().client
+
+    def _leer(self, tabla: str, columnas: str, filtros=None, orden: str = 'id') -> List[Dict]:
+        filas_totales, offset = [], 0
+        while True:
+            query = self.db.table(tabla).select(columnas)
+            for columna, valores in (filtros or {}).items():
+                query = query.in_(columna, valores) if isinstance(valores, list) else query.eq(columna, valores)
+            filas = query.order(orden).range(offset, offset + self.page_size - 1).execute().data or []
+            filas_totales.extend(filas)
+            if len(filas) < self.page_size:
+                return filas_totales
+            offset += self.page_size
+
+    @staticmethod
+    def _bloques(valores: List, tamanio: int = 500) -> Iterable[List]:
+        for i in range(0, len(valores), tamanio):
+            yield valores[i:i + tamanio]
+
+    def cargar_y_calcular(self, hoy: Optional[date] = None) -> ResultadoMRP:
+        from app.models.receta import RecetaModel
+
+        ops = self._leer('ordenes_produccion', 'id, receta_id, cantidad_planificada, estado, '
+                                               'fecha_inicio_planificada, fecha_meta',
+                         {'estado': ESTADOS_OP_DEMANDA})
+        receta_ids = sorted({op['receta_id'] for op in ops if op.get('receta_id')})
+        ingredientes_res = RecetaModel().get_ingredientes_by_receta_ids(receta_ids)
+        if not ingredientes_res.get('success'):
+            raise RuntimeError(ingredientes_res.get('error'))
+        ingredientes = ingredientes_res.get('data') or []
+        tiempos_entrega = {
+            str(ing['id_insumo']): (ing.get('insumos_catalogo') or {}).get('tiempo_entrega_dias')
+            for ing in ingredientes if ing.get('id_insumo')
+        }
+
+        op_ids = [op['id'] for op in ops]
+        reservas = []
+        for bloque in self._bloques(op_ids):
+            reservas += self._leer('reservas_insumos', 'id, orden_produccion_id, insumo_id, cantidad_reservada',
+                                   {'orden_produccion_id': bloque, 'estado': 'RESERVADO'})
+
+        lotes = self._leer('insumos_inventario', 'id_lote, id_insumo, cantidad_actual, estado, f_vencimiento',
+                           {'estado': list(ESTADOS_UTILIZABLES)}, orden='id_lote')
+
+        ocs = self._leer('ordenes_compra', 'id, fecha_emision, fecha_estimada_entrega',
+                         {'estado': ESTADOS_OC_EN_TRANSITO})
+        fechas_oc = {oc['id']: oc for oc in ocs}
+        items = []
+        for bloque in self._bloques(list(fechas_oc)):
+            for item in self._leer('orden_compra_items', 'id, orden_compra_id, insumo_id, cantidad_solicitada, '
+                                                         'cantidad_recibida', {'orden_compra_id': bloque}):
+                oc = fechas_oc[item['orden_compra_id']]
+                items.append({**item, 'fecha_estimada_entrega': oc.get('fecha_estimada_entrega'),
+                              'fecha_emision': oc.get('fecha_emision')})
+
+        return calcular_mrp(ops, ingredientes, lotes, reservas, items, hoy=hoy,
+                            horizonte_dias=self.horizonte_dias, tiempos_entrega=tiempos_entrega)
+
+    def resultado(self, forzar: bool = False) -> ResultadoMRP:
+        """Último resultado calculado, recalculándolo si venció la caché."""
+        with self._lock:
+            if forzar or self._resultado is None or time.monotonic() >= self._expira:
+                inicio = time.perf_counter()
+                self._resultado = self.cargar_y_calcular()
+                self._expira = time.monotonic() + self.cache_ttl
+                logger.info(f"[MRP] Proyección de {len(self._resultado.insumos)} insumos × "
+                            f"{self.horizonte_dias} días en {(time.perf_counter() - inicio) * 1000:.0f} ms.")
+            return self._resultado
+
+    def invalidar(self):
+        with self._lock:
+            self._resultado = None
+
+
+_motor = None
+_motor_lock = threading.Lock()
+
+
+def get_motor_mrp() -> MotorMRP:
+    """Devuelve el motor MRP del proceso, creándolo en el primer uso."""
+    global _motor
+    with _motor_lock:
+        if _motor is None:
+            _motor = MotorMRP(
+                horizonte_dias=int(os.getenv('MRP_HORIZONTE_DIAS', 60)),
+                cache_ttl=float(os.getenv('MRP_CACHE_SECONDS', 30)),
+            )
+        return _motor
+
+
+def obtener_resultado_mrp() -> Optional[ResultadoMRP]:
+    """Resultado vigente o None si no se pudo calcular (los llamadores usan su lógica previa)."""
+    try:
+        return get_motor_mrp().resultado()
+    except Exception as e:
+        logger.error(f"[MRP] No se pudo calcular la proyección de materiales: {e}", exc_info=True)
+        return None
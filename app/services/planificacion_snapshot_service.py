@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotPlanificacion:
+    """
+    Caché versionada de la vista de planificación.
+
+    El plan tiene una versión monotónicamente creciente que se incrementa con
+    cada escritura que lo afecta (estados de OP, bloqueos de capacidad,
+    reservas, issues, configuración de líneas). Cada snapshot se guarda por
+    (semana, horizonte, día) junto con la versión con la que se construyó:
+    mientras la versión no cambie, todos los usuarios reciben el mismo
+    snapshot sin consultar la base. Cuando cambia, la primera request lo
+    reconstruye y las concurrentes esperan ese resultado en lugar de
+    recalcularlo cada una.
+
+    La versión vive en el proceso; `max_edad` acota cuánto puede quedar
+    desactualizado un snapshot por escrituras hechas en otros workers.
+    """
+
+    def __init__(self, max_edad: float = 60.0, max_entradas: int = 32):
+        self.max_edad = max_edad
+        self.max_entradas = max_entradas
+        self._version = 0
+        self._version_lock = threading.Lock()
+        self._snapshots: Dict[Tuple, Tuple[int, float, Dict]] = {}
+        self._locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    # --- Versión del plan ----------------------------------------------
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def incrementar_version(self, motivo: str = '') -> int:
+        with self._version_lock:
+            self._version += 1
+            version = self._version
+        logger.debug(f"[Planificación] Versión del plan {version} ({motivo or 'sin motivo'}).")
+        return version
+
+    def cambio_desde(self, version: Optional[int]) -> bool:
+        return version is None or version != self._version
+
+    # --- Snapshots -----------------------------------------------------
+    def obtener(self, semana: str, horizonte: int, constructor: Callable[[], Dict]) -> Dict:
+        """
+        Devuelve el snapshot de (semana, horizonte) para la versión actual,
+        construyéndolo con `constructor()` si no existe, quedó viejo o venció.
+        El resultado lleva la clave 'version'. Si `constructor` devuelve None
+        (error) no se cachea nada.
+        """
+        clave = (semana, horizonte, date.today().isoformat())
+        vigente = self._vigente(clave)
+        if vigente is not None:
+            return vigente
+
+        with self._lock:
+            lock_clave = self._locks.setdefault(clave, threading.Lock())
+        with lock_clave:
+            # Otra request pudo haberlo reconstruido mientras esperábamos.
+            vigente = self._vigente(clave)
+            if vigente is not None:
+                return vigente
+
+            version = self._version
+            datos = constructor()
+            if datos is None:
+                return None
+            datos['version'] = version
+            with self._lock:
+                self._snapshots[clave] = (version, time.monotonic(), datos)
+                self._podar()
+            return datos
+
+    def invalidar(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def _vigente(self, clave: Tuple) -> Optional[Dict]:
+        entrada = self._snapshots.get(clave)
+        if entrada is None:
+            return None
+        version, creado, datos = entrada
+        if version != self._version or time.monotonic() - creado > self.max_edad:
+            return None
+        return datos
+
+    def _podar(self):
+        if len(self._snapshots) <= self.max_entradas:
+            return
+        # Se descartan primero los snapshots de versiones viejas y los más antiguos.
+        orden = sorted(self._snapshots.items(), key=lambda item: (item[1][0] == self._version, item[1][1]))
+        for clave, _ in orden[:len(self._snapshots) - self.max_entradas]:
+            self._snapshots.pop(clave, None)
+            self._locks.pop(clave, None)
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot_planificacion() -> SnapshotPlanificacion:
+    """Devuelve la caché de snapshots del proceso, creándola en el primer uso."""
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = SnapshotPlanificacion(
+                max_edad=float(os.getenv('PLANIFICACION_SNAPSHOT_SECONDS', 60)),
+            )
+        return _snapshot
+
+
+def incrementar_version_plan(motivo: str = '') -> int:
+    """
+    Marca que el plan cambió: los snapshots de la vista de planificación y la
+    proyección MRP en caché se recalculan en la próxima consulta.
+    """
+    version = get_snapshot_planificacion().incrementar_version(motivo)
+    from app.services import mrp_service
+    if mrp_service._motor is not None:
+        mrp_service._motor.invalidar()
+    return version
+
+
+class VersionaPlanMixin:
+    """
+    Mixin para modelos cuyas escrituras cambian el plan de producción:
+    incrementa la versión del plan después de cada create/update/delete exitoso.
+    """
+
+    def create(self, data: Dict) -> Dict:
+        resultado = super().create(data)
+        if resultado.get('success'):
+            incrementar_version_plan(f"alta en {self.get_table_name()}")
+        return resultado
+
+    def update(self, *args, **kwargs) -> Dict:
+        resultado = super().update(*args, **kwargs)
+        if resultado.get('success'):
+            incrementar_version_plan(f"cambio en {self.get_table_name()}")
+        return resultado
+
+    def delete(self, *args, **kwargs) -> Dict:
+        resultado = super().delete(*args, **kwargs)
+        if resultado.get('success'):
+            incrementar_version_plan(f"baja en {self.get_table_name()}")
+        return resultado
@@ -0,0 +1,111 @@
+"""
+Base de los procesos que juntan señales y las procesan en lote desde un hilo
+de fondo (reposición automática, hechos de producción).
+"""
+import contextlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ProcesadorDiferido:
+    """
+    Antirrebote con hilo de fondo. Las señales se anotan dentro de
+    `with self._senal():` (con el lock tomado) y despiertan al hilo, que
+    espera `ventana` segundos desde la primera señal pendiente y llama a
+    `flush`. Las subclases definen cómo se vacía el lote pendiente
+    (`_tomar_pendientes`, con el lock tomado) y cómo se procesa
+    (`_procesar`). Con `ventana <= 0` se procesa en el mismo hilo que señala.
+    """
+
+    nombre_hilo = 'procesador-diferido'
+    mensaje_error = 'Error en el procesamiento diferido'
+
+    def __init__(self, ventana: float = 2.0):
+        self.ventana = ventana
+        self._primera_senal = None
+        self._cond = threading.Condition()
+        self._app = None
+        self._stop = False
+        self._worker = None
+
+    def _tomar_pendientes(self):
+        raise NotImplementedError
+
+    def _procesar(self, lote):
+        raise NotImplementedError
+
+    @contextlib.contextmanager
+    def _senal(self):
+        self._capturar_app()
+        with self._cond:
+            yield
+            if self._primera_senal is None:
+                self._primera_senal = time.monotonic()
+            self._cond.notify_all()
+        if self.ventana <= 0:
+            self.flush()
+        else:
+            self.start()
+
+    def flush(self):
+        """Procesa ya mismo el lote pendiente."""
+        with self._cond:
+            lote = self._tomar_pendientes()
+            self._primera_senal = None
+        return self._procesar(lote)
+
+    def _en_contexto_app(self, funcion, *args):
+        """Ejecuta `funcion` dentro del contexto de la app capturada si el hilo no tiene uno."""
+        if self._app is not None:
+            from flask import has_app_context
+            if not has_app_context():
+                with self._app.app_context():
+                    return funcion(*args)
+        return funcion(*args)
+
+    # --- Hilo de fondo -------------------------------------------------
+    def start(self):
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop = False
+                self._worker = threading.Thread(target=self._run, name=self.nombre_hilo, daemon=True)
+                self._worker.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop:
+                    if self._primera_senal is None:
+                        self._cond.wait(1.0)
+                        continue
+                    restante = self._primera_senal + self.ventana - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                if self._stop:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"{self.mensaje_error}: {e}", exc_info=True)
+
+    def _capturar_app(self):
+        if self._app is not None:
+            return
+        try:
+            from flask import current_app, has_app_context
+            if has_app_context():
+                self._app = current_app._get_current_object()
+        except Exception:
+            self._app = None
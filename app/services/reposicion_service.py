@@ -0,0 +1,193 @@
+import atexit
+import logging
+import math
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from app.services.procesador_diferido import ProcesadorDiferido
+
+logger = logging.getLogger(__name__)
+
+CODIGO_PROVEEDOR_DEFAULT = 'PRV-0001'
+ID_USUARIO_SISTEMA = 1
+
+
+def necesita_reposicion(insumo: Dict) -> bool:
+    """Un insumo necesita reposición si está bajo su mínimo y no tiene una OC en curso."""
+    if not insumo or insumo.get('en_espera_de_reestock'):
+        return False
+    return float(insumo.get('stock_actual') or 0) < float(insumo.get('stock_min') or 0)
+
+
+def cantidad_a_reponer(insumo: Dict, faltante_proyectado: float = 0.0) -> int:
+    """
+    Cantidad a pedir para un insumo bajo mínimo: se repone hasta el stock
+    máximo cuando está definido (y es mayor al mínimo); si no, hasta el mínimo.
+    Si la proyección MRP anticipa un faltante mayor, se pide al menos ese faltante.
+    """
+    stock = float(insumo.get('stock_actual') or 0)
+    minimo = float(insumo.get('stock_min') or 0)
+    maximo = float(insumo.get('stock_max') or 0)
+    objetivo = maximo if maximo > minimo else minimo
+    return max(0, math.ceil(max(objetivo - stock, faltante_proyectado or 0.0)))
+
+
+def faltantes_proyectados_a_reponer(insumos: List[Dict], margen_dias: Optional[int] = None) -> Dict[str, float]:
+    """
+    Faltantes de la proyección MRP que hay que pedir ya: los que ocurren antes
+    del tiempo de entrega del insumo más un margen. {id_insumo: cantidad}.
+    """
+    from app.services.mrp_service import obtener_resultado_mrp
+    resultado = obtener_resultado_mrp()
+    if resultado is None:
+        return {}
+    if margen_dias is None:
+        margen_dias = int(os.getenv('REPOSICION_MARGEN_DIAS', 7))
+    faltantes = {f['id_insumo']: f for f in resultado.faltantes()}
+    a_reponer = {}
+    for insumo in insumos:
+        faltante = faltantes.get(str(insumo.get('id_insumo')))
+        if not faltante or insumo.get('en_espera_de_reestock'):
+            continue
+        plazo = int(insumo.get('tiempo_entrega_dias') or 0) + margen_dias
+        if date.fromisoformat(faltante['fecha_faltante']) <= resultado.hoy + timedelta(days=plazo):
+            a_reponer[insumo['id_insumo']] = faltante['cantidad_faltante']
+    return a_reponer
+
+
+class PlanificadorReposicion(ProcesadorDiferido):
+    """
+    Planificador de reposición automática con antirrebote.
+
+    Cada cambio de stock que deja un insumo bajo su mínimo se registra como
+    una señal (`notificar`) sin consultar la base de datos. Un hilo en
+    segundo plano espera `ventana` segundos desde la primera señal pendiente
+    y evalúa todas juntas: agrupa los insumos por proveedor (los que no tienen
+    proveedor van a PRV-0001) y genera a lo sumo una OC por proveedor en esa
+    ventana. El proveedor default y el usuario de sistema se resuelven una
+    sola vez y quedan en caché.
+
+    Con `ventana <= 0` la evaluación se hace en el mismo hilo que notifica.
+    """
+
+    nombre_hilo = 'planificador-reposicion'
+    mensaje_error = 'Error evaluando reposición automática'
+
+    def __init__(self, ventana: float = 2.0, evaluador=None, cache_ttl: float = 600.0):
+        super().__init__(ventana)
+        self.cache_ttl = cache_ttl
+        self._evaluador = evaluador
+        self._pendientes: Dict[str, Optional[str]] = {}  # id_insumo -> id_proveedor
+        self._evaluando = threading.Lock()
+        self._contexto = None
+        self._contexto_expira = 0.0
+
+    # --- Caché de proveedor default / usuario de sistema ---------------
+    def contexto(self) -> Dict:
+        """
+        Devuelve {'proveedor_default_id', 'usuario'} resolviendo ambos datos
+        sólo cuando la caché está vacía o vencida.
+        """
+        ahora = time.monotonic()
+        if self._contexto is not None and ahora < self._contexto_expira:
+            return self._contexto
+
+        from app.models.proveedor import ProveedorModel
+        from app.models.usuario import UsuarioModel
+
+        proveedor_default_id = None
+        default_prov_res = ProveedorModel().get_all(filtros={'codigo': CODIGO_PROVEEDOR_DEFAULT})
+        if default_prov_res.get('success') and default_prov_res.get('data'):
+            proveedor_default_id = default_prov_res['data'][0]['id']
+        else:
+            logger.warning(f"Reposición: no se encontró el proveedor '{CODIGO_PROVEEDOR_DEFAULT}'. "
+                           "Insumos sin proveedor no se repondrán.")
+
+        usuario = None
+        usuario_res = UsuarioModel().find_by_id(ID_USUARIO_SISTEMA)
+        if usuario_res and usuario_res.get('success') and usuario_res.get('data'):
+            usuario = usuario_res['data']
+        else:
+            logger.error(f"Reposición: no se encontró al usuario de sistema con ID {ID_USUARIO_SISTEMA}.")
+
+        contexto = {'proveedor_default_id': proveedor_default_id, 'usuario': usuario}
+        # Sólo se cachea un contexto completo; si falta algo se reintenta en la próxima ventana.
+        if proveedor_default_id is not None and usuario is not None:
+            self._contexto = contexto
+            self._contexto_expira = ahora + self.cache_ttl
+        return contexto
+
+    def invalidar_cache(self):
+        self._contexto = None
+
+    # --- Señales -------------------------------------------------------
+    def notificar(self, insumo: Dict) -> bool:
+        """
+        Registra que el stock de `insumo` cambió. Devuelve True si quedó
+        pendiente de evaluación (está bajo mínimo y sin OC en curso).
+        """
+        if not necesita_reposicion(insumo) or not insumo.get('id_insumo'):
+            return False
+        with self._senal():
+            self._pendientes[insumo['id_insumo']] = insumo.get('id_proveedor')
+        return True
+
+    def pendientes(self) -> int:
+        with self._cond:
+            return len(self._pendientes)
+
+    def flush(self) -> List[Dict]:
+        """Evalúa ya mismo las señales pendientes. Devuelve los resultados por proveedor."""
+        return super().flush()
+
+    def _tomar_pendientes(self) -> Dict[str, Optional[str]]:
+        lote, self._pendientes = self._pendientes, {}
+        return lote
+
+    # --- Evaluación ----------------------------------------------------
+    def _procesar(self, lote: Dict[str, Optional[str]]) -> List[Dict]:
+        if not lote:
+            return []
+        with self._evaluando:
+            return self._en_contexto_app(self._evaluar_lote, lote)
+
+    def _evaluar_lote(self, lote: Dict[str, Optional[str]]) -> List[Dict]:
+        contexto = self.contexto()
+        proveedor_default_id = contexto['proveedor_default_id']
+        proveedores = set()
+        for id_insumo, proveedor_id in lote.items():
+            proveedor_id = proveedor_id or proveedor_default_id
+            if proveedor_id:
+                proveedores.add(proveedor_id)
+            else:
+                logger.error(f"Insumo {id_insumo} sin proveedor y no se encontró {CODIGO_PROVEEDOR_DEFAULT}. "
+                             "No se puede generar OC.")
+        if not proveedores:
+            return []
+
+        logger.info(f"Reposición: evaluando {len(lote)} insumos señalados de {len(proveedores)} proveedores.")
+        evaluador = self._evaluador
+        if evaluador is None:
+            from app.controllers.insumo_controller import InsumoController
+            evaluador = InsumoController()._generar_ocs_automaticas
+        return evaluador(sorted(proveedores, key=str), proveedor_default_id, contexto['usuario'])
+
+
+_planificador = None
+_planificador_lock = threading.Lock()
+
+
+def get_planificador_reposicion() -> PlanificadorReposicion:
+    """Devuelve el planificador del proceso, creándolo en el primer uso."""
+    global _planificador
+    with _planificador_lock:
+        if _planificador is None:
+            _planificador = PlanificadorReposicion(
+                ventana=float(os.getenv('REPOSICION_DEBOUNCE_SECONDS', 2.0)),
+                cache_ttl=float(os.getenv('REPOSICION_CACHE_SECONDS', 600)),
+            )
+            atexit.register(_planificador.stop, 3.0)
+        return _planificador
@@ -0,0 +1,227 @@
+"""
+Libro mayor de movimientos de inventario de insumos.
+
+Cada cambio en la cantidad utilizable de un lote (`cantidad_actual` de un lote
+en estado disponible/reservado) se registra como un movimiento append-only en
+`movimientos_inventario`, con el saldo resultante del lote y del insumo. Los
+saldos se guardan en la base (`saldos_inventario_lote` y
+`saldos_inventario_insumo`) y los actualiza la función
+`registrar_movimientos_inventario` en la misma transacción que inserta el
+movimiento, a partir de la cantidad actual del lote: varios procesos pueden
+registrar cambios a la vez sin que los saldos se desvíen. El stock
+consolidado de un insumo es la lectura de una fila y el mapa de stock de
+todos los insumos no necesita recorrer lotes ni reservas.
+
+Los checkpoints (`checkpoints_inventario`) guardan los saldos de todos los
+lotes a un momento dado; con ellos y los movimientos posteriores se responde
+"stock al día X" para reportes. La conciliación diaria (scheduler) registra
+un AJUSTE por cualquier cambio hecho por fuera del libro y guarda un
+checkpoint nuevo.
+
+El libro escucha los `create`/`update` de `InventarioModel`; el tipo de
+movimiento lo aporta el flujo que hace el cambio:
+
+    with movimiento_inventario('RESERVA', referencia_tipo='orden_produccion', referencia_id=op_id):
+        ...
+
+o como decorador (`@movimiento_inventario('CONSUMO')`). Sin contexto se
+infiere (alta de lote → INGRESO, entrada/salida de cuarentena, resto AJUSTE).
+
+Dentro de un bloque los lotes tocados se acumulan y se registran juntos al
+salir (una sola llamada a `registrar_movimientos_inventario`, que toma un lock
+global), o antes si alguien lee los saldos en el medio. Cada lote deja un
+único movimiento por operación, con su cambio neto.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TIPOS_MOVIMIENTO = ('INGRESO', 'RESERVA', 'LIBERACION', 'CONSUMO', 'MERMA',
+                    'CUARENTENA_ENTRADA', 'CUARENTENA_SALIDA', 'AJUSTE')
+ESTADOS_UTILIZABLES = ('disponible', 'reservado')
+TOLERANCIA = 1e-9
+
+_contexto: contextvars.ContextVar = contextvars.ContextVar('movimiento_inventario', default=None)
+# Lotes tocados dentro del bloque actual y todavía no registrados: [(libro, id_lote, alta)].
+_pendientes: contextvars.ContextVar = contextvars.ContextVar('movimientos_pendientes', default=None)
+
+
+@contextlib.contextmanager
+def movimiento_inventario(tipo: str, referencia_tipo: str = None, referencia_id=None, usuario_id: int = None):
+    """Indica el tipo (y referencia) de los movimientos que se registren dentro del bloque."""
+    if tipo not in TIPOS_MOVIMIENTO:
+        raise ValueError(f"Tipo de movimiento desconocido: {tipo}")
+    # Lo pendiente de un bloque exterior se registra con su propio tipo.
+    registrar_pendientes()
+    token = _contexto.set({'tipo': tipo, 'referencia_tipo': referencia_tipo,
+                           'referencia_id': None if referencia_id is None else str(referencia_id),
+                           'usuario_id': usuario_id})
+    token_pendientes = _pendientes.set([])
+    try:
+        yield
+    finally:
+        registrar_pendientes()
+        _pendientes.reset(token_pendientes)
+        _contexto.reset(token)
+
+
+def registrar_pendientes():
+    """Registra los lotes acumulados en el bloque actual, una llamada por libro."""
+    pendientes = _pendientes.get()
+    if not pendientes:
+        return
+    por_libro = defaultdict(dict)
+    for libro, id_lote, alta in pendientes:
+        por_libro[libro][id_lote] = por_libro[libro].get(id_lote, False) or alta
+    pendientes.clear()
+    for libro, altas in por_libro.items():
+        try:
+            libro._registrar(altas)
+        except Exception as e:
+            # Igual que al registrar un lote suelto: el libro nunca interrumpe la operación.
+            logger.error(f"Error registrando {len(altas)} movimientos de inventario: {e}", exc_info=True)
+
+
+class StockLedger:
+    """Registro y lectura del libro de movimientos; los saldos se calculan en la base."""
+
+    def __init__(self, movimiento_model=None, checkpoint_model=None):
+        self._movimiento_model = movimiento_model
+        self._checkpoint_model = checkpoint_model
+
+    # --- Dependencias perezosas (evitan importar modelos al cargar el módulo) ---
+    @property
+    def movimientos(self):
+        if self._movimiento_model is None:
+            from app.models.movimiento_inventario import MovimientoInventarioModel
+            self._movimiento_model = MovimientoInventarioModel()
+        return self._movimiento_model
+
+    @property
+    def checkpoints(self):
+        if self._checkpoint_model is None:
+            from app.models.movimiento_inventario import CheckpointInventarioModel
+            self._checkpoint_model = CheckpointInventarioModel()
+        return self._checkpoint_model
+
+    # --- Escritura -----------------------------------------------------
+    def registrar_cambio_lote(self, lote: Dict, alta: bool = False) -> Optional[Dict]:
+        """
+        Registra el movimiento del lote según su cantidad actual en la base.
+        Devuelve el movimiento o None si la cantidad utilizable no cambió.
+        Dentro de un bloque `movimiento_inventario` sólo lo anota para
+        registrarlo al salir y devuelve None.
+        """
+        pendientes = _pendientes.get()
+        if pendientes is not None and lote and lote.get('id_lote'):
+            pendientes.append((self, lote['id_lote'], alta))
+            return None
+        movimientos = self.registrar_cambios_lotes([lote], alta=alta)
+        return movimientos[0] if movimientos else None
+
+    def registrar_cambios_lotes(self, lotes: List[Dict], alta: bool = False) -> List[Dict]:
+        """Igual que `registrar_cambio_lote` para varios lotes, con una única llamada a la base."""
+        ids = [l['id_lote'] for l in lotes or [] if l and l.get('id_lote')]
+        return self._registrar(dict.fromkeys(ids, alta))
+
+    def _registrar(self, altas: Dict[str, bool]) -> List[Dict]:
+        """Registra los lotes de `altas` ({id_lote: alta}) con una única llamada a la base."""
+        if not altas:
+            return []
+        contexto = _contexto.get() or {}
+        cambios = [{'id_lote': id_lote, 'alta': alta, **contexto} for id_lote, alta in altas.items()]
+        resultado = self.movimientos.registrar_cambios(cambios)
+        if not resultado.get('success'):
+            # El lote ya quedó escrito; la conciliación diaria registra el ajuste que falte.
+            logger.error(f"No se pudieron registrar {len(altas)} movimientos de inventario: {resultado.get('error')}")
+            return []
+        return resultado['data']
+
+    # --- Lectura -------------------------------------------------------
+    def saldo_insumo(self, id_insumo: str) -> Optional[float]:
+        """Stock utilizable del insumo, o None si la base no respondió."""
+        saldos = self.saldos_insumos([id_insumo])
+        if saldos is None:
+            return None
+        return float(saldos.get(id_insumo, 0))
+
+    def saldos_insumos(self, ids_insumo: Optional[List[str]] = None) -> Optional[Dict[str, Decimal]]:
+        """Mapa {id_insumo: stock utilizable} de los insumos con stock (todos o los pedidos)."""
+        registrar_pendientes()
+        resultado = self.movimientos.obtener_saldos_insumos(ids_insumo)
+        if not resultado.get('success'):
+            return None
+        return {fila['id_insumo']: Decimal(str(round(float(fila['saldo']), 6))) for fila in resultado['data']
+                if float(fila['saldo']) > TOLERANCIA}
+
+    def stock_a_fecha(self, fecha, id_insumo: Optional[str] = None) -> Dict:
+        """
+        Stock utilizable por insumo al momento `fecha` (date, datetime o ISO):
+        último checkpoint anterior a la fecha más los movimientos hasta ella.
+        """
+        registrar_pendientes()
+        try:
+            if not isinstance(fecha, str):
+                if not isinstance(fecha, datetime):
+                    fecha = datetime.combine(fecha, datetime.max.time())
+                if fecha.tzinfo is None:
+                    fecha = fecha.replace(tzinfo=timezone.utc)
+                fecha = fecha.isoformat()
+
+            checkpoint_res = self.checkpoints.obtener_ultimo(hasta_fecha=fecha)
+            if not checkpoint_res.get('success'):
+                return {'success': False, 'error': checkpoint_res.get('error')}
+            checkpoint = checkpoint_res['data']
+            if checkpoint is None:
+                return {'success': False, 'error': 'No hay historial de inventario para esa fecha.'}
+
+            saldos = defaultdict(float)
+            for valores in (checkpoint.get('saldos_lotes') or {}).values():
+                if id_insumo is None or valores[0] == id_insumo:
+                    saldos[valores[0]] += float(valores[1])
+            movimientos_res = self.movimientos.obtener_posteriores(
+                int(checkpoint.get('ultimo_movimiento_id') or 0), hasta_fecha=fecha, id_insumo=id_insumo)
+            if not movimientos_res.get('success'):
+                return {'success': False, 'error': movimientos_res.get('error')}
+            for mov in movimientos_res['data']:
+                saldos[mov['id_insumo']] += float(mov['cantidad'])
+
+            data = {k: round(v, 6) for k, v in saldos.items() if abs(v) > TOLERANCIA}
+            return {'success': True, 'data': data, 'checkpoint_id': checkpoint['id'], 'movimientos': len(movimientos_res['data'])}
+        except Exception as e:
+            logger.error(f"Error calculando stock a fecha {fecha}: {e}", exc_info=True)
+            return {'success': False, 'error': str(e)}
+
+    # --- Mantenimiento -------------------------------------------------
+    def crear_checkpoint(self) -> Dict:
+        return self.checkpoints.crear()
+
+    def reconstruir_desde_lotes(self) -> Dict:
+        """
+        Compara los saldos del libro con los lotes reales, registra un AJUSTE
+        por cada diferencia y guarda un checkpoint nuevo.
+        """
+        resultado = self.checkpoints.conciliar()
+        if not resultado.get('success'):
+            return {'success': False, 'error': resultado.get('error')}
+        return {'success': True, 'ajustes': resultado['data']}
+
+
+_ledger: Optional[StockLedger] = None
+
+
+def get_stock_ledger() -> Optional[StockLedger]:
+    """Instancia compartida del libro, o None si STOCK_LEDGER_ENABLED está apagado."""
+    global _ledger
+    if os.getenv('STOCK_LEDGER_ENABLED', 'true').lower() not in ('true', '1', 't'):
+        return None
+    if _ledger is None:
+        _ledger = StockLedger()
+    return _ledger
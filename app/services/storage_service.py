@@ -0,0 +1,219 @@
+import atexit
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONES_IMAGEN = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp'}
+# Rutas ya subidas que se recuerdan para no volver a transferir el mismo contenido.
+MAX_RUTAS_RECORDADAS = 20000
+
+
+class AlmacenSupabase:
+    """Supabase Storage con un único cliente de administrador compartido por todo el proceso."""
+
+    def __init__(self, cliente=None):
+        self._cliente = cliente
+        self._lock = threading.Lock()
+
+    @property
+    def cliente(self):
+        if self._cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    from supabase import create_client
+                    from app.config import Config
+                    # Clave de servicio: la subida necesita permisos de administrador.
+                    self._cliente = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
+        return self._cliente
+
+    def subir(self, bucket: str, ruta: str, contenido: bytes, content_type: str):
+        # La ruta depende sólo del contenido: si el objeto ya existe, sobrescribirlo no cambia nada.
+        self.cliente.storage.from_(bucket).upload(
+            path=ruta, file=contenido, file_options={'content-type': content_type, 'upsert': 'true'})
+
+    def url_publica(self, bucket: str, ruta: str) -> str:
+        # storage3 arma la URL pública localmente, sin ir a la red.
+        return self.cliente.storage.from_(bucket).get_public_url(ruta)
+
+
+class AlmacenLocal:
+    """
+    Stand-in de Supabase Storage sobre el sistema de archivos, para desarrollo
+    y tests sin red. Cada bucket es un directorio bajo `raiz`.
+    """
+
+    def __init__(self, raiz: str, url_base: Optional[str] = None):
+        self.raiz = raiz
+        self.url_base = (url_base or f"file://{os.path.abspath(raiz)}").rstrip('/')
+
+    def _path(self, bucket: str, ruta: str) -> str:
+        return os.path.join(self.raiz, bucket, *ruta.split('/'))
+
+    def subir(self, bucket: str, ruta: str, contenido: bytes, content_type: str):
+        destino = self._path(bucket, ruta)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporal = f"{destino}.{threading.get_ident()}.tmp"
+        with open(temporal, 'wb') as f:
+            f.write(contenido)
+        os.replace(temporal, destino)
+
+    def url_publica(self, bucket: str, ruta: str) -> str:
+        return f"{self.url_base}/{bucket}/{ruta}"
+
+    def existe(self, bucket: str, ruta: str) -> bool:
+        return os.path.exists(self._path(bucket, ruta))
+
+
+def _extension(nombre: Optional[str], content_type: Optional[str]) -> str:
+    extension = os.path.splitext(nombre or '')[1].lower()
+    if not extension and content_type:
+        extension = mimetypes.guess_extension(content_type) or ''
+    return extension if extension.replace('.', '').isalnum() else ''
+
+
+class ErrorSubida(Exception):
+    """El archivo no quedó guardado en Storage después de los reintentos."""
+
+
+class PipelineSubidas:
+    """
+    Subidas a Storage direccionadas por contenido.
+
+    La ruta de cada archivo es el SHA-256 de su contenido, así una misma foto
+    subida varias veces se guarda una sola vez. `subir()` vuelve recién cuando
+    el original está en Storage: quien la llama guarda la URL (comprobantes,
+    evidencias, fotos de desperdicio), así que nunca recibe un enlace a un
+    archivo que no existe. El original y las miniaturas (generadas localmente
+    con Pillow) se suben en paralelo desde un pool acotado de hilos que
+    comparten un único cliente; sólo se devuelven las miniaturas que quedaron
+    guardadas. Los errores se reintentan con espera creciente y, si persisten,
+    `subir()` lanza `ErrorSubida`.
+    """
+
+    def __init__(self, almacen=None, max_workers: int = 4, tamanios_miniatura: Iterable[int] = (320,),
+                 reintentos: int = 3, espera_reintento: float = 0.5):
+        self.almacen = almacen or AlmacenSupabase()
+        self.tamanios_miniatura = tuple(tamanios_miniatura)
+        self.reintentos = reintentos
+        self.espera_reintento = espera_reintento
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='storage-upload')
+        self._cond = threading.Condition()
+        self._en_curso = set()
+        # (bucket, ruta) -> tamaños de miniatura guardados
+        self._subidas: 'OrderedDict[Tuple[str, str], Tuple[int, ...]]' = OrderedDict()
+
+    def subir(self, contenido: bytes, bucket: str, nombre: Optional[str] = None,
+              content_type: Optional[str] = None) -> Dict:
+        """
+        Sube `contenido` y devuelve sus URLs públicas:
+        {'url', 'ruta', 'sha256', 'miniaturas': {tamaño: url}}.
+        Lanza `ErrorSubida` si el original no se pudo guardar.
+        """
+        sha = hashlib.sha256(contenido).hexdigest()
+        extension = _extension(nombre, content_type)
+        content_type = content_type or mimetypes.guess_type(f"x{extension}")[0] or 'application/octet-stream'
+        ruta = f"{sha[:2]}/{sha}{extension}"
+        es_imagen = content_type.startswith('image/') or extension in EXTENSIONES_IMAGEN
+        miniaturas = {t: f"miniaturas/{sha[:2]}/{sha}_{t}.jpg" for t in self.tamanios_miniatura} if es_imagen else {}
+
+        clave = (bucket, ruta)
+        with self._cond:
+            # Si otro hilo está subiendo el mismo contenido, se espera su resultado.
+            while clave in self._en_curso:
+                self._cond.wait()
+            guardadas = self._subidas.get(clave)
+            if guardadas is None:
+                self._en_curso.add(clave)
+        if guardadas is None:
+            try:
+                guardadas = self._procesar(bucket, ruta, contenido, content_type, miniaturas)
+            finally:
+                with self._cond:
+                    self._en_curso.discard(clave)
+                    if guardadas is not None:
+                        self._subidas[clave] = guardadas
+                        if len(self._subidas) > MAX_RUTAS_RECORDADAS:
+                            self._subidas.popitem(last=False)
+                    self._cond.notify_all()
+
+        return {
+            'url': self.almacen.url_publica(bucket, ruta),
+            'ruta': ruta,
+            'sha256': sha,
+            'miniaturas': {t: self.almacen.url_publica(bucket, miniaturas[t]) for t in guardadas},
+        }
+
+    def cerrar(self):
+        self._executor.shutdown(wait=True)
+
+    def _procesar(self, bucket: str, ruta: str, contenido: bytes, content_type: str,
+                  miniaturas: Dict[int, str]) -> Tuple[int, ...]:
+        original = self._executor.submit(self._subir_con_reintentos, bucket, ruta, contenido, content_type)
+        futuros = {}
+        if miniaturas:
+            for tamanio, ruta_miniatura, bytes_miniatura in self._generar_miniaturas(contenido, miniaturas):
+                futuros[tamanio] = self._executor.submit(
+                    self._subir_con_reintentos, bucket, ruta_miniatura, bytes_miniatura, 'image/jpeg')
+        if not original.result():
+            raise ErrorSubida(f"No se pudo guardar {bucket}/{ruta} en Storage.")
+        return tuple(sorted(t for t, futuro in futuros.items() if futuro.result()))
+
+    def _subir_con_reintentos(self, bucket: str, ruta: str, contenido: bytes, content_type: str) -> bool:
+        for intento in range(1, self.reintentos + 1):
+            try:
+                self.almacen.subir(bucket, ruta, contenido, content_type)
+                return True
+            except Exception as e:
+                if intento == self.reintentos:
+                    logger.error(f"[Storage] No se pudo subir {bucket}/{ruta} tras {intento} intentos: {e}")
+                    return False
+                logger.warning(f"[Storage] Falló la subida de {bucket}/{ruta} (intento {intento}): {e}. Se reintenta.")
+                time.sleep(self.espera_reintento * 2 ** (intento - 1))
+        return False
+
+    @staticmethod
+    def _generar_miniaturas(contenido: bytes, miniaturas: Dict[int, str]):
+        from PIL import Image, ImageOps
+        try:
+            with Image.open(io.BytesIO(contenido)) as original:
+                imagen = ImageOps.exif_transpose(original).convert('RGB')
+        except Exception as e:
+            logger.warning(f"[Storage] No se pudieron generar miniaturas: {e}")
+            return
+        for tamanio, ruta in sorted(miniaturas.items(), reverse=True):
+            copia = imagen.copy()
+            copia.thumbnail((tamanio, tamanio))
+            salida = io.BytesIO()
+            copia.save(salida, format='JPEG', quality=85, optimize=True)
+            yield tamanio, ruta, salida.getvalue()
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline_subidas() -> PipelineSubidas:
+    """
+    Devuelve el pipeline de subidas del proceso. Con STORAGE_LOCAL_DIR los
+    archivos se guardan en disco en lugar de Supabase Storage.
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            raiz_local = os.getenv('STORAGE_LOCAL_DIR')
+            almacen = AlmacenLocal(raiz_local, os.getenv('STORAGE_LOCAL_URL')) if raiz_local else AlmacenSupabase()
+            _pipeline = PipelineSubidas(
+                almacen,
+                max_workers=int(os.getenv('STORAGE_UPLOAD_WORKERS', 4)),
+            )
+            atexit.register(_pipeline.cerrar)
+        return _pipeline
@@ -1,13 +1,136 @@
 import requests
+from requests.adapters import HTTPAdapter
 import os
+import re
 import logging
+import queue
+import threading
+import time
+import atexit
 
 logger = logging.getLogger(__name__)
 
+TELEGRAM_API_URL = "https://api.telegram.org"
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = "\n\n——————————\n\n"
+_HTML_TAG_RE = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9-]*)[^>]*>")
+
+
+def _build_session() -> requests.Session:
+    """
+    Builds a requests Session with a small keep-alive connection pool.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def _open_tags(html: str) -> list:
+    """
+    Returns the (name, opening tag) pairs still open at the end of `html`.
+    """
+    stack = []
+    for match in _HTML_TAG_RE.finditer(html):
+        closing, name = match.group(1), match.group(2).lower()
+        if not closing:
+            stack.append((name, match.group(0)))
+            continue
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i][0] == name:
+                del stack[i:]
+                break
+    return stack
+
+
+def _safe_cut(text: str, cut: int) -> int:
+    """
+    Moves a hard cut back so it does not fall inside a tag or an HTML entity.
+    """
+    tag_start = text.rfind("<", 0, cut)
+    if tag_start != -1 and text.find(">", tag_start, cut) == -1:
+        cut = tag_start
+    entity_start = text.rfind("&", 0, cut)
+    if entity_start != -1 and cut - entity_start <= 10 and text.find(";", entity_start, cut) == -1:
+        cut = entity_start
+    return cut
+
+
+def _find_cut(text: str, limit: int, reopened: int) -> tuple:
+    """
+    Finds where to cut `text` so that the head plus the tags needed to close
+    it fit in `limit`. Never cuts inside the first `reopened` characters.
+    Returns (cut, separator, head, open tags, closing tags).
+    """
+    budget = limit
+    while True:
+        cut = -1
+        for separator in (DIGEST_SEPARATOR, "\n"):
+            cut = text.rfind(separator, reopened + 1, budget)
+            if cut != -1:
+                break
+        if cut == -1:
+            separator = ""
+            cut = max(_safe_cut(text, budget), reopened + 1)
+        head = text[:cut]
+        tags = _open_tags(head)
+        closing = "".join(f"</{name}>" for name, _ in reversed(tags))
+        if len(head) + len(closing) <= limit or budget <= reopened + 1:
+            return cut, separator, head, tags, closing
+        budget = limit - len(closing)
+
+
+def _split_html(text: str, limit: int) -> list:
+    """
+    Splits an HTML message into chunks of at most `limit` characters.
+    Cuts between digest entries when possible, then between lines, and only
+    as a last resort inside a line. Tags left open at a cut are closed at the
+    end of the chunk and reopened at the start of the next one, so every chunk
+    is valid for parse_mode=HTML.
+    """
+    chunks = []
+    reopened = 0
+    while len(text) > limit:
+        cut, separator, head, tags, closing = _find_cut(text, limit, reopened)
+        if len(head) + len(closing) > limit:
+            if reopened:
+                # The reopened tags alone leave no room: drop them and cut the plain text.
+                text, reopened = text[reopened:], 0
+                continue
+            # Nothing but markup fits: a hard cut keeps the limit even if the chunk is not valid HTML.
+            cut, separator, head, tags, closing = limit, "", text[:limit], [], ""
+        chunks.append(head + closing)
+        prefix = "".join(tag for _, tag in tags)
+        reopened = len(prefix)
+        text = prefix + text[cut + len(separator):]
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+def _get_api_url(bot_token: str) -> str:
+    base_url = os.getenv("TELEGRAM_API_URL", TELEGRAM_API_URL).rstrip("/")
+    return f"{base_url}/bot{bot_token}/sendMessage"
+
+
 def send_telegram_message(message: str):
     """
     Sends a message to a Telegram chat using a bot.
     Reads the Bot Token and Chat ID from environment variables.
+    This call blocks; business flows should use `notificar_telegram` instead.
     """
     bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
     chat_id = os.getenv("TELEGRAM_CHAT_ID")
@@ -16,7 +139,7 @@ def send_telegram_message(message: str):
         logger.warning("Telegram Bot Token or Chat ID not configured. Skipping notification.")
         return False
 
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    url = _get_api_url(bot_token)
     payload = {
         "chat_id": chat_id,
         "text": message,
@@ -24,10 +147,204 @@ def send_telegram_message(message: str):
     }
 
     try:
-        response = requests.post(url, json=payload)
+        response = _get_session().post(url, json=payload, timeout=(3.05, 10))
         response.raise_for_status()  # Raise an exception for bad status codes
         logger.info("Telegram message sent successfully.")
         return True
     except requests.exceptions.RequestException as e:
         logger.error(f"Failed to send Telegram message: {e}", exc_info=True)
         return False
+
+
+class TelegramDispatcher:
+    """
+    Asynchronous Telegram dispatcher.
+
+    Messages are queued without blocking the caller and delivered by a single
+    background worker that shares one pooled HTTP session. Messages enqueued
+    with the same key inside `coalesce_window` seconds are merged into one
+    digest, deliveries are throttled with a token bucket and transient
+    failures (network errors, 429, 5xx) are retried with exponential backoff.
+    """
+
+    def __init__(self, bot_token: str = None, chat_id: str = None, api_url: str = None,
+                 coalesce_window: float = 5.0, max_per_minute: int = 20,
+                 max_retries: int = 4, backoff_base: float = 1.0,
+                 max_queue_size: int = 1000, timeout=(3.05, 10), session: requests.Session = None):
+        self.bot_token = bot_token if bot_token is not None else os.getenv("TELEGRAM_BOT_TOKEN")
+        self.chat_id = chat_id if chat_id is not None else os.getenv("TELEGRAM_CHAT_ID")
+        base_url = (api_url or os.getenv("TELEGRAM_API_URL", TELEGRAM_API_URL)).rstrip("/")
+        self.url = f"{base_url}/bot{self.bot_token}/sendMessage"
+        self.coalesce_window = coalesce_window
+        self.max_per_minute = max(1, max_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.session = session or _build_session()
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._pending = {}  # key -> {'messages': [...], 'first_at': float}
+        self._tokens = float(self.max_per_minute)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._stop = threading.Event()
+        self._worker = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.bot_token and self.chat_id)
+
+    def start(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop.clear()
+                self._worker = threading.Thread(target=self._run, name="telegram-dispatcher", daemon=True)
+                self._worker.start()
+
+    def enqueue(self, message: str, key: str = None) -> bool:
+        """
+        Queues a message for delivery. Never blocks and never raises.
+        Returns False when the dispatcher is not configured or the queue is full.
+        """
+        if not self.enabled:
+            logger.warning("Telegram Bot Token or Chat ID not configured. Skipping notification.")
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait((key or message, message))
+            self._idle.clear()
+            return True
+        except queue.Full:
+            logger.error("Telegram dispatcher queue is full. Dropping notification.")
+            return False
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Forces pending digests out and waits until everything queued so far
+        has been delivered (or given up on). Returns False on timeout.
+        """
+        if self._worker is None:
+            return True
+        self._idle.clear()
+        self._queue.put((None, None))
+        return self._idle.wait(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        self.flush(timeout)
+        self._stop.set()
+        if self._worker is not None:
+            self._queue.put((None, None))
+            self._worker.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                key, message = self._queue.get(timeout=self._next_deadline())
+            except queue.Empty:
+                key, message = None, False
+
+            if message is None:
+                # Flush marker: emit every pending digest right away.
+                self._send_due(force=True)
+            elif message is not False:
+                group = self._pending.setdefault(key, {'messages': [], 'first_at': time.monotonic()})
+                group['messages'].append(message)
+
+            self._send_due(force=False)
+            if not self._pending and self._queue.empty():
+                self._idle.set()
+
+    def _next_deadline(self) -> float:
+        if not self._pending:
+            return 1.0
+        oldest = min(group['first_at'] for group in self._pending.values())
+        return max(0.0, oldest + self.coalesce_window - time.monotonic())
+
+    def _send_due(self, force: bool):
+        now = time.monotonic()
+        due = [key for key, group in self._pending.items()
+               if force or now - group['first_at'] >= self.coalesce_window]
+        for key in due:
+            group = self._pending.pop(key)
+            for text in self._build_digest(group['messages']):
+                self._deliver(text)
+
+    def _build_digest(self, messages: list) -> list:
+        if len(messages) == 1:
+            body = messages[0]
+        else:
+            header = f"<b>Resumen: {len(messages)} notificaciones</b>"
+            body = header + DIGEST_SEPARATOR + DIGEST_SEPARATOR.join(messages)
+        return _split_html(body, TELEGRAM_MAX_MESSAGE_LENGTH)
+
+    def _acquire_token(self):
+        rate = self.max_per_minute / 60.0
+        while True:
+            now = time.monotonic()
+            self._tokens = min(float(self.max_per_minute), self._tokens + (now - self._last_refill) * rate)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            time.sleep((1 - self._tokens) / rate)
+
+    def _deliver(self, text: str) -> bool:
+        payload = {"chat_id": self.chat_id, "text": text, "parse_mode": "HTML"}
+        for attempt in range(self.max_retries + 1):
+            self._acquire_token()
+            retry_after = None
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+                if response.status_code < 400:
+                    logger.info("Telegram message sent successfully.")
+                    return True
+                if response.status_code == 429:
+                    try:
+                        retry_after = response.json().get("parameters", {}).get("retry_after")
+                    except ValueError:
+                        retry_after = None
+                elif response.status_code < 500:
+                    logger.error(f"Telegram rejected the message ({response.status_code}): {response.text[:200]}")
+                    return False
+                logger.warning(f"Telegram returned {response.status_code} (attempt {attempt + 1}).")
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Failed to send Telegram message (attempt {attempt + 1}): {e}")
+
+            if attempt < self.max_retries:
+                time.sleep(retry_after if retry_after is not None else self.backoff_base * (2 ** attempt))
+
+        logger.error("Giving up on Telegram message after retries.")
+        return False
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_telegram_dispatcher() -> TelegramDispatcher:
+    """
+    Returns the process-wide dispatcher, creating it on first use.
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = TelegramDispatcher(
+                coalesce_window=float(os.getenv("TELEGRAM_COALESCE_SECONDS", 5)),
+                max_per_minute=int(os.getenv("TELEGRAM_MAX_PER_MINUTE", 20)),
+            )
+            atexit.register(_dispatcher.stop, 3.0)
+        return _dispatcher
+
+
+def notificar_telegram(message: str, key: str = None) -> bool:
+    """
+    Non-blocking entry point for business flows. Messages sharing `key`
+    within the coalescing window are delivered as a single digest.
+    """
+    try:
+        return get_telegram_dispatcher().enqueue(message, key)
+    except Exception as e:
+        logger.error(f"Could not enqueue Telegram message: {e}", exc_info=True)
+        return False
@@ -0,0 +1,180 @@
+"""
+Despacho de webhooks salientes (n8n) con outbox persistente.
+
+`encolar_webhook(url, payload)` inserta el evento en una tabla outbox de un
+archivo SQLite local y vuelve enseguida; un pool fijo de hilos lo envía con
+una única `requests.Session` (conexiones keep-alive reutilizadas). Cada
+endpoint admite a lo sumo `max_por_endpoint` envíos simultáneos, así una
+ráfaga hacia un mismo webhook no acapara todos los hilos. Los errores de red,
+los 5xx, 408 y 429 se reintentan con backoff exponencial; el resto de los 4xx
+o agotar los intentos deja el evento FALLIDO. Como el evento queda escrito
+antes de enviarse, un reinicio no lo pierde: el próximo despachador retoma
+los pendientes y los que quedaron a medio enviar (vencido su `lease`).
+La entrega es al-menos-una-vez; el header X-Webhook-Id permite deduplicar.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.services.cola_sqlite import ColaSQLite
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = 'PENDIENTE'
+ENVIANDO = 'ENVIANDO'
+ENVIADO = 'ENVIADO'
+FALLIDO = 'FALLIDO'
+
+ESTADOS_HTTP_REINTENTABLES = {408, 429}
+
+
+class DespachadorWebhooks(ColaSQLite):
+
+    nombre = 'webhooks'
+    tabla = 'outbox'
+    columna_id = 'id'
+    columnas_trabajo = ('id', 'url', 'payload', 'intentos')
+    en_curso = ENVIANDO
+    lote_worker = 20
+
+    def __init__(self, path: str, max_workers: int = 4, max_por_endpoint: int = 2, max_intentos: int = 8,
+                 espera_base: float = 2.0, espera_max: float = 600.0, timeout: float = 5.0,
+                 lease: float = 120.0, intervalo: float = 1.0, retencion_dias: int = 7,
+                 session: Optional[requests.Session] = None):
+        self.max_por_endpoint = max_por_endpoint
+        self.timeout = timeout
+        self.retencion_dias = retencion_dias
+        self.session = session or self._crear_session(max_workers)
+        self._en_vuelo: Dict[str, int] = {}
+        super().__init__(path, max_workers=max_workers, max_intentos=max_intentos, espera_base=espera_base,
+                         espera_max=espera_max, lease=lease, intervalo=intervalo)
+
+    def _crear_tablas(self, conn):
+        conn.execute("""CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, payload TEXT NOT NULL,
+            estado TEXT NOT NULL, intentos INTEGER NOT NULL DEFAULT 0, proximo_intento REAL NOT NULL,
+            tomado_en REAL, ultimo_error TEXT, creado_en REAL NOT NULL, enviado_en REAL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_pendientes ON outbox (estado, proximo_intento)")
+
+    @staticmethod
+    def _crear_session(max_workers: int) -> requests.Session:
+        session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=8, pool_maxsize=max_workers)
+        session.mount('http://', adaptador)
+        session.mount('https://', adaptador)
+        return session
+
+    def encolar(self, url: str, payload: Dict) -> int:
+        ahora = time.time()
+        conn = self._conexion()
+        evento_id = conn.execute(
+            "INSERT INTO outbox (url, payload, estado, proximo_intento, creado_en) VALUES (?, ?, ?, ?, ?)",
+            (url, json.dumps(payload, default=str), PENDIENTE, ahora, ahora)).lastrowid
+        if evento_id % 500 == 0:
+            conn.execute("DELETE FROM outbox WHERE estado = ? AND enviado_en < ?",
+                         (ENVIADO, ahora - self.retencion_dias * 86400))
+        self._hay_trabajo.set()
+        return evento_id
+
+    # region Envío
+    def _reservar_endpoint(self, url: str) -> bool:
+        with self._lock:
+            if self._en_vuelo.get(url, 0) >= self.max_por_endpoint:
+                return False
+            self._en_vuelo[url] = self._en_vuelo.get(url, 0) + 1
+            return True
+
+    def _liberar_endpoint(self, url: str):
+        with self._lock:
+            self._en_vuelo[url] -= 1
+
+    def _aceptar(self, fila) -> bool:
+        """Sólo se toman eventos de endpoints que no estén en su límite de concurrencia."""
+        return self._reservar_endpoint(fila[1])
+
+    def _soltar(self, fila):
+        self._liberar_endpoint(fila[1])
+
+    def _filtro_candidatos(self):
+        """Los endpoints en su límite quedan fuera de la consulta: sus eventos no tapan a los del resto."""
+        with self._lock:
+            saturados = tuple(url for url, en_vuelo in self._en_vuelo.items() if en_vuelo >= self.max_por_endpoint)
+        if not saturados:
+            return '', ()
+        return f"url NOT IN ({', '.join('?' * len(saturados))})", saturados
+
+    def _procesar(self, evento_id: int, url: str, payload: str, intentos: int, token: str):
+        intentos += 1
+        try:
+            respuesta = self.session.post(url, data=payload, timeout=self.timeout, headers={
+                'Content-Type': 'application/json', 'X-Webhook-Id': str(evento_id)})
+            if respuesta.status_code < 300:
+                error, reintentable = None, False
+            else:
+                error = f"HTTP {respuesta.status_code}"
+                reintentable = respuesta.status_code >= 500 or respuesta.status_code in ESTADOS_HTTP_REINTENTABLES
+        except requests.exceptions.RequestException as e:
+            error, reintentable = str(e) or type(e).__name__, True
+        finally:
+            self._liberar_endpoint(url)
+
+        ahora = time.time()
+        with self._transaccion() as conn:
+            if error is None:
+                if self._cerrar_tomada(conn, evento_id, token, {
+                        'estado': ENVIADO, 'intentos': intentos, 'ultimo_error': None, 'enviado_en': ahora}):
+                    logger.info(f"[Webhooks] Evento {evento_id} enviado a {url}.")
+            elif reintentable and intentos < self.max_intentos:
+                espera = self._espera(intentos)
+                if self._cerrar_tomada(conn, evento_id, token, {
+                        'estado': PENDIENTE, 'intentos': intentos, 'ultimo_error': error,
+                        'proximo_intento': ahora + espera}):
+                    logger.warning(f"[Webhooks] Evento {evento_id} a {url} falló (intento {intentos}), "
+                                   f"reintento en {espera:.0f} s: {error}")
+            elif self._cerrar_tomada(conn, evento_id, token, {
+                    'estado': FALLIDO, 'intentos': intentos, 'ultimo_error': error}):
+                logger.error(f"[Webhooks] Evento {evento_id} a {url} descartado tras {intentos} intento(s): {error}")
+
+    def detener(self, timeout: float = 5.0):
+        super().detener(timeout)
+        self.session.close()
+    # endregion
+
+
+_despachador = None
+_despachador_lock = threading.Lock()
+
+
+def get_despachador_webhooks() -> DespachadorWebhooks:
+    """
+    Despachador del proceso, con los workers ya corriendo. El outbox se toma
+    de WEBHOOKS_OUTBOX_PATH (por defecto `webhooks_outbox.sqlite3` en el
+    directorio de trabajo).
+    """
+    global _despachador
+    with _despachador_lock:
+        if _despachador is None:
+            _despachador = DespachadorWebhooks(
+                os.getenv('WEBHOOKS_OUTBOX_PATH', os.path.join(os.getcwd(), 'webhooks_outbox.sqlite3')),
+                max_workers=int(os.getenv('WEBHOOKS_WORKERS', 4)),
+                max_por_endpoint=int(os.getenv('WEBHOOKS_POR_ENDPOINT', 2)),
+            )
+            atexit.register(_despachador.detener, 1.0)
+        _despachador.iniciar()
+        return _despachador
+
+
+def encolar_webhook(url: str, payload: Dict) -> Optional[int]:
+    """Encola un webhook para envío en segundo plano. Nunca interrumpe el flujo que lo llama."""
+    try:
+        return get_despachador_webhooks().encolar(url, payload)
+    except Exception as e:
+        logger.error(f"[Webhooks] No se pudo encolar el webhook a {url}: {e}")
+        return None
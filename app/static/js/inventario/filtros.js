@@ -82,26 +82,10 @@ document.addEventListener('DOMContentLoaded', function () {
 
             rows.forEach(row => {
                 const insumoNombre = row.dataset.insumoNombre.toLowerCase();
-                const collapseTargetId = row.querySelector('.btn-expand').dataset.bsTarget;
-                const collapseElement = document.querySelector(collapseTargetId);
-
                 const matchInsumo = insumoNombre.includes(insumoQuery);
 
-                let matchLote = false;
-                if (loteQuery === '') {
-                    matchLote = true;
-                } else if (collapseElement) {
-                    const lotesRows = collapseElement.querySelectorAll('tbody tr');
-                    lotesRows.forEach(loteRow => {
-                        const loteNumeroCell = loteRow.cells[0]; // El número de lote está en la segunda celda
-                        if (loteNumeroCell) {
-                           const loteNumero = loteNumeroCell.textContent.toLowerCase().trim();
-                            if (loteNumero.includes(loteQuery)) {
-                                matchLote = true;
-                            }
-                        }
-                    });
-                }
+                // Los lotes se cargan al expandir; los números de lote vienen en la fila del insumo.
+                const matchLote = loteQuery === '' || (row.dataset.lotes || '').includes(loteQuery);
 
                 if (matchInsumo && matchLote) {
                     row.style.display = '';
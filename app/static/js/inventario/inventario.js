@@ -1,4 +1,28 @@
 document.addEventListener('DOMContentLoaded', function () {
+    // --- Detalle de lotes: se pide al servidor la primera vez que se expande el insumo ---
+    function cargarLotes(collapseElement) {
+        const contenedor = collapseElement.querySelector('.lotes-insumo');
+        if (!contenedor || contenedor.dataset.cargado) {
+            return;
+        }
+        contenedor.dataset.cargado = '1';
+        fetch(contenedor.dataset.url)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.text();
+            })
+            .then(html => {
+                contenedor.innerHTML = html;
+                contenedor.querySelectorAll('[data-bs-toggle="tooltip"]').forEach(el => new bootstrap.Tooltip(el));
+            })
+            .catch(() => {
+                delete contenedor.dataset.cargado;
+                contenedor.innerHTML = '<div class="text-center text-danger py-3">No se pudieron cargar los lotes.</div>';
+            });
+    }
+
     // --- Lógica para el botón de expandir/colapsar ---
     const expandButtons = document.querySelectorAll('.btn-expand');
     expandButtons.forEach(button => {
@@ -10,6 +34,7 @@ document.addEventListener('DOMContentLoaded', function () {
             collapseElement.addEventListener('show.bs.collapse', function () {
                 icon.classList.remove('bi-chevron-right');
                 icon.classList.add('bi-chevron-down');
+                cargarLotes(collapseElement);
             });
 
             collapseElement.addEventListener('hide.bs.collapse', function () {
@@ -103,7 +103,9 @@ document.addEventListener('DOMContentLoaded', function () {
     
     // ===== FILTROS =====
     const filterButtons = document.querySelectorAll('.filter-btn');
-    const allCards = document.querySelectorAll('.kanban-card');
+    // Las tarjetas cambian con el refresco incremental: se buscan en cada uso.
+    const getCards = () => document.querySelectorAll('.kanban-card');
+    let filtroActivo = 'todas';
     
     filterButtons.forEach(btn => {
         btn.addEventListener('click', function() {
@@ -111,15 +113,15 @@ document.addEventListener('DOMContentLoaded', function () {
             filterButtons.forEach(b => b.classList.remove('active'));
             this.classList.add('active');
             
-            const filter = this.dataset.filter;
-            applyFilter(filter);
+            filtroActivo = this.dataset.filter;
+            applyFilter(filtroActivo);
         });
     });
     
     function applyFilter(filter) {
         let visibleCount = 0;
         
-        allCards.forEach(card => {
+        getCards().forEach(card => {
             let show = true;
             
             if (filter === 'todas') {
@@ -193,7 +195,7 @@ document.addEventListener('DOMContentLoaded', function () {
     }
     
     // ===== HOVER EN CARDS (MOSTRAR MÁS INFO) =====
-    allCards.forEach(card => {
+    const prepararTarjeta = (card) => {
         card.addEventListener('mouseenter', function() {
             this.style.zIndex = '10';
         });
@@ -201,7 +203,8 @@ document.addEventListener('DOMContentLoaded', function () {
         card.addEventListener('mouseleave', function() {
             this.style.zIndex = '1';
         });
-    });
+    };
+    getCards().forEach(prepararTarjeta);
     
     // ===== ACCIONES DE TARJETA =====
     document.addEventListener('click', function(e) {
@@ -444,7 +447,7 @@ document.addEventListener('DOMContentLoaded', function () {
         searchInput.addEventListener('input', function() {
             const searchTerm = this.value.toLowerCase();
             
-            allCards.forEach(card => {
+            getCards().forEach(card => {
                 const productName = card.querySelector('.product-name').textContent.toLowerCase();
                 const productCode = card.querySelector('.product-code').textContent.toLowerCase();
                 
@@ -542,6 +545,90 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     });
     
+    // ===== REFRESCO INCREMENTAL =====
+    // Se consulta la versión del tablero; el servidor responde 304 si nada cambió.
+    // El delta se aplica sobre el DOM: sólo se reemplazan, mueven o quitan las
+    // tarjetas afectadas y se actualizan las métricas del día.
+    let versionTablero = typeof KANBAN_VERSION !== 'undefined' ? KANBAN_VERSION : '';
+    const aplicarDelta = (delta) => {
+        const cambiadas = delta.cambiadas || [];
+        if (delta.completo) {
+            // Versión desconocida: llegó el tablero entero, sobra lo que no vino.
+            const vigentes = new Set(cambiadas.map(tarjeta => String(tarjeta.orden.id)));
+            getCards().forEach(card => {
+                if (!vigentes.has(card.dataset.opId)) card.remove();
+            });
+        }
+        (delta.eliminadas || []).forEach(opId => {
+            const card = document.querySelector(`.kanban-card[data-op-id="${opId}"]`);
+            if (card) card.remove();
+        });
+        cambiadas.forEach(tarjeta => {
+            const contenedor = document.getElementById(`kanban-cards-${tarjeta.columna}`);
+            const plantilla = document.createElement('template');
+            plantilla.innerHTML = (tarjeta.html || '').trim();
+            const nueva = plantilla.content.querySelector('.kanban-card');
+            if (!contenedor || !nueva) return;
+            prepararTarjeta(nueva);
+            const actual = document.querySelector(`.kanban-card[data-op-id="${tarjeta.orden.id}"]`);
+            if (actual && actual.parentElement === contenedor) {
+                actual.replaceWith(nueva);
+            } else {
+                if (actual) actual.remove();
+                contenedor.appendChild(nueva);
+            }
+        });
+        Object.entries(delta.metricas_dia || {}).forEach(([clave, valor]) => {
+            const elemento = document.querySelector(`.metric-value[data-metrica="${clave}"]`);
+            if (!elemento) return;
+            const sufijo = elemento.textContent.trim().endsWith('%') ? '%' : '';
+            elemento.textContent = `${valor || 0}${sufijo}`;
+        });
+        // Reaplica el filtro vigente y recalcula contadores y estados vacíos.
+        applyFilter(filtroActivo);
+    };
+    const refrescarTablero = async () => {
+        if (document.hidden || !versionTablero) return;
+        try {
+            const response = await fetch('/produccion/kanban/api/tablero', {
+                headers: { 'If-None-Match': `"${versionTablero}"` }
+            });
+            if (response.status !== 200) return;
+            const result = await response.json();
+            const delta = result.data || {};
+            aplicarDelta(delta);
+            versionTablero = delta.version || versionTablero;
+        } catch (error) {
+            console.warn('No se pudo refrescar el tablero:', error);
+        }
+    };
+    // Los cambios llegan por SSE y disparan el refresco incremental; el polling
+    // queda como respaldo lento mientras el canal está abierto.
+    let canalAbierto = false;
+    const conectarEventos = () => {
+        if (typeof EventSource === 'undefined') return;
+        const eventos = new EventSource('/produccion/kanban/api/eventos');
+        eventos.onopen = () => { canalAbierto = true; };
+        eventos.onmessage = () => refrescarTablero();
+        // El servidor ya no tiene los eventos perdidos: el delta por versión los cubre.
+        eventos.addEventListener('reset', () => refrescarTablero());
+        eventos.onerror = () => {
+            canalAbierto = false;
+            if (eventos.readyState === EventSource.CLOSED) {
+                setTimeout(conectarEventos, 30000);
+            }
+        };
+    };
+    conectarEventos();
+    let ultimoPoll = 0;
+    setInterval(() => {
+        const intervalo = canalAbierto ? 120000 : 15000;
+        if (Date.now() - ultimoPoll >= intervalo) {
+            ultimoPoll = Date.now();
+            refrescarTablero();
+        }
+    }, 5000);
+
     console.log('✅ Tablero Kanban listo');
     console.log('💡 Atajos de teclado: Ctrl/Cmd + 1-6 para filtros rápidos');
 });
\ No newline at end of file
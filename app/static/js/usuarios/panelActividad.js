@@ -1,7 +1,8 @@
 const ActividadPanel = (function() {
     // --- ELEMENTOS DEL DOM (privados) ---
     let unifiedContainer, loadingUnified, noUnifiedMsg, activityTable, activityTableBody;
-    let filterSector, filterRol, filterFechaDesde, filterFechaHasta, refreshButton;
+    let filterSector, filterRol, filterFechaDesde, filterFechaHasta, refreshButton, loadMoreButton, exportButton;
+    let siguienteCursor = null;
 
     // --- FUNCIONES DE RENDERIZADO (privadas) ---
     function formatArgentinianDate(dateString) {
@@ -56,27 +57,40 @@ const ActividadPanel = (function() {
     }
 
     // --- LÓGICA DE FETCH Y FILTRADO (privada) ---
-    function fetchAndRender() {
+    function buildFilterParams() {
         const params = new URLSearchParams();
         if (filterSector.value) params.append('sector_id', filterSector.value);
         if (filterRol.value) params.append('rol_id', filterRol.value);
         if (filterFechaDesde.value) params.append('fecha_desde', filterFechaDesde.value);
         if (filterFechaHasta.value) params.append('fecha_hasta', filterFechaHasta.value);
+        return params;
+    }
+
+    // Carga la primera página (append = false) o la siguiente usando el cursor del servidor.
+    function fetchAndRender(append = false) {
+        const params = buildFilterParams();
+        if (append && siguienteCursor) params.append('cursor', siguienteCursor);
         const queryString = params.toString();
 
-        loadingUnified.style.display = 'block';
-        activityTable.style.display = 'none';
-        noUnifiedMsg.style.display = 'none';
+        if (!append) {
+            loadingUnified.style.display = 'block';
+            activityTable.style.display = 'none';
+            noUnifiedMsg.style.display = 'none';
+            activityTableBody.innerHTML = '';
+        }
+        loadMoreButton.disabled = true;
 
         fetch(`${URL_UNIFIED_ACTIVITY}?${queryString}`)
             .then(response => response.ok ? response.json() : Promise.reject('Error de red'))
             .then(result => {
                 if (result.success && result.data.length > 0) {
-                    activityTableBody.innerHTML = result.data.map(createActivityTableRow).join('');
+                    activityTableBody.insertAdjacentHTML('beforeend', result.data.map(createActivityTableRow).join(''));
                     activityTable.style.display = 'table';
-                } else {
+                } else if (!append) {
                     noUnifiedMsg.style.display = 'flex';
                 }
+                siguienteCursor = result.success ? result.siguiente_cursor : null;
+                loadMoreButton.style.display = siguienteCursor ? 'inline-block' : 'none';
             })
             .catch(error => {
                 console.error(`Error en fetch para ${URL_UNIFIED_ACTIVITY}:`, error);
@@ -84,8 +98,13 @@ const ActividadPanel = (function() {
             })
             .finally(() => {
                 loadingUnified.style.display = 'none';
+                loadMoreButton.disabled = false;
             });
     }
+
+    function exportCsv() {
+        window.location.href = `${URL_UNIFIED_ACTIVITY}/exportar?${buildFilterParams().toString()}`;
+    }
     
     function setupDateFilters() {
         filterFechaDesde.addEventListener('change', () => {
@@ -96,11 +115,13 @@ const ActividadPanel = (function() {
     }
 
     function bindEvents() {
-        filterSector.addEventListener('change', fetchAndRender);
-        filterRol.addEventListener('change', fetchAndRender);
-        filterFechaDesde.addEventListener('change', fetchAndRender);
-        filterFechaHasta.addEventListener('change', fetchAndRender);
-        refreshButton.addEventListener('click', fetchAndRender);
+        filterSector.addEventListener('change', () => fetchAndRender());
+        filterRol.addEventListener('change', () => fetchAndRender());
+        filterFechaDesde.addEventListener('change', () => fetchAndRender());
+        filterFechaHasta.addEventListener('change', () => fetchAndRender());
+        refreshButton.addEventListener('click', () => fetchAndRender());
+        loadMoreButton.addEventListener('click', () => fetchAndRender(true));
+        exportButton.addEventListener('click', exportCsv);
         setupDateFilters();
     }
 
@@ -118,6 +139,8 @@ const ActividadPanel = (function() {
         filterFechaDesde = document.getElementById('filter-fecha-desde');
         filterFechaHasta = document.getElementById('filter-fecha-hasta');
         refreshButton = document.getElementById('refresh-activity');
+        loadMoreButton = document.getElementById('load-more-activity');
+        exportButton = document.getElementById('export-activity');
 
         if (!unifiedContainer) return; // Salir si el panel no está presente
 
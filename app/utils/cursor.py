@@ -0,0 +1,40 @@
+"""
+Cursores opacos para la paginación keyset.
+
+El cursor es la lista de valores de orden de la última fila entregada, en
+JSON y base64 url-safe sin relleno. `decodificar_cursor` levanta ValueError
+ante cualquier cursor mal formado; cada llamador decide si lo rechaza o
+vuelve a la primera página.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+
+def codificar_cursor(valores: List[Any]) -> str:
+    texto = json.dumps(valores, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor: str, cantidad: Optional[int] = None) -> List[Any]:
+    """Devuelve los valores del cursor; con `cantidad`, exige que sean exactamente esos."""
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor mal formado: {cursor!r}") from e
+    if not isinstance(valores, list) or (cantidad is not None and len(valores) != cantidad):
+        raise ValueError(f"Cursor mal formado: {cursor!r}")
+    return valores
+
+
+def fecha_iso(valor: Any) -> str:
+    """
+    Valida que `valor` sea una fecha/hora ISO 8601 y lo devuelve sin cambios.
+    Las fechas de un cursor terminan en filtros de PostgREST, así que no se
+    acepta nada que no se pueda interpretar como fecha.
+    """
+    if not isinstance(valor, str):
+        raise ValueError(f"Fecha de cursor inválida: {valor!r}")
+    datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    return valor
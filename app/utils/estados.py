@@ -226,3 +226,29 @@ OP_FILTROS_UI_ACTUALIZADOS = [
     (OP_CONSOLIDADA, 'Consolidadas'),
     (OP_CANCELADA, 'Canceladas'),
 ]
+
+# -----------------------------------------------------------------------------
+# ESTADO CREDITICIO DE CLIENTES
+# -----------------------------------------------------------------------------
+
+CREDITO_NORMAL = 'normal'
+CREDITO_ALERTADO = 'alertado'
+
+
+def estado_crediticio_por_vencidos(conteo_vencidos, umbral):
+    """Un cliente queda 'alertado' cuando supera el umbral de pedidos vencidos."""
+    return CREDITO_ALERTADO if conteo_vencidos > umbral else CREDITO_NORMAL
+
+
+def calcular_transiciones_crediticias(clientes, vencidos_por_cliente, umbral):
+    """
+    Compara el estado actual de cada cliente con el que le corresponde según
+    sus pedidos vencidos. Devuelve {estado_destino: [ids]} sólo con los
+    clientes que deben cambiar.
+    """
+    transiciones = {}
+    for cliente in clientes:
+        nuevo_estado = estado_crediticio_por_vencidos(vencidos_por_cliente.get(cliente['id'], 0), umbral)
+        if cliente.get('estado_crediticio') != nuevo_estado:
+            transiciones.setdefault(nuevo_estado, []).append(cliente['id'])
+    return transiciones
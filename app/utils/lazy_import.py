@@ -0,0 +1,71 @@
+"""
+Importación diferida de librerías pesadas.
+
+`lazy_import('pandas')` devuelve un módulo sustituto que importa el real la
+primera vez que se accede a uno de sus atributos, así importar un controlador
+o registrar un blueprint no carga pandas, OpenCV, face_recognition o
+xhtml2pdf hasta que la funcionalidad que los usa se ejecuta. Para
+dependencias opcionales, `disponible(modulo)` indica si se pudo importar.
+"""
+import importlib
+import logging
+import threading
+import types
+
+logger = logging.getLogger(__name__)
+
+# Librerías que no deben cargarse al arrancar la aplicación (lo verifica el test de arranque).
+MODULOS_PESADOS = ('pandas', 'numpy', 'cv2', 'face_recognition', 'xhtml2pdf', 'matplotlib', 'qrcode')
+
+
+class _ModuloDiferido(types.ModuleType):
+
+    def __init__(self, nombre: str):
+        super().__init__(nombre)
+        self.__dict__['_modulo'] = None
+        self.__dict__['_error'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _cargar(self):
+        modulo = self.__dict__['_modulo']
+        if modulo is not None:
+            return modulo
+        with self.__dict__['_lock']:
+            if self.__dict__['_modulo'] is None:
+                if self.__dict__['_error'] is not None:
+                    raise self.__dict__['_error']
+                try:
+                    self.__dict__['_modulo'] = importlib.import_module(self.__name__)
+                except ImportError as e:
+                    self.__dict__['_error'] = e
+                    raise
+                logger.debug(f"Módulo {self.__name__} importado en diferido.")
+            return self.__dict__['_modulo']
+
+    def __getattr__(self, atributo):
+        return getattr(self._cargar(), atributo)
+
+    def __dir__(self):
+        return dir(self._cargar())
+
+    def __repr__(self):
+        estado = 'cargado' if self.__dict__['_modulo'] is not None else 'diferido'
+        return f"<módulo {estado} '{self.__name__}'>"
+
+
+def lazy_import(nombre: str) -> types.ModuleType:
+    """Sustituto de `import nombre` que difiere la importación hasta el primer uso."""
+    return _ModuloDiferido(nombre)
+
+
+def disponible(modulo) -> bool:
+    """True si el módulo (diferido o no) se puede importar. Lo importa si todavía no lo estaba."""
+    if modulo is None:
+        return False
+    if not isinstance(modulo, _ModuloDiferido):
+        return True
+    try:
+        modulo._cargar()
+        return True
+    except ImportError:
+        return False
@@ -0,0 +1,268 @@
+"""
+Perfilador de consultas PostgREST por request.
+
+Se engancha a las sesiones httpx del cliente de Supabase mediante `event_hooks`,
+por lo que ve todas las llamadas (table, schema().table, rpc) sin tocar los
+modelos. Por cada request muestreado registra tabla, método, latencia y tamaño
+de respuesta; marca como sospechas de N+1 las "formas" de consulta repetidas
+(misma tabla, método y filtros, ignorando los valores) y agrega un header
+`Server-Timing`. Los agregados p50/p95 por ruta y por tabla se guardan en
+ventanas acotadas en memoria.
+"""
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger(__name__)
+
+REST_PREFIX = '/rest/v1/'
+HTTP_METHOD_LABELS = {'GET': 'select', 'HEAD': 'count', 'POST': 'insert', 'PATCH': 'update', 'DELETE': 'delete'}
+
+_current_profile: contextvars.ContextVar = contextvars.ContextVar('query_profile', default=None)
+
+
+class QueryRecord:
+    __slots__ = ('table', 'method', 'shape', 'duration_ms', 'size')
+
+    def __init__(self, table: str, method: str, shape: str, duration_ms: float, size: int):
+        self.table = table
+        self.method = method
+        self.shape = shape
+        self.duration_ms = duration_ms
+        self.size = size
+
+
+class RequestProfile:
+    """Consultas registradas durante un único request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries: List[QueryRecord] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: QueryRecord):
+        with self._lock:
+            self.queries.append(record)
+
+    @property
+    def db_ms(self) -> float:
+        return sum(q.duration_ms for q in self.queries)
+
+    def n_plus_one_suspects(self, threshold: int) -> Dict[str, int]:
+        conteo = defaultdict(int)
+        for q in self.queries:
+            conteo[q.shape] += 1
+        return {shape: n for shape, n in conteo.items() if n >= threshold}
+
+
+def _percentile(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = min(len(ordenados) - 1, max(0, int(round(p * (len(ordenados) - 1)))))
+    return round(ordenados[k], 2)
+
+
+class QueryStats:
+    """Ventanas acotadas de muestras por ruta y por tabla."""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._routes = defaultdict(lambda: deque(maxlen=self.window))
+        self._tables = defaultdict(lambda: deque(maxlen=self.window))
+        self._n_plus_one = defaultdict(int)
+
+    def record(self, route: str, profile: RequestProfile, total_ms: float, suspects: Dict[str, int]):
+        with self._lock:
+            self._routes[route].append((total_ms, profile.db_ms, len(profile.queries)))
+            for q in profile.queries:
+                self._tables[q.table].append((q.duration_ms, q.size))
+            for shape in suspects:
+                self._n_plus_one[(route, shape)] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            rutas = {ruta: list(m) for ruta, m in self._routes.items()}
+            tablas = {tabla: list(m) for tabla, m in self._tables.items()}
+            n_plus_one = dict(self._n_plus_one)
+
+        return {
+            'rutas': {
+                ruta: {
+                    'muestras': len(m),
+                    'p50_ms': _percentile([x[0] for x in m], 0.5),
+                    'p95_ms': _percentile([x[0] for x in m], 0.95),
+                    'db_p50_ms': _percentile([x[1] for x in m], 0.5),
+                    'db_p95_ms': _percentile([x[1] for x in m], 0.95),
+                    'consultas_p50': _percentile([x[2] for x in m], 0.5),
+                    'consultas_p95': _percentile([x[2] for x in m], 0.95),
+                } for ruta, m in rutas.items()
+            },
+            'tablas': {
+                tabla: {
+                    'muestras': len(m),
+                    'p50_ms': _percentile([x[0] for x in m], 0.5),
+                    'p95_ms': _percentile([x[0] for x in m], 0.95),
+                    'bytes_p95': _percentile([x[1] for x in m], 0.95),
+                } for tabla, m in tablas.items()
+            },
+            'n_plus_one': [
+                {'ruta': ruta, 'forma': shape, 'requests': veces}
+                for (ruta, shape), veces in sorted(n_plus_one.items(), key=lambda kv: -kv[1])
+            ],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._tables.clear()
+            self._n_plus_one.clear()
+
+
+stats = QueryStats(window=int(os.getenv('QUERY_PROFILER_WINDOW', 500)))
+
+
+def _query_shape(method: str, table: str, query: str) -> str:
+    """
+    Normaliza una consulta quitando los valores de los filtros, de modo que
+    `id=eq.1` y `id=eq.2` compartan la misma forma.
+    """
+    partes = []
+    for clave, valor in parse_qsl(query, keep_blank_values=True):
+        if clave in ('select', 'order', 'on_conflict', 'columns'):
+            partes.append(f"{clave}={valor}")
+        elif clave in ('limit', 'offset'):
+            partes.append(f"{clave}=?")
+        else:
+            operador = valor.split('.', 1)[0] if '.' in valor else '?'
+            partes.append(f"{clave}={operador}.?")
+    return f"{method} {table}?{'&'.join(sorted(partes))}"
+
+
+def _on_request(request):
+    if _current_profile.get() is not None:
+        request.extensions['query_profiler_t0'] = time.perf_counter()
+
+
+def _on_response(response):
+    profile = _current_profile.get()
+    if profile is None:
+        return
+    t0 = response.request.extensions.get('query_profiler_t0')
+    if t0 is None:
+        return
+    try:
+        response.read()
+        size = len(response.content)
+    except Exception:
+        size = int(response.headers.get('content-length', 0) or 0)
+    duration_ms = (time.perf_counter() - t0) * 1000
+
+    request = response.request
+    path = request.url.path
+    table = path.split(REST_PREFIX, 1)[-1] if REST_PREFIX in path else path
+    schema = request.headers.get('accept-profile') or request.headers.get('content-profile')
+    if schema and schema != 'public':
+        table = f"{schema}.{table}"
+    method = 'rpc' if '/rpc/' in path else HTTP_METHOD_LABELS.get(request.method, request.method.lower())
+    query = request.url.query.decode() if isinstance(request.url.query, bytes) else request.url.query
+    profile.add(QueryRecord(table, method, _query_shape(method, table, query), duration_ms, size))
+
+
+def instrument_session(session):
+    """Añade los hooks del perfilador a una sesión httpx (idempotente)."""
+    hooks = session.event_hooks
+    if _on_request not in hooks.get('request', []):
+        session.event_hooks = {
+            'request': list(hooks.get('request', [])) + [_on_request],
+            'response': list(hooks.get('response', [])) + [_on_response],
+        }
+    return session
+
+
+class ProfiledClient:
+    """
+    Envoltorio transparente del cliente de Supabase. Instrumenta la sesión
+    PostgREST principal y reutiliza (instrumentado) un cliente por esquema en
+    lugar de crear uno nuevo en cada `schema()`.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._schemas = {}
+        self._schemas_lock = threading.Lock()
+        instrument_session(client.postgrest.session)
+
+    def schema(self, schema: str):
+        with self._schemas_lock:
+            if schema not in self._schemas:
+                postgrest = self._client.schema(schema)
+                instrument_session(postgrest.session)
+                self._schemas[schema] = postgrest
+            return self._schemas[schema]
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def start_profile(sample_rate: float) -> Optional[contextvars.Token]:
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return None
+    return _current_profile.set(RequestProfile())
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+
+def init_query_profiler(app):
+    """
+    Registra los hooks de Flask que abren y cierran el perfil de cada request.
+    Configuración: QUERY_PROFILER_ENABLED, QUERY_PROFILER_SAMPLE_RATE y
+    QUERY_PROFILER_N1_THRESHOLD.
+    """
+    if not app.config.get('QUERY_PROFILER_ENABLED', True):
+        return
+
+    from flask import g, request
+
+    sample_rate = float(app.config.get('QUERY_PROFILER_SAMPLE_RATE', 1.0))
+    threshold = int(app.config.get('QUERY_PROFILER_N1_THRESHOLD', 5))
+
+    @app.before_request
+    def _abrir_perfil():
+        if request.path.startswith('/static'):
+            return
+        g._query_profiler_token = start_profile(sample_rate)
+
+    @app.after_request
+    def _cerrar_perfil(response):
+        profile = _current_profile.get()
+        if profile is None:
+            return response
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        suspects = profile.n_plus_one_suspects(threshold)
+        route = request.url_rule.rule if request.url_rule else request.path
+
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={profile.db_ms:.1f};desc="{len(profile.queries)} consultas", app;dur={total_ms:.1f}'
+        )
+        if suspects:
+            logger.warning(f"[PERF] Posible N+1 en {route}: " +
+                           "; ".join(f"{n}x {shape}" for shape, n in suspects.items()))
+        stats.record(route, profile, total_ms, suspects)
+        return response
+
+    @app.teardown_request
+    def _liberar_perfil(exc):
+        token = g.pop('_query_profiler_token', None)
+        if token is not None:
+            _current_profile.reset(token)
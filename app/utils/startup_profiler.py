@@ -0,0 +1,101 @@
+"""
+Perfilador del arranque de la aplicación.
+
+Ejecuta `create_app()` en un intérprete limpio con `python -X importtime` y
+resume cuánto tarda cada import (tiempo propio y acumulado) y cada paquete de
+primer nivel, además de las librerías pesadas que quedaron cargadas. Sirve
+para detectar quién vuelve a importar pandas, OpenCV o xhtml2pdf al arrancar.
+
+    flask perfil-arranque --top 20
+    python -m app.utils.startup_profiler
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from app.utils.lazy_import import MODULOS_PESADOS
+
+_SCRIPT_ARRANQUE = (
+    "import json, sys, time\n"
+    "t0 = time.perf_counter()\n"
+    "from app import create_app\n"
+    "create_app()\n"
+    "print(json.dumps({'segundos': time.perf_counter() - t0, 'modulos': sorted(sys.modules)}))\n"
+)
+
+
+def _parsear_importtime(salida: str) -> List[Dict]:
+    """Convierte las líneas `import time: propio | acumulado | módulo` en registros (tiempos en ms)."""
+    registros = []
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:'):
+            continue
+        partes = linea[len('import time:'):].split('|')
+        if len(partes) != 3 or not partes[0].strip().isdigit():
+            continue  # encabezado
+        registros.append({
+            'modulo': partes[2].strip(),
+            'propio_ms': int(partes[0]) / 1000,
+            'acumulado_ms': int(partes[1]) / 1000,
+        })
+    return registros
+
+
+def perfilar_arranque(cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None, timeout: int = 120) -> Dict:
+    """
+    Arranca la aplicación en un subproceso y devuelve:
+    {'segundos', 'modulos': [...por acumulado desc], 'paquetes': [...por propio desc], 'pesados_cargados'}.
+    """
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _SCRIPT_ARRANQUE],
+        cwd=cwd, env={**os.environ, **(env or {})}, capture_output=True, text=True, timeout=timeout,
+    )
+    lineas_json = [l for l in proceso.stdout.splitlines() if l.startswith('{')]
+    if proceso.returncode != 0 or not lineas_json:
+        raise RuntimeError(f"La aplicación no arrancó (código {proceso.returncode}): {proceso.stderr[-2000:]}")
+    resultado = json.loads(lineas_json[-1])
+
+    modulos = _parsear_importtime(proceso.stderr)
+    paquetes = defaultdict(float)
+    for registro in modulos:
+        paquetes[registro['modulo'].split('.')[0]] += registro['propio_ms']
+
+    cargados = set(resultado['modulos'])
+    return {
+        'segundos': resultado['segundos'],
+        'modulos': sorted(modulos, key=lambda r: r['acumulado_ms'], reverse=True),
+        'paquetes': sorted(({'paquete': p, 'propio_ms': ms} for p, ms in paquetes.items()),
+                           key=lambda r: r['propio_ms'], reverse=True),
+        'pesados_cargados': [m for m in MODULOS_PESADOS if m in cargados],
+    }
+
+
+def formatear_reporte(perfil: Dict, top: int = 15) -> str:
+    lineas = [f"Arranque (import + create_app): {perfil['segundos']:.2f} s", '',
+              f"{'acumulado ms':>13} {'propio ms':>10}  módulo"]
+    for registro in perfil['modulos'][:top]:
+        lineas.append(f"{registro['acumulado_ms']:>13.1f} {registro['propio_ms']:>10.1f}  {registro['modulo']}")
+    lineas += ['', f"{'propio ms':>13}  paquete"]
+    for registro in perfil['paquetes'][:top]:
+        lineas.append(f"{registro['propio_ms']:>13.1f}  {registro['paquete']}")
+    pesados = ', '.join(perfil['pesados_cargados']) or 'ninguna'
+    lineas += ['', f"Librerías pesadas cargadas al arrancar: {pesados}"]
+    return '\n'.join(lineas)
+
+
+def init_startup_profiler_cli(app):
+    """Registra `flask perfil-arranque` para medir el tiempo de import de cada módulo al arrancar."""
+    import click
+
+    @app.cli.command('perfil-arranque')
+    @click.option('--top', default=15, show_default=True, help='Cantidad de módulos y paquetes a listar.')
+    def perfil_arranque(top):
+        click.echo(formatear_reporte(perfilar_arranque(), top=top))
+
+
+if __name__ == '__main__':
+    print(formatear_reporte(perfilar_arranque(), top=int(sys.argv[1]) if len(sys.argv) > 1 else 15))
@@ -0,0 +1,26 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+from app.utils.decorators import permission_required
+from app.utils import query_profiler
+
+admin_rendimiento_bp = Blueprint('admin_rendimiento', __name__, url_prefix='/admin/rendimiento')
+
+
+@admin_rendimiento_bp.route('/consultas', methods=['GET'])
+@jwt_required()
+@permission_required(accion='admin_gestion_sistema')
+def estadisticas_consultas():
+    """
+    Devuelve p50/p95 de latencia y cantidad de consultas por ruta y por tabla,
+    junto con las formas de consulta sospechosas de N+1.
+    """
+    return jsonify({'success': True, 'data': query_profiler.stats.snapshot()}), 200
+
+
+@admin_rendimiento_bp.route('/consultas/reset', methods=['POST'])
+@jwt_required()
+@permission_required(accion='admin_gestion_sistema')
+def reiniciar_estadisticas_consultas():
+    """Descarta las muestras acumuladas del perfilador."""
+    query_profiler.stats.reset()
+    return jsonify({'success': True, 'message': 'Estadísticas reiniciadas.'}), 200
@@ -16,15 +16,17 @@ def listar_alertas_riesgo():
     from app.controllers.usuario_controller import UsuarioController
     
     usuario_controller = UsuarioController()
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-    
-    filtros = request.args.to_dict()
-    if 'page' in filtros:
-        del filtros['page']
+    per_page = 12
+    filtros = {
+        'q': request.args.get('q', '').strip(),
+        'estado': request.args.get('estado', '').strip(),
+    }
+    cursor = request.args.get('cursor')
+
+    resultado = AlertaRiesgoModel().buscar(filtros['q'], filtros['estado'], limite=per_page, cursor=cursor)
+    if not resultado.get('success'):
+        flash('No se pudieron cargar las alertas de riesgo.', 'danger')
 
-    resultado = AlertaRiesgoModel().get_all_paginated(page, per_page, filtros)
-    
     alertas = resultado.get('data', [])
     for alerta in alertas:
         if alerta.get('id_usuario_creador'):
@@ -36,10 +38,9 @@ def listar_alertas_riesgo():
     return render_template(
         'admin_riesgos/listado.html',
         alertas=alertas,
-        page=page,
         per_page=per_page,
-        total=resultado.get('total', 0),
-        total_pages=resultado.get('total_pages', 0),
+        es_primera_pagina=not cursor,
+        siguiente_cursor=resultado.get('siguiente_cursor'),
         filtros=filtros
     )
 
@@ -1,5 +1,5 @@
 import logging
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from flask_jwt_extended import get_jwt_identity
 from app.controllers.usuario_controller import UsuarioController
 from app.controllers.facial_controller import FacialController
@@ -60,21 +60,45 @@ def obtener_actividad_web():
         return jsonify(success=True, data=resultado.get('data', []))
     return jsonify(success=False, error=resultado.get('error')), 500
 
-@api_bp.route('/usuarios/actividad_unificada', methods=['GET'])
-@permission_required(accion='consultar_logs_o_auditoria')
-def obtener_actividad_unificada():
-    """Devuelve la actividad unificada en formato JSON."""
-    filtros = {
+def _filtros_actividad_unificada() -> dict:
+    return {
         'sector_id': request.args.get('sector_id') if request.args.get('sector_id') else None,
         'fecha_desde': request.args.get('fecha_desde') if request.args.get('fecha_desde') else None,
         'fecha_hasta': request.args.get('fecha_hasta') if request.args.get('fecha_hasta') else None,
         'rol_id': request.args.get('rol_id') if request.args.get('rol_id') else None,
     }
+
+@api_bp.route('/usuarios/actividad_unificada', methods=['GET'])
+@permission_required(accion='consultar_logs_o_auditoria')
+def obtener_actividad_unificada():
+    """
+    Devuelve una página de la actividad unificada en formato JSON.
+    Parámetros: filtros, 'limite' (por defecto 50) y 'cursor' (el 'siguiente_cursor' de la página anterior).
+    """
     usuario_controller = UsuarioController()
-    resultado = usuario_controller.obtener_actividad_unificada(filtros)
+    resultado = usuario_controller.obtener_actividad_unificada(
+        _filtros_actividad_unificada(),
+        cursor=request.args.get('cursor') or None,
+        limite=request.args.get('limite', 50, type=int),
+    )
     if resultado.get('success'):
-        return jsonify(success=True, data=resultado.get('data', []))
-    return jsonify(success=False, error=resultado.get('error')), 500
+        return jsonify(success=True, data=resultado.get('data', []), siguiente_cursor=resultado.get('siguiente_cursor'))
+    return jsonify(success=False, error=resultado.get('error')), resultado.get('status_code', 500)
+
+@api_bp.route('/usuarios/actividad_unificada/exportar', methods=['GET'])
+@permission_required(accion='consultar_logs_o_auditoria')
+def exportar_actividad_unificada():
+    """Exporta a CSV la actividad unificada filtrada, generando el archivo a medida que se lee."""
+    from app.services.actividad_service import generar_csv
+    usuario_controller = UsuarioController()
+    try:
+        items = usuario_controller.iterar_actividad_unificada(_filtros_actividad_unificada())
+    except Exception as e:
+        logger.error(f"Error al exportar la actividad unificada: {e}", exc_info=True)
+        return jsonify(success=False, error='Error al obtener actividad'), 500
+    return Response(stream_with_context(generar_csv(items)), mimetype='text/csv', headers={
+        'Content-Disposition': 'attachment; filename=actividad_usuarios.csv',
+    })
 
 @api_bp.route('/validar/campo_usuario', methods=['POST'])
 @permission_any_of('crear_empleado', 'modificar_empleado')
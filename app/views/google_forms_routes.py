@@ -1,29 +1,83 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.controllers.pedido_controller import PedidoController
+from app.services.ingesta_service import ErrorPermanente, get_cola_ingesta
+from app import csrf
 from datetime import datetime
+from functools import wraps
+import hmac
 import logging
 import traceback  # ⬅️ AGREGAR ESTA IMPORTACIÓN
 import json
 
 google_forms_bp = Blueprint('google_forms', __name__)
 logger = logging.getLogger(__name__)
+# Webhook de un sistema externo: no trae token CSRF; se autentica con `requiere_token_webhook`.
+csrf.exempt(google_forms_bp)
+
+FUENTE_PEDIDO = 'google_forms_pedido'
+
+
+def procesar_pedido_google_forms(data):
+    """
+    Procesa un pedido tomado de la cola de ingesta. Los rechazos del
+    controlador (4xx) no se reintentan; los errores 5xx sí.
+    """
+    form_data = transformar_datos_para_controlador(data)
+    logger.info(f"Procesando pedido de Google Forms de '{form_data['nombre_cliente']}' con {len(form_data['items'])} items")
+
+    resultado = PedidoController().crear_pedido_con_items(form_data, usuario_id=None)
+    response_data, status_code = resultado if isinstance(resultado, tuple) else (resultado, 200)
+    if hasattr(response_data, 'get_json'):
+        response_data = response_data.get_json()
+
+    if status_code >= 500:
+        raise RuntimeError(response_data.get('error', f'Error {status_code} al crear el pedido'))
+    if status_code >= 400 or not response_data.get('success', True):
+        raise ErrorPermanente(response_data.get('error', f'Pedido rechazado ({status_code})'))
+    return response_data.get('data')
+
+
+def registrar_procesadores_google_forms(cola):
+    cola.registrar_procesador(FUENTE_PEDIDO, procesar_pedido_google_forms)
+
+
+def iniciar_cola_google_forms(app):
+    """Cola de ingesta con los procesadores registrados y los workers corriendo."""
+    cola = get_cola_ingesta(app)
+    registrar_procesadores_google_forms(cola)
+    cola.iniciar()
+    return cola
+
+
+def requiere_token_webhook(f):
+    """
+    Exige el header X-Webhook-Token igual a GOOGLE_FORMS_WEBHOOK_SECRET. Si el
+    secreto no está configurado el endpoint queda cerrado (503).
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        secreto = current_app.config.get('GOOGLE_FORMS_WEBHOOK_SECRET')
+        if not secreto:
+            logger.error("GOOGLE_FORMS_WEBHOOK_SECRET no está configurado; se rechaza el webhook.")
+            return jsonify({'success': False, 'error': 'Integración no configurada'}), 503
+        token = request.headers.get('X-Webhook-Token', '')
+        if not hmac.compare_digest(token.encode('utf-8'), secreto.encode('utf-8')):
+            return jsonify({'success': False, 'error': 'No autorizado'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
 
 @google_forms_bp.route('/api/google-forms/pedido', methods=['POST'])
+@requiere_token_webhook
 def recibir_pedido_google_forms():
     """
-    Endpoint para recibir pedidos desde Google Forms vía webhook
-    Usa el controlador existente de pedidos
+    Endpoint para recibir pedidos desde Google Forms vía webhook.
+    Valida lo mínimo, guarda el envío en la cola de ingesta y responde 202;
+    el pedido se crea en segundo plano. Un reenvío del mismo formulario
+    (mismo payload o mismo Idempotency-Key) devuelve la misma entrada.
     """
     try:
-        data = request.get_json()
-
-        # 🔍 DEBUG DETALLADO
-        logger.info("=" * 50)
-        logger.info("📥 DATOS RECIBIDOS DE GOOGLE FORMS")
-        logger.info("=" * 50)
-        logger.info(f"Tipo de datos: {type(data)}")
-        logger.info(f"Keys disponibles: {list(data.keys()) if data else 'No data'}")
-        logger.info(f"Contenido completo: {data}")
+        data = request.get_json(silent=True)
 
         if not data:
             return jsonify({
@@ -39,37 +93,14 @@ def recibir_pedido_google_forms():
                 'error': 'Campo requerido faltante: nombre_cliente'
             }), 400
 
-        # Transformar datos
-        form_data = transformar_datos_para_controlador(data)
-
-        logger.info("🔄 DATOS TRANSFORMADOS:")
-        logger.info(f"Form data: {form_data}")
-        logger.info(f"Items count: {len(form_data.get('items', []))}")
-
-        pedido_controller = PedidoController()
-        # 🔍 DEBUG: Verificar el schema ANTES de llamar al controlador
-        debug_schema_validation(form_data, pedido_controller)
-
-        # Usar el controlador existente para crear el pedido
-        resultado = pedido_controller.crear_pedido_con_items(form_data)
-
-        # 🔍 DEBUG MEJORADO de la respuesta del controlador
-        logger.info(f"📤 RESPUESTA DEL CONTROLADOR:")
-        logger.info(f"Tipo de resultado: {type(resultado)}")
-
-        # Manejar diferentes tipos de retorno del controlador
-        if isinstance(resultado, tuple):
-            response_data, status_code = resultado
-            logger.info(f"Status: {status_code}")
-            if hasattr(response_data, 'get_json'):
-                logger.info(f"Data: {response_data.get_json()}")
-            else:
-                logger.info(f"Data: {response_data}")
-            return response_data
-        else:
-            # Si el controlador retorna solo un dict
-            logger.info(f"Data (dict): {resultado}")
-            return jsonify(resultado)
+        cola = iniciar_cola_google_forms(current_app._get_current_object())
+        clave, nueva = cola.encolar(FUENTE_PEDIDO, data, request.headers.get('Idempotency-Key'))
+        if not nueva:
+            logger.info(f"Envío de Google Forms repetido ({clave[:12]}), se ignora.")
+        return jsonify({
+            'success': True,
+            'data': {'id_ingesta': clave, 'duplicado': not nueva}
+        }), 202
 
     except Exception as e:
         logger.error(f"❌ ERROR GENERAL: {str(e)}")
@@ -79,6 +110,16 @@ def recibir_pedido_google_forms():
             'error': f'Error interno del servidor: {str(e)}'
         }), 500
 
+
+@google_forms_bp.route('/api/google-forms/pedido/<id_ingesta>', methods=['GET'])
+@requiere_token_webhook
+def estado_pedido_google_forms(id_ingesta):
+    """Estado del procesamiento de un envío encolado."""
+    entrada = get_cola_ingesta(current_app._get_current_object()).estado(id_ingesta)
+    if entrada is None:
+        return jsonify({'success': False, 'error': 'Envío no encontrado'}), 404
+    return jsonify({'success': True, 'data': entrada})
+
 def transformar_datos_para_controlador(google_data):
     """
     Transforma los datos de Google Forms al formato que espera tu controlador
@@ -134,32 +175,6 @@ def transformar_datos_para_controlador(google_data):
     logger.info(f"📋 Campos finales: {list(form_data.keys())}")
     return form_data
 
-def debug_schema_validation(form_data, pedido_controller):
-    """
-    Función para debug del schema de validación
-    """
-    try:
-        logger.info("🔍 VALIDANDO SCHEMA...")
-
-        # Probar la validación directamente
-        from marshmallow import ValidationError
-
-        try:
-            # Intentar validar con el schema del controlador
-            validated_data = pedido_controller.schema.load(form_data)
-            logger.info("✅ SCHEMA VALIDACIÓN: Datos son válidos")
-            logger.info(f"   Datos validados: {validated_data}")
-            return True
-
-        except ValidationError as e:
-            logger.error(f"❌ ERROR VALIDACIÓN SCHEMA: {e.messages}")
-            logger.error(f"   Datos que fallaron: {form_data}")
-            return False
-
-    except Exception as e:
-        logger.error(f"❌ ERROR EN DEBUG SCHEMA: {str(e)}")
-        return False
-
 # Endpoint de health check específico para Google Forms
 @google_forms_bp.route('/api/google-forms/health', methods=['GET'])
 def health_check_google_forms():
@@ -168,5 +183,6 @@ def health_check_google_forms():
         'status': 'ok',
         'service': 'google_forms_integration',
         'timestamp': datetime.now().isoformat(),
-        'message': 'Integración con Google Forms funcionando correctamente'
+        'message': 'Integración con Google Forms funcionando correctamente',
+        'cola_ingesta': get_cola_ingesta(current_app._get_current_object()).resumen()
     })
\ No newline at end of file
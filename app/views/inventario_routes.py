@@ -12,6 +12,19 @@ from app.utils.estados import ESTADOS_INSPECCION
 
 inventario_view_bp = Blueprint('inventario_view', __name__, url_prefix='/inventario')
 
+COLUMNAS_EXPORTACION_LOTES = [
+    ('id_lote', 'ID lote'), ('id_insumo', 'ID insumo'), ('numero_lote_proveedor', 'Lote proveedor'),
+    ('cantidad_inicial', 'Cantidad inicial'), ('cantidad_actual', 'Cantidad actual'),
+    ('cantidad_en_cuarentena', 'En cuarentena'), ('precio_unitario', 'Precio unitario'), ('estado', 'Estado'),
+    ('f_ingreso', 'Fecha ingreso'), ('f_vencimiento', 'Fecha vencimiento'), ('ubicacion_fisica', 'Ubicación'),
+    ('id_proveedor', 'ID proveedor'), ('id_orden_compra', 'OC'), ('documento_ingreso', 'Documento ingreso'),
+]
+COLUMNAS_EXPORTACION_MOVIMIENTOS = [
+    ('id', 'ID'), ('fecha', 'Fecha'), ('tipo', 'Tipo'), ('id_lote', 'ID lote'), ('id_insumo', 'ID insumo'),
+    ('cantidad', 'Cantidad'), ('saldo_lote', 'Saldo lote'), ('saldo_insumo', 'Saldo insumo'),
+    ('referencia_tipo', 'Referencia'), ('referencia_id', 'ID referencia'), ('usuario_id', 'Usuario'),
+]
+
 
 @inventario_view_bp.route('/')
 @permission_required(accion='almacen_consulta_stock')
@@ -20,13 +33,10 @@ def listar_lotes():
     Muestra la lista de todos los lotes en el inventario, ahora agrupados por insumo.
     """
     controller = InventarioController()
-    # Primero, se recalcula y actualiza el stock en la base de datos.
-    controller.inventario_model.calcular_y_actualizar_stock_general()
-    
-    # Ahora, se obtienen los datos ya actualizados.
+    # Sólo los totales por insumo; los lotes se cargan al expandir cada insumo.
+    # El stock_actual del catálogo lo mantienen los cambios de lotes y el
+    # recálculo periódico del scheduler (job_recalculo_stock_insumos).
     response_agrupado, status_code = controller.obtener_lotes_agrupados_para_vista()
-    filtros = request.args.to_dict()
-    response, status_code = controller.obtener_lotes_para_vista(filtros)
     insumos_agrupados = []
     if response_agrupado.get('success'):
         insumos_agrupados = response_agrupado.get('data', [])
@@ -61,6 +71,18 @@ def listar_lotes():
                            estados_inspeccion=ESTADOS_INSPECCION,
                            motivos_desperdicio=motivos_desperdicio)
 
+@inventario_view_bp.route('/insumo/<id_insumo>/lotes')
+@permission_required(accion='almacen_consulta_stock')
+def lotes_de_insumo(id_insumo):
+    """
+    Fragmento HTML con la tabla de lotes de un insumo, que la vista agrupada pide al expandirlo.
+    """
+    controller = InventarioController()
+    response, status_code = controller.obtener_lotes_de_insumo_para_vista(id_insumo)
+    if not response.get('success'):
+        return response.get('error', 'Error al cargar los lotes.'), status_code
+    return render_template('inventario/_lote_details_table.html', insumo={'lotes': response.get('data', [])})
+
 @inventario_view_bp.route('/lote/nuevo', methods=['GET', 'POST'])
 @jwt_required()
 @permission_required(accion='registrar_ingreso_de_materia_prima')
@@ -344,4 +366,43 @@ def obtener_ops_afectadas(lote_id):
         return jsonify({'success': True, 'data': ops_data}), 200
 
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _exportar(model, clave, filtros, columnas, nombre):
+    from app.services.exportacion_service import FORMATO_POR_DEFECTO, FORMATOS, paginar_find_all, respuesta_exportacion
+
+    formato = request.args.get('formato', FORMATO_POR_DEFECTO)
+    if formato not in FORMATOS:
+        return jsonify({'success': False, 'error': f'Formato no soportado: {formato}'}), 400
+    try:
+        filas = paginar_find_all(model, clave, filtros, columnas=[campo for campo, _ in columnas])
+    except Exception as e:
+        flash(f'No se pudo generar la exportación: {e}', 'error')
+        return redirect(url_for('inventario_view.listar_lotes'))
+    return respuesta_exportacion(filas, columnas, formato, nombre)
+
+
+@inventario_view_bp.route('/exportar')
+@permission_required(accion='almacen_consulta_stock')
+def exportar_lotes():
+    """Descarga los lotes de insumos en Excel o CSV, generando el archivo por páginas."""
+    from app.models.inventario import InventarioModel
+
+    filtros = {'id_insumo': request.args.get('id_insumo') or None, 'estado': request.args.get('estado') or None}
+    return _exportar(InventarioModel(), 'id_lote', filtros, COLUMNAS_EXPORTACION_LOTES, 'lotes_insumos')
+
+
+@inventario_view_bp.route('/movimientos/exportar')
+@permission_required(accion='almacen_consulta_stock')
+def exportar_movimientos():
+    """Descarga el historial de movimientos de stock (trazabilidad de lotes) en Excel o CSV."""
+    from app.models.movimiento_inventario import MovimientoInventarioModel
+
+    filtros = {
+        'id_insumo': request.args.get('id_insumo') or None,
+        'id_lote': request.args.get('id_lote') or None,
+        'fecha_gte': request.args.get('fecha_desde') or None,
+        'fecha_lte': request.args.get('fecha_hasta') or None,
+    }
+    return _exportar(MovimientoInventarioModel(), 'id', filtros, COLUMNAS_EXPORTACION_MOVIMIENTOS, 'movimientos_inventario')
@@ -2,7 +2,6 @@ import os
 import random
 from flask import Blueprint, current_app, render_template, request, redirect, session, url_for, flash, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import qrcode
 import io
 from app.controllers.pedido_controller import PedidoController
 from app.controllers.cliente_controller import ClienteController
@@ -15,13 +14,21 @@ import base64
 from flask import Response
 from io import BytesIO
 
-try:
-    from xhtml2pdf import pisa
-except ImportError:
-    pisa = None
+from app.utils.lazy_import import disponible, lazy_import
+
+# qrcode y xhtml2pdf (que arrastra reportlab) se cargan al generar el primer QR o PDF.
+qrcode = lazy_import('qrcode')
+pisa = lazy_import('xhtml2pdf.pisa')
 
 orden_venta_bp = Blueprint('orden_venta', __name__, url_prefix='/orden-venta')
 
+COLUMNAS_EXPORTACION = [
+    ('id', 'ID'), ('nombre_cliente', 'Cliente'), ('id_cliente', 'ID cliente'), ('fecha_solicitud', 'Fecha solicitud'),
+    ('fecha_requerido', 'Fecha requerida'), ('estado', 'Estado'), ('precio_orden', 'Total'),
+    ('condicion_venta', 'Condición de venta'), ('estado_pago', 'Estado de pago'),
+    ('fecha_vencimiento', 'Vencimiento de pago'), ('comentarios_adicionales', 'Comentarios'),
+]
+
 def _parse_form_data(form_dict):
     """
     Convierte los datos planos del formulario en una estructura anidada para el schema.
@@ -580,7 +587,7 @@ def generar_documento_pdf(tipo, id_documento):
     Genera un PDF para un documento específico (nota de crédito o pago).
     """
     try:
-        if pisa is None:
+        if not disponible(pisa):
              flash('Librería de generación de PDF no disponible.', 'error')
              return redirect(request.referrer or url_for('orden_venta.listar'))
 
@@ -654,3 +661,26 @@ def generar_documento_pdf(tipo, id_documento):
     except Exception as e:
         flash(f'Error al generar el PDF: {e}', 'danger')
         return redirect(request.referrer or url_for('orden_venta.listar'))
+
+
+@orden_venta_bp.route('/exportar')
+@permission_required(accion='logistica_gestion_ov', allowed_roles=['GERENTE'])
+def exportar():
+    """Descarga las órdenes de venta en Excel o CSV, generando el archivo por páginas."""
+    from app.models.pedido import PedidoModel
+    from app.services.exportacion_service import FORMATO_POR_DEFECTO, FORMATOS, paginar_find_all, respuesta_exportacion
+
+    formato = request.args.get('formato', FORMATO_POR_DEFECTO)
+    if formato not in FORMATOS:
+        return jsonify({'success': False, 'error': f'Formato no soportado: {formato}'}), 400
+    filtros = {
+        'estado': request.args.get('estado') or None,
+        'fecha_solicitud_gte': request.args.get('fecha_desde') or None,
+        'fecha_solicitud_lte': request.args.get('fecha_hasta') or None,
+    }
+    try:
+        filas = paginar_find_all(PedidoModel(), 'id', filtros, columnas=[campo for campo, _ in COLUMNAS_EXPORTACION])
+    except Exception as e:
+        flash(f'No se pudo generar la exportación: {e}', 'danger')
+        return redirect(url_for('orden_venta.listar'))
+    return respuesta_exportacion(filas, COLUMNAS_EXPORTACION, formato, 'ordenes_de_venta')
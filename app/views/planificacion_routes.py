@@ -126,6 +126,19 @@ def add_no_cache_headers(response):
 
 # --- Rutas de API (sin cambios) ---
 
+@planificacion_bp.route('/api/version', methods=['GET'])
+@jwt_required()
+@permission_required(accion='consultar_plan_de_produccion')
+def version_plan_api():
+    """
+    Consulta liviana para el polling del tablero: ?desde=N responde si el plan
+    cambió desde la versión N sin reconstruir la vista.
+    """
+    desde = request.args.get('desde', type=int)
+    controller = PlanificacionController()
+    response, status_code = controller.obtener_version_plan(desde)
+    return jsonify(response), status_code
+
 @planificacion_bp.route('/api/consolidar', methods=['POST'])
 @jwt_required()
 @permission_required(accion='aprobar_plan_de_produccion')
@@ -1,6 +1,5 @@
 from flask import Blueprint, request, jsonify, send_file, render_template, Flask
 from werkzeug.utils import secure_filename
-import pandas as pd
 import logging
 from datetime import datetime
 from io import BytesIO
@@ -10,6 +9,9 @@ from app.controllers.proveedor_controller import ProveedorController
 from app.controllers.insumo_controller import InsumoController
 from app.controllers.historial_precios_controller import HistorialPreciosController
 from app.utils.decorators import permission_required
+from app.utils.lazy_import import lazy_import
+
+pd = lazy_import('pandas')
 
 precios_bp = Blueprint('precios', __name__)
 logger = logging.getLogger(__name__)
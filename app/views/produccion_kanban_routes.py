@@ -1,11 +1,13 @@
 # app/views/produccion_kanban_routes.py
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, make_response, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from datetime import datetime
 from app.controllers.orden_produccion_controller import OrdenProduccionController
 from app.controllers.produccion_kanban_controller import ProduccionKanbanController
 from app.controllers.op_cronometro_controller import OpCronometroController
 from app.utils.decorators import permission_required
+from app.services.eventos_produccion_service import get_bus_eventos, stream_eventos
+import os
 
 # Renombrado para mayor claridad
 produccion_kanban_bp = Blueprint("produccion_kanban", __name__, url_prefix="/produccion/kanban")
@@ -53,6 +55,77 @@ def tablero_produccion():
     contexto['current_user_id'] = usuario_id
     return render_template('planificacion/kanban.html', **contexto) # Plantilla renombrada
 
+@produccion_kanban_bp.route('/api/tablero', methods=['GET'])
+@jwt_required()
+@permission_required(accion='consultar_kanban_produccion')
+def api_tablero_delta():
+    """
+    Refresco incremental del tablero. El cliente envía la versión que tiene
+    (cabecera If-None-Match o ?since=) y recibe 304 si nada cambió o sólo
+    las tarjetas cambiadas (con su HTML) / eliminadas y las métricas del día.
+    """
+    jwt_data = get_jwt()
+    desde = request.args.get('since') or (request.headers.get('If-None-Match') or '').strip('"') or None
+    controller = ProduccionKanbanController()
+    response, status_code = controller.obtener_delta_tablero(
+        usuario_id=get_jwt_identity(),
+        usuario_rol=jwt_data.get('rol', ''),
+        desde=desde
+    )
+    if status_code != 200:
+        return jsonify(response), status_code
+
+    delta = response['data']
+    if delta['sin_cambios']:
+        resp = make_response('', 304)
+    else:
+        # Las tarjetas van renderizadas con la misma plantilla del tablero para reemplazarlas en el DOM.
+        for tarjeta in delta['cambiadas']:
+            tarjeta['html'] = render_template('planificacion/_tarjeta_kanban.html',
+                                              orden=tarjeta['orden'], estado_key=tarjeta['columna'])
+        resp = jsonify(response)
+    resp.headers['ETag'] = f'"{delta["version"]}"'
+    return resp
+
+@produccion_kanban_bp.route('/api/eventos', methods=['GET'])
+@jwt_required()
+@permission_required(accion='consultar_kanban_produccion')
+def api_eventos_produccion():
+    """
+    Canal SSE con los cambios de estado de las OPs, filtrado por rol. Soporta
+    reconexión con Last-Event-ID (replay de lo que se perdió). Cada conexión
+    ocupa un hilo del worker (8 por proceso con gthread), por eso se admiten
+    hasta EVENTOS_MAX_CONEXIONES por worker (la mitad de los hilos) y cada
+    una se corta a los EVENTOS_DURACION_SECONDS; al superar el límite el
+    cliente sigue con el refresco por polling.
+    """
+    bus = get_bus_eventos()
+    suscripcion = bus.suscribir(maximo=int(os.getenv('EVENTOS_MAX_CONEXIONES', 4)))
+    if suscripcion is None:
+        resp = jsonify({'success': False, 'error': 'Demasiadas conexiones de eventos.'})
+        resp.status_code = 503
+        resp.headers['Retry-After'] = '30'
+        return resp
+
+    jwt_data = get_jwt()
+    ultimo_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    stream = stream_eventos(
+        bus,
+        rol=jwt_data.get('rol', ''),
+        usuario_id=get_jwt_identity(),
+        ultimo_id=int(ultimo_id) if ultimo_id and ultimo_id.isdigit() else None,
+        heartbeat=float(os.getenv('EVENTOS_HEARTBEAT_SECONDS', 10)),
+        duracion_max=float(os.getenv('EVENTOS_DURACION_SECONDS', 55)),
+        suscripcion=suscripcion,
+    )
+    resp = Response(stream_with_context(stream), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # Si el cliente se va antes de que empiece el stream, el generador no llega a liberar la reserva.
+    resp.call_on_close(lambda: bus.desuscribir(suscripcion))
+    return resp
+
 @produccion_kanban_bp.route('/foco/<int:op_id>')
 @jwt_required()
 @permission_required(accion='produccion_ejecucion')
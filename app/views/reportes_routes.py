@@ -124,6 +124,14 @@ def api_stock_insumos_vencimiento():
     return jsonify(data)
 
 # Productos
+@reportes_bp.route('/api/stock/insumos/a_fecha')
+def api_stock_insumos_a_fecha():
+    fecha = request.args.get('fecha')
+    if not fecha:
+        return jsonify({'success': False, 'error': "El parámetro 'fecha' (YYYY-MM-DD) es obligatorio."}), 400
+    data = stock_controller.obtener_stock_insumos_a_fecha(fecha, request.args.get('id_insumo'))
+    return jsonify(data)
+
 @reportes_bp.route('/api/stock/productos/composicion')
 def api_stock_productos_composicion():
     data = stock_controller.obtener_composicion_stock_productos()
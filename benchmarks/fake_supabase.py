@@ -0,0 +1,808 @@
+"""
+Stand-in en memoria del cliente `supabase` para correr controladores sin red.
+
+Implementa el subconjunto de la API de query builder de postgrest-py que usa
+la aplicación: select (con recursos embebidos `alias:tabla!hint!inner(cols)`),
+filtros (eq, neq, gt, gte, lt, lte, like, ilike, is_, in_, contains, not_,
+or_, filter, match), order, limit, range, single, maybe_single, count,
+insert, upsert, update, delete y rpc. Las relaciones se leen de los
+FOREIGN KEY de `setup.sql` y pueden completarse con `add_relation`.
+
+Cada `execute()` se cuenta como un round trip, por tabla y por método, para
+que los benchmarks puedan reportar cuántas llamadas hace cada flujo.
+"""
+import copy
+import itertools
+import os
+import re
+import threading
+import uuid
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+SETUP_SQL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'setup.sql')
+
+_TABLE_RE = re.compile(r'CREATE TABLE (?:(\w+)\.)?"?(\w+)"?\s*\((.*?)\n\);', re.S)
+_FK_RE = re.compile(r'CONSTRAINT (\w+) FOREIGN KEY \((\w+)\) REFERENCES (?:(\w+)\.)?"?(\w+)"?\((\w+)\)')
+_PK_RE = re.compile(r'CONSTRAINT \w+ PRIMARY KEY \(([\w, ]+)\)')
+_COL_RE = re.compile(r'^\s+"?(\w+)"? ([A-Za-z][\w ]*?)(?:\[\])?(?:\(.*?\))?(?: |,|$)(.*)$')
+_ADD_COLUMN_RE = re.compile(r'ALTER TABLE (?:(\w+)\.)?"?(\w+)"? ADD COLUMN (?:IF NOT EXISTS )?'
+                            r'"?(\w+)"? ([A-Za-z][\w ]*?)(?:\[\])?(?:\(.*?\))?(?= |;)(.*?);', re.S)
+
+
+class FakeAPIError(Exception):
+    def __init__(self, message: str, code: str = 'PGRST000'):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+    def __repr__(self):
+        return f"FakeResponse(data={self.data!r}, count={self.count!r})"
+
+
+class Relation:
+    __slots__ = ('name', 'table', 'column', 'ref_table', 'ref_column')
+
+    def __init__(self, name, table, column, ref_table, ref_column):
+        self.name, self.table, self.column = name, table, column
+        self.ref_table, self.ref_column = ref_table, ref_column
+
+
+class TableSchema:
+    def __init__(self, name: str):
+        self.name = name
+        self.columns: Dict[str, str] = {}
+        self.defaults: Dict[str, str] = {}
+        self.primary_key: List[str] = []
+
+
+def parse_schema(path: str = SETUP_SQL):
+    """Lee tablas, columnas, PKs y FKs de un volcado de esquema de Supabase."""
+    tables: Dict[str, TableSchema] = {}
+    relations: List[Relation] = []
+    if not os.path.exists(path):
+        return tables, relations
+    with open(path, encoding='utf-8') as fh:
+        sql = fh.read()
+    for schema, name, body in _TABLE_RE.findall(sql):
+        full = name if schema in ('', 'public') else f"{schema}.{name}"
+        table = TableSchema(full)
+        for line in body.split('\n'):
+            fk = _FK_RE.search(line)
+            if fk:
+                cname, col, ref_schema, ref_table, ref_col = fk.groups()
+                ref_full = ref_table if ref_schema in (None, '', 'public') else f"{ref_schema}.{ref_table}"
+                relations.append(Relation(cname, full, col, ref_full, ref_col))
+                continue
+            pk = _PK_RE.search(line)
+            if pk:
+                table.primary_key = [c.strip() for c in pk.group(1).split(',')]
+                continue
+            if line.strip().startswith('CONSTRAINT'):
+                continue
+            col = _COL_RE.match(line)
+            if col:
+                table.columns[col.group(1)] = col.group(2).strip().lower()
+                rest = col.group(3)
+                if 'DEFAULT' in rest or 'GENERATED' in rest:
+                    table.defaults[col.group(1)] = rest
+        tables[full] = table
+    # Columnas agregadas después por migraciones (ALTER TABLE ... ADD COLUMN).
+    for schema, name, col, tipo, rest in _ADD_COLUMN_RE.findall(sql):
+        table = tables.get(name if schema in ('', 'public') else f"{schema}.{name}")
+        if table is not None and col not in table.columns:
+            table.columns[col] = tipo.strip().lower()
+            if 'DEFAULT' in rest:
+                table.defaults[col] = rest
+    return tables, relations
+
+
+def _to_comparable(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _coerce_pair(a, b):
+    a, b = _to_comparable(a), _to_comparable(b)
+    if isinstance(a, float) and isinstance(b, str):
+        try:
+            return a, float(b)
+        except ValueError:
+            return str(a), b
+    if isinstance(a, str) and isinstance(b, float):
+        try:
+            return float(a), b
+        except ValueError:
+            return a, str(b)
+    if isinstance(a, bool) and isinstance(b, str):
+        return a, b.lower() == 'true'
+    if isinstance(a, str) and isinstance(b, str) and len(a) >= 10 and len(b) >= 10 and a[4:5] == '-' == b[4:5]:
+        # Fechas ISO: comparar sin zona horaria ni separador.
+        return a.replace('T', ' ')[:26].split('+')[0], b.replace('T', ' ')[:26].split('+')[0]
+    return a, b
+
+
+def _like_to_regex(pattern: str, flags=0):
+    escaped = re.escape(pattern).replace('%', '.*').replace('\\*', '.*').replace('_', '.')
+    return re.compile(f"^{escaped}$", flags | re.S)
+
+
+def _get_path(row: Dict, column: str):
+    if '.' not in column or column in row:
+        return row.get(column)
+    current = row
+    for part in column.split('.'):
+        if isinstance(current, list):
+            return [c.get(part) if isinstance(c, dict) else None for c in current]
+        if not isinstance(current, dict):
+            return None
+        current = current.get(part)
+    return current
+
+
+def _compare(op: str, value, target) -> bool:
+    if isinstance(value, list) and op not in ('cs', 'cd', 'ov', 'is'):
+        return any(_compare(op, v, target) for v in value)
+    if op == 'is':
+        if target in (None, 'null'):
+            return value is None
+        if str(target).lower() == 'true':
+            return value is True
+        if str(target).lower() == 'false':
+            return value is False
+        return value == target
+    if op == 'in':
+        return any(_compare('eq', value, t) for t in target)
+    if op in ('cs', 'contains'):
+        if isinstance(value, dict) and isinstance(target, dict):
+            return all(value.get(k) == v for k, v in target.items())
+        return value is not None and all(t in value for t in target)
+    if op in ('cd', 'contained_by'):
+        return value is not None and all(v in target for v in value)
+    if op == 'ov':
+        return value is not None and any(v in target for v in value)
+    if value is None:
+        return False
+    if op == 'like':
+        return bool(_like_to_regex(str(target)).match(str(value)))
+    if op == 'ilike':
+        return bool(_like_to_regex(str(target), re.I).match(str(value)))
+    a, b = _coerce_pair(value, target)
+    try:
+        if op == 'eq':
+            return a == b
+        if op == 'neq':
+            return a != b
+        if op == 'gt':
+            return a > b
+        if op == 'gte':
+            return a >= b
+        if op == 'lt':
+            return a < b
+        if op == 'lte':
+            return a <= b
+    except TypeError:
+        return False
+    raise FakeAPIError(f"Operador no soportado: {op}")
+
+
+def _split_top_level(text: str, sep: str = ',') -> List[str]:
+    parts, depth, current = [], 0, []
+    for ch in text:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        if ch == sep and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if ''.join(current).strip():
+        parts.append(''.join(current).strip())
+    return parts
+
+
+def _parse_literal(op: str, raw: str):
+    if op == 'in':
+        raw = raw.strip()
+        if raw.startswith('(') and raw.endswith(')'):
+            raw = raw[1:-1]
+        return [v.strip().strip('"') for v in _split_top_level(raw)]
+    if op == 'is':
+        return None if raw == 'null' else raw
+    return raw.strip('"')
+
+
+def _parse_or(expr: str) -> Callable[[Dict], bool]:
+    """Convierte una expresión `or_` de PostgREST en un predicado."""
+    expr = expr.strip()
+    if expr.startswith('(') and expr.endswith(')'):
+        expr = expr[1:-1]
+    preds = []
+    for term in _split_top_level(expr):
+        if term.startswith('and(') or term.startswith('or('):
+            kind, inner = term.split('(', 1)
+            sub = _parse_or(inner[:-1])
+            if kind == 'and':
+                terms = [_parse_or(t) for t in _split_top_level(inner[:-1])]
+                preds.append(lambda row, ts=terms: all(t(row) for t in ts))
+            else:
+                preds.append(sub)
+            continue
+        col, rest = term.split('.', 1)
+        negate = rest.startswith('not.')
+        if negate:
+            rest = rest[4:]
+        op, raw = rest.split('.', 1)
+        target = _parse_literal(op, raw)
+        preds.append(lambda row, c=col, o=op, t=target, n=negate: _compare(o, _get_path(row, c), t) != n)
+    return lambda row: any(p(row) for p in preds)
+
+
+class _SelectNode:
+    def __init__(self):
+        self.columns: List = []     # (alias, column)
+        self.star = False
+        self.embeds: List = []      # (alias, target, hints, inner, node)
+
+
+def _parse_select(text: str) -> _SelectNode:
+    node = _SelectNode()
+    text = (text or '*').strip()
+    for item in _split_top_level(text):
+        item = item.strip()
+        if not item:
+            continue
+        if item == '*':
+            node.star = True
+            continue
+        if '(' in item and item.endswith(')'):
+            head, inner = item.split('(', 1)
+            inner = inner[:-1]
+            alias = None
+            if ':' in head:
+                alias, head = head.split(':', 1)
+            parts = head.strip().split('!')
+            target, hints = parts[0].strip(), [h.strip() for h in parts[1:]]
+            inner_join = 'inner' in hints
+            hints = [h for h in hints if h not in ('inner', 'left')]
+            node.embeds.append(((alias or target).strip(), target, hints, inner_join, _parse_select(inner)))
+            continue
+        if item in ('count', 'count()'):
+            node.columns.append(('count', '__count__'))
+            continue
+        alias = None
+        if ':' in item and '::' not in item.split(':', 1)[1][:1]:
+            alias, item = item.split(':', 1)
+        column = item.split('::', 1)[0].strip()
+        node.columns.append(((alias or column.split('->')[0]).strip(), column))
+    if not node.columns and not node.embeds:
+        node.star = True
+    return node
+
+
+class FakeDatabase:
+    """
+    Base de datos en memoria compartida por los clientes falsos. Guarda filas
+    por tabla (`esquema.tabla` fuera de `public`), relaciones y funciones RPC.
+    """
+
+    def __init__(self, schema_path: Optional[str] = SETUP_SQL, max_rows: Optional[int] = None):
+        self.tables: Dict[str, List[Dict]] = defaultdict(list)
+        # Como `db-max-rows` de PostgREST: tope de filas por respuesta de un select.
+        self.max_rows = max_rows
+        self.schema, relations = parse_schema(schema_path) if schema_path else ({}, [])
+        self.relations: List[Relation] = list(relations)
+        self.rpcs: Dict[str, Callable] = {}
+        self.round_trips = Counter()
+        self._sequences = defaultdict(lambda: itertools.count(1))
+        self._lock = threading.RLock()
+
+    # --- Configuración -------------------------------------------------
+    def add_relation(self, table: str, column: str, ref_table: str, ref_column: str = 'id', name: str = None):
+        self.relations.append(Relation(name or f"{table.split('.')[-1]}_{column}_fkey", table, column, ref_table, ref_column))
+
+    def register_rpc(self, name: str, fn: Callable[['FakeDatabase', Dict], Any]):
+        self.rpcs[name] = fn
+
+    def primary_key(self, table: str) -> str:
+        schema = self.schema.get(table)
+        if schema and schema.primary_key:
+            return schema.primary_key[0]
+        rows = self.tables.get(table)
+        if rows:
+            for candidate in ('id', f"id_{table.split('.')[-1].rstrip('s')}"):
+                if candidate in rows[0]:
+                    return candidate
+        return 'id'
+
+    def seed(self, table: str, rows: List[Dict]):
+        with self._lock:
+            for row in rows:
+                self._apply_defaults(table, row)
+                self.tables[table].append(row)
+            pk = self.primary_key(table)
+            ints = [r[pk] for r in self.tables[table] if isinstance(r.get(pk), int)]
+            if ints:
+                self._sequences[table] = itertools.count(max(ints) + 1)
+
+    def reset_counters(self):
+        self.round_trips.clear()
+
+    @property
+    def total_round_trips(self) -> int:
+        return sum(self.round_trips.values())
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        return copy.deepcopy(dict(self.tables))
+
+    def restore(self, snapshot: Dict[str, List[Dict]]):
+        with self._lock:
+            self.tables = defaultdict(list, copy.deepcopy(snapshot))
+
+    def _apply_defaults(self, table: str, row: Dict):
+        schema = self.schema.get(table)
+        pk = self.primary_key(table)
+        if pk not in row:
+            if schema and pk in schema.columns:
+                col_type = schema.columns[pk]
+            else:
+                existentes = self.tables.get(table)
+                col_type = 'uuid' if existentes and isinstance(existentes[0].get(pk), str) else 'bigint'
+            if 'uuid' in col_type:
+                row[pk] = str(uuid.uuid4())
+            elif 'int' in col_type or col_type.startswith('serial'):
+                row[pk] = next(self._sequences[table])
+        if schema:
+            now = datetime.now().isoformat()
+            for col, default in schema.defaults.items():
+                if col in row:
+                    continue
+                if 'now()' in default:
+                    row[col] = now
+                elif "DEFAULT true" in default:
+                    row[col] = True
+                elif "DEFAULT false" in default:
+                    row[col] = False
+                else:
+                    m = re.search(r"DEFAULT '?([^':]*)'?", default)
+                    if m and 'nextval' not in default and 'gen_random_uuid' not in default:
+                        raw = m.group(1)
+                        try:
+                            row[col] = float(raw) if '.' in raw else int(raw)
+                        except ValueError:
+                            row[col] = raw
+
+    # --- Relaciones ----------------------------------------------------
+    def resolve_embed(self, base: str, target: str, hints: List[str]):
+        """
+        Devuelve (tabla_destino, columna_local, columna_remota, es_lista).
+        """
+        schema_prefix = base.split('.')[0] + '.' if '.' in base else ''
+        candidates = []
+        for rel in self.relations:
+            if rel.table == base and (rel.column == target or rel.ref_table in (target, schema_prefix + target)):
+                candidates.append((rel, rel.ref_table, rel.column, rel.ref_column, False))
+            if rel.ref_table == base and rel.table in (target, schema_prefix + target):
+                candidates.append((rel, rel.table, rel.ref_column, rel.column, True))
+        if hints:
+            filtradas = [c for c in candidates if any(h in (c[0].name, c[0].column, c[0].table) for h in hints)]
+            candidates = filtradas or candidates
+        if candidates:
+            # Preferir la relación "a uno" salvo que el hint diga lo contrario.
+            candidates.sort(key=lambda c: c[4])
+            _, table, local, remote, many = candidates[0]
+            return table, local, remote, many
+
+        # Heurística para tablas fuera de setup.sql.
+        target_table = target if target in self.tables or target in self.schema else schema_prefix + target
+        singular = target.rstrip('s')
+        base_rows = self.tables.get(base) or [{}]
+        for col in (f"{singular}_id", f"id_{singular}", f"{target}_id"):
+            if col in base_rows[0]:
+                return target_table, col, self.primary_key(target_table), False
+        base_singular = base.split('.')[-1].rstrip('s')
+        target_rows = self.tables.get(target_table) or [{}]
+        for col in (f"{base_singular}_id", f"id_{base_singular}"):
+            if col in target_rows[0]:
+                return target_table, self.primary_key(base), col, True
+        raise FakeAPIError(f"No hay relación entre '{base}' y '{target}'", 'PGRST200')
+
+
+class FakeQueryBuilder:
+    def __init__(self, db: FakeDatabase, table: str):
+        self._db = db
+        self._table = table
+        self._action = 'select'
+        self._select = '*'
+        self._payload = None
+        self._filters: List[Callable[[Dict], bool]] = []
+        self._embed_filters = defaultdict(list)
+        self._orders: List = []
+        self._limit = None
+        self._offset = 0
+        self._single = None
+        self._count = None
+        self._head = False
+        self._on_conflict = None
+        self._negate_next = False
+        self._returning = 'representation'
+
+    # --- Acciones ------------------------------------------------------
+    def select(self, *columns, count=None, head=False):
+        self._action = 'select' if self._action in ('select', None) else self._action
+        self._select = ','.join(columns) if columns else '*'
+        self._count = count
+        self._head = head
+        return self
+
+    def insert(self, json, count=None, returning='representation', upsert=False, default_to_null=True):
+        self._action = 'upsert' if upsert else 'insert'
+        self._payload = json
+        self._count = count
+        self._returning = str(getattr(returning, 'value', returning))
+        return self
+
+    def upsert(self, json, count=None, returning='representation', ignore_duplicates=False, on_conflict='', default_to_null=True):
+        self._action = 'upsert'
+        self._payload = json
+        self._on_conflict = on_conflict or None
+        self._returning = str(getattr(returning, 'value', returning))
+        return self
+
+    def update(self, json, count=None, returning='representation'):
+        self._action = 'update'
+        self._payload = json
+        self._returning = str(getattr(returning, 'value', returning))
+        return self
+
+    def delete(self, count=None, returning='representation'):
+        self._action = 'delete'
+        self._returning = str(getattr(returning, 'value', returning))
+        return self
+
+    # --- Filtros -------------------------------------------------------
+    def _add(self, column: str, op: str, target):
+        negate = self._negate_next
+        self._negate_next = False
+        if '.' in column and not column.startswith('('):
+            rel, sub = column.split('.', 1)
+            self._embed_filters[rel].append(lambda row, s=sub, o=op, t=target, n=negate: _compare(o, _get_path(row, s), t) != n)
+            return self
+        self._filters.append(lambda row: _compare(op, _get_path(row, column), target) != negate)
+        return self
+
+    @property
+    def not_(self):
+        self._negate_next = True
+        return self
+
+    def eq(self, column, value):
+        return self._add(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self._add(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self._add(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self._add(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self._add(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self._add(column, 'lte', value)
+
+    def like(self, column, pattern):
+        return self._add(column, 'like', pattern)
+
+    def ilike(self, column, pattern):
+        return self._add(column, 'ilike', pattern)
+
+    def is_(self, column, value):
+        return self._add(column, 'is', value)
+
+    def in_(self, column, values):
+        return self._add(column, 'in', list(values))
+
+    def contains(self, column, value):
+        return self._add(column, 'cs', value)
+
+    def contained_by(self, column, value):
+        return self._add(column, 'cd', value)
+
+    def overlaps(self, column, value):
+        return self._add(column, 'ov', value)
+
+    def match(self, query: Dict):
+        for column, value in query.items():
+            self.eq(column, value)
+        return self
+
+    def filter(self, column, operator, criteria):
+        negate = operator.startswith('not.')
+        if negate:
+            operator = operator[4:]
+            self._negate_next = True
+        return self._add(column, operator, _parse_literal(operator, str(criteria)) if isinstance(criteria, str) else criteria)
+
+    def or_(self, filters: str, reference_table: str = None):
+        predicate = _parse_or(filters)
+        negate = self._negate_next
+        self._negate_next = False
+        if reference_table:
+            self._embed_filters[reference_table].append(lambda row: predicate(row) != negate)
+        else:
+            self._filters.append(lambda row: predicate(row) != negate)
+        return self
+
+    # --- Modificadores -------------------------------------------------
+    def order(self, column, desc=False, nullsfirst=False, foreign_table=None):
+        self._orders.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size, foreign_table=None):
+        self._limit = size
+        return self
+
+    def offset(self, size):
+        self._offset = size
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self):
+        self._single = 'single'
+        return self
+
+    def maybe_single(self):
+        self._single = 'maybe'
+        return self
+
+    # --- Ejecución -----------------------------------------------------
+    def _matches(self, row: Dict) -> bool:
+        return all(f(row) for f in self._filters)
+
+    def execute(self):
+        db = self._db
+        with db._lock:
+            db.round_trips[(self._table, self._action)] += 1
+            rows = db.tables[self._table]
+            if self._action == 'select':
+                return self._execute_select(rows)
+            if self._action in ('insert', 'upsert'):
+                return self._execute_insert(rows)
+            if self._action == 'update':
+                return self._execute_update(rows)
+            if self._action == 'delete':
+                return self._execute_delete(rows)
+        raise FakeAPIError(f"Acción no soportada: {self._action}")
+
+    def _project(self, table: str, row: Dict, node: _SelectNode) -> Optional[Dict]:
+        out = dict(row) if node.star else {}
+        for alias, column in node.columns:
+            if column == '__count__':
+                continue
+            out[alias] = _get_path(row, column.replace('->>', '.').replace('->', '.'))
+        for alias, target, hints, inner, sub in node.embeds:
+            ref_table, local, remote, many = self._db.resolve_embed(table, target, hints)
+            key = row.get(local)
+            related = [r for r in self._db.tables.get(ref_table, []) if key is not None and _compare('eq', r.get(remote), key)]
+            for pred in self._embed_filters.get(alias, []):
+                related = [r for r in related if pred(r)]
+            projected = [self._project(ref_table, r, sub) for r in related]
+            projected = [p for p in projected if p is not None]
+            if many:
+                if inner and not projected:
+                    return None
+                out[alias] = projected
+            else:
+                if inner and not projected:
+                    return None
+                out[alias] = projected[0] if projected else None
+        return out
+
+    def _sorted(self, rows: List[Dict], key_row: Callable[[Dict], Dict] = lambda r: r) -> List[Dict]:
+        # Semántica de Postgres: ASC NULLS LAST, DESC NULLS FIRST (salvo `nullsfirst`).
+        for column, desc, nullsfirst in reversed(self._orders):
+            def clave(r, c=column):
+                v = _to_comparable(_get_path(key_row(r), c))
+                return (isinstance(v, str), v) if v is not None else (False, 0)
+            con_valor = [r for r in rows if _get_path(key_row(r), column) is not None]
+            sin_valor = [r for r in rows if _get_path(key_row(r), column) is None]
+            con_valor.sort(key=clave, reverse=desc)
+            nulos_primero = nullsfirst or desc
+            rows = sin_valor + con_valor if nulos_primero else con_valor + sin_valor
+        return rows
+
+    def _execute_select(self, rows: List[Dict]):
+        node = _parse_select(self._select)
+        projected = []
+        for row in rows:
+            if not self._matches(row):
+                continue
+            p = self._project(self._table, row, node)
+            if p is not None:
+                projected.append((row, p))
+        total = len(projected)
+        if self._orders:
+            projected = self._sorted(projected, key_row=lambda rp: {**rp[0], **rp[1]})
+        projected_list = [p for _, p in projected]
+
+        if self._offset:
+            projected_list = projected_list[self._offset:]
+        if self._limit is not None:
+            projected_list = projected_list[:self._limit]
+        if self._db.max_rows is not None:
+            projected_list = projected_list[:self._db.max_rows]
+
+        if any(c == '__count__' for _, c in node.columns) and not node.star and len(node.columns) == 1:
+            return FakeResponse([{'count': total}], count=total)
+
+        data = [copy.deepcopy(p) for p in projected_list]
+        count = total if self._count else None
+        if self._head:
+            return FakeResponse([], count=count)
+        return self._finish(data, count)
+
+    def _finish(self, data: List[Dict], count=None):
+        if self._single == 'single':
+            if len(data) != 1:
+                raise FakeAPIError('JSON object requested, multiple (or no) rows returned', 'PGRST116')
+            return FakeResponse(data[0], count)
+        if self._single == 'maybe':
+            if not data:
+                return None
+            return FakeResponse(data[0], count)
+        return FakeResponse(data, count)
+
+    def _clean(self, payload: Dict) -> Dict:
+        return {k: (str(v) if isinstance(v, Decimal) else v.isoformat() if isinstance(v, (date, datetime)) else v)
+                for k, v in payload.items()}
+
+    def _execute_insert(self, rows: List[Dict]):
+        payload = self._payload if isinstance(self._payload, list) else [self._payload]
+        conflict_cols = (self._on_conflict or self._db.primary_key(self._table)).split(',')
+        created = []
+        for item in payload:
+            new_row = self._clean(dict(item))
+            if self._action == 'upsert':
+                existing = next((r for r in rows if all(c in new_row and _compare('eq', r.get(c), new_row[c]) for c in conflict_cols)), None)
+                if existing is not None:
+                    existing.update(new_row)
+                    created.append(existing)
+                    continue
+            self._db._apply_defaults(self._table, new_row)
+            rows.append(new_row)
+            created.append(new_row)
+        data = [] if self._returning == 'minimal' else copy.deepcopy(created)
+        return FakeResponse(data, len(created) if self._count else None)
+
+    def _execute_update(self, rows: List[Dict]):
+        values = self._clean(dict(self._payload))
+        updated = []
+        for row in rows:
+            if self._matches(row):
+                row.update(values)
+                updated.append(row)
+        data = [] if self._returning == 'minimal' else copy.deepcopy(updated)
+        return self._finish(data, len(updated) if self._count else None)
+
+    def _execute_delete(self, rows: List[Dict]):
+        keep, removed = [], []
+        for row in rows:
+            (removed if self._matches(row) else keep).append(row)
+        rows[:] = keep
+        return FakeResponse([] if self._returning == 'minimal' else removed)
+
+
+class FakeRPCBuilder(FakeQueryBuilder):
+    def __init__(self, db: FakeDatabase, name: str, params: Dict):
+        super().__init__(db, f"rpc/{name}")
+        self._name = name
+        self._params = params or {}
+
+    def execute(self):
+        db = self._db
+        with db._lock:
+            db.round_trips[(f"rpc/{self._name}", 'rpc')] += 1
+            fn = db.rpcs.get(self._name)
+            if fn is None:
+                raise FakeAPIError(f"Could not find the function public.{self._name}", 'PGRST202')
+            result = fn(db, self._params)
+        if isinstance(result, list):
+            rows = [r for r in result if not isinstance(r, dict) or self._matches(r)]
+            if self._orders:
+                rows = self._sorted(rows)
+            if self._limit is not None:
+                rows = rows[self._offset:self._offset + self._limit]
+            return self._finish(copy.deepcopy(rows))
+        return FakeResponse(copy.deepcopy(result))
+
+
+class _FakeSchema:
+    def __init__(self, db: FakeDatabase, schema: str):
+        self._db = db
+        self._schema = schema
+
+    def _name(self, table: str) -> str:
+        return table if self._schema == 'public' else f"{self._schema}.{table}"
+
+    def table(self, table: str) -> FakeQueryBuilder:
+        return FakeQueryBuilder(self._db, self._name(table))
+
+    from_ = table
+
+    def rpc(self, fn: str, params: Optional[Dict] = None, *args, **kwargs):
+        return FakeRPCBuilder(self._db, fn, params)
+
+
+class _FakeBucket:
+    def __init__(self, storage, name):
+        self._storage, self._name = storage, name
+
+    def upload(self, path, file, file_options=None):
+        self._storage.objects[(self._name, path)] = file
+        return {'Key': f"{self._name}/{path}"}
+
+    def get_public_url(self, path, options=None):
+        return f"http://fake-storage.local/{self._name}/{path}"
+
+    def remove(self, paths):
+        for p in paths:
+            self._storage.objects.pop((self._name, p), None)
+        return []
+
+
+class _FakeStorage:
+    def __init__(self):
+        self.objects = {}
+
+    def from_(self, bucket):
+        return _FakeBucket(self, bucket)
+
+
+class FakeSupabaseClient(_FakeSchema):
+    """Cliente compatible con `supabase.Client` para tablas, esquemas y RPC."""
+
+    def __init__(self, db: Optional[FakeDatabase] = None):
+        super().__init__(db or FakeDatabase(), 'public')
+        self.storage = _FakeStorage()
+
+    @property
+    def db(self) -> FakeDatabase:
+        return self._db
+
+    def schema(self, schema: str) -> _FakeSchema:
+        return _FakeSchema(self._db, schema)
+
+
+def install(client: FakeSupabaseClient):
+    """
+    Hace que `Database().client` devuelva el cliente falso. Debe llamarse
+    antes de instanciar modelos o controladores.
+    """
+    from app.database import Database
+    instance = object.__new__(Database)
+    Database._instance = instance
+    Database._client = client
+    return client
@@ -0,0 +1,396 @@
+"""
+Ejecuta los benchmarks offline contra el stand-in en memoria de Supabase.
+
+    python -m benchmarks.run --scale 1 --repeat 3 --output bench.json
+    python -m benchmarks.run --only planificacion_automatica,kanban
+
+Cada benchmark parte del mismo snapshot de datos (los que escriben no
+contaminan a los siguientes) y reporta tiempo de pared (mediana y mínimo)
+y round-trips a la base por tabla. La salida JSON tiene claves ordenadas
+para poder compararse con `diff` entre commits.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List
+
+os.environ.setdefault('SUPABASE_URL', 'http://fake-supabase.local')
+os.environ.setdefault('SUPABASE_KEY', 'fake-key')
+os.environ.setdefault('SUPABASE_SERVICE_KEY', 'fake-service-key')
+
+from benchmarks.fake_supabase import FakeDatabase, FakeSupabaseClient, install  # noqa: E402
+from benchmarks.seed import seed_database  # noqa: E402
+from app.services.audit_service import get_audit_sink  # noqa: E402
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(nombre: str):
+    def decorador(fn):
+        BENCHMARKS[nombre] = fn
+        return fn
+    return decorador
+
+
+def _resultado_ok(resultado) -> bool:
+    if isinstance(resultado, tuple):
+        resultado = resultado[0]
+    if isinstance(resultado, dict):
+        return resultado.get('success', True) is not False
+    return resultado is not None
+
+
+# --- Definición de benchmarks -----------------------------------------
+
+@benchmark('planificacion_automatica')
+def bench_planificacion_automatica(db: FakeDatabase):
+    from app.controllers.planificacion_controller import PlanificacionController
+    return PlanificacionController()._ejecutar_planificacion_automatica(usuario_id=1, dias_horizonte=7)
+
+
+@benchmark('carga_capacidad')
+def bench_carga_capacidad(db: FakeDatabase):
+    from app.controllers.planificacion_controller import PlanificacionController
+    ordenes = [op for op in db.tables['ordenes_produccion'] if op.get('fecha_inicio_planificada') and op.get('linea_asignada')]
+    return PlanificacionController().calcular_carga_capacidad(ordenes)
+
+
+@benchmark('vista_planificacion')
+def bench_vista_planificacion(db: FakeDatabase):
+    from app.controllers.planificacion_controller import PlanificacionController
+    from app.services.planificacion_snapshot_service import incrementar_version_plan
+    semana = date.today().strftime('%G-W%V')
+    incrementar_version_plan('benchmark')  # siempre se mide la construcción en frío
+    return PlanificacionController().obtener_datos_para_vista_planificacion(semana, 7, 1, 'DEV')
+
+
+@benchmark('vista_planificacion_snapshot')
+def bench_vista_planificacion_snapshot(db: FakeDatabase):
+    from app.controllers.planificacion_controller import PlanificacionController
+    from app.services.planificacion_snapshot_service import incrementar_version_plan
+    semana = date.today().strftime('%G-W%V')
+    incrementar_version_plan('benchmark')
+    # 20 usuarios abren el tablero sin cambios en el plan: una sola construcción.
+    resultados = [PlanificacionController().obtener_datos_para_vista_planificacion(semana, 7, usuario, 'DEV')
+                  for usuario in range(1, 21)]
+    return {'success': all(status == 200 for _, status in resultados)}
+
+
+@benchmark('trazabilidad')
+def bench_trazabilidad(db: FakeDatabase):
+    from app.controllers.trazabilidad_controller import TrazabilidadController
+    pedido_id = db.tables['reservas_productos'][0]['pedido_id'] if db.tables['reservas_productos'] else 1
+    return TrazabilidadController().obtener_trazabilidad('pedido', pedido_id, 'completo')
+
+
+@benchmark('kanban')
+def bench_kanban(db: FakeDatabase):
+    from app.controllers.produccion_kanban_controller import ProduccionKanbanController
+    return ProduccionKanbanController().obtener_datos_para_tablero(1, 'SUPERVISOR')
+
+
+@benchmark('kanban_delta')
+def bench_kanban_delta(db: FakeDatabase):
+    from app.controllers.produccion_kanban_controller import ProduccionKanbanController
+    from app.services.planificacion_snapshot_service import incrementar_version_plan
+    incrementar_version_plan('benchmark')
+    controller = ProduccionKanbanController()
+    response, status = controller.obtener_datos_para_tablero(1, 'SUPERVISOR')
+    version = response['data']['version']
+    # 50 polls de tablets sin cambios en el tablero.
+    polls = [controller.obtener_delta_tablero(1, 'SUPERVISOR', version) for _ in range(50)]
+    return {'success': status == 200 and all(r['data']['sin_cambios'] for r, _ in polls)}
+
+
+@benchmark('indicadores')
+def bench_indicadores(db: FakeDatabase):
+    from app.controllers.indicadores_controller import IndicadoresController
+    controller = IndicadoresController()
+    mes = date.today().strftime('%Y-%m')
+    resultados = [
+        controller.obtener_kpis_produccion(mes=mes),
+        controller.obtener_datos_calidad(mes=mes),
+        controller.obtener_datos_comercial(mes=mes),
+        controller.obtener_datos_financieros(mes=mes),
+        controller.obtener_datos_inventario(mes=mes),
+    ]
+    return {'success': all(r is not None for r in resultados)}
+
+
+@benchmark('matriz_rentabilidad')
+def bench_matriz_rentabilidad(db: FakeDatabase):
+    from app.controllers.rentabilidad_controller import RentabilidadController
+    hoy = date.today()
+    return RentabilidadController().obtener_datos_matriz_rentabilidad((hoy - timedelta(days=180)).isoformat(), hoy.isoformat())
+
+
+@benchmark('reservas_insumos')
+def bench_reservas_insumos(db: FakeDatabase):
+    from app.controllers.inventario_controller import InventarioController
+    controller = InventarioController()
+    pendientes = [op for op in db.tables['ordenes_produccion'] if op['estado'] == 'PENDIENTE'][:10]
+    resultados = [controller.reservar_stock_insumos_para_op(dict(op), 1) for op in pendientes]
+    # "Stock insuficiente" es un resultado válido del negocio; sólo cuentan los errores inesperados.
+    errores = [r['error'] for r in resultados if not r.get('success') and 'insuficiente' not in str(r.get('error'))]
+    return {'success': not errores, 'ordenes': len(resultados), 'errores': errores}
+
+
+@benchmark('costeo_precio_insumo')
+def bench_costeo_precio_insumo(db: FakeDatabase):
+    from app.controllers.producto_controller import ProductoController
+    from app.services.costeo_service import get_motor_costos
+    controller = ProductoController()
+    get_motor_costos().cargar()  # grafo caliente, como en un worker ya en uso
+    db.reset_counters()
+    insumos = db.tables['insumos_catalogo'][:5]
+    for insumo in insumos:
+        insumo['precio_unitario'] = round(float(insumo['precio_unitario']) * 1.1, 2)
+    return controller.actualizar_costo_productos_insumo([{'id_insumo': i['id_insumo']} for i in insumos])
+
+
+@benchmark('costeo_catalogo')
+def bench_costeo_catalogo(db: FakeDatabase):
+    from app.services.costeo_service import get_motor_costos
+    actualizados = get_motor_costos().recostear_todos()
+    return {'success': True, 'productos_actualizados': len(actualizados)}
+
+
+def _afectados_alerta(db: FakeDatabase, total: int) -> List[Dict]:
+    """
+    Afectados de una alerta amplia (40% lotes de insumo, 30% lotes de
+    producto, 20% OPs, 10% pedidos), completando con copias de filas
+    existentes si la escala sembrada no alcanza.
+    """
+    import uuid
+    cupos = [('lote_insumo', 'insumos_inventario', 'id_lote', 0.4), ('lote_producto', 'lotes_productos', 'id_lote', 0.3),
+             ('orden_produccion', 'ordenes_produccion', 'id', 0.2), ('pedido', 'pedidos', 'id', 0.1)]
+    afectados = []
+    for tipo, tabla, columna, proporcion in cupos:
+        filas = db.tables[tabla]
+        cantidad = int(total * proporcion)
+        siguiente = max((f[columna] for f in filas if isinstance(f[columna], int)), default=0) + 1
+        for i in range(max(0, cantidad - len(filas))):
+            copia = dict(filas[i % len(filas)])
+            copia[columna] = str(uuid.uuid4()) if columna == 'id_lote' and tipo == 'lote_insumo' else siguiente + i
+            if tabla == 'lotes_productos':
+                copia['numero_lote'] = f"LPT-B{copia[columna]}"
+            filas.append(copia)
+        afectados += [{'tipo_entidad': tipo, 'id_entidad': str(f[columna])} for f in filas[:cantidad]]
+    return afectados
+
+
+@benchmark('alerta_riesgo_efectos')
+def bench_alerta_riesgo_efectos(db: FakeDatabase):
+    from app.controllers.riesgo_controller import RiesgoController
+    from app.services.efectos_alerta_service import EjecutorEfectosAlerta
+    afectados = _afectados_alerta(db, 1000)
+    controller = RiesgoController()
+    db.reset_counters()
+    alerta = controller._crear_alerta_base({'tipo_entidad': 'lote_insumo', 'id_entidad': afectados[0]['id_entidad'],
+                                            'motivo': 'Recall de proveedor'}, 1)
+    ejecutor = EjecutorEfectosAlerta()
+    estados = controller._obtener_estados_actuales(afectados, ejecutor)
+    controller.alerta_riesgo_model.asociar_afectados(alerta['id'], afectados, estados)
+    resumen = controller._procesar_efectos_secundarios_alerta(alerta, afectados, estados, f"Alerta {alerta['codigo']}", 1, ejecutor)
+    return {'success': bool(resumen) and resumen['en_alerta'] == len(afectados)}
+
+
+LOTES_INVENTARIO = 50000
+
+
+def _completar_lotes(db: FakeDatabase, total: int):
+    import uuid
+    lotes = db.tables['insumos_inventario']
+    base = list(lotes)
+    for i in range(max(0, total - len(lotes))):
+        copia = dict(base[i % len(base)])
+        copia['id_lote'] = str(uuid.uuid4())
+        copia['numero_lote_proveedor'] = f"LB-{i:06d}"
+        lotes.append(copia)
+
+
+def _vista_agrupada_anterior(controller) -> Dict:
+    """Camino anterior: catálogo + todos los lotes enriquecidos + todas las reservas, agrupado en Python."""
+    insumos = controller.insumo_model.find_all(filters={'activo': True}).get('data', [])
+    lotes, _ = controller.obtener_lotes_para_vista()
+    reservas = controller.reserva_insumo_model.find_all(filters={'estado': 'RESERVADO'}).get('data', [])
+    reservado = {}
+    for reserva in reservas:
+        reservado[reserva.get('lote_inventario_id')] = reservado.get(reserva.get('lote_inventario_id'), 0) + float(reserva.get('cantidad_reservada', 0))
+    por_insumo = {}
+    for lote in lotes.get('data', []):
+        lote['cantidad_actual'] = float(lote.get('cantidad_actual') or 0)
+        lote['cantidad_reservada'] = reservado.get(lote.get('id_lote'), 0)
+        por_insumo.setdefault(lote.get('id_insumo'), []).append(lote)
+    data = [{'id_insumo': i['id_insumo'], 'stock_actual': sum(l['cantidad_actual'] for l in por_insumo.get(i['id_insumo'], [])),
+             'lotes': por_insumo.get(i['id_insumo'], [])} for i in insumos]
+    return {'success': True, 'data': data}
+
+
+@benchmark('inventario_agrupado')
+def bench_inventario_agrupado(db: FakeDatabase):
+    """Lo que hace `listar_lotes`: resumen por insumo y stock consolidado; después se expande un insumo."""
+    from app.controllers.inventario_controller import InventarioController
+    _completar_lotes(db, LOTES_INVENTARIO)
+    controller = InventarioController()
+    db.reset_counters()
+    resumen, _ = controller.obtener_lotes_agrupados_para_vista()
+    stock, _ = controller.obtener_stock_consolidado()
+    detalle, _ = controller.obtener_lotes_de_insumo_para_vista(resumen['data'][0]['id_insumo'])
+    return {'success': resumen['success'] and stock['success'] and detalle['success']}
+
+
+@benchmark('inventario_agrupado_anterior')
+def bench_inventario_agrupado_anterior(db: FakeDatabase):
+    """La ruta anterior: recálculo del stock de todo el catálogo en cada carga más la agrupación en Python."""
+    from app.controllers.inventario_controller import InventarioController
+    _completar_lotes(db, LOTES_INVENTARIO)
+    controller = InventarioController()
+    db.reset_counters()
+    controller.inventario_model.calcular_y_actualizar_stock_general()
+    vista = _vista_agrupada_anterior(controller)
+    stock, _ = controller.obtener_stock_consolidado()
+    return {'success': vista['success'] and stock['success']}
+
+
+# Sesiones del widget por corrida: cada una pide las preguntas principales y
+# baja por una rama (4 requests). Requests/s = 4 * SESIONES_CHATBOT * 1000 / wall_ms.
+SESIONES_CHATBOT = 250
+
+
+def _sesiones_chatbot(db: FakeDatabase, max_edad: float) -> Dict:
+    from flask import current_app
+    from app.services import chatbot_service
+    if not db.tables.get('chatbot_qa'):
+        qas = []
+        for raiz in range(1, 9):
+            qas.append({'id': raiz, 'pregunta': f'Pregunta {raiz}', 'respuesta': 'Respuesta', 'activo': True, 'parent_id': None})
+            for hijo in range(3):
+                qid = 100 + raiz * 10 + hijo
+                qas.append({'id': qid, 'pregunta': f'Pregunta {qid}', 'respuesta': 'Respuesta', 'activo': True, 'parent_id': raiz})
+        db.tables['chatbot_qa'] = qas
+    chatbot_service._arbol = chatbot_service.ArbolChatbot(max_edad=max_edad)
+    db.reset_counters()
+    cliente = current_app.test_client()
+    fallidas = 0
+    for i in range(SESIONES_CHATBOT):
+        raiz = 1 + i % 8
+        rutas = ['/api/chatbot/qas', f'/api/chatbot/qas/{raiz}/children',
+                 f'/api/chatbot/qas/{100 + raiz * 10 + i % 3}/children', '/api/chatbot/qas']
+        fallidas += sum(cliente.get(ruta).status_code != 200 for ruta in rutas)
+    chatbot_service._arbol = None
+    return {'success': fallidas == 0, 'requests': 4 * SESIONES_CHATBOT}
+
+
+@benchmark('chatbot_widget')
+def bench_chatbot_widget(db: FakeDatabase):
+    return _sesiones_chatbot(db, max_edad=300)
+
+
+@benchmark('chatbot_widget_sin_cache')
+def bench_chatbot_widget_sin_cache(db: FakeDatabase):
+    return _sesiones_chatbot(db, max_edad=0)
+
+
+# --- Ejecución ---------------------------------------------------------
+
+def _medir(nombre: str, fn: Callable, db: FakeDatabase, base: Dict, repeat: int) -> Dict:
+    tiempos: List[float] = []
+    round_trips = {}
+    error = None
+    ok = True
+    for _ in range(repeat):
+        db.restore(base)
+        db.reset_counters()
+        inicio = time.perf_counter()
+        try:
+            resultado = fn(db)
+            ok = ok and _resultado_ok(resultado)
+        except Exception as exc:  # el benchmark no debe cortar el resto de la corrida
+            error = f"{type(exc).__name__}: {exc}"
+            ok = False
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        # La auditoría se escribe en segundo plano; se vacía para que sus inserts
+        # caigan siempre dentro del benchmark que los generó.
+        get_audit_sink().flush(timeout=5)
+        round_trips = dict(db.round_trips)
+
+    return {
+        'ok': ok,
+        'error': error,
+        'wall_ms_median': round(statistics.median(tiempos), 2),
+        'wall_ms_min': round(min(tiempos), 2),
+        'round_trips_total': sum(round_trips.values()),
+        'round_trips': {f"{tabla} {accion}": n for (tabla, accion), n in sorted(round_trips.items())},
+    }
+
+
+def run(scale: float = 1.0, repeat: int = 3, only: List[str] = None, seed: int = 42) -> Dict:
+    db = FakeDatabase()
+    volumen = seed_database(db, scale=scale, seed=seed)
+    install(FakeSupabaseClient(db))
+
+    from app import create_app
+    from flask_jwt_extended import create_access_token, verify_jwt_in_request
+    app = create_app()
+    base = db.snapshot()
+
+    # Los controladores leen la identidad del JWT; se simula un usuario DEV logueado.
+    with app.app_context():
+        token = create_access_token(identity='1', additional_claims={'rol': 'DEV', 'user_level': 9, 'permisos': {}})
+    cookie = f"{app.config.get('JWT_ACCESS_COOKIE_NAME', 'access_token_cookie')}={token}"
+
+    resultados = {}
+    with app.test_request_context('/', headers={'Cookie': cookie}):
+        verify_jwt_in_request()
+        for nombre, fn in BENCHMARKS.items():
+            if only and nombre not in only:
+                continue
+            resultados[nombre] = _medir(nombre, fn, db, base, repeat)
+
+    return {
+        'meta': {'scale': scale, 'repeat': repeat, 'seed': seed, 'python': platform.python_version()},
+        'dataset': dict(sorted(volumen.items())),
+        'benchmarks': resultados,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks offline de rutas calientes.')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplicador del volumen de datos sintéticos.')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones por benchmark.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', default='', help='Lista separada por comas de benchmarks a correr.')
+    parser.add_argument('--output', help='Archivo JSON de salida (por defecto stdout).')
+    parser.add_argument('--verbose', action='store_true', help='Muestra los logs de la aplicación.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    only = [n.strip() for n in args.only.split(',') if n.strip()]
+    # Algunos controladores usan print(); se desvían a stderr para no ensuciar el JSON.
+    with contextlib.redirect_stdout(sys.stderr):
+        reporte = run(scale=args.scale, repeat=args.repeat, only=only, seed=args.seed)
+    salida = json.dumps(reporte, indent=2, sort_keys=True, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(salida + '\n')
+    else:
+        print(salida)
+
+    for nombre, r in reporte['benchmarks'].items():
+        estado = 'ok' if r['ok'] else f"FALLÓ ({r['error'] or 'resultado sin éxito'})"
+        print(f"{nombre:28s} {r['wall_ms_median']:10.1f} ms {r['round_trips_total']:6d} round-trips  {estado}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,502 @@
+"""
+Datos sintéticos reproducibles para el stand-in de Supabase.
+
+`seed_database(db, scale)` puebla catálogo, recetas, stock, órdenes de
+producción y compra, pedidos, lotes de producto y registros del MES con
+volúmenes proporcionales a `scale` (1 = planta chica, 10 = un año de
+historia de una planta mediana). Con la misma semilla se generan siempre
+los mismos datos, así los resultados son comparables entre commits.
+"""
+import random
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict
+
+from benchmarks.fake_supabase import FakeDatabase
+
+OP_ESTADOS_ACTIVOS = ['PENDIENTE', 'EN ESPERA', 'LISTA PARA PRODUCIR', 'EN_LINEA_1', 'EN_LINEA_2',
+                      'EN_EMPAQUETADO', 'CONTROL_DE_CALIDAD', 'PLANIFICADA']
+ROLES = [('DEV', 'Desarrollador', 9), ('GERENTE', 'Gerente', 7), ('SUPERVISOR', 'Supervisor', 5),
+         ('SUPERVISOR_CALIDAD', 'Supervisor de Calidad', 5), ('OPERARIO', 'Operario', 1),
+         ('CALIDAD', 'Calidad', 3), ('ADMIN', 'Administrador', 8)]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def volumes(scale: float) -> Dict[str, int]:
+    s = max(scale, 0.1)
+    return {
+        'productos': int(20 * s), 'insumos': int(60 * s), 'lotes_por_insumo': 8,
+        'proveedores': max(3, int(8 * s)), 'clientes': int(50 * s), 'pedidos': int(300 * s),
+        'ops': int(200 * s), 'ocs': int(80 * s), 'usuarios': int(30 * s),
+    }
+
+
+def seed_database(db: FakeDatabase, scale: float = 1.0, seed: int = 42, hoy: date = None) -> Dict[str, int]:
+    rng = random.Random(seed)
+    hoy = hoy or date.today()
+    ahora = datetime.combine(hoy, datetime.min.time(), tzinfo=timezone.utc) + timedelta(hours=10)
+    v = volumes(scale)
+
+    # --- Seguridad y personal -------------------------------------------
+    db.seed('roles', [{'id': i + 1, 'codigo': c, 'nombre': n, 'nivel': lvl, 'costo_por_hora': 2500 + 500 * i}
+                      for i, (c, n, lvl) in enumerate(ROLES)])
+    db.seed('sectores', [{'id': i + 1, 'codigo': c, 'nombre': c.title()} for i, c in enumerate(['PRODUCCION', 'CALIDAD', 'ALMACEN'])])
+    db.seed('usuarios', [{
+        'id': i + 1, 'email': f'user{i + 1}@frozen.test', 'nombre': f'Nombre{i + 1}', 'apellido': f'Apellido{i + 1}',
+        'legajo': f'L{i + 1:04d}', 'activo': True, 'role_id': 1 if i == 0 else rng.randint(2, len(ROLES)),
+        'turno_id': rng.randint(1, 2),
+    } for i in range(v['usuarios'])])
+    db.seed('usuario_sectores', [{'id': i + 1, 'usuario_id': i + 1, 'sector_id': rng.randint(1, 3)} for i in range(v['usuarios'])])
+
+    # --- Capacidad --------------------------------------------------------
+    db.seed('CentrosTrabajo', [
+        {'id': 1, 'nombre': 'Linea 1', 'tiempo_disponible_std_dia': 480, 'eficiencia': 0.9, 'utilizacion': 0.95, 'numero_maquinas': 1},
+        {'id': 2, 'nombre': 'Linea 2', 'tiempo_disponible_std_dia': 480, 'eficiencia': 0.85, 'utilizacion': 0.9, 'numero_maquinas': 1},
+    ])
+    db.seed('bloqueos_capacidad', [{
+        'centro_trabajo_id': rng.randint(1, 2), 'fecha': (hoy + timedelta(days=rng.randint(0, 20))).isoformat(),
+        'minutos_bloqueados': rng.choice([30, 60, 120]), 'motivo': 'Mantenimiento',
+    } for _ in range(max(2, int(6 * scale)))])
+    db.seed('calendario_excepciones', [{'id': 1, 'fecha': (hoy + timedelta(days=9)).isoformat(), 'es_laborable': False, 'motivo': 'Inventario anual'}])
+
+    # --- Proveedores e insumos ------------------------------------------
+    db.seed('proveedores', [{'id': i + 1, 'codigo': f'PRV-{i + 1:04d}', 'nombre': f'Proveedor {i + 1}', 'activo': True,
+                             'email': f'prov{i + 1}@frozen.test'} for i in range(v['proveedores'])])
+    insumos = []
+    for i in range(v['insumos']):
+        insumos.append({
+            'id_insumo': _uuid(rng), 'nombre': f'Insumo {i + 1}', 'codigo_interno': f'INS-{i + 1:04d}',
+            'unidad_medida': rng.choice(['kg', 'lt', 'un']), 'categoria': rng.choice(['Secos', 'Refrigerados', 'Congelados', 'Envases']),
+            'stock_min': rng.randint(5, 50), 'stock_max': rng.randint(200, 800), 'vida_util_dias': rng.randint(30, 365),
+            'es_critico': rng.random() < 0.2, 'activo': True, 'precio_unitario': round(rng.uniform(50, 5000), 2),
+            'id_proveedor': rng.randint(1, v['proveedores']), 'tiempo_entrega_dias': rng.randint(1, 7),
+            'en_espera_de_reestock': False,
+        })
+    lotes = []
+    for insumo in insumos:
+        for j in range(v['lotes_por_insumo']):
+            inicial = round(rng.uniform(20, 300), 2)
+            estado = rng.choices(['disponible', 'reservado', 'agotado', 'cuarentena', 'vencido'], [60, 15, 15, 5, 5])[0]
+            actual = 0 if estado == 'agotado' else round(inicial * rng.uniform(0.1, 1), 2)
+            lotes.append({
+                'id_lote': _uuid(rng), 'id_insumo': insumo['id_insumo'], 'numero_lote_proveedor': f'LP-{len(lotes) + 1:06d}',
+                'cantidad_inicial': inicial, 'cantidad_actual': actual, 'precio_unitario': insumo['precio_unitario'],
+                'f_ingreso': (hoy - timedelta(days=rng.randint(1, 120))).isoformat(),
+                'f_vencimiento': (hoy + timedelta(days=rng.randint(-10, 200))).isoformat(),
+                'estado': estado, 'cantidad_en_cuarentena': round(actual * 0.5, 2) if estado == 'cuarentena' else 0,
+                'id_proveedor': insumo['id_proveedor'], 'documento_ingreso': None, 'created_at': ahora.isoformat(),
+            })
+        insumo['stock_actual'] = round(sum(l['cantidad_actual'] for l in lotes[-v['lotes_por_insumo']:] if l['estado'] == 'disponible'), 2)
+        insumo['stock_total'] = insumo['stock_actual']
+    db.seed('insumos_catalogo', insumos)
+
+    # --- Productos, recetas y operaciones --------------------------------
+    productos, recetas, ingredientes, operaciones, op_roles = [], [], [], [], []
+    db.seed('costos_fijos', [{'id': i + 1, 'nombre_costo': f'Costo fijo {i + 1}', 'tipo': rng.choice(['Directo', 'Indirecto']),
+                              'monto_mensual': rng.randint(50_000, 900_000), 'activo': True,
+                              'created_at': (ahora - timedelta(days=400)).isoformat()} for i in range(6)])
+    for i in range(v['productos']):
+        pid = i + 1
+        productos.append({
+            'id': pid, 'codigo': f'PROD-{pid:04d}', 'nombre': f'Producto {pid}', 'categoria': rng.choice(['Pizzas', 'Empanadas', 'Tartas']),
+            'activo': True, 'unidad_medida': 'un', 'precio_unitario': round(rng.uniform(1500, 9000), 2), 'porcentaje_extra': 30,
+            'iva': True, 'unidades_por_paquete': rng.choice([1, 6, 12]), 'stock_min_produccion': rng.randint(10, 80),
+            'cantidad_maxima_x_pedido': 500, 'costo_total_produccion': round(rng.uniform(500, 4000), 2),
+            'costo_materia_prima': round(rng.uniform(300, 2000), 2), 'costo_mano_obra': round(rng.uniform(100, 800), 2),
+            'costo_fijos_aplicado': round(rng.uniform(50, 400), 2),
+        })
+        recetas.append({'id': pid, 'nombre': f'Receta {pid}', 'producto_id': pid, 'version': '1', 'rendimiento': 1, 'activa': True,
+                        'tiempo_preparacion_minutos': rng.randint(15, 60), 'linea_compatible': rng.choice(['1', '2', '1,2']),
+                        'tiempo_prod_unidad_linea1': round(rng.uniform(0.2, 1.5), 2), 'tiempo_prod_unidad_linea2': round(rng.uniform(0.3, 2), 2)})
+        for insumo in rng.sample(insumos, k=min(len(insumos), rng.randint(4, 12))):
+            ingredientes.append({'receta_id': pid, 'id_insumo': insumo['id_insumo'], 'cantidad': round(rng.uniform(0.01, 0.5), 3),
+                                 'unidad_medida': insumo['unidad_medida']})
+        for sec in range(1, rng.randint(2, 4) + 1):
+            operaciones.append({'receta_id': pid, 'secuencia': sec, 'nombre_operacion': f'Paso {sec}',
+                                'tiempo_preparacion': rng.randint(5, 30), 'tiempo_ejecucion_unitario': round(rng.uniform(0.05, 0.8), 3)})
+    db.seed('productos', productos)
+    db.seed('recetas', recetas)
+    db.seed('receta_ingredientes', ingredientes)
+    db.seed('operacionesreceta', operaciones)
+    for operacion in db.tables['operacionesreceta']:
+        op_roles.append({'operacion_receta_id': operacion['id'], 'rol_id': rng.randint(2, len(ROLES)), 'porcentaje_participacion': 100})
+    db.seed('operacion_receta_roles', op_roles)
+    db.seed('operacion_receta_costos_fijos', [{'operacion_receta_id': o['id'], 'costo_fijo_id': rng.randint(1, 6)}
+                                              for o in db.tables['operacionesreceta'][::2]])
+
+    # --- Clientes y pedidos --------------------------------------------
+    db.seed('usuario_direccion', [{'id': i + 1, 'calle': f'Calle {i + 1}', 'altura': rng.randint(1, 5000), 'localidad': 'CABA',
+                                   'provincia': 'Buenos Aires', 'codigo_postal': '1000'} for i in range(v['clientes'])])
+    db.seed('clientes', [{
+        'id': i + 1, 'codigo': f'CLI-{i + 1:04d}', 'nombre': f'Cliente {i + 1}', 'razon_social': f'Cliente {i + 1} SA',
+        'email': f'cliente{i + 1}@frozen.test', 'cuit': f'30-{10000000 + i}-1', 'activo': True, 'direccion_id': i + 1,
+        'condicion_venta': rng.choice([1, 2, 3]), 'estado_aprobacion': 'aprobado', 'estado_crediticio': 'normal',
+    } for i in range(v['clientes'])])
+
+    pedidos, items = [], []
+    for i in range(v['pedidos']):
+        fecha = hoy - timedelta(days=rng.randint(0, 365))
+        estado = rng.choices(['PENDIENTE', 'EN_PROCESO', 'LISTO_PARA_ENTREGA', 'COMPLETADO', 'CANCELADO'], [15, 20, 10, 50, 5])[0]
+        pedido = {
+            'id': i + 1, 'id_cliente': rng.randint(1, v['clientes']), 'fecha_solicitud': fecha.isoformat(),
+            'fecha_requerido': (fecha + timedelta(days=rng.randint(2, 20))).isoformat(), 'estado': estado,
+            'condicion_venta': rng.choice(['contado', 'credito_30', 'credito_60']), 'id_direccion_entrega': rng.randint(1, v['clientes']),
+            'estado_pago': rng.choices(['pagado', 'pendiente', 'vencido'], [60, 30, 10])[0], 'precio_orden': 0,
+            'created_at': datetime.combine(fecha, datetime.min.time(), tzinfo=timezone.utc).isoformat(),
+        }
+        total = 0
+        for producto in rng.sample(productos, k=rng.randint(1, 4)):
+            cantidad = rng.randint(5, 120)
+            total += cantidad * producto['precio_unitario']
+            items.append({'pedido_id': pedido['id'], 'producto_id': producto['id'], 'cantidad': cantidad, 'estado': 'PENDIENTE',
+                          'precio_unitario': producto['precio_unitario']})
+        pedido['precio_orden'] = round(total, 2)
+        pedidos.append(pedido)
+    db.seed('pedidos', pedidos)
+    db.seed('pedido_items', items)
+    db.seed('pagos', [{'id_pedido': p['id'], 'monto': p['precio_orden'], 'estado': 'verificado',
+                       'fecha_pago': p['fecha_solicitud']} for p in pedidos if p['estado_pago'] == 'pagado'])
+
+    # --- Órdenes de producción ------------------------------------------
+    ops = []
+    for i in range(v['ops']):
+        producto = rng.choice(productos)
+        dias = rng.randint(-30, 14)
+        estado = rng.choices(OP_ESTADOS_ACTIVOS + ['COMPLETADA', 'CANCELADA'], [10, 8, 8, 4, 4, 2, 2, 12, 45, 5])[0]
+        inicio = ahora + timedelta(days=dias)
+        planificada = int(rng.randint(50, 600))
+        op = {
+            'id': i + 1, 'codigo': f'OP-{i + 1:05d}', 'producto_id': producto['id'], 'receta_id': producto['id'],
+            'cantidad_planificada': planificada, 'estado': estado, 'prioridad': rng.choice(['BAJA', 'NORMAL', 'ALTA']),
+            'fecha_planificada': inicio.date().isoformat(), 'fecha_meta': (inicio + timedelta(days=rng.randint(1, 10))).isoformat(),
+            'usuario_creador_id': 1, 'created_at': (inicio - timedelta(days=3)).isoformat(),
+            'cantidad_producida': planificada if estado == 'COMPLETADA' else int(planificada * rng.uniform(0, 0.7)),
+        }
+        if estado not in ('PENDIENTE', 'CANCELADA'):
+            op['linea_asignada'] = rng.randint(1, 2)
+            op['fecha_inicio_planificada'] = inicio.date().isoformat()
+        if estado in ('EN_LINEA_1', 'EN_LINEA_2', 'EN_EMPAQUETADO', 'CONTROL_DE_CALIDAD', 'COMPLETADA'):
+            op['fecha_inicio'] = inicio.isoformat()
+            op['operario_asignado_id'] = rng.randint(1, v['usuarios'])
+        if estado == 'COMPLETADA':
+            op['fecha_fin'] = (inicio + timedelta(hours=rng.randint(2, 12))).isoformat()
+        ops.append(op)
+    db.seed('ordenes_produccion', ops)
+    for item in rng.sample(db.tables['pedido_items'], k=min(len(ops), len(db.tables['pedido_items']) // 2)):
+        item['orden_produccion_id'] = rng.randint(1, len(ops))
+
+    # Reservas de insumos de OPs en curso y lotes consumidos por OPs terminadas.
+    reservas = []
+    lotes_por_insumo = {}
+    for lote in lotes:
+        lotes_por_insumo.setdefault(lote['id_insumo'], []).append(lote)
+    ing_por_receta = {}
+    for ing in ingredientes:
+        ing_por_receta.setdefault(ing['receta_id'], []).append(ing)
+    for op in ops:
+        if op['estado'] in ('PENDIENTE', 'CANCELADA', 'EN ESPERA'):
+            continue
+        for ing in ing_por_receta.get(op['receta_id'], []):
+            lote = rng.choice(lotes_por_insumo[ing['id_insumo']])
+            reservas.append({'orden_produccion_id': op['id'], 'lote_inventario_id': lote['id_lote'], 'insumo_id': ing['id_insumo'],
+                             'cantidad_reservada': round(ing['cantidad'] * op['cantidad_planificada'], 3),
+                             'estado': 'CONSUMIDO' if op['estado'] == 'COMPLETADA' else 'RESERVADO', 'usuario_reserva_id': 1})
+    db.seed('insumos_inventario', lotes)
+    db.seed('reservas_insumos', reservas)
+
+    # --- Órdenes de compra ---------------------------------------------
+    ocs, oc_items = [], []
+    for i in range(v['ocs']):
+        emision = hoy - timedelta(days=rng.randint(0, 90))
+        estado = rng.choice(['PENDIENTE', 'APROBADA', 'EN_TRANSITO', 'RECEPCION_COMPLETA', 'CANCELADA'])
+        oc = {'id': i + 1, 'codigo_oc': f'OC-{i + 1:05d}', 'proveedor_id': rng.randint(1, v['proveedores']), 'estado': estado,
+              'fecha_emision': emision.isoformat(), 'fecha_estimada_entrega': (emision + timedelta(days=rng.randint(2, 10))).isoformat(),
+              'orden_produccion_id': rng.choice([None, rng.randint(1, len(ops))]), 'usuario_creador_id': 1, 'subtotal': 0,
+              'iva': 0, 'total': 0, 'prioridad': 'NORMAL', 'fecha_creacion': emision.isoformat()}
+        for insumo in rng.sample(insumos, k=rng.randint(1, 5)):
+            cantidad = rng.randint(10, 200)
+            oc_items.append({'orden_compra_id': oc['id'], 'insumo_id': insumo['id_insumo'], 'cantidad_solicitada': cantidad,
+                             'cantidad_recibida': cantidad if estado == 'RECEPCION_COMPLETA' else 0,
+                             'precio_unitario': insumo['precio_unitario'], 'subtotal': round(cantidad * insumo['precio_unitario'], 2)})
+            oc['subtotal'] += oc_items[-1]['subtotal']
+        oc['total'] = round(oc['subtotal'] * 1.21, 2)
+        ocs.append(oc)
+    db.seed('ordenes_compra', ocs)
+    db.seed('orden_compra_items', oc_items)
+    for lote in rng.sample(lotes, k=len(lotes) // 3):
+        oc = rng.choice(ocs)
+        lote['documento_ingreso'] = oc['codigo_oc']
+        lote['id_orden_compra'] = oc['id']
+
+    # --- Lotes de producto y reservas de pedidos ------------------------
+    lotes_prod, reservas_prod = [], []
+    for op in ops:
+        if op['estado'] not in ('COMPLETADA', 'CONTROL_DE_CALIDAD'):
+            continue
+        producido = op['cantidad_producida']
+        actual = int(producido * rng.uniform(0, 1))
+        lotes_prod.append({
+            'id_lote': len(lotes_prod) + 1, 'producto_id': op['producto_id'], 'numero_lote': f'LPT-{len(lotes_prod) + 1:06d}',
+            'cantidad_inicial': producido, 'cantidad_actual': actual, 'orden_produccion_id': op['id'],
+            'fecha_produccion': op['fecha_planificada'], 'fecha_vencimiento': (hoy + timedelta(days=rng.randint(-5, 180))).isoformat(),
+            'estado': 'DISPONIBLE' if actual > 0 else 'AGOTADO', 'cantidad_en_cuarentena': 0,
+            'costo_produccion_unitario': round(rng.uniform(300, 3000), 2),
+        })
+    db.seed('lotes_productos', lotes_prod)
+    items_por_producto = {}
+    for item in db.tables['pedido_items']:
+        items_por_producto.setdefault(item['producto_id'], []).append(item)
+    for lote in lotes_prod:
+        for item in rng.sample(items_por_producto.get(lote['producto_id'], []), k=min(2, len(items_por_producto.get(lote['producto_id'], [])))):
+            reservas_prod.append({'lote_producto_id': lote['id_lote'], 'pedido_id': item['pedido_id'], 'pedido_item_id': item['id'],
+                                  'cantidad_reservada': min(item['cantidad'], lote['cantidad_inicial']), 'cantidad_despachada': 0,
+                                  'estado': rng.choice(['RESERVADO', 'COMPLETADO']), 'fecha_reserva': ahora.isoformat(), 'usuario_reserva_id': 1})
+    db.seed('reservas_productos', reservas_prod)
+    db.seed('control_calidad_productos', [{'lote_producto_id': l['id_lote'], 'orden_produccion_id': l['orden_produccion_id'],
+                                           'usuario_supervisor_id': 1, 'decision_final': rng.choice(['APROBADO', 'APROBADO', 'RECHAZADO']),
+                                           'fecha_inspeccion': ahora.isoformat()} for l in lotes_prod])
+
+    # --- MES (esquema mes_kanban) ---------------------------------------
+    db.seed('mes_kanban.motivos_desperdicio', [{'id': i + 1, 'descripcion': d} for i, d in enumerate(['Rotura', 'Quemado', 'Forma'])])
+    db.seed('mes_kanban.motivos_paro', [{'id': i + 1, 'descripcion': d} for i, d in enumerate(['Mantenimiento', 'Falta material', 'Limpieza'])])
+    desperdicios, paros = [], []
+    for op in ops:
+        if 'fecha_inicio' not in op:
+            continue
+        for _ in range(rng.randint(0, 3)):
+            desperdicios.append({'orden_produccion_id': op['id'], 'motivo_desperdicio_id': rng.randint(1, 3),
+                                 'cantidad': rng.randint(1, 20), 'usuario_id': 1, 'fecha_registro': op['fecha_inicio']})
+        for _ in range(rng.randint(0, 2)):
+            inicio = datetime.fromisoformat(op['fecha_inicio']) + timedelta(minutes=rng.randint(10, 120))
+            paros.append({'orden_produccion_id': op['id'], 'motivo_paro_id': rng.randint(1, 3), 'usuario_id': 1,
+                          'fecha_inicio': inicio.isoformat(), 'fecha_fin': (inicio + timedelta(minutes=rng.randint(5, 60))).isoformat()})
+    db.seed('mes_kanban.registros_desperdicio', desperdicios)
+    db.seed('mes_kanban.registros_paro', paros)
+    db.seed('mes_kanban.traspasos_turno', [])
+
+    inicializar_saldos_inventario(db)
+    register_default_rpcs(db)
+    return {table: len(rows) for table, rows in db.tables.items()}
+
+
+def _saldo_utilizable(lote: Dict) -> float:
+    if str(lote.get('estado') or '').lower() not in ('disponible', 'reservado'):
+        return 0.0
+    return max(0.0, float(lote.get('cantidad_actual') or 0))
+
+
+def inicializar_saldos_inventario(db: FakeDatabase):
+    """Saldos iniciales del libro de inventario desde los lotes, como la migración de setup.sql."""
+    saldos_lote = {s['id_lote'] for s in db.tables['saldos_inventario_lote']}
+    nuevos = [{'id_lote': l['id_lote'], 'id_insumo': l['id_insumo'], 'saldo': _saldo_utilizable(l), 'estado': l.get('estado')}
+              for l in db.tables['insumos_inventario'] if l['id_lote'] not in saldos_lote]
+    db.seed('saldos_inventario_lote', nuevos)
+    por_insumo = {}
+    for saldo in db.tables['saldos_inventario_lote']:
+        por_insumo[saldo['id_insumo']] = por_insumo.get(saldo['id_insumo'], 0.0) + saldo['saldo']
+    existentes = {s['id_insumo'] for s in db.tables['saldos_inventario_insumo']}
+    db.seed('saldos_inventario_insumo', [{'id_insumo': k, 'saldo': v} for k, v in por_insumo.items() if k not in existentes])
+
+
+TIPO_INVERSO = {'RESERVA': 'LIBERACION', 'LIBERACION': 'RESERVA',
+                'CUARENTENA_ENTRADA': 'CUARENTENA_SALIDA', 'CUARENTENA_SALIDA': 'CUARENTENA_ENTRADA'}
+TIPOS_NEGATIVOS = ('RESERVA', 'CONSUMO', 'MERMA', 'CUARENTENA_ENTRADA')
+TIPOS_POSITIVOS = ('INGRESO', 'LIBERACION', 'CUARENTENA_SALIDA')
+
+
+def registrar_movimientos_inventario(db: FakeDatabase, params: Dict):
+    """Equivalente de `public.registrar_movimientos_inventario` (el lock de la base serializa las llamadas)."""
+    lotes = {l['id_lote']: l for l in db.tables['insumos_inventario']}
+    saldos_lote = {s['id_lote']: s for s in db.tables['saldos_inventario_lote']}
+    saldos_insumo = {s['id_insumo']: s for s in db.tables['saldos_inventario_insumo']}
+    movimientos = []
+    for cambio in params['p_cambios']:
+        lote = lotes.get(cambio['id_lote'])
+        if lote is None:
+            continue
+        nuevo = _saldo_utilizable(lote)
+        saldo = saldos_lote.get(lote['id_lote'])
+        if saldo is None:
+            saldo = {'id_lote': lote['id_lote'], 'id_insumo': lote['id_insumo'], 'saldo': 0.0, 'estado': None}
+            db.tables['saldos_inventario_lote'].append(saldo)
+            saldos_lote[lote['id_lote']] = saldo
+        anterior, estado_anterior = saldo['saldo'], str(saldo['estado'] or '').lower()
+        saldo['saldo'], saldo['estado'] = nuevo, lote.get('estado')
+        delta = nuevo - anterior
+        if abs(delta) < 1e-9:
+            continue
+        total = saldos_insumo.get(lote['id_insumo'])
+        if total is None:
+            total = saldos_insumo[lote['id_insumo']] = {'id_insumo': lote['id_insumo'], 'saldo': 0.0}
+            db.tables['saldos_inventario_insumo'].append(total)
+        total['saldo'] += delta
+
+        estado, tipo = str(lote.get('estado') or '').lower(), cambio.get('tipo')
+        if cambio.get('alta'):
+            tipo = 'INGRESO'
+        elif estado == 'cuarentena' and estado_anterior != 'cuarentena':
+            tipo = 'CUARENTENA_ENTRADA'
+        elif estado_anterior == 'cuarentena' and estado != 'cuarentena':
+            tipo = 'CUARENTENA_SALIDA'
+        elif tipo is None:
+            tipo = 'AJUSTE'
+        elif (tipo in TIPOS_NEGATIVOS and delta > 0) or (tipo in TIPOS_POSITIVOS and delta < 0):
+            tipo = TIPO_INVERSO.get(tipo, 'AJUSTE')
+        movimiento = {'fecha': datetime.now(timezone.utc).isoformat(), 'tipo': tipo, 'id_lote': lote['id_lote'],
+                      'id_insumo': lote['id_insumo'], 'cantidad': round(delta, 6), 'saldo_lote': round(nuevo, 6),
+                      'saldo_insumo': round(total['saldo'], 6), 'referencia_tipo': cambio.get('referencia_tipo'),
+                      'referencia_id': cambio.get('referencia_id'), 'usuario_id': cambio.get('usuario_id')}
+        db.seed('movimientos_inventario', [movimiento])
+        movimientos.append(movimiento)
+    return movimientos
+
+
+def crear_checkpoint_inventario(db: FakeDatabase, params: Dict):
+    checkpoint = {
+        'fecha': datetime.now(timezone.utc).isoformat(),
+        'ultimo_movimiento_id': max((m['id'] for m in db.tables['movimientos_inventario']), default=0),
+        'saldos_insumos': {s['id_insumo']: s['saldo'] for s in db.tables['saldos_inventario_insumo'] if abs(s['saldo']) > 1e-9},
+        'saldos_lotes': {s['id_lote']: [s['id_insumo'], s['saldo'], s['estado']] for s in db.tables['saldos_inventario_lote']
+                         if abs(s['saldo']) > 1e-9 or str(s['estado'] or '').lower() == 'cuarentena'},
+    }
+    db.seed('checkpoints_inventario', [checkpoint])
+    return checkpoint
+
+
+def conciliar_inventario(db: FakeDatabase, params: Dict):
+    saldos_lote = {s['id_lote']: s for s in db.tables['saldos_inventario_lote']}
+    desviados = [{'id_lote': l['id_lote'], 'tipo': 'AJUSTE', 'referencia_tipo': 'reconciliacion'}
+                 for l in db.tables['insumos_inventario']
+                 if l['id_lote'] not in saldos_lote or saldos_lote[l['id_lote']]['saldo'] != _saldo_utilizable(l)
+                 or saldos_lote[l['id_lote']]['estado'] != l.get('estado')]
+    ajustes = len(registrar_movimientos_inventario(db, {'p_cambios': desviados}))
+    lotes = {l['id_lote'] for l in db.tables['insumos_inventario']}
+    totales = {s['id_insumo']: s for s in db.tables['saldos_inventario_insumo']}
+    for saldo in [s for s in db.tables['saldos_inventario_lote'] if s['id_lote'] not in lotes]:
+        totales[saldo['id_insumo']]['saldo'] -= saldo['saldo']
+        db.tables['saldos_inventario_lote'].remove(saldo)
+    crear_checkpoint_inventario(db, {})
+    return ajustes
+
+
+def actualizar_costos_productos(db: FakeDatabase, params: Dict):
+    """Equivalente de `public.actualizar_costos_productos`: escribe sólo las columnas de costo."""
+    columnas = ('costo_mano_obra', 'costo_fijos', 'costo_total_produccion', 'precio_unitario')
+    filas = {f['id']: f for f in params['p_filas']}
+    actualizados = 0
+    for producto in db.tables['productos']:
+        fila = filas.get(producto['id'])
+        if fila is not None:
+            producto.update({c: fila[c] for c in columnas})
+            producto['updated_at'] = datetime.now(timezone.utc).isoformat()
+            actualizados += 1
+    return actualizados
+
+
+def _num(valor) -> float:
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def cuarentena_lotes_insumo(db: FakeDatabase, params: Dict):
+    """Equivalente de `public.cuarentena_lotes_insumo`."""
+    ids = {str(i) for i in params['p_ids']}
+    reservado = {}
+    for reserva in db.tables['reservas_insumos']:
+        if str(reserva['lote_inventario_id']) in ids and reserva.get('estado') == 'RESERVADO':
+            clave = str(reserva['lote_inventario_id'])
+            reservado[clave] = reservado.get(clave, 0.0) + _num(reserva.get('cantidad_reservada'))
+    actualizados = []
+    for lote in db.tables['insumos_inventario']:
+        if str(lote['id_lote']) in ids:
+            cuarentena = _num(lote.get('cantidad_en_cuarentena')) + _num(lote.get('cantidad_actual')) + \
+                reservado.get(str(lote['id_lote']), 0.0)
+            lote.update(cantidad_en_cuarentena=cuarentena, estado='cuarentena' if cuarentena > 0 else 'agotado',
+                        cantidad_actual=0, motivo_cuarentena=params['p_motivo'], en_alerta=True,
+                        updated_at=datetime.now(timezone.utc).isoformat())
+            actualizados.append(dict(lote))
+    return actualizados
+
+
+def cuarentena_lotes_producto(db: FakeDatabase, params: Dict):
+    """Equivalente de `public.cuarentena_lotes_producto`."""
+    ids = {int(i) for i in params['p_ids']}
+    actualizados = []
+    for lote in db.tables['lotes_productos']:
+        if int(lote['id_lote']) in ids:
+            cuarentena = _num(lote.get('cantidad_en_cuarentena')) + _num(lote.get('cantidad_actual'))
+            lote.update(cantidad_en_cuarentena=cuarentena, estado='CUARENTENA' if cuarentena > 0 else 'AGOTADO',
+                        cantidad_actual=0, motivo_cuarentena=params['p_motivo'], en_alerta=True,
+                        updated_at=datetime.now(timezone.utc).isoformat())
+            actualizados.append(dict(lote))
+    return actualizados
+
+
+def actualizar_stock_insumos(db: FakeDatabase, params: Dict):
+    """Equivalente de `public.actualizar_stock_insumos`: stock_actual desde la tabla de saldos."""
+    ids = {str(i) for i in params['p_ids']}
+    saldos = {str(s['id_insumo']): s['saldo'] for s in db.tables['saldos_inventario_insumo']}
+    actualizados = []
+    for insumo in db.tables['insumos_catalogo']:
+        if str(insumo['id_insumo']) in ids:
+            insumo['stock_actual'] = saldos.get(str(insumo['id_insumo']), 0)
+            actualizados.append(dict(insumo))
+    return actualizados
+
+
+def register_default_rpcs(db: FakeDatabase):
+    """Equivalentes en Python de las funciones SQL que usa la aplicación."""
+
+    def get_stock_total_disponible(db, params):
+        totales = {}
+        for lote in db.tables['insumos_inventario']:
+            if str(lote.get('estado', '')).lower() == 'disponible':
+                totales[lote['id_insumo']] = totales.get(lote['id_insumo'], 0) + float(lote.get('cantidad_actual') or 0)
+        return [{'insumo_id': k, 'stock_disponible': round(v, 4)} for k, v in totales.items()]
+
+    def get_insumos_stock_critico(db, params):
+        return [i for i in db.tables['insumos_catalogo'] if float(i.get('stock_actual') or 0) < float(i.get('stock_min') or 0)]
+
+    def get_top_productos_vendidos(db, params):
+        totales = {}
+        for item in db.tables['pedido_items']:
+            totales[item['producto_id']] = totales.get(item['producto_id'], 0) + item['cantidad']
+        nombres = {p['id']: p['nombre'] for p in db.tables['productos']}
+        top = sorted(totales.items(), key=lambda kv: -kv[1])[:int(params.get('limite', params.get('p_limit', 5)) or 5)]
+        return [{'producto_id': pid, 'nombre': nombres.get(pid), 'total_vendido': total} for pid, total in top]
+
+    def get_resumen_inventario_insumos(db, params):
+        from app.models.inventario import resumir_inventario_por_insumo
+        return resumir_inventario_por_insumo(db.tables['insumos_catalogo'], db.tables['insumos_inventario'],
+                                             db.tables['reservas_insumos'])
+
+    def contar_pedidos_vencidos_por_cliente(db, params):
+        conteo = {}
+        for pedido in db.tables['pedidos']:
+            if pedido.get('estado_pago') == 'vencido' and pedido.get('id_cliente') is not None:
+                conteo[pedido['id_cliente']] = conteo.get(pedido['id_cliente'], 0) + 1
+        return [{'id_cliente': k, 'vencidos': v} for k, v in conteo.items()]
+
+    def get_estados_crediticios_con_vencidos(db, params):
+        conteo = {f['id_cliente']: f['vencidos'] for f in contar_pedidos_vencidos_por_cliente(db, params)}
+        return [{'id': c['id'], 'estado_crediticio': c.get('estado_crediticio'), 'vencidos': conteo.get(c['id'], 0)}
+                for c in db.tables['clientes']]
+
+    db.register_rpc('get_stock_total_disponible', get_stock_total_disponible)
+    db.register_rpc('get_insumos_stock_critico', get_insumos_stock_critico)
+    db.register_rpc('get_top_productos_vendidos', get_top_productos_vendidos)
+    db.register_rpc('get_resumen_inventario_insumos', get_resumen_inventario_insumos)
+    db.register_rpc('registrar_movimientos_inventario', registrar_movimientos_inventario)
+    db.register_rpc('crear_checkpoint_inventario', crear_checkpoint_inventario)
+    db.register_rpc('conciliar_inventario', conciliar_inventario)
+    db.register_rpc('actualizar_costos_productos', actualizar_costos_productos)
+    db.register_rpc('contar_pedidos_vencidos_por_cliente', contar_pedidos_vencidos_por_cliente)
+    db.register_rpc('get_estados_crediticios_con_vencidos', get_estados_crediticios_con_vencidos)
+    db.register_rpc('cuarentena_lotes_insumo', cuarentena_lotes_insumo)
+    db.register_rpc('cuarentena_lotes_producto', cuarentena_lotes_producto)
+    db.register_rpc('actualizar_stock_insumos', actualizar_stock_insumos)
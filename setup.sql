@@ -64,6 +64,14 @@ CREATE TABLE public.chatbot_qa (
   CONSTRAINT chatbot_qa_pkey PRIMARY KEY (id),
   CONSTRAINT chatbot_qa_parent_id_fkey FOREIGN KEY (parent_id) REFERENCES public.chatbot_qa(id)
 );
+CREATE TABLE public.checkpoints_inventario (
+  id bigint GENERATED ALWAYS AS IDENTITY NOT NULL,
+  fecha timestamp with time zone NOT NULL DEFAULT now(),
+  ultimo_movimiento_id bigint NOT NULL DEFAULT 0,
+  saldos_insumos jsonb NOT NULL DEFAULT '{}'::jsonb,
+  saldos_lotes jsonb NOT NULL DEFAULT '{}'::jsonb,
+  CONSTRAINT checkpoints_inventario_pkey PRIMARY KEY (id)
+);
 CREATE TABLE public.clientes (
   id integer GENERATED ALWAYS AS IDENTITY NOT NULL UNIQUE,
   codigo character varying NOT NULL UNIQUE,
@@ -155,6 +163,22 @@ CREATE TABLE public.despachos (
   CONSTRAINT despachos_pkey PRIMARY KEY (id),
   CONSTRAINT despachos_vehiculo_id_fkey FOREIGN KEY (vehiculo_id) REFERENCES public.vehiculos(id)
 );
+CREATE TABLE public.hechos_produccion_op (
+  orden_produccion_id integer NOT NULL,
+  receta_id integer,
+  estado character varying,
+  fecha_inicio timestamp with time zone,
+  fecha_fin timestamp with time zone,
+  tiempo_produccion_seg numeric NOT NULL DEFAULT 0,
+  tiempo_paro_seg numeric NOT NULL DEFAULT 0,
+  minutos_planificados numeric NOT NULL DEFAULT 0,
+  cantidad_producida numeric NOT NULL DEFAULT 0,
+  cantidad_desperdicio numeric NOT NULL DEFAULT 0,
+  cantidad_rechazada numeric NOT NULL DEFAULT 0,
+  actualizado_en timestamp with time zone NOT NULL DEFAULT now(),
+  CONSTRAINT hechos_produccion_op_pkey PRIMARY KEY (orden_produccion_id),
+  CONSTRAINT hechos_produccion_op_orden_produccion_id_fkey FOREIGN KEY (orden_produccion_id) REFERENCES public.ordenes_produccion(id)
+);
 CREATE TABLE public.historial_precios_insumos (
   id integer NOT NULL DEFAULT nextval('historial_precios_insumos_id_seq'::regclass),
   id_insumo uuid NOT NULL,
@@ -258,6 +282,23 @@ CREATE TABLE public.lotes_productos (
   CONSTRAINT lotes_productos_orden_produccion_id_fkey FOREIGN KEY (orden_produccion_id) REFERENCES public.ordenes_produccion(id),
   CONSTRAINT lotes_productos_pedido_id_fkey FOREIGN KEY (pedido_id) REFERENCES public.pedidos(id)
 );
+CREATE TABLE public.movimientos_inventario (
+  id bigint GENERATED ALWAYS AS IDENTITY NOT NULL,
+  fecha timestamp with time zone NOT NULL DEFAULT now(),
+  tipo character varying NOT NULL CHECK (tipo::text = ANY (ARRAY['INGRESO'::text, 'RESERVA'::text, 'LIBERACION'::text, 'CONSUMO'::text, 'MERMA'::text, 'CUARENTENA_ENTRADA'::text, 'CUARENTENA_SALIDA'::text, 'AJUSTE'::text])),
+  id_lote uuid NOT NULL,
+  id_insumo uuid NOT NULL,
+  cantidad numeric NOT NULL,
+  saldo_lote numeric NOT NULL,
+  saldo_insumo numeric NOT NULL,
+  referencia_tipo character varying,
+  referencia_id character varying,
+  usuario_id integer,
+  CONSTRAINT movimientos_inventario_pkey PRIMARY KEY (id),
+  CONSTRAINT movimientos_inventario_id_lote_fkey FOREIGN KEY (id_lote) REFERENCES public.insumos_inventario(id_lote),
+  CONSTRAINT movimientos_inventario_id_insumo_fkey FOREIGN KEY (id_insumo) REFERENCES public.insumos_catalogo(id_insumo),
+  CONSTRAINT movimientos_inventario_usuario_id_fkey FOREIGN KEY (usuario_id) REFERENCES public.usuarios(id)
+);
 CREATE TABLE public.notas_credito (
   id bigint GENERATED ALWAYS AS IDENTITY NOT NULL,
   created_at timestamp with time zone NOT NULL DEFAULT now(),
@@ -586,6 +627,20 @@ CREATE TABLE public.roles (
   created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
   CONSTRAINT roles_pkey PRIMARY KEY (id)
 );
+CREATE TABLE public.saldos_inventario_insumo (
+  id_insumo uuid NOT NULL,
+  saldo numeric NOT NULL DEFAULT 0,
+  CONSTRAINT saldos_inventario_insumo_pkey PRIMARY KEY (id_insumo),
+  CONSTRAINT saldos_inventario_insumo_id_insumo_fkey FOREIGN KEY (id_insumo) REFERENCES public.insumos_catalogo(id_insumo)
+);
+CREATE TABLE public.saldos_inventario_lote (
+  id_lote uuid NOT NULL,
+  id_insumo uuid NOT NULL,
+  saldo numeric NOT NULL DEFAULT 0,
+  estado character varying,
+  CONSTRAINT saldos_inventario_lote_pkey PRIMARY KEY (id_lote),
+  CONSTRAINT saldos_inventario_lote_id_insumo_fkey FOREIGN KEY (id_insumo) REFERENCES public.insumos_catalogo(id_insumo)
+);
 CREATE TABLE public.sectores (
   id integer NOT NULL DEFAULT nextval('sectores_id_seq'::regclass),
   codigo character varying NOT NULL UNIQUE,
@@ -733,6 +788,379 @@ CREATE TABLE public.zonas_localidades (
   CONSTRAINT zonas_localidades_localidad_id_fkey FOREIGN KEY (localidad_id) REFERENCES public.usuario_direccion(id)
 );
 
+-- Resumen del inventario de insumos para la vista agrupada: una fila por insumo
+-- activo con los totales de sus lotes, calculada en una sola pasada en la base.
+CREATE INDEX IF NOT EXISTS idx_insumos_inventario_id_insumo ON public.insumos_inventario (id_insumo);
+CREATE INDEX IF NOT EXISTS idx_reservas_insumos_estado_insumo ON public.reservas_insumos (estado, insumo_id);
+
+CREATE OR REPLACE FUNCTION public.get_resumen_inventario_insumos()
+RETURNS TABLE (
+  id_insumo uuid,
+  nombre character varying,
+  categoria character varying,
+  unidad_medida character varying,
+  stock_fisico numeric,
+  stock_cuarentena numeric,
+  stock_reservado numeric,
+  cantidad_lotes integer,
+  numeros_lote text
+)
+LANGUAGE sql STABLE AS $$
+  SELECT c.id_insumo, c.nombre, c.categoria, c.unidad_medida,
+         COALESCE(l.stock_fisico, 0), COALESCE(l.stock_cuarentena, 0), COALESCE(r.stock_reservado, 0),
+         COALESCE(l.cantidad_lotes, 0)::integer, COALESCE(l.numeros_lote, '')
+  FROM public.insumos_catalogo c
+  LEFT JOIN (
+    SELECT i.id_insumo,
+           SUM(i.cantidad_actual) AS stock_fisico,
+           SUM(COALESCE(NULLIF(i.cantidad_en_cuarentena, '')::numeric, 0)) AS stock_cuarentena,
+           COUNT(*) AS cantidad_lotes,
+           string_agg(DISTINCT lower(i.numero_lote_proveedor), ' ') AS numeros_lote
+    FROM public.insumos_inventario i
+    GROUP BY i.id_insumo
+  ) l ON l.id_insumo = c.id_insumo
+  LEFT JOIN (
+    SELECT ri.insumo_id, SUM(ri.cantidad_reservada) AS stock_reservado
+    FROM public.reservas_insumos ri
+    WHERE ri.estado = 'RESERVADO'
+    GROUP BY ri.insumo_id
+  ) r ON r.insumo_id = c.id_insumo
+  WHERE c.activo
+  ORDER BY c.nombre;
+$$;
+
+-- Costos recalculados de varios productos en una sola sentencia. Sólo toca las
+-- columnas de costo y el precio: el resto de la fila (código, nombre, margen,
+-- IVA) puede haber cambiado desde que el motor de costos leyó el producto.
+CREATE OR REPLACE FUNCTION public.actualizar_costos_productos(p_filas jsonb)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+  v_actualizados integer;
+BEGIN
+  UPDATE public.productos p
+  SET costo_mano_obra = f.costo_mano_obra,
+      costo_fijos = f.costo_fijos,
+      costo_total_produccion = f.costo_total_produccion,
+      precio_unitario = f.precio_unitario,
+      updated_at = now()
+  FROM jsonb_to_recordset(p_filas) AS f(id integer, costo_mano_obra numeric, costo_fijos numeric,
+                                        costo_total_produccion numeric, precio_unitario numeric)
+  WHERE p.id = f.id;
+  GET DIAGNOSTICS v_actualizados = ROW_COUNT;
+  RETURN v_actualizados;
+END;
+$$;
+
+-- Cuarentena de lotes por una alerta de riesgo: todo el stock físico del lote
+-- (lo disponible más lo reservado) pasa a cantidad_en_cuarentena. Se calcula
+-- sobre los valores vigentes de cada fila al actualizarla y no toca el resto
+-- de las columnas.
+CREATE OR REPLACE FUNCTION public.cuarentena_lotes_insumo(p_ids uuid[], p_motivo text)
+RETURNS SETOF public.insumos_inventario
+LANGUAGE plpgsql AS $$
+BEGIN
+  RETURN QUERY
+    UPDATE public.insumos_inventario i
+    SET cantidad_en_cuarentena = (COALESCE(NULLIF(i.cantidad_en_cuarentena, '')::numeric, 0)
+                                  + COALESCE(i.cantidad_actual, 0) + COALESCE(r.reservado, 0))::text,
+        estado = CASE WHEN COALESCE(NULLIF(i.cantidad_en_cuarentena, '')::numeric, 0)
+                           + COALESCE(i.cantidad_actual, 0) + COALESCE(r.reservado, 0) > 0
+                      THEN 'cuarentena' ELSE 'agotado' END,
+        cantidad_actual = 0,
+        motivo_cuarentena = p_motivo,
+        en_alerta = true,
+        updated_at = now()
+    FROM unnest(p_ids) AS x(id_lote)
+    LEFT JOIN (
+      SELECT ri.lote_inventario_id, SUM(ri.cantidad_reservada) AS reservado
+      FROM public.reservas_insumos ri
+      WHERE ri.lote_inventario_id = ANY (p_ids) AND ri.estado = 'RESERVADO'
+      GROUP BY ri.lote_inventario_id
+    ) r ON r.lote_inventario_id = x.id_lote
+    WHERE i.id_lote = x.id_lote
+    RETURNING i.*;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.cuarentena_lotes_producto(p_ids integer[], p_motivo text)
+RETURNS SETOF public.lotes_productos
+LANGUAGE plpgsql AS $$
+BEGIN
+  RETURN QUERY
+    UPDATE public.lotes_productos l
+    SET cantidad_en_cuarentena = COALESCE(l.cantidad_en_cuarentena, 0) + COALESCE(l.cantidad_actual, 0),
+        estado = CASE WHEN COALESCE(l.cantidad_en_cuarentena, 0) + COALESCE(l.cantidad_actual, 0) > 0
+                      THEN 'CUARENTENA' ELSE 'AGOTADO' END,
+        cantidad_actual = 0,
+        motivo_cuarentena = p_motivo,
+        en_alerta = true,
+        updated_at = now()
+    WHERE l.id_lote = ANY (p_ids)
+    RETURNING l.*;
+END;
+$$;
+
+-- stock_actual de varios insumos desde la tabla de saldos del libro de
+-- inventario, en una sentencia y sólo sobre esa columna.
+CREATE OR REPLACE FUNCTION public.actualizar_stock_insumos(p_ids uuid[])
+RETURNS SETOF public.insumos_catalogo
+LANGUAGE plpgsql AS $$
+BEGIN
+  RETURN QUERY
+    UPDATE public.insumos_catalogo c
+    SET stock_actual = COALESCE(s.saldo, 0)
+    FROM unnest(p_ids) AS x(id_insumo)
+    LEFT JOIN public.saldos_inventario_insumo s ON s.id_insumo = x.id_insumo
+    WHERE c.id_insumo = x.id_insumo
+    RETURNING c.*;
+END;
+$$;
+
+-- Pedidos con pago vencido contados por cliente en la base (recálculo
+-- crediticio diario), sin traer una fila por pedido.
+CREATE OR REPLACE FUNCTION public.contar_pedidos_vencidos_por_cliente()
+RETURNS TABLE (id_cliente integer, vencidos integer)
+LANGUAGE sql STABLE AS $$
+  SELECT p.id_cliente, count(*)::integer
+  FROM public.pedidos p
+  WHERE p.estado_pago = 'vencido' AND p.id_cliente IS NOT NULL
+  GROUP BY p.id_cliente;
+$$;
+
+-- Estado crediticio de cada cliente junto con su conteo de pedidos vencidos.
+CREATE OR REPLACE FUNCTION public.get_estados_crediticios_con_vencidos()
+RETURNS TABLE (id integer, estado_crediticio character varying, vencidos integer)
+LANGUAGE sql STABLE AS $$
+  SELECT c.id, c.estado_crediticio, COALESCE(v.vencidos, 0)
+  FROM public.clientes c
+  LEFT JOIN public.contar_pedidos_vencidos_por_cliente() v ON v.id_cliente = c.id;
+$$;
+
+-- Vencimientos de la flota (revisión diaria de VTV y licencias): último
+-- estado avisado de cada documento e índices por fecha de vencimiento.
+ALTER TABLE public.vehiculos ADD COLUMN IF NOT EXISTS estado_vtv character varying NOT NULL DEFAULT 'AL_DIA'
+  CHECK (estado_vtv::text = ANY (ARRAY['AL_DIA'::text, 'PRONTO_VENC'::text, 'VENCIDA'::text]));
+ALTER TABLE public.vehiculos ADD COLUMN IF NOT EXISTS estado_licencia character varying NOT NULL DEFAULT 'AL_DIA'
+  CHECK (estado_licencia::text = ANY (ARRAY['AL_DIA'::text, 'PRONTO_VENC'::text, 'VENCIDA'::text]));
+CREATE INDEX IF NOT EXISTS idx_vehiculos_vtv_vencimiento ON public.vehiculos (vtv_vencimiento) WHERE activo;
+CREATE INDEX IF NOT EXISTS idx_vehiculos_licencia_vencimiento ON public.vehiculos (licencia_vencimiento) WHERE activo;
+
+-- Búsqueda de texto completo en alertas de riesgo: vector ponderado (código,
+-- motivo, comentarios, resolución, conclusión y origen) mantenido por la base,
+-- índice GIN para el match y un índice (fecha_creacion, id) para la paginación
+-- por cursor. conclusion_final la escribe el cierre del análisis.
+ALTER TABLE public.alerta_riesgo ADD COLUMN IF NOT EXISTS conclusion_final character varying;
+ALTER TABLE public.alerta_riesgo ADD COLUMN IF NOT EXISTS busqueda tsvector
+  GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', COALESCE(codigo, '')), 'A') ||
+    setweight(to_tsvector('spanish', COALESCE(motivo, '')), 'B') ||
+    setweight(to_tsvector('spanish', COALESCE(comentarios, '') || ' ' || COALESCE(resolucion_seleccionada, '') || ' ' ||
+                                     COALESCE(conclusion_final, '')), 'C') ||
+    setweight(to_tsvector('simple', COALESCE(origen_tipo_entidad, '') || ' ' || COALESCE(origen_id_entidad, '')), 'D')
+  ) STORED;
+CREATE INDEX IF NOT EXISTS idx_alerta_riesgo_busqueda ON public.alerta_riesgo USING GIN (busqueda);
+CREATE INDEX IF NOT EXISTS idx_alerta_riesgo_fecha_id ON public.alerta_riesgo (fecha_creacion DESC, id DESC);
+
+-- Página de alertas ordenada por relevancia (sin texto, por fecha) y después
+-- por (fecha_creacion, id) descendente. El cursor es la última fila de la
+-- página anterior: (rank, fecha_creacion, id). Devuelve las mismas columnas
+-- que el listado anterior (todas las de la tabla más el creador).
+DROP FUNCTION IF EXISTS public.buscar_alertas_riesgo(text, text, integer, real, timestamp with time zone, bigint);
+CREATE OR REPLACE FUNCTION public.buscar_alertas_riesgo(
+  p_texto text DEFAULT NULL,
+  p_estado text DEFAULT NULL,
+  p_limite integer DEFAULT 20,
+  p_cursor_rank real DEFAULT NULL,
+  p_cursor_fecha timestamp with time zone DEFAULT NULL,
+  p_cursor_id bigint DEFAULT NULL
+)
+RETURNS TABLE (
+  id bigint,
+  fecha_creacion timestamp with time zone,
+  codigo character varying,
+  origen_tipo_entidad character varying,
+  origen_id_entidad character varying,
+  estado character varying,
+  motivo character varying,
+  comentarios character varying,
+  resolucion_seleccionada character varying,
+  url_evidencia character varying,
+  id_usuario_creador integer,
+  conclusion_final character varying,
+  creador jsonb,
+  rank real
+)
+LANGUAGE plpgsql STABLE AS $$
+DECLARE
+  v_consulta tsquery;
+BEGIN
+  IF COALESCE(btrim(p_texto), '') = '' THEN
+    -- Sin texto: recorre el índice (fecha_creacion, id).
+    RETURN QUERY
+      SELECT a.id, a.fecha_creacion, a.codigo, a.origen_tipo_entidad, a.origen_id_entidad, a.estado, a.motivo,
+             a.comentarios, a.resolucion_seleccionada, a.url_evidencia, a.id_usuario_creador, a.conclusion_final,
+             (SELECT jsonb_build_object('nombre', u.nombre, 'apellido', u.apellido)
+              FROM public.usuarios u WHERE u.id = a.id_usuario_creador), 0::real
+      FROM public.alerta_riesgo a
+      WHERE (p_estado IS NULL OR a.estado = p_estado)
+        AND (p_cursor_id IS NULL OR (a.fecha_creacion, a.id) < (p_cursor_fecha, p_cursor_id))
+      ORDER BY a.fecha_creacion DESC, a.id DESC
+      LIMIT p_limite;
+    RETURN;
+  END IF;
+
+  v_consulta := websearch_to_tsquery('spanish', p_texto) || websearch_to_tsquery('simple', p_texto);
+  RETURN QUERY
+    SELECT r.id, r.fecha_creacion, r.codigo, r.origen_tipo_entidad, r.origen_id_entidad, r.estado, r.motivo,
+           r.comentarios, r.resolucion_seleccionada, r.url_evidencia, r.id_usuario_creador, r.conclusion_final,
+           (SELECT jsonb_build_object('nombre', u.nombre, 'apellido', u.apellido)
+            FROM public.usuarios u WHERE u.id = r.id_usuario_creador), r.rank
+    FROM (
+      SELECT a.*, ts_rank(a.busqueda, v_consulta) AS rank
+      FROM public.alerta_riesgo a
+      WHERE a.busqueda @@ v_consulta
+        AND (p_estado IS NULL OR a.estado = p_estado)
+    ) r
+    WHERE p_cursor_id IS NULL OR (r.rank, r.fecha_creacion, r.id) < (p_cursor_rank, p_cursor_fecha, p_cursor_id)
+    ORDER BY r.rank DESC, r.fecha_creacion DESC, r.id DESC
+    LIMIT p_limite;
+END;
+$$;
+
+-- Libro de movimientos de inventario: los saldos por lote e insumo viven en la
+-- base y se actualizan en la misma transacción que inserta el movimiento. Cada
+-- llamada lee la cantidad actual del lote (no la que trae el cliente), así dos
+-- procesos que tocan el mismo lote nunca calculan el delta contra un saldo
+-- viejo. El lock de transacción serializa los registros: los ids de
+-- movimientos_inventario quedan en orden de commit y un checkpoint nunca
+-- saltea un movimiento al reproducir el libro.
+CREATE OR REPLACE FUNCTION public.registrar_movimientos_inventario(p_cambios jsonb)
+RETURNS SETOF public.movimientos_inventario
+LANGUAGE plpgsql AS $$
+DECLARE
+  c record;
+  v_lote record;
+  v_nuevo numeric;
+  v_anterior numeric;
+  v_estado_anterior character varying;
+  v_delta numeric;
+  v_saldo_insumo numeric;
+  v_tipo character varying;
+  v_mov public.movimientos_inventario;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('public.movimientos_inventario'));
+  FOR c IN
+    SELECT * FROM jsonb_to_recordset(p_cambios) AS x(id_lote uuid, alta boolean, tipo text, referencia_tipo text,
+                                                     referencia_id text, usuario_id integer)
+  LOOP
+    SELECT i.id_insumo, i.cantidad_actual, i.estado INTO v_lote
+    FROM public.insumos_inventario i WHERE i.id_lote = c.id_lote;
+    CONTINUE WHEN NOT FOUND;
+    v_nuevo := CASE WHEN lower(v_lote.estado) IN ('disponible', 'reservado')
+                    THEN GREATEST(COALESCE(v_lote.cantidad_actual, 0), 0) ELSE 0 END;
+
+    SELECT s.saldo, s.estado INTO v_anterior, v_estado_anterior
+    FROM public.saldos_inventario_lote s WHERE s.id_lote = c.id_lote FOR UPDATE;
+    v_anterior := COALESCE(v_anterior, 0);
+    INSERT INTO public.saldos_inventario_lote (id_lote, id_insumo, saldo, estado)
+    VALUES (c.id_lote, v_lote.id_insumo, v_nuevo, v_lote.estado)
+    ON CONFLICT (id_lote) DO UPDATE SET saldo = EXCLUDED.saldo, estado = EXCLUDED.estado;
+
+    v_delta := v_nuevo - v_anterior;
+    CONTINUE WHEN abs(v_delta) < 1e-9;
+    INSERT INTO public.saldos_inventario_insumo (id_insumo, saldo) VALUES (v_lote.id_insumo, v_delta)
+    ON CONFLICT (id_insumo) DO UPDATE SET saldo = public.saldos_inventario_insumo.saldo + EXCLUDED.saldo
+    RETURNING saldo INTO v_saldo_insumo;
+
+    v_tipo := CASE
+      WHEN COALESCE(c.alta, false) THEN 'INGRESO'
+      WHEN lower(v_lote.estado) = 'cuarentena' AND lower(COALESCE(v_estado_anterior, '')) <> 'cuarentena' THEN 'CUARENTENA_ENTRADA'
+      WHEN lower(COALESCE(v_estado_anterior, '')) = 'cuarentena' AND lower(v_lote.estado) <> 'cuarentena' THEN 'CUARENTENA_SALIDA'
+      WHEN c.tipo IS NULL THEN 'AJUSTE'
+      -- Signo contrario al del contexto: el rollback dentro de una reserva es una liberación.
+      WHEN c.tipo IN ('RESERVA', 'CONSUMO', 'MERMA', 'CUARENTENA_ENTRADA') AND v_delta > 0 THEN
+        CASE c.tipo WHEN 'RESERVA' THEN 'LIBERACION' WHEN 'CUARENTENA_ENTRADA' THEN 'CUARENTENA_SALIDA' ELSE 'AJUSTE' END
+      WHEN c.tipo IN ('INGRESO', 'LIBERACION', 'CUARENTENA_SALIDA') AND v_delta < 0 THEN
+        CASE c.tipo WHEN 'LIBERACION' THEN 'RESERVA' WHEN 'CUARENTENA_SALIDA' THEN 'CUARENTENA_ENTRADA' ELSE 'AJUSTE' END
+      ELSE c.tipo
+    END;
+
+    INSERT INTO public.movimientos_inventario (tipo, id_lote, id_insumo, cantidad, saldo_lote, saldo_insumo,
+                                               referencia_tipo, referencia_id, usuario_id)
+    VALUES (v_tipo, c.id_lote, v_lote.id_insumo, v_delta, v_nuevo, v_saldo_insumo,
+            c.referencia_tipo, c.referencia_id, c.usuario_id)
+    RETURNING * INTO v_mov;
+    RETURN NEXT v_mov;
+  END LOOP;
+END;
+$$;
+
+-- Checkpoint de saldos tomado bajo el mismo lock que los registros.
+CREATE OR REPLACE FUNCTION public.crear_checkpoint_inventario()
+RETURNS public.checkpoints_inventario
+LANGUAGE plpgsql AS $$
+DECLARE
+  v_checkpoint public.checkpoints_inventario;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('public.movimientos_inventario'));
+  INSERT INTO public.checkpoints_inventario (ultimo_movimiento_id, saldos_insumos, saldos_lotes)
+  SELECT (SELECT COALESCE(max(id), 0) FROM public.movimientos_inventario),
+         (SELECT COALESCE(jsonb_object_agg(id_insumo, saldo), '{}'::jsonb)
+            FROM public.saldos_inventario_insumo WHERE abs(saldo) > 1e-9),
+         -- Se guardan también los lotes en cero en cuarentena para clasificar su salida.
+         (SELECT COALESCE(jsonb_object_agg(id_lote, jsonb_build_array(id_insumo, saldo, estado)), '{}'::jsonb)
+            FROM public.saldos_inventario_lote WHERE abs(saldo) > 1e-9 OR lower(estado) = 'cuarentena')
+  RETURNING * INTO v_checkpoint;
+  RETURN v_checkpoint;
+END;
+$$;
+
+-- Conciliación: registra un AJUSTE por cada lote cuyo saldo no coincide con
+-- su cantidad real, descuenta los lotes borrados y guarda un checkpoint.
+CREATE OR REPLACE FUNCTION public.conciliar_inventario()
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+  v_ajustes integer;
+BEGIN
+  SELECT count(*) INTO v_ajustes FROM public.registrar_movimientos_inventario((
+    SELECT COALESCE(jsonb_agg(jsonb_build_object('id_lote', i.id_lote, 'tipo', 'AJUSTE',
+                                                 'referencia_tipo', 'reconciliacion')), '[]'::jsonb)
+    FROM public.insumos_inventario i
+    LEFT JOIN public.saldos_inventario_lote s ON s.id_lote = i.id_lote
+    WHERE s.id_lote IS NULL
+       OR s.saldo <> CASE WHEN lower(i.estado) IN ('disponible', 'reservado')
+                          THEN GREATEST(COALESCE(i.cantidad_actual, 0), 0) ELSE 0 END
+       OR s.estado IS DISTINCT FROM i.estado));
+
+  WITH borrados AS (
+    DELETE FROM public.saldos_inventario_lote s
+    WHERE NOT EXISTS (SELECT 1 FROM public.insumos_inventario i WHERE i.id_lote = s.id_lote)
+    RETURNING s.id_insumo, s.saldo
+  )
+  UPDATE public.saldos_inventario_insumo t SET saldo = t.saldo - b.saldo
+  FROM (SELECT id_insumo, sum(saldo) AS saldo FROM borrados GROUP BY id_insumo) b
+  WHERE t.id_insumo = b.id_insumo;
+
+  PERFORM public.crear_checkpoint_inventario();
+  RETURN v_ajustes;
+END;
+$$;
+
+-- Saldos iniciales desde los lotes actuales (sin movimientos) y primer checkpoint.
+INSERT INTO public.saldos_inventario_lote (id_lote, id_insumo, saldo, estado)
+SELECT id_lote, id_insumo,
+       CASE WHEN lower(estado) IN ('disponible', 'reservado') THEN GREATEST(COALESCE(cantidad_actual, 0), 0) ELSE 0 END,
+       estado
+FROM public.insumos_inventario
+ON CONFLICT (id_lote) DO NOTHING;
+INSERT INTO public.saldos_inventario_insumo (id_insumo, saldo)
+SELECT id_insumo, sum(saldo) FROM public.saldos_inventario_lote GROUP BY id_insumo
+ON CONFLICT (id_insumo) DO NOTHING;
+SELECT public.crear_checkpoint_inventario()
+WHERE NOT EXISTS (SELECT 1 FROM public.checkpoints_inventario);
+
 // SCHEMA MES_KANBAN
 
 -- WARNING: This schema is for context only and is not meant to be run.
@@ -0,0 +1,70 @@
+import pytest
+
+from benchmarks.fake_supabase import FakeAPIError, FakeDatabase, FakeSupabaseClient
+from benchmarks.seed import seed_database
+
+
+@pytest.fixture
+def client():
+    db = FakeDatabase()
+    db.seed('productos', [
+        {'id': 1, 'nombre': 'Pizza', 'activo': True, 'precio_unitario': 100},
+        {'id': 2, 'nombre': 'Empanada', 'activo': True, 'precio_unitario': 50},
+        {'id': 3, 'nombre': 'Tarta', 'activo': False, 'precio_unitario': 80},
+    ])
+    db.seed('ordenes_produccion', [
+        {'id': 10, 'producto_id': 1, 'estado': 'PENDIENTE', 'cantidad_planificada': 5},
+        {'id': 11, 'producto_id': 2, 'estado': 'COMPLETADA', 'cantidad_planificada': 7},
+    ])
+    return FakeSupabaseClient(db)
+
+
+def test_filtros_orden_y_rango(client):
+    data = client.table('productos').select('id, nombre').eq('activo', True).order('precio_unitario', desc=True).execute().data
+    assert data == [{'id': 1, 'nombre': 'Pizza'}, {'id': 2, 'nombre': 'Empanada'}]
+
+    data = client.table('productos').select('id').in_('id', [2, 3]).gte('precio_unitario', 60).execute().data
+    assert data == [{'id': 3}]
+
+    data = client.table('productos').select('id').order('id').range(1, 2).execute().data
+    assert [r['id'] for r in data] == [2, 3]
+
+
+def test_or_y_count(client):
+    res = client.table('productos').select('*', count='exact').or_('nombre.ilike.%pizza%,precio_unitario.lt.60').execute()
+    assert sorted(r['id'] for r in res.data) == [1, 2]
+    assert res.count == 2
+
+
+def test_embebido_por_foreign_key(client):
+    data = client.table('ordenes_produccion').select('id, productos(nombre)').eq('id', 10).single().execute().data
+    assert data == {'id': 10, 'productos': {'nombre': 'Pizza'}}
+
+
+def test_insert_update_y_round_trips(client):
+    db = client.db
+    nuevo = client.table('productos').insert({'nombre': 'Sandwich', 'activo': True}).execute().data[0]
+    assert nuevo['id'] == 4
+    client.table('productos').update({'activo': False}).eq('id', 4).execute()
+    assert client.table('productos').select('activo').eq('id', 4).single().execute().data == {'activo': False}
+    assert db.round_trips[('productos', 'insert')] == 1
+    assert db.round_trips[('productos', 'update')] == 1
+    assert db.total_round_trips == 3
+
+
+def test_rpc_no_registrada(client):
+    with pytest.raises(FakeAPIError):
+        client.rpc('no_existe', {}).execute()
+
+
+def _sin_timestamps(rows):
+    return [{k: v for k, v in r.items() if k not in ('created_at', 'updated_at')} for r in rows]
+
+
+def test_seed_es_reproducible():
+    a, b = FakeDatabase(), FakeDatabase()
+    seed_database(a, scale=0.2, seed=7)
+    seed_database(b, scale=0.2, seed=7)
+    for tabla in ('insumos_catalogo', 'insumos_inventario', 'ordenes_produccion', 'pedido_items'):
+        assert _sin_timestamps(a.tables[tabla]) == _sin_timestamps(b.tables[tabla])
+    assert a.rpcs.keys() == b.rpcs.keys()
@@ -0,0 +1,21 @@
+import pytest
+
+from app.config import Config
+from app.database import Database
+from benchmarks.fake_supabase import FakeDatabase, FakeSupabaseClient, install
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Base en memoria instalada como cliente de Supabase mientras dura el test.
+
+    Los módulos que necesitan datos la extienden con un fixture del mismo nombre que
+    recibe éste y siembra las tablas que usa.
+    """
+    # Los controladores que crean su propio cliente admin sólo necesitan una clave cualquiera.
+    monkeypatch.setattr(Config, 'SUPABASE_SERVICE_KEY', Config.SUPABASE_SERVICE_KEY or 'fake-service-key')
+    instancia, cliente = Database._instance, Database._client
+    db = FakeDatabase()
+    install(FakeSupabaseClient(db))
+    yield db
+    Database._instance, Database._client = instancia, cliente
@@ -0,0 +1,82 @@
+import pytest
+
+from app.config import Config
+
+
+def _sembrar(db, n_clientes):
+    umbral = Config.CREDIT_ALERT_THRESHOLD
+    db.seed('clientes', [{'id': i, 'nombre': f'Cliente {i}', 'estado_crediticio': 'normal' if i % 2 else 'alertado'}
+                         for i in range(1, n_clientes + 1)])
+    pedidos = []
+    for i in range(1, n_clientes + 1):
+        vencidos = umbral + 1 if i % 3 == 0 else 0
+        pedidos += [{'id_cliente': i, 'estado_pago': 'vencido'} for _ in range(vencidos)]
+        pedidos.append({'id_cliente': i, 'estado_pago': 'pagado'})
+    db.seed('pedidos', pedidos)
+
+
+def _esperado(i):
+    return 'alertado' if i % 3 == 0 else 'normal'
+
+
+@pytest.mark.parametrize('n_clientes', [12, 120])
+def test_recalculo_masivo_por_conjuntos(fake_db, n_clientes):
+    from app.controllers.cliente_controller import ClienteController
+    _sembrar(fake_db, n_clientes)
+    antes = {c['id']: c['estado_crediticio'] for c in fake_db.tables['clientes']}
+    fake_db.reset_counters()
+
+    afectados = ClienteController().recalcular_estado_crediticio_todos_los_clientes()
+
+    estados = {c['id']: c['estado_crediticio'] for c in fake_db.tables['clientes']}
+    assert estados == {i: _esperado(i) for i in estados}
+    assert afectados == sum(1 for i in estados if antes[i] != estados[i])
+    # Un select de clientes, uno de pedidos vencidos y a lo sumo un UPDATE por estado destino.
+    assert fake_db.round_trips[('clientes', 'select')] == 1
+    assert fake_db.round_trips[('pedidos', 'select')] == 1
+    assert fake_db.round_trips[('clientes', 'update')] <= 2
+
+
+def test_pago_de_pedido_no_vencido_no_recalcula(fake_db):
+    from app.controllers.pedido_controller import PedidoController
+    fake_db.seed('clientes', [{'id': 1, 'estado_crediticio': 'normal'}])
+    fake_db.seed('pedidos', [{'id': 5, 'id_cliente': 1, 'estado_pago': 'pendiente'}])
+    fake_db.reset_counters()
+
+    _, status = PedidoController().registrar_pago(5, {}, None)
+
+    assert status == 200
+    assert fake_db.tables['pedidos'][0]['estado_pago'] == 'pagado'
+    assert fake_db.round_trips[('clientes', 'update')] == 0
+    assert fake_db.round_trips[('pedidos', 'select')] == 1
+
+
+def test_pago_de_pedido_vencido_normaliza_cliente(fake_db):
+    from app.controllers.pedido_controller import PedidoController
+    umbral = Config.CREDIT_ALERT_THRESHOLD
+    fake_db.seed('clientes', [{'id': 1, 'estado_crediticio': 'alertado'}])
+    fake_db.seed('pedidos', [{'id': 100 + i, 'id_cliente': 1, 'estado_pago': 'vencido'} for i in range(umbral + 1)])
+
+    _, status = PedidoController().registrar_pago(100, {}, None)
+
+    assert status == 200
+    assert fake_db.tables['clientes'][0]['estado_crediticio'] == 'normal'
+
+
+def test_recalculo_con_el_conteo_agrupado_en_la_base(fake_db):
+    from app.controllers.cliente_controller import ClienteController
+    from benchmarks.seed import register_default_rpcs
+    from app.models.pedido import PedidoModel
+    register_default_rpcs(fake_db)
+    _sembrar(fake_db, 120)
+    fake_db.reset_counters()
+
+    ClienteController().recalcular_estado_crediticio_todos_los_clientes()
+
+    assert {c['id']: c['estado_crediticio'] for c in fake_db.tables['clientes']} == {i: _esperado(i) for i in range(1, 121)}
+    # Los estados llegan con el conteo ya agrupado: no se leen clientes ni pedidos fila por fila.
+    assert fake_db.round_trips[('clientes', 'select')] == 0
+    assert fake_db.round_trips[('pedidos', 'select')] == 0
+    assert PedidoModel().contar_vencidos_por_cliente()['data'] == {
+        i: Config.CREDIT_ALERT_THRESHOLD + 1 for i in range(3, 121, 3)}
+    assert fake_db.round_trips[('pedidos', 'select')] == 0
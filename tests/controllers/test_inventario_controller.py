@@ -102,3 +102,41 @@ def test_crear_lote_insumo(app, inventario_controller, mock_inventario_dependenc
 
             assert status_code == 201
             assert response['success']
+
+def test_obtener_lotes_agrupados_para_vista_usa_resumen(app, inventario_controller, mock_inventario_dependencies):
+    with app.app_context():
+        mock_inventario_dependencies['inventario_model'].obtener_resumen_por_insumo.return_value = {'success': True, 'data': [
+            {'id_insumo': 'b', 'nombre': 'Harina', 'categoria': None, 'unidad_medida': 'kg', 'stock_fisico': '12.5',
+             'stock_cuarentena': 2, 'stock_reservado': 5, 'cantidad_lotes': 3, 'numeros_lote': 'h-1 h-2'},
+            {'id_insumo': 'a', 'nombre': 'Azúcar', 'categoria': 'Secos', 'unidad_medida': 'kg', 'stock_fisico': 0,
+             'stock_cuarentena': 0, 'stock_reservado': 0, 'cantidad_lotes': 0, 'numeros_lote': ''},
+        ]}
+
+        response, status = inventario_controller.obtener_lotes_agrupados_para_vista()
+
+        assert status == 200
+        azucar, harina = response['data']
+        assert azucar['estado_general'] == 'Agotado' and harina['insumo_categoria'] == 'Sin categoría'
+        assert harina['stock_actual'] == harina['stock_total'] == 12.5
+        assert harina['cantidad_lotes'] == 3 and harina['stock_reservado'] == 5.0
+        assert 'lotes' not in harina
+        # Los lotes ya no se leen para armar la vista agrupada.
+        mock_inventario_dependencies['inventario_model'].get_all_lotes_for_view.assert_not_called()
+        mock_inventario_dependencies['reserva_insumo_model'].find_all.assert_not_called()
+
+
+def test_resumir_inventario_por_insumo():
+    from app.models.inventario import resumir_inventario_por_insumo
+    catalogo = [{'id_insumo': 'h', 'nombre': 'Harina', 'activo': True}, {'id_insumo': 'x', 'nombre': 'Baja', 'activo': False},
+                {'id_insumo': 'a', 'nombre': 'Azúcar', 'activo': True}]
+    lotes = [{'id_insumo': 'h', 'cantidad_actual': 5, 'cantidad_en_cuarentena': '2', 'numero_lote_proveedor': 'H-1'},
+             {'id_insumo': 'h', 'cantidad_actual': '7.5', 'cantidad_en_cuarentena': None, 'numero_lote_proveedor': 'H-2'},
+             {'id_insumo': 'x', 'cantidad_actual': 1}]
+    reservas = [{'insumo_id': 'h', 'cantidad_reservada': 3, 'estado': 'RESERVADO'},
+                {'insumo_id': 'h', 'cantidad_reservada': 9, 'estado': 'CONSUMIDO'}]
+
+    azucar, harina = resumir_inventario_por_insumo(catalogo, lotes, reservas)
+
+    assert azucar['stock_fisico'] == 0 and azucar['cantidad_lotes'] == 0
+    assert (harina['stock_fisico'], harina['stock_cuarentena'], harina['stock_reservado']) == (12.5, 2.0, 3.0)
+    assert harina['cantidad_lotes'] == 2 and harina['numeros_lote'] == 'h-1 h-2'
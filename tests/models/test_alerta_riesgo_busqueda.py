@@ -0,0 +1,178 @@
+import re
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.alerta_riesgo import AlertaRiesgoModel
+from benchmarks.fake_supabase import SETUP_SQL
+
+# Pesos de ts_rank por defecto para las clases A, B, C y D de `busqueda`.
+PESOS = (1.0, 0.4, 0.2, 0.1)
+
+
+def _columnas_funcion():
+    """Columnas de RETURNS TABLE de `buscar_alertas_riesgo` en setup.sql, sin `rank`."""
+    with open(SETUP_SQL, encoding='utf-8') as fh:
+        sql = fh.read()
+    cuerpo = re.search(r'FUNCTION public\.buscar_alertas_riesgo\(.*?RETURNS TABLE \((.*?)\n\)', sql, re.S).group(1)
+    return tuple(linea.split()[0] for linea in cuerpo.strip().splitlines() if linea.split()[0] != 'rank')
+
+
+RETORNO = _columnas_funcion()
+# `creador` sale de un join con usuarios; el resto son columnas de alerta_riesgo.
+COLUMNAS = tuple(c for c in RETORNO if c != 'creador')
+
+
+def _rank(consulta, *campos):
+    """Como ts_rank: depende sólo del documento (no del resto de la tabla), así el cursor sigue siendo válido."""
+    terminos = consulta.split()
+    return sum(peso * sum(re.findall(r'\w+', (campo or '').lower()).count(t) for t in terminos)
+               for peso, campo in zip(PESOS, campos))
+
+
+def buscar_alertas_riesgo_fts5(db, params):
+    """
+    Equivalente en SQLite FTS5 de `public.buscar_alertas_riesgo` (setup.sql):
+    match por índice de texto completo, orden (rank, fecha_creacion, id)
+    descendente y cursor por comparación de filas.
+    """
+    conn = sqlite3.connect(':memory:')
+    conn.create_function('ts_rank', 5, _rank, deterministic=True)
+    conn.execute(f"CREATE TABLE alerta_riesgo ({', '.join(COLUMNAS)})")
+    conn.execute("CREATE VIRTUAL TABLE alerta_fts USING fts5(codigo, motivo, comentarios, origen, "
+                 "tokenize='unicode61 remove_diacritics 0')")
+    for a in db.tables['alerta_riesgo']:
+        conn.execute(f"INSERT INTO alerta_riesgo VALUES ({', '.join('?' * len(COLUMNAS))})", [a.get(c) for c in COLUMNAS])
+        conn.execute("INSERT INTO alerta_fts (rowid, codigo, motivo, comentarios, origen) VALUES (?, ?, ?, ?, ?)",
+                     (a['id'], a.get('codigo'), a.get('motivo'),
+                      f"{a.get('comentarios') or ''} {a.get('resolucion_seleccionada') or ''} "
+                      f"{a.get('conclusion_final') or ''}",
+                      f"{a.get('origen_tipo_entidad') or ''} {a.get('origen_id_entidad') or ''}"))
+
+    texto = params.get('p_texto')
+    if texto:
+        consulta = ' '.join(re.findall(r'\w+', texto.lower()))
+        sql = ("SELECT a.*, ts_rank(?, f.codigo, f.motivo, f.comentarios, f.origen) AS rank "
+               "FROM alerta_fts f JOIN alerta_riesgo a ON a.id = f.rowid WHERE alerta_fts MATCH ?")
+        args = [consulta, ' '.join(f'"{t}"' for t in consulta.split())]
+    else:
+        sql, args = "SELECT a.*, 0.0 AS rank FROM alerta_riesgo a WHERE 1 = 1", []
+    if params.get('p_estado'):
+        sql += " AND a.estado = ?"
+        args.append(params['p_estado'])
+    sql = f"SELECT * FROM ({sql}) r"
+    if params.get('p_cursor_id') is not None:
+        sql += " WHERE (r.rank, r.fecha_creacion, r.id) < (?, ?, ?)"
+        args += [params['p_cursor_rank'], params['p_cursor_fecha'], params['p_cursor_id']]
+    sql += " ORDER BY r.rank DESC, r.fecha_creacion DESC, r.id DESC LIMIT ?"
+    args.append(params['p_limite'])
+
+    cursor = conn.execute(sql, args)
+    nombres = [d[0] for d in cursor.description]
+    usuarios = {u['id']: {'nombre': u.get('nombre'), 'apellido': u.get('apellido')} for u in db.tables['usuarios']}
+    filas = [dict(zip(nombres, fila)) for fila in cursor.fetchall()]
+    for fila in filas:
+        fila['creador'] = usuarios.get(fila['id_usuario_creador'])
+    return [{c: fila[c] for c in RETORNO + ('rank',)} for fila in filas]
+
+
+INICIO = datetime(2025, 6, 1, 8, 0, tzinfo=timezone.utc)
+
+
+def _alerta(id_, motivo, comentarios='', codigo=None, estado='Pendiente', minutos=0):
+    return {'id': id_, 'codigo': codigo or f'ALR-{id_:04d}', 'motivo': motivo, 'comentarios': comentarios,
+            'estado': estado, 'origen_tipo_entidad': 'lote_insumo', 'origen_id_entidad': str(100 + id_),
+            'fecha_creacion': (INICIO + timedelta(minutes=minutos)).isoformat(), 'id_usuario_creador': None}
+
+
+@pytest.fixture
+def fake_db(fake_db):
+    fake_db.seed('alerta_riesgo', [])
+    fake_db.seed('alerta_riesgo_afectados', [])
+    fake_db.seed('usuarios', [])
+    fake_db.register_rpc('buscar_alertas_riesgo', buscar_alertas_riesgo_fts5)
+    return fake_db
+
+
+def _paginar(model, limite, **kwargs):
+    ids, cursor, paginas = [], None, 0
+    while True:
+        resultado = model.buscar(limite=limite, cursor=cursor, **kwargs)
+        assert resultado['success'], resultado
+        ids += [a['id'] for a in resultado['data']]
+        paginas += 1
+        cursor = resultado['siguiente_cursor']
+        if cursor is None:
+            return ids, paginas
+
+
+def test_ordena_por_relevancia_y_filtra_por_estado(fake_db):
+    fake_db.tables['alerta_riesgo'].extend([
+        _alerta(1, 'Harina contaminada', 'Se detectó harina húmeda en el depósito', codigo='HARINA-7'),
+        _alerta(2, 'Temperatura fuera de rango', 'La cámara de harina superó los 8 grados', minutos=5),
+        _alerta(3, 'Harina con humedad', minutos=10),
+        _alerta(4, 'Envase dañado', 'Sin relación', minutos=15),
+        _alerta(5, 'Harina vencida', estado='Resuelta', minutos=20),
+    ])
+    model = AlertaRiesgoModel()
+
+    resultado = model.buscar('harina')
+    assert [a['id'] for a in resultado['data']] == [1, 5, 3, 2]
+    assert resultado['data'][0]['pendientes_count'] == 0 and resultado['siguiente_cursor'] is None
+
+    # Sin distinguir mayúsculas, y con filtro de estado.
+    assert [a['id'] for a in model.buscar('HÚMEDA')['data']] == [1]
+    assert [a['id'] for a in model.buscar('harina', estado='Pendiente')['data']] == [1, 3, 2]
+    # Sin texto: las más nuevas primero.
+    assert [a['id'] for a in model.buscar(limite=3)['data']] == [5, 4, 3]
+
+
+def test_paginacion_por_cursor_estable_ante_altas(fake_db):
+    # 40 alertas con relevancias y fechas repetidas: la fecha y después el id desempatan.
+    fake_db.tables['alerta_riesgo'].extend(
+        _alerta(i, 'Lote de azúcar en cuarentena', 'azúcar ' * (i % 3), minutos=i // 2) for i in range(1, 41))
+    model = AlertaRiesgoModel()
+
+    esperados, _ = _paginar(model, 40, texto='azúcar')
+    assert len(esperados) == 40
+
+    primera = model.buscar('azúcar', limite=7)
+    ids = [a['id'] for a in primera['data']]
+    # Entre página y página llegan alertas nuevas, más relevantes y más recientes.
+    fake_db.tables['alerta_riesgo'].extend(
+        _alerta(100 + i, 'Azúcar azúcar azúcar', minutos=1000 + i) for i in range(5))
+    cursor = primera['siguiente_cursor']
+    while cursor:
+        pagina = model.buscar('azúcar', limite=7, cursor=cursor)
+        ids += [a['id'] for a in pagina['data']]
+        cursor = pagina['siguiente_cursor']
+
+    # Ni repetidas ni salteadas: las nuevas quedan antes del cursor y no corren las páginas.
+    assert ids == esperados
+
+    todas, paginas = _paginar(model, 10)
+    assert len(todas) == len(set(todas)) == 45 and paginas == 5
+    assert todas[:5] == [104, 103, 102, 101, 100]
+
+    # Un cursor corrupto vuelve a la primera página.
+    assert [a['id'] for a in model.buscar(limite=2, cursor='no-es-un-cursor')['data']] == [104, 103]
+    con_fecha_invalida = AlertaRiesgoModel.codificar_cursor({'rank': 0, 'fecha_creacion': 'ayer', 'id': 1})
+    assert [a['id'] for a in model.buscar(limite=2, cursor=con_fecha_invalida)['data']] == [104, 103]
+
+
+def test_listado_conserva_las_columnas_anteriores(fake_db):
+    fake_db.seed('usuarios', [{'id': 9, 'nombre': 'Ana', 'apellido': 'Paz'}])
+    alerta = dict(_alerta(1, 'Harina contaminada'), id_usuario_creador=9, resolucion_seleccionada='descartar',
+                  url_evidencia='https://x/evidencia.pdf', conclusion_final='Proveedor con humedad recurrente')
+    fake_db.tables['alerta_riesgo'].append(alerta)
+    model = AlertaRiesgoModel()
+    # Lo que devolvía el listado paginado por OFFSET.
+    anterior = model._get_query_builder().select(
+        '*, creador:usuarios!alerta_riesgo_id_usuario_creador_fkey(nombre, apellido)').execute().data[0]
+
+    for resultado in (model.buscar(), model.buscar('recurrente')):
+        fila = resultado['data'][0]
+        assert {k: fila[k] for k in anterior} == anterior
+        assert fila['nombre_creador'] == 'Ana Paz'
+    assert set(alerta) <= set(COLUMNAS)
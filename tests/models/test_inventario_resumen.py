@@ -0,0 +1,26 @@
+from app.models.inventario import InventarioModel
+
+HARINA = '11111111-1111-4111-8111-111111111111'
+AZUCAR = '22222222-2222-4222-8222-222222222222'
+
+
+def test_resumen_sin_rpc_lee_todas_las_paginas(fake_db):
+    # Como PostgREST con db-max-rows=1000 y sin `get_resumen_inventario_insumos` instalada.
+    fake_db.max_rows = 1000
+    fake_db.seed('insumos_catalogo', [{'id_insumo': HARINA, 'nombre': 'Harina', 'activo': True},
+                                      {'id_insumo': AZUCAR, 'nombre': 'Azúcar', 'activo': True}])
+    fake_db.seed('insumos_inventario', [
+        {'id_lote': f'a0000000-0000-4000-8000-{i:012d}', 'id_insumo': HARINA if i % 2 else AZUCAR,
+         'cantidad_actual': 1, 'cantidad_en_cuarentena': 0, 'estado': 'disponible'}
+        for i in range(2500)
+    ])
+    fake_db.seed('reservas_insumos', [{'id': i, 'insumo_id': HARINA, 'cantidad_reservada': 1, 'estado': 'RESERVADO'}
+                                      for i in range(1, 1201)])
+
+    resultado = InventarioModel().obtener_resumen_por_insumo()
+
+    assert resultado['success']
+    resumen = {fila['id_insumo']: fila for fila in resultado['data']}
+    assert resumen[HARINA]['stock_fisico'] == 1250 and resumen[HARINA]['cantidad_lotes'] == 1250
+    assert resumen[AZUCAR]['stock_fisico'] == 1250 and resumen[AZUCAR]['cantidad_lotes'] == 1250
+    assert resumen[HARINA]['stock_reservado'] == 1200
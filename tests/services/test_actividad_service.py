@@ -0,0 +1,86 @@
+import pytest
+
+from app.services.actividad_service import CursorInvalidoError, codificar_cursor, decodificar_cursor, generar_csv
+
+
+@pytest.fixture
+def fake_db(fake_db):
+    fake_db.seed('roles', [{'id': 1, 'nombre': 'OPERARIO'}, {'id': 2, 'nombre': 'SUPERVISOR'}])
+    fake_db.seed('sectores', [{'id': 1, 'nombre': 'Producción'}, {'id': 2, 'nombre': 'Calidad'}])
+    fake_db.seed('usuarios', [
+        {'id': 1, 'nombre': 'Ana', 'apellido': 'Paz', 'legajo': 'L1', 'role_id': 1},
+        {'id': 2, 'nombre': 'Luis', 'apellido': 'Sosa', 'legajo': 'L2', 'role_id': 2},
+    ])
+    fake_db.seed('usuario_sectores', [{'id': 1, 'usuario_id': 1, 'sector_id': 1},
+                                      {'id': 2, 'usuario_id': 2, 'sector_id': 2}])
+    # Varios registros comparten fecha entre fuentes y dentro de una misma fuente.
+    fake_db.seed('totem_sesiones', [
+        {'id': i, 'usuario_id': 1 + i % 2, 'fecha_inicio': f'2026-03-{1 + i // 3:02d}T08:00:00',
+         'fecha_fin': None, 'session_id': str(i), 'metodo_acceso': 'FACIAL', 'dispositivo_totem': 'T', 'activa': i == 1}
+        for i in range(1, 13)
+    ])
+    fake_db.seed('registros_acceso', [
+        {'id': i, 'usuario_id': 1 + i % 2, 'fecha_hora': f'2026-03-{1 + i // 2:02d}T08:00:00',
+         'tipo': 'LOGIN', 'metodo': 'WEB', 'dispositivo': 'PC'}
+        for i in range(1, 10)
+    ])
+    return fake_db
+
+
+def _esperado(db, rol_id=None):
+    """Resultado del algoritmo anterior: todo en memoria, filtrado y ordenado."""
+    filas = [(s['fecha_inicio'], 0, s['id'], s['usuario_id'], 'Totem') for s in db.tables['totem_sesiones']]
+    filas += [(r['fecha_hora'], 1, r['id'], r['usuario_id'], 'Web') for r in db.tables['registros_acceso']]
+    if rol_id:
+        filas = [f for f in filas if f[3] == rol_id]
+    return [(f[0], f[4]) for f in sorted(filas, reverse=True)]
+
+
+def test_paginas_con_cursor_equivalen_al_listado_completo(fake_db):
+    from app.controllers.usuario_controller import UsuarioController
+    controller = UsuarioController()
+
+    vistos, cursor, paginas = [], None, 0
+    fake_db.reset_counters()
+    while True:
+        resultado = controller.obtener_actividad_unificada({}, cursor=cursor, limite=4)
+        assert resultado['success']
+        vistos += [(i['fecha_ingreso'], i['acceso_en']) for i in resultado['data']]
+        paginas += 1
+        cursor = resultado['siguiente_cursor']
+        if cursor is None:
+            break
+    assert vistos == _esperado(fake_db)
+    assert paginas == 6
+    # Una consulta por fuente y página: nunca se descarga todo el historial.
+    assert fake_db.total_round_trips == 2 * paginas
+
+    with pytest.raises(CursorInvalidoError):
+        decodificar_cursor('no-es-un-cursor')
+    # Una fecha que no es ISO no llega al filtro `or_` de PostgREST.
+    inyectado = codificar_cursor('2026-03-01",id.gt.0', 'Web', 1)
+    with pytest.raises(CursorInvalidoError):
+        decodificar_cursor(inyectado)
+    for cursor in (inyectado, 'no-es-un-cursor'):
+        resultado = controller.obtener_actividad_unificada({}, cursor=cursor)
+        assert not resultado['success'] and resultado['status_code'] == 400
+
+
+def test_filtros_en_la_consulta_y_csv(fake_db):
+    from app.controllers.usuario_controller import UsuarioController
+    controller = UsuarioController()
+
+    resultado = controller.obtener_actividad_unificada({'rol_id': '2'}, limite=100)
+    assert [(i['fecha_ingreso'], i['acceso_en']) for i in resultado['data']] == _esperado(fake_db, rol_id=2)
+    assert {i['rol'] for i in resultado['data']} == {'SUPERVISOR'}
+
+    fake_db.reset_counters()
+    por_sector = controller.obtener_actividad_unificada({'sector_id': 1}, limite=100)['data']
+    assert {i['sector'] for i in por_sector} == {'Producción'}
+    assert fake_db.total_round_trips == 3  # usuarios del sector + una página por fuente
+    assert controller.obtener_actividad_unificada({'sector_id': 99})['data'] == []
+
+    csv = ''.join(generar_csv(controller.iterar_actividad_unificada({'rol_id': 1}, page_size=2))).splitlines()
+    assert csv[0].startswith('Legajo,Nombre,Rol')
+    assert len(csv) == 1 + len(_esperado(fake_db, rol_id=1))
+    assert all(',OPERARIO,' in linea for linea in csv[1:])
@@ -0,0 +1,149 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from app.services.audit_service import AuditSink
+
+
+class FakeWriter:
+    def __init__(self):
+        self.lotes = []
+        self.disponible = True
+        self.lock = threading.Lock()
+
+    def __call__(self, registros):
+        with self.lock:
+            if not self.disponible:
+                return {'success': False, 'error': 'DB no disponible'}
+            self.lotes.append(list(registros))
+            return {'success': True, 'count': len(registros)}
+
+    @property
+    def registros(self):
+        return [r for lote in self.lotes for r in lote]
+
+
+@pytest.fixture
+def writer():
+    return FakeWriter()
+
+
+def _sink(writer, tmp_path, **kwargs):
+    options = dict(writer=writer, batch_size=10, flush_interval=0.05, max_buffer=100,
+                   journal_dir=str(tmp_path), replay_interval=0)
+    options.update(kwargs)
+    return AuditSink(**options)
+
+
+def test_agrupa_registros_en_inserts_por_lote(writer, tmp_path):
+    sink = _sink(writer, tmp_path, flush_interval=10)
+    for i in range(25):
+        sink.submit({'accion': f'a{i}'})
+
+    assert sink.flush(timeout=5)
+    sink.stop()
+
+    assert [r['accion'] for r in writer.registros] == [f'a{i}' for i in range(25)]
+    assert [len(lote) for lote in writer.lotes] == [10, 10, 5]
+
+
+def test_flush_por_tiempo(writer, tmp_path):
+    sink = _sink(writer, tmp_path, batch_size=1000)
+    sink.submit({'accion': 'unico'})
+
+    limite = time.monotonic() + 2
+    while not writer.registros and time.monotonic() < limite:
+        time.sleep(0.01)
+    sink.stop()
+
+    assert writer.registros == [{'accion': 'unico'}]
+
+
+def test_journal_conserva_registros_si_la_db_cae(writer, tmp_path):
+    writer.disponible = False
+    sink = _sink(writer, tmp_path)
+    for i in range(15):
+        sink.submit({'accion': f'a{i}'})
+    assert sink.flush(timeout=5)
+    assert writer.registros == []
+    assert list(tmp_path.glob('registros-*.jsonl'))
+
+    writer.disponible = True
+    assert sink.replay_journal() == 15
+    sink.stop()
+
+    assert sorted(r['accion'] for r in writer.registros) == sorted(f'a{i}' for i in range(15))
+    assert not list(tmp_path.glob('registros-*'))
+
+
+def test_buffer_acotado_deriva_a_disco_sin_bloquear(tmp_path):
+    bloqueo = threading.Event()
+    escritos = []
+
+    def writer_lento(registros):
+        bloqueo.wait(5)
+        escritos.extend(registros)
+        return {'success': True}
+
+    sink = _sink(writer_lento, tmp_path, batch_size=5, max_buffer=5, max_block=0.01)
+    inicio = time.monotonic()
+    for i in range(50):
+        sink.submit({'accion': f'a{i}'})
+    assert time.monotonic() - inicio < 2
+    assert sink.pending_count() <= 10
+
+    bloqueo.set()
+    assert sink.flush(timeout=5)
+    sink.replay_journal()
+    sink.stop()
+
+    assert sorted(r['accion'] for r in escritos) == sorted(f'a{i}' for i in range(50))
+
+
+def test_no_reprocesa_el_journal_de_otro_proceso_vivo(writer, tmp_path):
+    vivo = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    terminado = subprocess.Popen([sys.executable, '-c', 'pass'])
+    terminado.wait()
+    try:
+        (tmp_path / f'registros-{vivo.pid}.jsonl').write_text('{"accion": "vivo"}\n', encoding='utf-8')
+        (tmp_path / f'registros-{terminado.pid}.jsonl').write_text('{"accion": "terminado"}\n', encoding='utf-8')
+
+        sink = _sink(writer, tmp_path)
+        assert sink.replay_journal() == 1
+        sink.stop()
+    finally:
+        vivo.kill()
+        vivo.wait()
+
+    assert writer.registros == [{'accion': 'terminado'}]
+    assert (tmp_path / f'registros-{vivo.pid}.jsonl').exists()
+
+
+def test_journal_con_lineas_corruptas_no_queda_reclamado(writer, tmp_path):
+    journal = tmp_path / 'registros-999999999.jsonl'
+    journal.write_text('{"accion": "a"}\n{"acci\n{"accion": "b"}\n', encoding='utf-8')
+
+    sink = _sink(writer, tmp_path)
+    assert sink.replay_journal() == 2
+    sink.stop()
+
+    assert writer.registros == [{'accion': 'a'}, {'accion': 'b'}]
+    assert not list(tmp_path.iterdir())
+
+
+def test_journal_reclamado_vuelve_a_su_nombre_si_no_se_puede_volcar(writer, tmp_path, monkeypatch):
+    journal = tmp_path / 'registros-999999999.jsonl'
+    journal.write_text(''.join(f'{{"accion": "a{i}"}}\n' for i in range(25)), encoding='utf-8')
+    writer.disponible = False
+
+    sink = _sink(writer, tmp_path)
+    monkeypatch.setattr(sink, '_spill', lambda registros: not registros)
+    assert sink.replay_journal() == 0
+    sink.stop()
+
+    # Nada se insertó ni se pudo volcar al journal: el archivo vuelve a su nombre original.
+    assert [p.name for p in tmp_path.iterdir()] == ['registros-999999999.jsonl']
+    assert journal.read_text(encoding='utf-8').count('\n') == 25
@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.services.calendario_laboral_service import CalendarioLaboral
+
+
+class ExcepcionesFalsas:
+    def __init__(self, excepciones):
+        self.excepciones = excepciones
+        self.consultas = 0
+
+    def find_all(self, filters=None):
+        self.consultas += 1
+        return {'success': True, 'data': [e for e in self.excepciones
+                                          if filters['fecha_gte'] <= e['fecha'] <= filters['fecha_lte']]}
+
+
+@pytest.fixture
+def excepciones():
+    return ExcepcionesFalsas([
+        {'fecha': '2025-12-06', 'es_laborable': True, 'motivo': 'Sábado extra', 'horas': 4},
+        {'fecha': '2025-12-09', 'es_laborable': False, 'motivo': 'Mantenimiento'},
+        # Feriado nacional trabajado por la planta.
+        {'fecha': '2025-12-25', 'es_laborable': True, 'motivo': 'Turno de Navidad'},
+    ])
+
+
+def _es_laborable_ingenuo(fecha, excepciones):
+    import holidays
+    for e in excepciones.excepciones:
+        if e['fecha'] == fecha.isoformat():
+            return e['es_laborable']
+    return fecha.weekday() < 5 and fecha not in holidays.country_holidays('AR', years=[fecha.year])
+
+
+def test_fines_de_semana_feriados_y_excepciones(excepciones):
+    calendario = CalendarioLaboral(excepcion_model=excepciones)
+    assert calendario.es_laborable(date(2025, 12, 5))
+    assert calendario.es_laborable(date(2025, 12, 6))            # sábado con excepción laborable
+    assert not calendario.es_laborable(date(2025, 12, 7))
+    assert calendario.motivo_no_laborable(date(2025, 12, 9)) == 'Mantenimiento'
+    assert calendario.motivo_no_laborable(date(2025, 12, 8))      # Inmaculada Concepción
+    assert calendario.es_laborable(date(2025, 12, 25))
+    assert calendario.motivo_no_laborable(date(2025, 12, 14)) == 'Fin de Semana'
+
+    inicio = date(2025, 11, 1)
+    for i in range(90):  # cruza el cambio de año
+        fecha = inicio + timedelta(days=i)
+        assert calendario.es_laborable(fecha) == _es_laborable_ingenuo(fecha, excepciones), fecha
+    # Un año por consulta al cargar; las consultas siguientes no van a la base.
+    assert excepciones.consultas == 2
+
+
+def test_siguiente_anterior_y_sumar_dias(excepciones):
+    calendario = CalendarioLaboral(excepcion_model=excepciones)
+    assert calendario.siguiente_laborable(date(2025, 12, 7)) == date(2025, 12, 10)   # dom -> 8 feriado, 9 excepción
+    assert calendario.anterior_laborable(date(2025, 12, 9)) == date(2025, 12, 6)     # sábado extra
+    assert calendario.anterior_laborable(date(2025, 12, 10)) == date(2025, 12, 10)
+    assert calendario.sumar_dias_laborables(date(2025, 12, 5), 2) == date(2025, 12, 10)
+    # El resultado cae en el año siguiente: el rango se extiende solo.
+    assert calendario.sumar_dias_laborables(date(2025, 12, 30), 3).year == 2026
+    assert calendario.contar_dias_laborables(date(2025, 12, 5), date(2025, 12, 12)) == 5
+
+
+def test_invalidar_relee_las_excepciones(excepciones):
+    calendario = CalendarioLaboral(excepcion_model=excepciones)
+    assert calendario.es_laborable(date(2025, 12, 10))
+    excepciones.excepciones.append({'fecha': '2025-12-10', 'es_laborable': False, 'motivo': 'Inventario anual'})
+    assert calendario.es_laborable(date(2025, 12, 10))  # sigue precalculado
+    calendario.invalidar()
+    assert calendario.motivo_no_laborable(date(2025, 12, 10)) == 'Inventario anual'
+
+
+def test_no_conserva_un_calendario_sin_excepciones_por_un_error(excepciones):
+    class ExcepcionesCaidas(ExcepcionesFalsas):
+        caida = True
+
+        def find_all(self, filters=None):
+            if self.caida:
+                self.consultas += 1
+                return {'success': False, 'error': 'timeout'}
+            return super().find_all(filters)
+
+    modelo = ExcepcionesCaidas(excepciones.excepciones)
+    calendario = CalendarioLaboral(excepcion_model=modelo, reintento=0)
+    assert not calendario.es_laborable(date(2025, 12, 6))  # sin excepciones, el sábado no se trabaja
+    modelo.caida = False
+    assert calendario.es_laborable(date(2025, 12, 6))
+    assert calendario.es_laborable(date(2025, 12, 6))
+    assert modelo.consultas == 2
@@ -0,0 +1,100 @@
+import pytest
+
+from app.services import chatbot_service
+from app.services.chatbot_service import ArbolChatbot
+
+
+class _Consulta:
+    def __init__(self, tabla):
+        self.tabla = tabla
+        self.filtros = {}
+        self.nueva = None
+
+    def insert(self, fila):
+        self.nueva = dict(fila, id=max(f['id'] for f in self.tabla.filas) + 1)
+        return self
+
+    def select(self, *_):
+        return self
+
+    def eq(self, columna, valor):
+        self.filtros[columna] = valor
+        return self
+
+    def order(self, *_):
+        return self
+
+    def execute(self):
+        if self.nueva is not None:
+            self.tabla.filas.append(self.nueva)
+            return type('Resultado', (), {'data': [self.nueva]})()
+        self.tabla.consultas += 1
+        filas = [f for f in self.tabla.filas if all(f.get(c) == v for c, v in self.filtros.items())]
+        return type('Resultado', (), {'data': [dict(f) for f in sorted(filas, key=lambda f: f['id'])]})()
+
+
+class QAsFalsas:
+    def __init__(self, filas):
+        self.filas = filas
+        self.consultas = 0
+        self.db = self
+
+    def table(self, _nombre):
+        return _Consulta(self)
+
+    def get_table_name(self):
+        return 'chatbot_qa'
+
+
+@pytest.fixture
+def qas():
+    return QAsFalsas([
+        {'id': 1, 'pregunta': 'Horarios', 'respuesta': 'De 8 a 17', 'activo': True, 'parent_id': None},
+        {'id': 2, 'pregunta': 'Envíos', 'respuesta': 'Sí', 'activo': True, 'parent_id': None},
+        {'id': 3, 'pregunta': 'Sábados', 'respuesta': 'No', 'activo': True, 'parent_id': 1},
+        {'id': 4, 'pregunta': 'Feriados', 'respuesta': 'No', 'activo': False, 'parent_id': 1},
+    ])
+
+
+def test_una_consulta_para_todo_el_arbol(qas):
+    arbol = ArbolChatbot(model=qas)
+    raices, etag = arbol.raices()
+    assert [q['id'] for q in raices] == [1, 2, -1]
+    assert raices[-1]['type'] == 'redirect'
+    for _ in range(50):
+        assert [q['id'] for q in arbol.hijos(1)[0]] == [3]
+        assert arbol.hijos(2)[0] == []
+        assert arbol.raices()[1] == etag
+    assert qas.consultas == 1
+
+    # Sin caché cada pedido vuelve a la base.
+    sin_cache = ArbolChatbot(max_edad=0, model=qas)
+    sin_cache.raices()
+    sin_cache.hijos(1)
+    assert qas.consultas == 3
+
+
+def test_endpoints_responden_304_e_invalidan_al_editar(qas, monkeypatch):
+    from flask import Flask
+    from app.controllers.chatbot_controller import ChatbotController
+
+    monkeypatch.setattr(chatbot_service, '_arbol', ArbolChatbot(model=qas))
+    app = Flask(__name__)
+    controller = ChatbotController.__new__(ChatbotController)
+    controller.model = qas
+
+    with app.test_request_context('/'):
+        resp, status = controller.get_children_qas(1)
+        etag = resp.headers['ETag']
+        assert status == 200 and [q['id'] for q in resp.get_json()['data']] == [3]
+
+        resp, status = controller.get_children_qas(1, etag)
+        assert status == 304 and resp.get_data() == b''
+
+        # El admin agrega una respuesta: el ETag cambia y la lista se relee.
+        assert controller.create_qa({'pregunta': 'Domingos', 'respuesta': 'No', 'parent_id': '1'})[1] == 201
+
+        resp, status = controller.get_children_qas(1, etag)
+        assert status == 200 and resp.headers['ETag'] != etag
+        assert [q['id'] for q in resp.get_json()['data']] == [3, 5]
+    assert qas.consultas == 2
@@ -0,0 +1,131 @@
+import pytest
+
+from app.services.costeo_service import MotorCostos
+from benchmarks.seed import actualizar_costos_productos
+
+
+@pytest.fixture
+def fake_db(fake_db):
+    fake_db.seed('productos', [
+        {'id': 1, 'codigo': 'P1', 'nombre': 'Pan', 'categoria': 'A', 'iva': True, 'porcentaje_ganancia': 50},
+        {'id': 2, 'codigo': 'P2', 'nombre': 'Torta', 'categoria': 'A', 'iva': False, 'porcentaje_ganancia': 20},
+        {'id': 3, 'codigo': 'P3', 'nombre': 'Sin receta', 'categoria': 'B', 'iva': True, 'porcentaje_ganancia': 10},
+    ])
+    fake_db.seed('insumos_catalogo', [
+        {'id_insumo': 'harina', 'precio_unitario': 2.0},
+        {'id_insumo': 'azucar', 'precio_unitario': 3.0},
+        {'id_insumo': 'huevo', 'precio_unitario': 0.5},
+    ])
+    fake_db.seed('recetas', [{'id': 10, 'producto_id': 1}, {'id': 20, 'producto_id': 2}])
+    fake_db.seed('receta_ingredientes', [
+        {'id': 1, 'receta_id': 10, 'id_insumo': 'harina', 'cantidad': 1.5},
+        {'id': 2, 'receta_id': 20, 'id_insumo': 'harina', 'cantidad': 1},
+        {'id': 3, 'receta_id': 20, 'id_insumo': 'azucar', 'cantidad': 2},
+    ])
+    fake_db.seed('operacionesreceta', [
+        {'id': 100, 'receta_id': 10, 'tiempo_preparacion': 30, 'tiempo_ejecucion_unitario': 30},
+        {'id': 200, 'receta_id': 20, 'tiempo_preparacion': 0, 'tiempo_ejecucion_unitario': 120},
+    ])
+    fake_db.seed('operacion_receta_roles', [
+        {'id': 1, 'operacion_receta_id': 100, 'rol_id': 1, 'porcentaje_participacion': 50},
+        {'id': 2, 'operacion_receta_id': 200, 'rol_id': 2, 'porcentaje_participacion': None},
+    ])
+    fake_db.seed('operacion_receta_costos_fijos', [
+        {'id': 1, 'operacion_receta_id': 100, 'costo_fijo_id': 1},
+        {'id': 2, 'operacion_receta_id': 200, 'costo_fijo_id': 1},
+    ])
+    fake_db.seed('roles', [{'id': 1, 'nombre': 'OPERARIO', 'costo_por_hora': 10},
+                           {'id': 2, 'nombre': 'MAESTRO', 'costo_por_hora': 20}])
+    fake_db.seed('costos_fijos', [{'id': 1, 'nombre': 'Luz', 'monto_mensual': 160, 'activo': True}])
+    fake_db.seed('configuracion_produccion', [{'id': 1, 'dia_semana': 1, 'horas': 8},
+                                              {'id': 2, 'dia_semana': 2, 'horas': 12}])
+    fake_db.seed('historial_costos_productos', [])
+    fake_db.register_rpc('actualizar_costos_productos', actualizar_costos_productos)
+    return fake_db
+
+
+def _producto(db, producto_id):
+    return next(p for p in db.tables['productos'] if p['id'] == producto_id)
+
+
+def test_recosteo_completo_con_las_formulas_de_siempre(fake_db):
+    motor = MotorCostos()
+    sin_receta = dict(_producto(fake_db, 3))
+    assert motor.recostear_todos() == [1, 2]
+    # Horas del mes: (8 + 12) * 4 = 80 -> tasa de Luz 160 / 80 = 2 por hora.
+    pan = _producto(fake_db, 1)
+    assert pan['costo_mano_obra'] == pytest.approx(5.0)        # 1 h * 50% * 10
+    assert pan['costo_fijos'] == pytest.approx(2.0)
+    assert pan['costo_total_produccion'] == pytest.approx(10.0)  # 3 + 5 + 2
+    assert pan['precio_unitario'] == pytest.approx(10.0 * 1.5 * 1.21)
+    torta = _producto(fake_db, 2)
+    assert torta['costo_total_produccion'] == pytest.approx(8.0 + 40.0 + 4.0)
+    assert torta['precio_unitario'] == pytest.approx(52.0 * 1.2)
+    assert _producto(fake_db, 3) == sin_receta
+    assert len(fake_db.tables['historial_costos_productos']) == 2
+
+
+def test_cambio_de_precio_propaga_solo_a_los_afectados_en_lote(fake_db):
+    motor = MotorCostos()
+    motor.cargar()
+    fake_db.tables['insumos_catalogo'][1]['precio_unitario'] = 4.5  # azúcar: sólo la torta
+    fake_db.reset_counters()
+    assert motor.actualizar_precios_insumos(['azucar']) == [2]
+    # Un select del precio, uno de márgenes, una actualización de costos y un insert de historial.
+    assert fake_db.total_round_trips == 4
+    incremental = _producto(fake_db, 2)['precio_unitario']
+
+    assert MotorCostos().recostear_todos() == [1, 2]
+    assert _producto(fake_db, 2)['precio_unitario'] == pytest.approx(incremental)
+    assert incremental == pytest.approx((11.0 + 40.0 + 4.0) * 1.2)
+
+    fake_db.reset_counters()
+    assert motor.actualizar_precios_insumos(['huevo']) == []  # sin cambio ni productos que lo usen
+    assert fake_db.total_round_trips == 1
+
+
+def test_cambios_de_estructura_tarifas_y_costos_fijos(fake_db):
+    motor = MotorCostos()
+    motor.cargar()
+    fake_db.tables['receta_ingredientes'].append({'id': 4, 'receta_id': 10, 'id_insumo': 'huevo', 'cantidad': 2})
+    assert motor.recostear_producto(1) == {'success': True}
+    assert _producto(fake_db, 1)['costo_total_produccion'] == pytest.approx(11.0)
+    assert motor.actualizar_precios_insumos([]) == []
+
+    fake_db.tables['roles'][0]['costo_por_hora'] = 30
+    assert motor.actualizar_tarifas_roles([1]) == [1]
+    assert _producto(fake_db, 1)['costo_mano_obra'] == pytest.approx(15.0)
+
+    fake_db.tables['costos_fijos'][0]['activo'] = False
+    assert motor.actualizar_costos_fijos([1]) == [1, 2]
+    assert _producto(fake_db, 2)['costo_fijos'] == 0
+    assert motor.recostear_producto(3)['success']
+
+
+def test_solo_escribe_las_columnas_de_costo(fake_db):
+    motor = MotorCostos()
+    motor.cargar()
+    # Alguien edita el producto después de que el motor leyó el catálogo.
+    _producto(fake_db, 2).update(nombre='Torta de campo', categoria='C', iva=True)
+    fake_db.tables['insumos_catalogo'][1]['precio_unitario'] = 4.5
+    assert motor.actualizar_precios_insumos(['azucar']) == [2]
+    torta = _producto(fake_db, 2)
+    assert (torta['nombre'], torta['categoria'], torta['iva'], torta['codigo']) == ('Torta de campo', 'C', True, 'P2')
+
+    # Sin la función instalada, actualiza producto por producto con las mismas columnas.
+    del fake_db.rpcs['actualizar_costos_productos']
+    _producto(fake_db, 1)['nombre'] = 'Pan casero'
+    assert motor.recostear_todos() == [1, 2]
+    assert _producto(fake_db, 1)['nombre'] == 'Pan casero'
+    assert _producto(fake_db, 1)['costo_total_produccion'] == pytest.approx(10.0)
+    assert _producto(fake_db, 2)['nombre'] == 'Torta de campo'
+
+
+def test_el_precio_usa_el_margen_vigente_y_no_el_del_grafo(fake_db):
+    motor = MotorCostos(max_edad=600)
+    motor.cargar()
+    # Otro worker cambia margen e IVA dentro de la vida del grafo en memoria.
+    _producto(fake_db, 2).update(porcentaje_ganancia=50, iva=True)
+    fake_db.tables['insumos_catalogo'][1]['precio_unitario'] = 4.5
+    assert motor.actualizar_precios_insumos(['azucar']) == [2]
+    assert _producto(fake_db, 2)['precio_unitario'] == pytest.approx((11.0 + 40.0 + 4.0) * 1.5 * 1.21)
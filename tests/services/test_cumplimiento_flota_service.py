@@ -0,0 +1,69 @@
+from datetime import date
+
+import pytest
+
+from app.services.cumplimiento_flota_service import (AL_DIA, PRONTO_VENC, VENCIDA, MotorCumplimientoFlota,
+                                                     normalizar_vencimiento)
+
+HOY = date(2025, 6, 10)
+
+
+def _vehiculo(id_, vtv, licencia, activo=True):
+    return {'id': id_, 'patente': f'AB{id_:03d}CD', 'nombre_conductor': 'Juan Perez', 'dni_conductor': '30111222',
+            'vtv_vencimiento': vtv, 'licencia_vencimiento': licencia, 'activo': activo}
+
+
+@pytest.fixture
+def fake_db(fake_db):
+    fake_db.seed('vehiculos', [
+        _vehiculo(1, '2025-12-01', '2029-01-01'),
+        _vehiculo(2, '2025-06-30', '2025-06-01T00:00:00+00:00'),
+        _vehiculo(3, '2025-06-10', None),
+        _vehiculo(4, '2020-01-01', '2020-01-01', activo=False),
+    ])
+    return fake_db
+
+
+def test_enriquecer_calcula_estados_y_normaliza_fechas():
+    vehiculos = [_vehiculo(1, '2025-12-01', '2029-01-01'), _vehiculo(2, '2025-06-30', '2025-06-01T00:00:00+00:00'),
+                 _vehiculo(3, '2025-06-10', None), _vehiculo(4, '2025-07-10', '2025-07-11')]
+    MotorCumplimientoFlota(model=object()).enriquecer(vehiculos, hoy=HOY)
+
+    assert [(v['estado_vtv'], v['estado_licencia']) for v in vehiculos] == [
+        (AL_DIA, AL_DIA), (PRONTO_VENC, VENCIDA), (PRONTO_VENC, AL_DIA), (PRONTO_VENC, AL_DIA)]
+    assert vehiculos[1]['licencia_vencimiento'] == '2025-06-01'
+    assert vehiculos[1]['licencia_emision_estimada'] == '2020-06-01'
+    assert vehiculos[0]['vtv_emision_estimada'] == '2024-12-01'
+    assert vehiculos[2]['licencia_emision_estimada'] is None and not vehiculos[2]['alerta_licencia']
+    assert vehiculos[1]['alerta_vtv'] and not vehiculos[0]['alerta_vtv']
+
+    # Cada valor distinto se interpreta una sola vez.
+    normalizar_vencimiento.cache_clear()
+    for _ in range(3):
+        MotorCumplimientoFlota(model=object()).enriquecer([_vehiculo(1, '2025-12-01', '2029-01-01')], hoy=HOY)
+    assert normalizar_vencimiento.cache_info().misses == 2
+
+
+def test_avisa_solo_en_las_transiciones(fake_db, monkeypatch):
+    avisos = []
+    monkeypatch.setattr(MotorCumplimientoFlota, '_avisar', lambda self, lista: avisos.append(
+        sorted((v['id'], doc, estado) for v, doc, estado in lista)))
+    motor = MotorCumplimientoFlota()
+
+    resumen = motor.revisar_transiciones(HOY)
+    assert resumen == {'vehiculos': 3, 'cambios': 3, 'avisos': 3}
+    assert avisos == [[(2, 'licencia', VENCIDA), (2, 'vtv', PRONTO_VENC), (3, 'vtv', PRONTO_VENC)]]
+    estados = {v['id']: (v['estado_vtv'], v['estado_licencia']) for v in fake_db.tables['vehiculos']}
+    assert estados[2] == (PRONTO_VENC, VENCIDA) and estados[4] == (AL_DIA, AL_DIA)
+
+    # Sin cambios de estado no se vuelve a avisar.
+    assert motor.revisar_transiciones(HOY)['avisos'] == 0
+
+    # Al día siguiente sólo vence la VTV del vehículo 3.
+    assert motor.revisar_transiciones(date(2025, 6, 11))['avisos'] == 1
+    assert avisos[-1] == [(3, 'vtv', VENCIDA)]
+
+    # Renovar la VTV vuelve el estado a AL_DIA sin avisar.
+    fake_db.tables['vehiculos'][2]['vtv_vencimiento'] = '2026-06-11'
+    assert motor.revisar_transiciones(date(2025, 6, 11)) == {'vehiculos': 3, 'cambios': 1, 'avisos': 0}
+    assert len(avisos) == 2
@@ -0,0 +1,157 @@
+import pytest
+
+from app.services import stock_ledger_service
+from app.services.efectos_alerta_service import EjecutorEfectosAlerta
+from app.services.stock_ledger_service import StockLedger
+from benchmarks.seed import inicializar_saldos_inventario, register_default_rpcs
+
+HARINA = '11111111-1111-4111-8111-111111111111'
+AZUCAR = '22222222-2222-4222-8222-222222222222'
+
+
+def _lote(n, insumo=HARINA, actual=10, estado='disponible'):
+    return {'id_lote': f'a0000000-0000-4000-8000-{n:012d}', 'id_insumo': insumo, 'cantidad_inicial': 20,
+            'cantidad_actual': actual, 'cantidad_en_cuarentena': 0, 'estado': estado, 'en_alerta': False}
+
+
+@pytest.fixture
+def fake_db(fake_db):
+    ledger = stock_ledger_service._ledger
+    fake_db.seed('insumos_catalogo', [{'id_insumo': HARINA, 'nombre': 'Harina', 'stock_actual': 18},
+                                      {'id_insumo': AZUCAR, 'nombre': 'Azúcar', 'stock_actual': 3}])
+    fake_db.seed('insumos_inventario', [_lote(1, actual=5), _lote(2, actual=0, estado='agotado'),
+                                        _lote(3, AZUCAR, actual=3), _lote(4, actual=13)])
+    fake_db.seed('reservas_insumos', [{'id': 1, 'orden_produccion_id': 1, 'lote_inventario_id': _lote(1)['id_lote'],
+                                       'insumo_id': HARINA, 'cantidad_reservada': 5, 'estado': 'RESERVADO'}])
+    fake_db.seed('ordenes_produccion', [{'id': 1, 'codigo': 'OP-1', 'estado': 'LISTA PARA PRODUCIR'},
+                                        {'id': 2, 'codigo': 'OP-2', 'estado': 'EN PROCESO'},
+                                        {'id': 3, 'codigo': 'OP-3', 'estado': 'COMPLETADA'}])
+    fake_db.seed('lotes_productos', [
+        {'id_lote': 1, 'producto_id': 1, 'numero_lote': 'LPT-1', 'cantidad_inicial': 8, 'cantidad_actual': 8,
+         'cantidad_en_cuarentena': 0, 'estado': 'DISPONIBLE'},
+        {'id_lote': 2, 'producto_id': 1, 'numero_lote': 'LPT-2', 'cantidad_inicial': 8, 'cantidad_actual': 0,
+         'cantidad_en_cuarentena': 0, 'estado': 'AGOTADO'},
+    ])
+    fake_db.seed('pedidos', [{'id': 1, 'estado': 'EN PROCESO'}, {'id': 2, 'estado': 'ENTREGADO'}])
+    fake_db.seed('alerta_riesgo', [{'id': 1, 'codigo': 'ALR-1', 'estado': 'Pendiente'}])
+    fake_db.seed('alerta_riesgo_afectados', [])
+    fake_db.seed('usuarios', [])
+    inicializar_saldos_inventario(fake_db)
+    register_default_rpcs(fake_db)
+    stock_ledger_service._ledger = StockLedger()
+    yield fake_db
+    stock_ledger_service._ledger = ledger
+
+
+def _afectados(db):
+    return ([{'tipo_entidad': 'lote_insumo', 'id_entidad': l['id_lote']} for l in db.tables['insumos_inventario']] +
+            [{'tipo_entidad': 'lote_producto', 'id_entidad': l['id_lote']} for l in db.tables['lotes_productos']] +
+            [{'tipo_entidad': 'orden_produccion', 'id_entidad': op['id']} for op in db.tables['ordenes_produccion'][1:]] +
+            [{'tipo_entidad': 'pedido', 'id_entidad': p['id']} for p in db.tables['pedidos']])
+
+
+def _ejecutar(db, afectados):
+    from app.models.alerta_riesgo import AlertaRiesgoModel
+    ejecutor = EjecutorEfectosAlerta()
+    estados = ejecutor.obtener_estados(afectados)
+    AlertaRiesgoModel().asociar_afectados(1, afectados, estados)
+    return ejecutor.aplicar({'id': 1, 'codigo': 'ALR-1'}, afectados, estados, 'Alerta ALR-1', 1)
+
+
+def _fila(db, tabla, columna, valor):
+    return next(f for f in db.tables[tabla] if str(f[columna]) == str(valor))
+
+
+def test_efectos_de_la_alerta(fake_db, monkeypatch):
+    from app.controllers.registro_controller import RegistroController
+    auditoria = []
+    monkeypatch.setattr(RegistroController, 'crear_registro', lambda self, *args: auditoria.append(args))
+    resumen = _ejecutar(fake_db, _afectados(fake_db))
+    assert resumen == {'en_alerta': 10, 'omitidos': 3, 'lotes_insumo_cuarentena': 3, 'lotes_producto_cuarentena': 1,
+                       'ops_en_espera': 1, 'pedidos_en_revision': 1}
+
+    lote = _fila(fake_db, 'insumos_inventario', 'id_lote', _lote(1)['id_lote'])
+    # El stock reservado también pasa a cuarentena y la reserva se cancela.
+    assert (lote['estado'], lote['cantidad_actual'], lote['cantidad_en_cuarentena'], lote['en_alerta']) == ('cuarentena', 0, 10, True)
+    assert fake_db.tables['reservas_insumos'] == []
+    assert _fila(fake_db, 'insumos_inventario', 'id_lote', _lote(2)['id_lote'])['estado'] == 'agotado'
+    assert [op['estado'] for op in fake_db.tables['ordenes_produccion']] == ['EN ESPERA', 'EN ESPERA', 'COMPLETADA']
+    assert [l['estado'] for l in fake_db.tables['lotes_productos']] == ['CUARENTENA', 'AGOTADO']
+    assert all(l['en_alerta'] for l in fake_db.tables['lotes_productos'])
+    assert [p['estado'] for p in fake_db.tables['pedidos']] == ['EN PROCESO', 'ENTREGADO']
+
+    afectados = {(a['tipo_entidad'], a['id_entidad']): a for a in fake_db.tables['alerta_riesgo_afectados']}
+    assert afectados[('lote_insumo', _lote(2)['id_lote'])]['resolucion_aplicada'] == 'omitido_por_estado_previo'
+    assert afectados[('orden_produccion', '3')]['estado'] == 'resuelto'
+    assert afectados[('lote_producto', '2')]['estado'] == 'pendiente'
+
+    # Libro de movimientos y stock consolidado, escritos en lote.
+    assert {m['tipo'] for m in fake_db.tables['movimientos_inventario']} == {'CUARENTENA_ENTRADA'}
+    assert {i['id_insumo']: i['stock_actual'] for i in fake_db.tables['insumos_catalogo']} == {HARINA: 0, AZUCAR: 0}
+    assert len(fake_db.tables['control_calidad_insumos']) == 3
+
+    # Un único registro de auditoría con el resumen de toda la alerta.
+    assert [(categoria, accion) for _, categoria, accion, _ in auditoria] == [('Alertas de riesgo', 'Efectos de alerta')]
+
+
+def test_consultas_no_crecen_con_la_cantidad_de_afectados(fake_db):
+    snapshot = fake_db.snapshot()
+    totales = []
+    for extra in (5, 60):
+        fake_db.restore(snapshot)
+        fake_db.tables['insumos_inventario'].extend(_lote(100 + i) for i in range(extra))
+        fake_db.tables['ordenes_produccion'].extend({'id': 100 + i, 'estado': 'EN PROCESO'} for i in range(extra))
+        inicializar_saldos_inventario(fake_db)
+        afectados = _afectados(fake_db)
+        fake_db.reset_counters()
+        assert _ejecutar(fake_db, afectados)['lotes_insumo_cuarentena'] == 3 + extra
+        totales.append(fake_db.total_round_trips)
+    assert totales[0] == totales[1]
+
+
+def test_cuarentena_usa_los_valores_vigentes_y_no_pisa_otras_columnas(fake_db):
+    from app.models.alerta_riesgo import AlertaRiesgoModel
+    from app.models.inventario import InventarioModel
+    ejecutor = EjecutorEfectosAlerta()
+    afectados = _afectados(fake_db)
+    estados = ejecutor.obtener_estados(afectados)
+    AlertaRiesgoModel().asociar_afectados(1, afectados, estados)
+
+    # Entre la lectura de estados y la cuarentena se consume parte de un lote y se editan otras columnas.
+    InventarioModel().update(_lote(4)['id_lote'], {'cantidad_actual': 9}, 'id_lote')
+    _fila(fake_db, 'insumos_inventario', 'id_lote', _lote(4)['id_lote'])['ubicacion_fisica'] = 'Depósito B'
+    _fila(fake_db, 'lotes_productos', 'id_lote', 1)['observaciones'] = 'Revisado'
+    _fila(fake_db, 'insumos_catalogo', 'id_insumo', HARINA)['nombre'] = 'Harina 000'
+
+    ejecutor.aplicar({'id': 1, 'codigo': 'ALR-1'}, afectados, estados, 'Alerta ALR-1', 1)
+
+    lote = _fila(fake_db, 'insumos_inventario', 'id_lote', _lote(4)['id_lote'])
+    assert (lote['cantidad_en_cuarentena'], lote['cantidad_actual'], lote['ubicacion_fisica']) == (9, 0, 'Depósito B')
+    assert _fila(fake_db, 'lotes_productos', 'id_lote', 1)['observaciones'] == 'Revisado'
+    assert _fila(fake_db, 'insumos_catalogo', 'id_insumo', HARINA)['nombre'] == 'Harina 000'
+
+
+def test_invalida_el_plan_y_los_hechos_de_las_ops_tocadas(fake_db, monkeypatch):
+    from app.controllers.registro_controller import RegistroController
+    from app.services import hechos_produccion_service
+    monkeypatch.setattr(RegistroController, 'crear_registro', lambda self, *args: None)
+    from app.services.planificacion_snapshot_service import get_snapshot_planificacion
+    notificadas = []
+    monkeypatch.setattr(hechos_produccion_service, 'notificar_hecho_op', notificadas.append)
+    snapshot = get_snapshot_planificacion()
+    construcciones = []
+
+    def construir():
+        construcciones.append(1)
+        return {'ops': []}
+
+    snapshot.obtener('2026-W10', 7, construir)
+    snapshot.obtener('2026-W10', 7, construir)
+    assert len(construcciones) == 1
+
+    _ejecutar(fake_db, _afectados(fake_db))
+
+    # La OP 1 perdió su reserva y volvió a EN ESPERA; la OP 2 pasó a EN ESPERA por estar afectada.
+    assert sorted(notificadas) == [1, 2]
+    snapshot.obtener('2026-W10', 7, construir)
+    assert len(construcciones) == 2
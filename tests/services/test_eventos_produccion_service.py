@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+from app.services import planificacion_snapshot_service
+from app.services.eventos_produccion_service import BusEventos, RelayArchivoEventos, puede_ver, stream_eventos
+from app.services.planificacion_snapshot_service import SnapshotPlanificacion
+
+
+@pytest.fixture(autouse=True)
+def snapshot_aislado():
+    anterior = planificacion_snapshot_service._snapshot
+    planificacion_snapshot_service._snapshot = SnapshotPlanificacion()
+    yield planificacion_snapshot_service._snapshot
+    planificacion_snapshot_service._snapshot = anterior
+
+
+def test_filtro_por_rol():
+    evento = {'tipo': 'op_estado', 'op_id': 1, 'operario_id': 7, 'roles': None}
+    assert puede_ver(evento, 'SUPERVISOR')
+    assert puede_ver(evento, 'OPERARIO', 7)
+    assert not puede_ver(evento, 'OPERARIO', 8)
+    assert puede_ver(dict(evento, operario_id=None), 'OPERARIO', 8)
+    assert not puede_ver(dict(evento, roles=['GERENTE']), 'SUPERVISOR')
+
+
+def test_stream_con_replay_heartbeat_y_filtro():
+    bus = BusEventos()
+    primero = bus.publicar('op_estado', op_id=1, estado='EN_PROCESO', operario_id=7)
+    bus.publicar('op_estado', op_id=2, estado='PAUSADA', operario_id=8)
+    bus.publicar('op_avance', op_id=1, operario_id=7, cantidad_producida=10)
+
+    stream = stream_eventos(bus, rol='OPERARIO', usuario_id=7, ultimo_id=primero['id'],
+                            heartbeat=0.05, duracion_max=1)
+    assert next(stream) == 'retry: 3000\n\n'
+    replay = next(stream)
+    # El evento de la OP 2 es de otro operario: no se envía.
+    assert replay.startswith(f"id: {primero['id'] + 2}\n") and '"op_avance"' in replay
+    assert next(stream) == ': heartbeat\n\n'
+
+    bus.publicar('op_estado', op_id=1, estado='CONTROL_DE_CALIDAD', operario_id=7)
+    assert '"CONTROL_DE_CALIDAD"' in next(stream)
+    stream.close()
+    assert bus.conexiones() == 0
+
+    # Un id de un proceso anterior pide recargar el tablero completo.
+    reset = stream_eventos(bus, rol='SUPERVISOR', ultimo_id=5, duracion_max=0)
+    next(reset)
+    assert next(reset).startswith('event: reset')
+
+
+def test_relay_entre_workers(tmp_path, snapshot_aislado):
+    path = str(tmp_path / 'eventos.sqlite')
+    worker_a = BusEventos(relay=RelayArchivoEventos(path, intervalo=0.02))
+    worker_b = BusEventos(relay=RelayArchivoEventos(path, intervalo=0.02))
+    suscripcion = worker_b.suscribir()
+
+    inicio = time.monotonic()
+    publicado = worker_a.publicar('op_estado', op_id=3, estado='EN_PROCESO')
+    recibido = suscripcion.esperar(timeout=1)
+    assert recibido['id'] == publicado['id'] and recibido['estado'] == 'EN_PROCESO'
+    assert time.monotonic() - inicio < 1
+
+    # Un evento de otro proceso invalida los snapshots locales.
+    worker_a.relay.publicar({'tipo': 'op_estado', 'op_id': 4, 'pid': -1})
+    assert suscripcion.esperar(timeout=1)['op_id'] == 4
+    assert snapshot_aislado.version >= 1
+
+    # Replay por Last-Event-ID desde el archivo compartido.
+    assert [e['op_id'] for e in worker_b.eventos_desde(publicado['id'] - 1)] == [3, 4]
+    for bus in (worker_a, worker_b):
+        bus.relay.detener()
+
+
+def test_reserva_de_conexiones_atomica():
+    import threading
+    bus = BusEventos()
+    barrera = threading.Barrier(16)
+    reservas = []
+
+    def conectar():
+        barrera.wait()
+        reservas.append(bus.suscribir(maximo=4))
+
+    hilos = [threading.Thread(target=conectar) for _ in range(16)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    abiertas = [r for r in reservas if r is not None]
+    assert len(abiertas) == 4 and bus.conexiones() == 4
+    # El stream usa la reserva y la libera al cerrarse.
+    stream = stream_eventos(bus, rol='SUPERVISOR', duracion_max=0, suscripcion=abiertas[0])
+    list(stream)
+    assert bus.conexiones() == 3 and bus.suscribir(maximo=4) is not None
+
+
+def test_cantidad_de_workers(monkeypatch):
+    from app.services import eventos_produccion_service
+    monkeypatch.delenv('WEB_CONCURRENCY', raising=False)
+    monkeypatch.setattr(eventos_produccion_service.sys, 'argv', ['gunicorn', '--workers=3', 'main:app'])
+    assert eventos_produccion_service._cantidad_workers() == 3
+    monkeypatch.setenv('GUNICORN_CMD_ARGS', '-w 2')
+    monkeypatch.setattr(eventos_produccion_service.sys, 'argv', ['gunicorn', 'main:app'])
+    assert eventos_produccion_service._cantidad_workers() == 2
+    monkeypatch.setenv('WEB_CONCURRENCY', '5')
+    assert eventos_produccion_service._cantidad_workers() == 5
@@ -0,0 +1,93 @@
+import io
+import os
+import subprocess
+import sys
+import textwrap
+
+from flask import Flask
+from openpyxl import load_workbook
+
+from app.services.exportacion_service import generar_xlsx, paginar_find_all, respuesta_exportacion
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+COLUMNAS = [('id', 'ID'), ('codigo', 'Código'), ('cantidad', 'Cantidad'), ('estado', 'Estado'), ('fecha', 'Fecha')]
+
+
+class TablaSintetica:
+    """Imita `BaseModel.find_all` con `<clave>_gt`, orden y límite, y registra cada página pedida."""
+
+    def __init__(self, total):
+        self.total = total
+        self.pedidos = []
+
+    def get_table_name(self):
+        return 'sintetica'
+
+    def find_all(self, filters=None, order_by=None, limit=None, select_columns=None):
+        self.pedidos.append((dict(filters or {}), order_by, limit, select_columns))
+        desde = (filters or {}).get('id_gt', 0)
+        return {'success': True, 'data': [
+            {'id': i, 'codigo': f'LOTE-{i:07d}', 'cantidad': i * 0.5, 'estado': 'DISPONIBLE',
+             'fecha': '2025-06-01T10:00:00+00:00'}
+            for i in range(desde + 1, min(desde + limit, self.total) + 1)]}
+
+
+def test_pagina_por_clave_y_genera_excel(tmp_path):
+    tabla = TablaSintetica(2500)
+    filas = paginar_find_all(tabla, 'id', {'estado': 'DISPONIBLE'}, columnas=['codigo', 'cantidad'])
+    # La primera página se pide enseguida; el resto a medida que se consumen.
+    assert len(tabla.pedidos) == 1
+
+    app = Flask(__name__)
+    with app.test_request_context():
+        respuesta = respuesta_exportacion(filas, COLUMNAS, 'xlsx', 'lotes')
+        contenido = b''.join(respuesta.response)
+    assert respuesta.headers['Content-Disposition'].startswith('attachment; filename=lotes_')
+
+    assert [f['id_gt'] if 'id_gt' in f else None for f, *_ in tabla.pedidos] == [None, 1000, 2000]
+    assert all(f['estado'] == 'DISPONIBLE' and orden == 'id' and columnas == ['id', 'codigo', 'cantidad']
+               for f, orden, _, columnas in tabla.pedidos)
+
+    hoja = load_workbook(io.BytesIO(contenido), read_only=True).active
+    filas_excel = list(hoja.iter_rows(values_only=True))
+    assert filas_excel[0] == ('ID', 'Código', 'Cantidad', 'Estado', 'Fecha')
+    assert len(filas_excel) == 2501 and filas_excel[-1][:3] == (2500, 'LOTE-0002500', 1250.0)
+
+
+def test_csv_de_500k_filas_con_memoria_acotada():
+    # Se mide en un proceso aparte: ru_maxrss es el pico del proceso y no baja.
+    script = textwrap.dedent(f"""
+        import resource, sys
+        sys.path.insert(0, {str(os.path.join(RAIZ, 'tests', 'services'))!r})
+        from test_exportacion_service import COLUMNAS, TablaSintetica
+        from app.services.exportacion_service import generar_csv, paginar_find_all
+
+        antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        lineas = bytes_ = 0
+        for bloque in generar_csv(paginar_find_all(TablaSintetica(500_000), 'id'), COLUMNAS):
+            lineas += bloque.count('\\n')
+            bytes_ += len(bloque)
+        print(lineas, bytes_, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - antes) // 1024)
+    """)
+    env = dict(os.environ, PYTHONPATH=RAIZ, SUPABASE_URL=os.getenv('SUPABASE_URL', 'http://localhost'),
+               SUPABASE_KEY=os.getenv('SUPABASE_KEY', 'x'))
+    salida = subprocess.run([sys.executable, '-c', script], cwd=RAIZ, env=env, capture_output=True, text=True,
+                            timeout=120)
+    assert salida.returncode == 0, salida.stderr
+    lineas, bytes_, delta_mb = map(int, salida.stdout.split())
+
+    assert lineas == 500_001
+    assert bytes_ > 25_000_000
+    # Materializar las 500k filas como dicts ocuparía ~250 MB; paginado no pasa de unas pocas páginas.
+    assert delta_mb < 40, f'RSS creció {delta_mb} MB'
+
+
+def test_excel_se_corta_en_el_maximo_de_filas():
+    tabla = TablaSintetica(2500)
+    contenido = b''.join(generar_xlsx(paginar_find_all(tabla, 'id'), COLUMNAS, max_filas=1000))
+
+    filas_excel = list(load_workbook(io.BytesIO(contenido), read_only=True).active.iter_rows(values_only=True))
+    assert len(filas_excel) == 1 + 1000 + 1
+    assert filas_excel[-1][0].startswith('Exportación cortada en 1000 filas')
+    # No se leyó más allá de lo necesario para detectar el corte.
+    assert len(tabla.pedidos) == 2
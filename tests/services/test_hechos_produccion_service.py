@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+
+from app.services.hechos_produccion_service import RegistradorHechosProduccion, calcular_oee_desde_hechos
+
+
+@pytest.fixture
+def fake_db(fake_db):
+    fake_db.seed('operacionesreceta', [{'id': 1, 'receta_id': 10, 'secuencia': 1, 'nombre_operacion': 'Amasado',
+                                        'tiempo_preparacion': 30, 'tiempo_ejecucion_unitario': 1}])
+    fake_db.seed('ordenes_produccion', [
+        {'id': 1, 'receta_id': 10, 'estado': 'COMPLETADA', 'cantidad_planificada': 100, 'cantidad_producida': 100,
+         'fecha_inicio': '2026-03-02T08:00:00', 'fecha_fin': '2026-03-02T12:00:00'},
+        {'id': 2, 'receta_id': 10, 'estado': 'EN_PROCESO', 'cantidad_planificada': 50, 'cantidad_producida': 20,
+         'fecha_inicio': '2026-03-03T08:00:00', 'fecha_fin': None},
+    ])
+    fake_db.seed('mes_kanban.registros_paro', [
+        {'id': 1, 'orden_produccion_id': 1, 'motivo_paro_id': 1,
+         'fecha_inicio': '2026-03-02T09:00:00', 'fecha_fin': '2026-03-02T09:30:00'},
+        {'id': 2, 'orden_produccion_id': 2, 'motivo_paro_id': 1, 'fecha_inicio': '2026-03-03T09:00:00'},
+    ])
+    fake_db.seed('mes_kanban.registros_desperdicio', [{'id': 1, 'orden_produccion_id': 1, 'motivo_desperdicio_id': 1,
+                                                       'cantidad': 5}])
+    fake_db.seed('lotes_productos', [{'id_lote': 7, 'cantidad_inicial': 10}])
+    fake_db.seed('control_calidad_productos', [{'id': 1, 'orden_produccion_id': 1, 'lote_producto_id': 7,
+                                                'decision_final': 'RECHAZADO'}])
+    return fake_db
+
+
+def test_hechos_por_op(fake_db):
+    registrador = RegistradorHechosProduccion(ventana=0)
+    registrador.notificar(1)
+    registrador.notificar(2)
+
+    hechos = {h['orden_produccion_id']: h for h in fake_db.tables['hechos_produccion_op']}
+    assert hechos[1]['tiempo_produccion_seg'] == 4 * 3600
+    assert hechos[1]['tiempo_paro_seg'] == 30 * 60
+    assert hechos[1]['minutos_planificados'] == 130
+    assert (hechos[1]['cantidad_desperdicio'], hechos[1]['cantidad_rechazada']) == (5, 10)
+    # La OP en curso no suma tiempo ni el paro abierto.
+    assert (hechos[2]['tiempo_produccion_seg'], hechos[2]['tiempo_paro_seg']) == (0, 0)
+
+    # Un nuevo avance reemplaza el hecho en lugar de duplicarlo.
+    fake_db.tables['ordenes_produccion'][1]['cantidad_producida'] = 50
+    registrador.notificar(2)
+    assert len(fake_db.tables['hechos_produccion_op']) == 2
+    hechos = {h['orden_produccion_id']: h for h in fake_db.tables['hechos_produccion_op']}
+    assert hechos[2]['cantidad_producida'] == 50
+
+
+def test_oee_desde_hechos_igual_al_calculo_desde_ops(fake_db):
+    from app.controllers.indicadores_controller import IndicadoresController
+    controller = IndicadoresController()
+    desde, hasta = datetime(2026, 3, 1), datetime(2026, 3, 8)
+    esperado = controller._calcular_oee_desde_ops(desde, hasta)
+    assert esperado['valor'] > 0
+
+    assert RegistradorHechosProduccion(ventana=0, page_size=1).backfill() == 2
+    fake_db.reset_counters()
+    assert controller._calcular_oee(desde, hasta) == esperado
+    assert fake_db.total_round_trips == 3  # hechos + ids de las OPs del período + bloqueos de línea
+
+
+def test_oee_con_hechos_parciales_completa_las_ops_faltantes(fake_db):
+    from app.controllers.indicadores_controller import IndicadoresController
+    controller = IndicadoresController()
+    desde, hasta = datetime(2026, 3, 1), datetime(2026, 3, 8)
+    esperado = controller._calcular_oee_desde_ops(desde, hasta)
+
+    # Sólo una de las dos OPs del período tiene su hecho materializado.
+    assert RegistradorHechosProduccion(ventana=0).registrar([2]) == 1
+    assert controller._calcular_oee(desde, hasta) == esperado
+    assert len(fake_db.tables['hechos_produccion_op']) == 1
+
+
+def test_tiempo_de_ciclo_con_hechos_parciales_completa_las_ops_faltantes(fake_db):
+    from app.controllers.reporte_produccion_controller import ReporteProduccionController
+    fake_db.tables['ordenes_produccion'].append(
+        {'id': 3, 'receta_id': 10, 'estado': 'COMPLETADA', 'cantidad_planificada': 10, 'cantidad_producida': 10,
+         'fecha_inicio': '2026-03-04T08:00:00', 'fecha_fin': '2026-03-04T10:00:00'})
+    assert RegistradorHechosProduccion(ventana=0).registrar([1]) == 1
+
+    promedio, cantidad = ReporteProduccionController().calcular_tiempo_ciclo_segundos(
+        datetime(2026, 3, 1), datetime(2026, 3, 8))
+
+    assert (promedio, cantidad) == (3 * 3600, 2)
+
+
+def test_oee_sin_produccion():
+    assert calcular_oee_desde_hechos([]) == {"valor": 0, "disponibilidad": 0, "rendimiento": 0, "calidad": 0}
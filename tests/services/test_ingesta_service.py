@@ -0,0 +1,155 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask
+
+from app.services.ingesta_service import DEAD_LETTER, PROCESADO, PROCESANDO, ColaIngesta, ErrorPermanente
+from app.views import google_forms_routes
+
+SECRETO = 'secreto-de-prueba'
+PAYLOAD = {'nombre_cliente': 'Panadería Sur', 'fecha_solicitud': '2025-06-10',
+           'productos': [{'producto_id': 3, 'cantidad': '12'}, {'producto_id': 7, 'cantidad': 4}]}
+
+
+@pytest.fixture
+def cola(tmp_path):
+    cola = ColaIngesta(str(tmp_path / 'ingesta.sqlite3'), max_workers=4, espera_base=0, intervalo=0.05)
+    yield cola
+    cola.detener()
+
+
+def _app(secreto=SECRETO):
+    app = Flask(__name__)
+    app.config['GOOGLE_FORMS_WEBHOOK_SECRET'] = secreto
+    app.register_blueprint(google_forms_routes.google_forms_bp)
+    return app
+
+
+def test_el_mismo_envio_100_veces_concurrentes_se_procesa_una_vez(cola, monkeypatch):
+    procesados = []
+
+    def procesar(data):
+        time.sleep(0.05)  # alcanza para que los workers compitan por la entrada
+        procesados.append(data)
+        return {'pedido_id': 99}
+
+    monkeypatch.setattr(google_forms_routes, 'get_cola_ingesta', lambda app=None: cola)
+    monkeypatch.setattr(google_forms_routes, 'procesar_pedido_google_forms', procesar)
+    app = _app()
+
+    barrera = threading.Barrier(100)
+
+    def enviar(_):
+        cliente = app.test_client()
+        barrera.wait()
+        # Las claves en otro orden generan el mismo hash.
+        return cliente.post('/api/google-forms/pedido', json=dict(reversed(list(PAYLOAD.items()))),
+                            headers={'X-Webhook-Token': SECRETO})
+
+    with ThreadPoolExecutor(max_workers=100) as pool:
+        respuestas = list(pool.map(enviar, range(100)))
+
+    assert {r.status_code for r in respuestas} == {202}
+    datos = [r.get_json()['data'] for r in respuestas]
+    assert len({d['id_ingesta'] for d in datos}) == 1
+    assert sum(not d['duplicado'] for d in datos) == 1
+
+    assert cola.esperar(5)
+    assert procesados == [PAYLOAD]
+    estado = app.test_client().get(f"/api/google-forms/pedido/{datos[0]['id_ingesta']}",
+                                   headers={'X-Webhook-Token': SECRETO}).get_json()['data']
+    assert estado['estado'] == PROCESADO and estado['resultado'] == {'pedido_id': 99}
+
+
+def test_reintentos_dead_letter_y_replay(cola):
+    base_caida = {'valor': True}
+
+    def procesar(data):
+        if data.get('invalido'):
+            raise ErrorPermanente('Producto inexistente')
+        if base_caida['valor'] and data['n'] == 1:
+            raise ConnectionError('timeout de la base')
+        return data['n']
+
+    cola.max_intentos = 3
+    cola.registrar_procesador('forms', procesar)
+    clave_transitoria, _ = cola.encolar('forms', {'n': 1})
+    clave_invalida, _ = cola.encolar('forms', {'invalido': True})
+    clave_externa, nueva = cola.encolar('forms', {'n': 2}, clave_externa='resp-123')
+    assert nueva and not cola.encolar('forms', {'n': 2, 'reenvio': True}, clave_externa='resp-123')[1]
+
+    # Sin espera entre reintentos, una pasada agota los tres intentos de la transitoria.
+    assert cola.procesar_pendientes() == 5
+    assert cola.estado(clave_invalida)['intentos'] == 1
+    assert cola.estado(clave_transitoria)['estado'] == DEAD_LETTER
+    assert cola.estado(clave_externa)['estado'] == PROCESADO
+    assert {d['clave']: d['ultimo_error'] for d in cola.dead_letters()} == {
+        clave_transitoria: 'timeout de la base', clave_invalida: 'Producto inexistente'}
+
+    # Replay: la caída se resolvió, se reencola sólo la transitoria.
+    base_caida['valor'] = False
+    assert cola.reencolar([clave_transitoria]) == 1
+    cola.procesar_pendientes()
+    assert cola.estado(clave_transitoria)['estado'] == PROCESADO
+    assert cola.estado(clave_transitoria)['resultado'] == 1
+    assert [d['clave'] for d in cola.dead_letters()] == [clave_invalida]
+
+
+def test_entrada_tomada_por_un_proceso_caido_se_recupera(cola):
+    clave, _ = cola.encolar('forms', {'n': 5})
+    assert cola._tomar()[0] == clave  # el proceso "muere" sin terminarla
+    assert cola.estado(clave)['estado'] == PROCESANDO
+
+    otra = ColaIngesta(cola.path, lease=0.05)
+    otra.registrar_procesador('forms', lambda data: data['n'] * 2)
+    assert otra.procesar_pendientes() == 0
+    time.sleep(0.1)
+    assert otra.procesar_pendientes() == 1
+    assert otra.estado(clave)['resultado'] == 10
+
+
+def test_el_resultado_de_una_toma_vencida_no_pisa_al_que_la_retomo(cola):
+    clave, _ = cola.encolar('forms', {'n': 5})
+    *_, token_lento = cola._tomar()
+
+    otra = ColaIngesta(cola.path, lease=0.05)
+    otra.registrar_procesador('forms', lambda data: {'pedido_id': 1})
+    time.sleep(0.1)
+    assert otra.procesar_pendientes() == 1
+
+    # El worker lento termina después: su resultado se descarta.
+    cola.registrar_procesador('forms', lambda data: {'pedido_id': 2})
+    cola._procesar(clave, 'forms', '{"n": 5}', 0, token_lento)
+    assert cola.estado(clave)['resultado'] == {'pedido_id': 1}
+
+
+def test_la_clave_vence_pasada_la_retencion(cola):
+    cola.registrar_procesador('forms', lambda data: data['n'])
+    clave, _ = cola.encolar('forms', {'n': 1})
+    cola.procesar_pendientes()
+    assert not cola.encolar('forms', {'n': 1})[1]
+
+    cola.retencion = 0.1 / 3600
+    time.sleep(0.15)
+    assert cola.encolar('forms', {'n': 1}) == (clave, True)
+    assert cola.estado(clave)['estado'] != PROCESADO
+
+    cola.procesar_pendientes()
+    time.sleep(0.15)
+    assert cola.purgar() == 1 and cola.estado(clave) is None
+
+
+def test_el_webhook_exige_el_token(cola, monkeypatch):
+    monkeypatch.setattr(google_forms_routes, 'get_cola_ingesta', lambda app=None: cola)
+    cliente = _app().test_client()
+
+    assert cliente.post('/api/google-forms/pedido', json=PAYLOAD).status_code == 401
+    assert cliente.post('/api/google-forms/pedido', json=PAYLOAD,
+                        headers={'X-Webhook-Token': 'otro'}).status_code == 401
+    assert cliente.get('/api/google-forms/pedido/abc').status_code == 401
+    assert cola.resumen() == {}
+    # Sin secreto configurado no se acepta nada.
+    assert _app(None).test_client().post('/api/google-forms/pedido', json=PAYLOAD,
+                                         headers={'X-Webhook-Token': ''}).status_code == 503
@@ -0,0 +1,81 @@
+import pytest
+
+from app.services import planificacion_snapshot_service
+from app.services.kanban_delta_service import TableroKanbanVersionado, version_tarjeta
+from app.services.planificacion_snapshot_service import SnapshotPlanificacion
+
+
+@pytest.fixture(autouse=True)
+def snapshot_aislado():
+    anterior = planificacion_snapshot_service._snapshot
+    planificacion_snapshot_service._snapshot = SnapshotPlanificacion()
+    yield planificacion_snapshot_service._snapshot
+    planificacion_snapshot_service._snapshot = anterior
+
+
+def _contexto(*ordenes, metricas=None):
+    por_estado = {}
+    for columna, orden in ordenes:
+        por_estado.setdefault(columna, []).append(orden)
+    return {'ordenes_por_estado': por_estado, 'columnas': {'EN_PROCESO': 'En Proceso'},
+            'metricas_dia': metricas or {'completadas': 0, 'oee_promedio': 50}, 'usuario_rol': 'SUPERVISOR'}
+
+
+def test_los_campos_de_reloj_no_cambian_la_version():
+    orden = {'id': 1, 'cantidad_producida': 10, 'tiempo_transcurrido': '1h 02m', 'oee_actual': 80}
+    reloj = dict(orden, tiempo_transcurrido='1h 03m', oee_actual=81)
+    assert version_tarjeta(orden, 'EN_PROCESO') == version_tarjeta(reloj, 'EN_PROCESO')
+    assert version_tarjeta(orden, 'EN_PROCESO') != version_tarjeta(orden, 'CONTROL_DE_CALIDAD')
+    assert version_tarjeta(orden, 'EN_PROCESO') != version_tarjeta(dict(orden, cantidad_producida=11), 'EN_PROCESO')
+
+
+def test_delta_entre_versiones():
+    tablero = TableroKanbanVersionado()
+    clave = ('SUPERVISOR', None)
+    v1 = tablero.registrar(clave, _contexto(('EN_PROCESO', {'id': 1, 'cantidad_producida': 10}),
+                                           ('EN_PROCESO', {'id': 2, 'cantidad_producida': 0})))
+    assert tablero.delta(clave, v1)['sin_cambios']
+    # Sólo cambia el OEE promedio (reloj): no es un 304, pero el delta viene sin tarjetas.
+    reloj = tablero.delta(clave, v1, {'oee_promedio': 55})
+    assert not reloj['sin_cambios'] and reloj['cambiadas'] == [] and reloj['eliminadas'] == []
+    assert reloj['metricas_dia']['oee_promedio'] == 55
+    assert tablero.delta(clave, reloj['version'], {'oee_promedio': 55})['sin_cambios']
+
+    v2 = tablero.registrar(clave, _contexto(('EN_PROCESO', {'id': 1, 'cantidad_producida': 20}),
+                                           ('EN_PROCESO', {'id': 3, 'cantidad_producida': 0})))
+    delta = tablero.delta(clave, v1)
+    assert delta['version'] == v2 and not delta['completo']
+    assert sorted(t['orden']['id'] for t in delta['cambiadas']) == [1, 3]
+    assert delta['eliminadas'] == [2]
+
+    # Una versión desconocida recibe el tablero completo.
+    completo = tablero.delta(clave, 'desconocida')
+    assert completo['completo'] and len(completo['cambiadas']) == 2
+
+
+def test_el_estado_vence_al_cambiar_el_plan(snapshot_aislado):
+    tablero = TableroKanbanVersionado(max_edad=60)
+    clave = ('SUPERVISOR', None)
+    tablero.registrar(clave, _contexto(('EN_PROCESO', {'id': 1})))
+    assert tablero.vigente(clave) is not None
+    snapshot_aislado.incrementar_version('OP 1 pasó a CONTROL_DE_CALIDAD')
+    assert tablero.vigente(clave) is None
+    assert tablero.delta(('OPERARIO', 7), None) is None
+
+
+def test_un_evento_de_op_invalida_el_tablero():
+    from app.services.eventos_produccion_service import BusEventos
+    bus = BusEventos()
+    tablero = TableroKanbanVersionado()
+    bus.agregar_oyente(tablero.invalidar)
+    clave = ('SUPERVISOR', None)
+    v1 = tablero.registrar(clave, _contexto(('EN_PROCESO', {'id': 1})))
+    # Con la vida por defecto el tablero sobrevive a varios polls de 15 s.
+    assert tablero.max_edad > 120 and tablero.vigente(clave) is not None
+
+    bus.publicar('op_estado', op_id=1, estado='CONTROL_DE_CALIDAD')
+
+    assert tablero.vigente(clave) is None
+    # El historial sigue sirviendo para el delta después de reconstruir.
+    tablero.registrar(clave, _contexto(('CONTROL_DE_CALIDAD', {'id': 1})))
+    assert [t['orden']['id'] for t in tablero.delta(clave, v1)['cambiadas']] == [1]
@@ -0,0 +1,93 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.services import mrp_service
+from app.services.mrp_service import MotorMRP, calcular_mrp
+
+HOY = date(2026, 1, 5)
+
+
+def _dia(n):
+    return (HOY + timedelta(days=n)).isoformat()
+
+
+def _ops():
+    return [{'id': i, 'receta_id': 10, 'cantidad_planificada': 5, 'fecha_inicio_planificada': _dia(d)}
+            for i, d in ((1, 1), (2, 3), (3, 10))]
+
+
+INGREDIENTES = [{'receta_id': 10, 'id_insumo': 'harina', 'cantidad': 2}]
+
+
+def test_netting_con_vencimientos_reservas_y_transito():
+    lotes = [
+        {'id_insumo': 'harina', 'cantidad_actual': 8, 'estado': 'disponible', 'f_vencimiento': _dia(2)},
+        {'id_insumo': 'harina', 'cantidad_actual': 10, 'estado': 'disponible', 'f_vencimiento': None},
+        {'id_insumo': 'harina', 'cantidad_actual': 50, 'estado': 'cuarentena', 'f_vencimiento': None},
+    ]
+    reservas = [{'orden_produccion_id': 1, 'insumo_id': 'harina', 'cantidad_reservada': 4}]
+    transito = [{'insumo_id': 'harina', 'cantidad_solicitada': 10, 'cantidad_recibida': 0,
+                 'fecha_estimada_entrega': _dia(8)}]
+
+    r = calcular_mrp(_ops(), INGREDIENTES, lotes, reservas, transito, hoy=HOY, horizonte_dias=14)
+
+    # OP 1 ya tiene 4 reservados: sólo demanda 6, que sale del lote que vence (FEFO); los 2 restantes se pierden.
+    assert r.bruto[0, [1, 3, 10]].tolist() == [6, 10, 10]
+    assert r.vencimientos[0, 2] == 2
+    assert r.saldo_proyectado('harina', _dia(3)) == 0
+    assert r.saldo_proyectado('harina', _dia(8)) == 10
+    assert r.faltantes() == []
+    assert all(r.cobertura_op({'id': i})['stock_ok'] for i in (1, 2, 3))
+
+    # Una OP nueva el día 4 no puede tomar nada sin dejar sin stock a la OP 3 (la OC llega el día 8).
+    cobertura = r.cobertura_op({'receta_id': 10, 'cantidad_planificada': 3, 'fecha_meta': _dia(4)})
+    assert cobertura['insumos_faltantes'] == [{'insumo_id': 'harina', 'cantidad_faltante': 6.0, 'fecha_faltante': _dia(4)}]
+
+
+def test_las_ops_anteriores_consumen_primero():
+    lotes = [{'id_insumo': 'harina', 'cantidad_actual': 15, 'estado': 'disponible'}]
+
+    r = calcular_mrp(_ops(), INGREDIENTES, lotes, [], [], hoy=HOY, horizonte_dias=14)
+
+    assert r.cobertura_op({'id': 1})['stock_ok']
+    assert r.cobertura_op({'id': 2})['insumos_faltantes'][0]['cantidad_faltante'] == 5
+    assert r.cobertura_op({'id': 3})['insumos_faltantes'][0]['cantidad_faltante'] == 10
+    # El grupo de OPs del MPS suma los faltantes de sus órdenes.
+    grupo = r.cobertura_op({'ordenes_ids': [2, 3]})
+    assert grupo['insumos_faltantes'] == [{'insumo_id': 'harina', 'cantidad_faltante': 15.0, 'fecha_faltante': _dia(3)}]
+    assert r.faltantes() == [{'id_insumo': 'harina', 'fecha_faltante': _dia(3), 'cantidad_faltante': 15.0, 'saldo_final': -15.0}]
+    # Sin datos de la receta no hay cobertura simulada.
+    assert r.cobertura_op({'receta_id': 99, 'cantidad_planificada': 1}) is None
+
+
+@pytest.fixture
+def fake_db(fake_db):
+    motor = mrp_service._motor
+    yield fake_db
+    mrp_service._motor = motor
+
+
+def test_motor_lee_el_plan_desde_la_base(fake_db):
+    hoy = date.today()
+    fake_db.seed('insumos_catalogo', [{'id_insumo': 'harina', 'nombre': 'Harina', 'tiempo_entrega_dias': 3}])
+    fake_db.seed('receta_ingredientes', [{'id': 1, 'receta_id': 10, 'id_insumo': 'harina', 'cantidad': 2}])
+    fake_db.seed('ordenes_produccion', [
+        {'id': 1, 'receta_id': 10, 'cantidad_planificada': 5, 'estado': 'EN ESPERA', 'fecha_meta': (hoy + timedelta(days=2)).isoformat()},
+        {'id': 2, 'receta_id': 10, 'cantidad_planificada': 5, 'estado': 'COMPLETADA', 'fecha_meta': hoy.isoformat()},
+    ])
+    fake_db.seed('insumos_inventario', [{'id_lote': 'l1', 'id_insumo': 'harina', 'cantidad_actual': 4, 'estado': 'disponible'}])
+    fake_db.seed('ordenes_compra', [{'id': 7, 'estado': 'APROBADA', 'fecha_emision': hoy.isoformat()}])
+    fake_db.seed('orden_compra_items', [{'id': 1, 'orden_compra_id': 7, 'insumo_id': 'harina',
+                                         'cantidad_solicitada': 20, 'cantidad_recibida': 0}])
+
+    motor = MotorMRP(horizonte_dias=10, cache_ttl=60)
+    r = motor.resultado()
+
+    assert r.bruto.sum() == 10  # la OP completada no demanda
+    # Sin fecha estimada, la OC llega a los 3 días (tiempo de entrega del insumo).
+    assert r.faltantes() == [{'id_insumo': 'harina', 'fecha_faltante': (hoy + timedelta(days=2)).isoformat(),
+                              'cantidad_faltante': 6.0, 'saldo_final': 14.0}]
+    fake_db.reset_counters()
+    assert motor.resultado() is r
+    assert fake_db.total_round_trips == 0
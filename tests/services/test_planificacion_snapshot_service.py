@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from app.models.orden_produccion import OrdenProduccionModel
+from app.services import planificacion_snapshot_service
+from app.services.planificacion_snapshot_service import SnapshotPlanificacion
+
+
+def test_snapshot_compartido_hasta_que_cambia_la_version():
+    snapshot = SnapshotPlanificacion(max_edad=60)
+    construcciones = []
+
+    def construir():
+        construcciones.append(1)
+        return {'mps_data': {'n': len(construcciones)}}
+
+    primero = snapshot.obtener('2026-W03', 7, construir)
+    assert snapshot.obtener('2026-W03', 7, construir) is primero
+    assert primero['version'] == 0 and len(construcciones) == 1
+    assert not snapshot.cambio_desde(0)
+
+    snapshot.incrementar_version('OP 1 pasó a LISTA PARA PRODUCIR')
+    assert snapshot.cambio_desde(0)
+    segundo = snapshot.obtener('2026-W03', 7, construir)
+    assert segundo['version'] == 1 and segundo['mps_data'] == {'n': 2}
+    # Otra semana u otro horizonte son snapshots distintos.
+    snapshot.obtener('2026-W03', 14, construir)
+    assert len(construcciones) == 3
+
+
+def test_reconstruccion_unica_con_requests_concurrentes():
+    snapshot = SnapshotPlanificacion(max_edad=60)
+    construcciones = []
+
+    def construir():
+        construcciones.append(1)
+        time.sleep(0.05)
+        return {'mps_data': {}}
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(snapshot.obtener('2026-W03', 7, construir)))
+             for _ in range(20)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(construcciones) == 1
+    assert all(r is resultados[0] for r in resultados)
+    # Los errores no se cachean.
+    assert snapshot.obtener('2026-W04', 7, lambda: None) is None
+    assert snapshot.obtener('2026-W04', 7, lambda: {'ok': True})['ok']
+
+
+@pytest.fixture
+def fake_db(fake_db):
+    snapshot = planificacion_snapshot_service._snapshot
+    planificacion_snapshot_service._snapshot = SnapshotPlanificacion()
+    fake_db.seed('ordenes_produccion', [{'id': 1, 'estado': 'EN ESPERA', 'cantidad_planificada': 5}])
+    yield fake_db
+    planificacion_snapshot_service._snapshot = snapshot
+
+
+def test_cambio_de_estado_de_op_incrementa_la_version(fake_db):
+    snapshot = planificacion_snapshot_service.get_snapshot_planificacion()
+
+    assert OrdenProduccionModel().cambiar_estado(1, 'LISTA PARA PRODUCIR')['success']
+    assert snapshot.version == 1
+    # Una escritura fallida no invalida los snapshots.
+    OrdenProduccionModel().update(99, {'estado': 'COMPLETADA'})
+    assert snapshot.version == 1
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from app.services.reposicion_service import PlanificadorReposicion, cantidad_a_reponer, necesita_reposicion
+
+
+@pytest.fixture
+def fake_db(fake_db):
+    fake_db.seed('roles', [{'id': 1, 'codigo': 'GERENTE', 'nombre': 'Gerente'}])
+    fake_db.seed('usuarios', [{'id': 1, 'nombre': 'Sistema', 'apellido': '', 'activo': True, 'role_id': 1}])
+    fake_db.seed('proveedores', [{'id': 1, 'codigo': 'PRV-0001', 'nombre': 'Default'},
+                            {'id': 2, 'codigo': 'PRV-0002', 'nombre': 'Molino'},
+                            {'id': 3, 'codigo': 'PRV-0003', 'nombre': 'Lácteos'}])
+    # 15 insumos bajo mínimo repartidos entre dos proveedores y "sin proveedor".
+    fake_db.seed('insumos_catalogo', [{
+        'id_insumo': f'00000000-0000-4000-8000-{i:012d}', 'nombre': f'Insumo {i}', 'activo': True,
+        'en_espera_de_reestock': False, 'stock_actual': 2, 'stock_min': 10, 'stock_max': 50,
+        'precio_unitario': 100, 'id_proveedor': [2, 3, None][i % 3],
+    } for i in range(15)])
+    return fake_db
+
+
+def test_reglas_de_reposicion():
+    assert necesita_reposicion({'stock_actual': 1, 'stock_min': 5})
+    assert not necesita_reposicion({'stock_actual': 1, 'stock_min': 5, 'en_espera_de_reestock': True})
+    assert not necesita_reposicion({'stock_actual': 5, 'stock_min': 5})
+    assert cantidad_a_reponer({'stock_actual': 2.5, 'stock_min': 10, 'stock_max': 50}) == 48
+    assert cantidad_a_reponer({'stock_actual': 2.5, 'stock_min': 10, 'stock_max': None}) == 8
+
+
+def test_una_oc_por_proveedor_por_ventana(fake_db):
+    planificador = PlanificadorReposicion(ventana=60)
+    for insumo in fake_db.tables['insumos_catalogo']:
+        assert planificador.notificar(dict(insumo))
+    assert planificador.pendientes() == 15
+    assert fake_db.total_round_trips == 0  # las señales no consultan la base
+
+    resultados = planificador.flush()
+
+    ocs = fake_db.tables['ordenes_compra']
+    assert sorted(oc['proveedor_id'] for oc in ocs) == [1, 2, 3]
+    assert sorted(r['items'] for r in resultados) == [5, 5, 5]
+    assert all(i['en_espera_de_reestock'] for i in fake_db.tables['insumos_catalogo'])
+    assert {item['cantidad_solicitada'] for item in fake_db.tables['orden_compra_items']} == {48}
+    assert fake_db.round_trips[('insumos_catalogo', 'select')] == 1
+
+    # En la ventana siguiente el usuario de sistema y PRV-0001 salen de la caché.
+    fake_db.tables['insumos_catalogo'][0]['en_espera_de_reestock'] = False
+    fake_db.reset_counters()
+    planificador.notificar(dict(fake_db.tables['insumos_catalogo'][0]))
+    planificador.flush()
+    assert len(fake_db.tables['ordenes_compra']) == 4
+    assert fake_db.round_trips[('proveedores', 'select')] == 1  # sólo los nombres
+    assert fake_db.round_trips[('usuarios', 'select')] == 1  # sólo los destinatarios del aviso
+    planificador.stop()
+
+
+def test_antirrebote_agrupa_senales():
+    llamadas = []
+    evaluado = threading.Event()
+
+    def evaluador(proveedores, default_id, usuario):
+        llamadas.append(proveedores)
+        evaluado.set()
+        return []
+
+    planificador = PlanificadorReposicion(ventana=0.05, evaluador=evaluador)
+    planificador._contexto = {'proveedor_default_id': 1, 'usuario': {'id': 1}}
+    planificador._contexto_expira = float('inf')
+    for i in range(15):
+        planificador.notificar({'id_insumo': f'i{i}', 'id_proveedor': [2, 3, None][i % 3],
+                                'stock_actual': 0, 'stock_min': 1})
+
+    assert evaluado.wait(2)
+    planificador.stop()
+    assert llamadas == [[1, 2, 3]]
@@ -0,0 +1,139 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import stock_ledger_service
+from app.services.stock_ledger_service import StockLedger, movimiento_inventario
+from benchmarks.seed import crear_checkpoint_inventario, inicializar_saldos_inventario, register_default_rpcs
+
+HARINA = '11111111-1111-4111-8111-111111111111'
+AZUCAR = '22222222-2222-4222-8222-222222222222'
+LOTE_HARINA = 'a0000000-0000-4000-8000-000000000001'
+LOTE_AZUCAR = 'a0000000-0000-4000-8000-000000000002'
+
+
+@pytest.fixture
+def fake_db(fake_db):
+    ledger = stock_ledger_service._ledger
+    fake_db.seed('insumos_catalogo', [{'id_insumo': HARINA, 'nombre': 'Harina'},
+                                      {'id_insumo': AZUCAR, 'nombre': 'Azúcar'}])
+    fake_db.seed('insumos_inventario', [
+        {'id_lote': LOTE_HARINA, 'id_insumo': HARINA, 'cantidad_inicial': 100, 'cantidad_actual': 100, 'estado': 'disponible'},
+        {'id_lote': LOTE_AZUCAR, 'id_insumo': AZUCAR, 'cantidad_inicial': 30, 'cantidad_actual': 30, 'estado': 'cuarentena'},
+    ])
+    inicializar_saldos_inventario(fake_db)
+    crear_checkpoint_inventario(fake_db, {})
+    register_default_rpcs(fake_db)
+    stock_ledger_service._ledger = StockLedger()
+    yield fake_db
+    stock_ledger_service._ledger = ledger
+
+
+def _modelo():
+    from app.models.inventario import InventarioModel
+    return InventarioModel()
+
+
+def test_saldos_y_tipos(fake_db):
+    ledger = stock_ledger_service.get_stock_ledger()
+    modelo = _modelo()
+    assert ledger.saldo_insumo(HARINA) == 100
+    assert ledger.saldo_insumo(AZUCAR) == 0
+
+    nuevo = modelo.create({'id_insumo': HARINA, 'cantidad_inicial': 50, 'cantidad_actual': 50, 'estado': 'disponible'})['data']
+    with movimiento_inventario('RESERVA', referencia_tipo='orden_produccion', referencia_id=7):
+        modelo.update(nuevo['id_lote'], {'cantidad_actual': 20}, 'id_lote')
+    with movimiento_inventario('RESERVA', referencia_tipo='orden_produccion', referencia_id=7):
+        modelo.update(nuevo['id_lote'], {'cantidad_actual': 30}, 'id_lote')  # rollback parcial
+    modelo.update(LOTE_AZUCAR, {'estado': 'disponible'}, 'id_lote')
+
+    movimientos = fake_db.tables['movimientos_inventario']
+    assert [m['tipo'] for m in movimientos] == ['INGRESO', 'RESERVA', 'LIBERACION', 'CUARENTENA_SALIDA']
+    assert movimientos[1]['referencia_id'] == '7'
+    assert [m['saldo_insumo'] for m in movimientos[:3]] == [150, 120, 130]
+    assert ledger.saldo_insumo(HARINA) == 130
+
+    # El mapa de stock es una lectura de la tabla de saldos, sin recorrer lotes.
+    fake_db.reset_counters()
+    stock = modelo.get_all_stock_disponible_map()['data']
+    assert {k: float(v) for k, v in stock.items()} == {HARINA: 130, AZUCAR: 30}
+    assert fake_db.total_round_trips == 1
+
+
+def test_una_operacion_registra_sus_lotes_en_una_sola_llamada(fake_db):
+    ledger = stock_ledger_service.get_stock_ledger()
+    modelo = _modelo()
+    llamadas = []
+    registrar = ledger.movimientos.registrar_cambios
+    ledger.movimientos.registrar_cambios = lambda cambios: llamadas.append(len(cambios)) or registrar(cambios)
+
+    with movimiento_inventario('RESERVA', referencia_tipo='orden_produccion', referencia_id=9):
+        nuevo = modelo.create({'id_insumo': HARINA, 'cantidad_inicial': 40, 'cantidad_actual': 40, 'estado': 'disponible'})['data']
+        modelo.update(LOTE_HARINA, {'cantidad_actual': 70}, 'id_lote')
+        modelo.update(LOTE_HARINA, {'cantidad_actual': 60}, 'id_lote')
+        assert llamadas == []
+        # Una lectura de saldos dentro del bloque ve lo ya escrito.
+        assert ledger.saldo_insumo(HARINA) == 100
+        modelo.update(nuevo['id_lote'], {'cantidad_actual': 25}, 'id_lote')
+
+    assert llamadas == [2, 1]
+    movimientos = fake_db.tables['movimientos_inventario']
+    assert [(m['tipo'], m['cantidad']) for m in movimientos] == [('INGRESO', 40), ('RESERVA', -40), ('RESERVA', -15)]
+    assert ledger.saldo_insumo(HARINA) == 85
+
+
+def test_escrituras_concurrentes_de_varios_procesos_no_desvian_el_saldo(fake_db):
+    modelo = _modelo()
+    # Cada hilo usa su propio libro, como si fueran procesos distintos.
+    libros = [StockLedger() for _ in range(8)]
+    barrera = threading.Barrier(len(libros))
+
+    def trabajar(i):
+        stock_ledger_service._ledger = libros[i]
+        barrera.wait()
+        for paso in range(10):
+            with movimiento_inventario('CONSUMO'):
+                modelo.update(LOTE_HARINA, {'cantidad_actual': 90 - i - paso}, 'id_lote')
+
+    hilos = [threading.Thread(target=trabajar, args=(i,)) for i in range(len(libros))]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    final = float(fake_db.tables['insumos_inventario'][0]['cantidad_actual'])
+    movimientos = [m for m in fake_db.tables['movimientos_inventario'] if m['id_lote'] == LOTE_HARINA]
+    # Los deltas suman exactamente el cambio real del lote y el saldo guardado coincide con él.
+    assert 100 + sum(m['cantidad'] for m in movimientos) == pytest.approx(final)
+    assert StockLedger().saldo_insumo(HARINA) == pytest.approx(final)
+    assert movimientos[-1]['saldo_insumo'] == pytest.approx(final)
+
+
+def test_checkpoint_y_stock_a_fecha(fake_db):
+    ledger = stock_ledger_service.get_stock_ledger()
+    modelo = _modelo()
+    with movimiento_inventario('CONSUMO'):
+        modelo.update(LOTE_HARINA, {'cantidad_actual': 60}, 'id_lote')
+    assert ledger.crear_checkpoint()['success']
+    with movimiento_inventario('MERMA'):
+        modelo.update(LOTE_HARINA, {'cantidad_actual': 55}, 'id_lote')
+
+    manana = datetime.now(timezone.utc) + timedelta(days=1)
+    resultado = ledger.stock_a_fecha(manana)
+    assert resultado['data'] == {HARINA: 55} and resultado['movimientos'] == 1
+    # Antes del primer checkpoint no hay historia.
+    assert not ledger.stock_a_fecha(datetime(2000, 1, 1, tzinfo=timezone.utc))['success']
+
+
+def test_conciliacion_registra_ajustes_por_desvios(fake_db):
+    ledger = stock_ledger_service.get_stock_ledger()
+    # Cambio hecho por fuera del modelo (p. ej. SQL manual).
+    fake_db.tables['insumos_inventario'][0]['cantidad_actual'] = 90
+
+    resultado = ledger.reconstruir_desde_lotes()
+
+    assert resultado == {'success': True, 'ajustes': 1}
+    assert fake_db.tables['movimientos_inventario'][-1]['tipo'] == 'AJUSTE'
+    assert ledger.saldo_insumo(HARINA) == 90
+    assert fake_db.tables['checkpoints_inventario'][-1]['saldos_insumos'] == {HARINA: 90}
@@ -0,0 +1,103 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from app.services.storage_service import AlmacenLocal, PipelineSubidas
+
+
+def _foto(color='red', tamanio=(1200, 800)):
+    salida = io.BytesIO()
+    Image.new('RGB', tamanio, color).save(salida, format='PNG')
+    return salida.getvalue()
+
+
+class AlmacenFalla(AlmacenLocal):
+    """Almacén local que puede estar caído o fallar las primeras subidas (o las de miniaturas)."""
+
+    def __init__(self, raiz, fallas=0, fallan_miniaturas=False):
+        super().__init__(raiz, 'https://cdn.test/storage')
+        self.caido = False
+        self.fallas = fallas
+        self.fallan_miniaturas = fallan_miniaturas
+        self.subidas = []
+        self._lock = threading.Lock()
+
+    def subir(self, bucket, ruta, contenido, content_type):
+        with self._lock:
+            if self.caido or self.fallas or (self.fallan_miniaturas and ruta.startswith('miniaturas/')):
+                self.fallas = max(self.fallas - 1, 0)
+                raise ConnectionError('storage caído')
+            self.subidas.append(ruta)
+        super().subir(bucket, ruta, contenido, content_type)
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    return AlmacenFalla(str(tmp_path))
+
+
+def test_la_url_devuelta_ya_existe_y_el_contenido_se_guarda_una_vez(almacen):
+    pipeline = PipelineSubidas(almacen, max_workers=2, tamanios_miniatura=(320, 64))
+    foto = _foto()
+
+    primero = pipeline.subir(foto, 'evidencias', 'IMG_0001.PNG', 'image/png')
+    # Al volver, el original ya está guardado; la ruta depende sólo del contenido.
+    assert primero['url'] == f"https://cdn.test/storage/evidencias/{primero['ruta']}"
+    assert primero['ruta'].endswith(f"{primero['sha256']}.png")
+    assert almacen.existe('evidencias', primero['ruta'])
+
+    # La misma foto subida a la vez desde varios hilos se transfiere una sola vez.
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        copias = list(pool.map(lambda n: pipeline.subir(foto, 'evidencias', f'copia_{n}.png', 'image/png'), range(4)))
+    otra = pipeline.subir(_foto('blue'), 'evidencias', 'azul.png', 'image/png')
+    assert all(c == primero for c in copias) and otra['url'] != primero['url']
+
+    # Dos originales y dos miniaturas de cada uno; la foto repetida no se volvió a transferir.
+    assert sorted(almacen.subidas) == sorted(set(almacen.subidas)) and len(almacen.subidas) == 6
+    for tamanio, url in primero['miniaturas'].items():
+        ruta = url.split('/evidencias/', 1)[1]
+        with Image.open(os.path.join(almacen.raiz, 'evidencias', *ruta.split('/'))) as miniatura:
+            assert max(miniatura.size) == tamanio and miniatura.format == 'JPEG'
+    pipeline.cerrar()
+
+
+def test_reintenta_y_solo_devuelve_miniaturas_guardadas(tmp_path):
+    almacen = AlmacenFalla(str(tmp_path), fallas=2)
+    pipeline = PipelineSubidas(almacen, espera_reintento=0.01)
+    resultado = pipeline.subir(b'%PDF-1.4 comprobante', 'comprobantes', 'pago.pdf', 'application/pdf')
+    assert resultado['miniaturas'] == {}
+    assert almacen.existe('comprobantes', resultado['ruta'])
+
+    almacen.fallan_miniaturas = True
+    foto = pipeline.subir(_foto(), 'evidencias', 'foto.png', 'image/png')
+    assert almacen.existe('evidencias', foto['ruta']) and foto['miniaturas'] == {}
+    pipeline.cerrar()
+
+
+def test_controller_informa_el_error_si_la_subida_falla(tmp_path, monkeypatch):
+    from werkzeug.datastructures import FileStorage
+    from app.controllers import storage_controller
+
+    almacen = AlmacenFalla(str(tmp_path))
+    almacen.caido = True
+    pipeline = PipelineSubidas(almacen, espera_reintento=0.01)
+    monkeypatch.setattr(storage_controller, 'get_pipeline_subidas', lambda: pipeline)
+
+    def subir():
+        archivo = FileStorage(io.BytesIO(_foto()), filename='foto.png', content_type='image/png')
+        return storage_controller.StorageController().upload_file(archivo, 'evidencias', 'lote_1/foto.png')
+
+    respuesta, status = subir()
+    assert status == 502 and not respuesta['success'] and almacen.subidas == []
+
+    # Un reintento posterior del mismo contenido vuelve a intentarlo.
+    almacen.caido = False
+    respuesta, status = subir()
+    assert status == 200 and respuesta['success']
+    assert respuesta['url'].startswith('https://cdn.test/storage/evidencias/')
+    assert almacen.existe('evidencias', respuesta['url'].split('/evidencias/', 1)[1])
+    pipeline.cerrar()
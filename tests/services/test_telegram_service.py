@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.telegram_service import TelegramDispatcher
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(server.delay)
+        with server.lock:
+            server.calls += 1
+            status = server.statuses.pop(0) if server.statuses else 200
+            if status == 200:
+                server.received.append(payload)
+        body = {'ok': status == 200}
+        if status == 429:
+            body['parameters'] = {'retry_after': 0}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_telegram():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTelegramHandler)
+    server.received, server.statuses, server.calls = [], [], 0
+    server.delay = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _dispatcher(server, **kwargs):
+    options = dict(bot_token='TOKEN', chat_id='42', api_url=f'http://127.0.0.1:{server.server_port}',
+                   coalesce_window=0.2, max_per_minute=600, backoff_base=0.01)
+    options.update(kwargs)
+    return TelegramDispatcher(**options)
+
+
+def test_rafaga_de_alertas_se_agrupa_en_un_resumen(fake_telegram):
+    dispatcher = _dispatcher(fake_telegram)
+    for i in range(10):
+        assert dispatcher.enqueue(f'Alerta ALR-{i}', key='alerta_riesgo')
+    dispatcher.enqueue('Otro aviso', key='otro')
+
+    assert dispatcher.flush(timeout=5)
+    dispatcher.stop()
+
+    assert len(fake_telegram.received) == 2
+    digest = next(p['text'] for p in fake_telegram.received if 'ALR-0' in p['text'])
+    assert 'Resumen: 10 notificaciones' in digest
+    assert all(f'ALR-{i}' in digest for i in range(10))
+    assert fake_telegram.received[0]['chat_id'] == '42'
+
+
+def test_reintenta_ante_errores_transitorios(fake_telegram):
+    fake_telegram.statuses = [500, 429]
+    dispatcher = _dispatcher(fake_telegram)
+    dispatcher.enqueue('Alerta con reintentos')
+
+    assert dispatcher.flush(timeout=5)
+    dispatcher.stop()
+
+    assert fake_telegram.calls == 3
+    assert [p['text'] for p in fake_telegram.received] == ['Alerta con reintentos']
+
+
+def test_no_reintenta_ante_errores_del_cliente(fake_telegram):
+    fake_telegram.statuses = [400]
+    dispatcher = _dispatcher(fake_telegram)
+    dispatcher.enqueue('Mensaje invalido')
+
+    assert dispatcher.flush(timeout=5)
+    dispatcher.stop()
+
+    assert fake_telegram.calls == 1
+    assert fake_telegram.received == []
+
+
+def test_encolar_no_bloquea_con_api_lenta(fake_telegram):
+    fake_telegram.delay = 1.0
+    dispatcher = _dispatcher(fake_telegram, coalesce_window=0)
+
+    inicio = time.monotonic()
+    for i in range(5):
+        dispatcher.enqueue(f'Alerta {i}')
+    assert time.monotonic() - inicio < 0.1
+
+    dispatcher.stop(timeout=0.1)
+
+
+def test_sin_configuracion_no_encola():
+    dispatcher = TelegramDispatcher(bot_token='', chat_id='')
+    assert dispatcher.enqueue('hola') is False
+
+
+def _etiquetas_balanceadas(html):
+    from app.services.telegram_service import _HTML_TAG_RE
+    pila = []
+    for match in _HTML_TAG_RE.finditer(html):
+        if not match.group(1):
+            pila.append(match.group(2))
+        elif not pila or pila.pop() != match.group(2):
+            return False
+    return not pila
+
+
+def test_resumen_largo_se_parte_sin_romper_el_html():
+    dispatcher = TelegramDispatcher(bot_token='TOKEN', chat_id='42')
+    mensajes = [f'<b>Alerta ALR-{i}</b>\nLote <code>L-{i}</code> vence &amp; requiere revisión' for i in range(150)]
+    # Una entrada que por sí sola supera el límite, con una etiqueta abierta a través de las líneas.
+    mensajes.append('<pre>' + '\n'.join(f'linea {i} <i>detalle</i> &lt;x&gt;' for i in range(400)) + '</pre>')
+
+    partes = dispatcher._build_digest(mensajes)
+
+    assert len(partes) > 2
+    for parte in partes:
+        assert len(parte) <= 4096
+        assert _etiquetas_balanceadas(parte)
+    texto = ''.join(partes)
+    assert all(f'ALR-{i}</b>' in texto for i in range(150))
+    assert all(f'linea {i} <i>detalle</i> &lt;x&gt;' in texto for i in range(400))
+
+
+def test_etiquetas_reabiertas_que_no_entran_no_pasan_el_limite():
+    dispatcher = TelegramDispatcher(bot_token='TOKEN', chat_id='42')
+    # La etiqueta abierta ocupa casi todo el límite: reabrirla en la parte siguiente no deja lugar al texto.
+    etiqueta = '<a href="' + 'x' * 4081 + '">'
+    partes = dispatcher._build_digest([etiqueta + 'palabra ' * 1000 + '</a>'])
+
+    assert all(len(parte) <= 4096 for parte in partes)
+    assert ''.join(partes).count('palabra') == 1000
+
+
+def test_el_motivo_de_la_alerta_se_escapa(monkeypatch):
+    from app.controllers import riesgo_controller
+    enviados = []
+    monkeypatch.setattr(riesgo_controller, 'notificar_telegram', lambda mensaje, key=None: enviados.append(mensaje))
+    monkeypatch.setattr(riesgo_controller.RoleModel, 'find_by_codigo', lambda self, codigo: {'success': False})
+
+    controller = riesgo_controller.RiesgoController.__new__(riesgo_controller.RiesgoController)
+    controller._enviar_notificaciones_alerta({'codigo': 'ALR-1', 'motivo': 'Lote <contaminado> & retenido',
+                                              'origen_tipo_entidad': 'lote_insumo', 'origen_id_entidad': 7})
+
+    assert 'Lote &lt;contaminado&gt; &amp; retenido' in enviados[0]
+    assert _etiquetas_balanceadas(enviados[0])
@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.webhook_service import ENVIADO, FALLIDO, DespachadorWebhooks
+
+
+class StubN8n:
+    """Servidor HTTP local que registra los webhooks recibidos y puede simular caídas y demoras."""
+
+    def __init__(self):
+        self.recibidos = []
+        self.puertos = set()
+        self.caido = False
+        self.demora = 0.0
+        self.en_vuelo = {}
+        self.max_en_vuelo = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                cuerpo = self.rfile.read(int(self.headers['Content-Length']))
+                with stub._lock:
+                    stub.puertos.add(self.client_address[1])
+                    stub.en_vuelo[self.path] = stub.en_vuelo.get(self.path, 0) + 1
+                    stub.max_en_vuelo[self.path] = max(stub.max_en_vuelo.get(self.path, 0), stub.en_vuelo[self.path])
+                time.sleep(stub.demora)
+                if stub.caido:
+                    status = 503
+                elif self.path == '/webhook/malo':
+                    status = 400
+                else:
+                    status = 200
+                    with stub._lock:
+                        stub.recibidos.append((self.path, int(self.headers['X-Webhook-Id']), json.loads(cuerpo)))
+                with stub._lock:
+                    stub.en_vuelo[self.path] -= 1
+                self.send_response(status)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    stub = StubN8n()
+    yield stub
+    stub.cerrar()
+
+
+def test_no_se_pierden_eventos_entre_reinicios(stub, tmp_path):
+    path = str(tmp_path / 'outbox.sqlite3')
+    stub.caido = True
+    primero = DespachadorWebhooks(path, max_workers=4, espera_base=0.05, espera_max=0.2, intervalo=0.05)
+    primero.iniciar()
+    ids = [primero.encolar(f"{stub.url}/webhook/op", {'op_id': i}) for i in range(30)]
+    time.sleep(0.3)  # n8n caído: todo se reintenta
+    primero.detener()
+    # Un evento quedó tomado por un worker que murió a mitad del envío.
+    huerfano = primero.encolar(f"{stub.url}/webhook/op", {'op_id': 'huerfano'})
+    primero._conexion().execute("UPDATE outbox SET estado = 'ENVIANDO', tomado_en = ? WHERE id = ?", (time.time(), huerfano))
+    assert stub.recibidos == []
+
+    stub.caido = False
+    segundo = DespachadorWebhooks(path, max_workers=4, espera_base=0.05, espera_max=0.2, intervalo=0.05, lease=0.3)
+    segundo.iniciar()
+    assert segundo.esperar(10)
+    segundo.detener()
+
+    assert sorted(evento_id for _, evento_id, _ in stub.recibidos) == sorted(ids + [huerfano])
+    assert segundo.resumen() == {ENVIADO: 31}
+
+
+def test_limite_por_endpoint_keep_alive_y_errores_permanentes(stub, tmp_path):
+    stub.demora = 0.02
+    despachador = DespachadorWebhooks(str(tmp_path / 'outbox.sqlite3'), max_workers=6, max_por_endpoint=2,
+                                      espera_base=0.05, intervalo=0.05)
+    for i in range(20):
+        despachador.encolar(f"{stub.url}/webhook/op", {'n': i})
+        despachador.encolar(f"{stub.url}/webhook/oc", {'n': i})
+    malo = despachador.encolar(f"{stub.url}/webhook/malo", {'n': 0})
+    despachador.iniciar()
+    assert despachador.esperar(10)
+    despachador.detener()
+
+    assert len(stub.recibidos) == 40
+    assert stub.max_en_vuelo['/webhook/op'] <= 2 and stub.max_en_vuelo['/webhook/oc'] <= 2
+    # Las conexiones se reutilizan: como mucho una por worker.
+    assert len(stub.puertos) <= 6
+    fila = despachador._conexion().execute("SELECT estado, intentos FROM outbox WHERE id = ?", (malo,)).fetchone()
+    assert fila == (FALLIDO, 1)
+
+
+def test_un_endpoint_saturado_no_tapa_a_los_demas(tmp_path):
+    despachador = DespachadorWebhooks(str(tmp_path / 'outbox.sqlite3'), max_por_endpoint=2)
+    for i in range(120):
+        despachador.encolar('http://n8n/webhook/lento', {'n': i})
+    otro = despachador.encolar('http://n8n/webhook/oc', {'n': 0})
+
+    tomados = [despachador._tomar() for _ in range(3)]
+
+    # Los dos primeros ocupan el cupo del endpoint lento; el tercero es del otro, aunque quede fuera de los primeros 50.
+    assert [t[1] for t in tomados] == ['http://n8n/webhook/lento'] * 2 + ['http://n8n/webhook/oc']
+    assert tomados[2][0] == otro
+    assert despachador._tomar() is None
+
+
+def test_la_reserva_se_libera_si_la_toma_falla(tmp_path):
+    import sqlite3
+    despachador = DespachadorWebhooks(str(tmp_path / 'outbox.sqlite3'), max_por_endpoint=1)
+    despachador.encolar('http://n8n/webhook/op', {'n': 0})
+    conn = despachador._conexion()
+    conn.execute("CREATE TRIGGER falla BEFORE UPDATE ON outbox WHEN NEW.estado = 'ENVIANDO' "
+                 "BEGIN SELECT RAISE(ABORT, 'disco lleno'); END")
+    with pytest.raises(sqlite3.DatabaseError):
+        despachador._tomar()
+    assert despachador._en_vuelo['http://n8n/webhook/op'] == 0
+
+    conn.execute("DROP TRIGGER falla")
+    assert despachador._tomar() is not None
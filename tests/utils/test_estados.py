@@ -4,7 +4,11 @@ from app.utils.estados import (
     traducir_a_cadena,
     OV_MAP_STRING_TO_INT,
     OC_MAP_STRING_TO_INT,
-    OP_MAP_STRING_TO_INT
+    OP_MAP_STRING_TO_INT,
+    CREDITO_ALERTADO,
+    CREDITO_NORMAL,
+    estado_crediticio_por_vencidos,
+    calcular_transiciones_crediticias,
 )
 
 # Construir los diccionarios inversos dinámicamente
@@ -41,3 +45,19 @@ class TestEstados:
     def test_valores_invalidos(self):
         assert traducir_a_int('ESTADO_INEXISTENTE', 'OV') is None
         assert traducir_a_cadena(9999, 'OC') is None
+
+
+class TestEstadoCrediticio:
+    def test_supera_umbral_queda_alertado(self):
+        assert estado_crediticio_por_vencidos(3, 2) == CREDITO_ALERTADO
+        assert estado_crediticio_por_vencidos(2, 2) == CREDITO_NORMAL
+
+    def test_transiciones_solo_incluyen_cambios(self):
+        clientes = [
+            {'id': 1, 'estado_crediticio': 'normal'},
+            {'id': 2, 'estado_crediticio': 'alertado'},
+            {'id': 3, 'estado_crediticio': 'alertado'},
+            {'id': 4, 'estado_crediticio': None},
+        ]
+        transiciones = calcular_transiciones_crediticias(clientes, {1: 5, 2: 4}, 2)
+        assert transiciones == {CREDITO_ALERTADO: [1], CREDITO_NORMAL: [3, 4]}
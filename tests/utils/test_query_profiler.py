@@ -0,0 +1,70 @@
+import httpx
+import pytest
+from flask import Flask
+
+from app.utils import query_profiler
+from app.utils.query_profiler import init_query_profiler, instrument_session
+
+
+def _fake_postgrest():
+    def handler(request):
+        return httpx.Response(200, json=[{'id': 1, 'nombre': 'Harina'}])
+    session = httpx.Client(base_url='http://supabase.local/rest/v1', transport=httpx.MockTransport(handler))
+    return instrument_session(session)
+
+
+@pytest.fixture(autouse=True)
+def limpiar_estadisticas():
+    query_profiler.stats.reset()
+    yield
+    query_profiler.stats.reset()
+
+
+def test_sin_perfil_activo_no_registra_nada():
+    session = _fake_postgrest()
+    session.get('/insumos_catalogo', params={'id_insumo': 'eq.1'})
+    assert query_profiler.current_profile() is None
+
+
+def test_detecta_formas_repetidas_como_n_mas_uno():
+    session = _fake_postgrest()
+    token = query_profiler.start_profile(1.0)
+    try:
+        for i in range(6):
+            session.get('/insumos_catalogo', params={'select': '*', 'id_insumo': f'eq.{i}'})
+        session.post('/rpc/get_stock', json={})
+        profile = query_profiler.current_profile()
+    finally:
+        query_profiler._current_profile.reset(token)
+
+    assert len(profile.queries) == 7
+    assert profile.queries[0].table == 'insumos_catalogo'
+    assert profile.queries[0].method == 'select'
+    assert profile.queries[0].size > 0
+    assert profile.queries[-1].method == 'rpc'
+    suspects = profile.n_plus_one_suspects(5)
+    assert list(suspects.values()) == [6]
+    assert 'id_insumo=eq.?' in next(iter(suspects))
+
+
+def test_agrega_server_timing_y_estadisticas_por_ruta():
+    app = Flask(__name__)
+    app.config['QUERY_PROFILER_N1_THRESHOLD'] = 3
+    init_query_profiler(app)
+    session = _fake_postgrest()
+
+    @app.route('/pedidos/<int:pedido_id>')
+    def detalle(pedido_id):
+        for i in range(3):
+            session.get('/pedido_items', params={'pedido_id': f'eq.{pedido_id}', 'id': f'eq.{i}'})
+        return 'ok'
+
+    with app.test_client() as client:
+        response = client.get('/pedidos/7')
+
+    assert 'db;dur=' in response.headers['Server-Timing']
+    assert '3 consultas' in response.headers['Server-Timing']
+    snapshot = query_profiler.stats.snapshot()
+    assert snapshot['rutas']['/pedidos/<int:pedido_id>']['consultas_p50'] == 3
+    assert snapshot['tablas']['pedido_items']['muestras'] == 3
+    assert snapshot['n_plus_one'][0]['ruta'] == '/pedidos/<int:pedido_id>'
@@ -0,0 +1,30 @@
+import pytest
+
+from app.utils.lazy_import import MODULOS_PESADOS, disponible, lazy_import
+from app.utils.startup_profiler import perfilar_arranque
+
+# Cota muy holgada: hoy el arranque en frío ronda 1,4 s; con pandas, OpenCV y xhtml2pdf superaba los 2,5 s.
+# Lo que se verifica de verdad es sys.modules; el tiempo sólo ataja una regresión grosera.
+MAX_SEGUNDOS_ARRANQUE = 15.0
+
+
+def test_create_app_no_carga_librerias_pesadas():
+    perfil = perfilar_arranque(env={'SUPABASE_URL': 'https://x.supabase.co', 'SUPABASE_KEY': 'abc'})
+
+    assert perfil['pesados_cargados'] == []
+    assert perfil['segundos'] < MAX_SEGUNDOS_ARRANQUE
+    importados = {r['modulo'].split('.')[0] for r in perfil['modulos']}
+    assert importados.isdisjoint(MODULOS_PESADOS)
+    assert 'app' in importados
+
+
+def test_modulo_diferido_se_importa_en_el_primer_uso():
+    json_diferido = lazy_import('json')
+    assert 'diferido' in repr(json_diferido)
+    assert json_diferido.dumps([1]) == '[1]'
+    assert 'cargado' in repr(json_diferido)
+
+    faltante = lazy_import('modulo_que_no_existe_xyz')
+    assert not disponible(faltante) and not disponible(None)
+    with pytest.raises(ImportError):
+        faltante.algo